@@ -0,0 +1,176 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Placement simulation for the deployer plugins
+
+Places resources with random sizes on a simulated cluster of nodes in
+several sites and racks. Nodes report their storage pool data only every
+few placements, like nodes that run update_pool_data() after deploying
+their assignments. Reports the balance of the storage pool usage, the
+spread of each resource's replicas over sites and racks and the decision
+latency of deploy_select() for each deployer.
+
+Usage: deployer_placement.py [placements] [nodes] [report-interval]
+"""
+
+import random
+import sys
+import time
+
+from drbdmanage.deployers import BalancedDeployer, ReservationDeployer
+from drbdmanage.drbd.drbdcore import DrbdNode
+from drbdmanage.exceptions import DM_SUCCESS
+from drbdmanage.propscontainer import PropsContainer
+import drbdmanage.consts as consts
+
+DEFAULT_PLACEMENTS      = 10000
+DEFAULT_NODES           = 64
+# Number of placements between two storage pool reports of a node
+DEFAULT_REPORT_INTERVAL = 50
+
+SITES       = 2
+RACKS       = 4
+REPLICAS    = 3
+POOL_KIB    = 16 * 1024 * 1024 * 1024
+MIN_RES_KIB = 1024 * 1024
+MAX_RES_KIB = 64 * 1024 * 1024
+RANDOM_SEED = 4711
+
+
+def get_serial():
+    return 1
+
+
+def build_nodes(node_count):
+    nodes = {}
+    for node_idx in xrange(node_count):
+        node_name = "node%03d" % (node_idx)
+        node = DrbdNode(
+            node_name, "10.0.%d.%d" % (node_idx / 250, node_idx % 250 + 1),
+            consts.AF_IPV4, node_idx, DrbdNode.FLAG_STORAGE,
+            POOL_KIB, POOL_KIB, get_serial, None, None
+        )
+        props = node.get_props()
+        props.set_prop(
+            consts.KEY_SITE, "site%d" % (node_idx % SITES),
+            PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+        )
+        props.set_prop(
+            consts.AUX_PROP_PREFIX + "rack",
+            "rack%d" % ((node_idx / SITES) % RACKS)
+        )
+        nodes[node_name] = node
+    return nodes
+
+
+def simulate(deployer, placements, node_count, report_interval):
+    """
+    Places resources using the deployer
+
+    @return: tuple (placed, storage used per node, sites per resource,
+             racks per resource, deploy_select() latencies)
+    """
+    rnd = random.Random(RANDOM_SEED)
+    nodes = build_nodes(node_count)
+    used = dict([(node_name, 0) for node_name in nodes.iterkeys()])
+    site_spread = []
+    rack_spread = []
+    latencies = []
+    placed = 0
+    for placement_idx in xrange(placements):
+        size_kiB = rnd.randint(MIN_RES_KIB, MAX_RES_KIB)
+        selected = []
+        start = time.time()
+        fn_rc = deployer.deploy_select(nodes, selected, REPLICAS, size_kiB, False)
+        latencies.append(time.time() - start)
+        if fn_rc == DM_SUCCESS:
+            placed += 1
+            sites = set()
+            racks = set()
+            for node in selected:
+                used[node.get_name()] += size_kiB
+                props = node.get_props()
+                site = props.get_prop(
+                    consts.KEY_SITE,
+                    PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+                )
+                sites.add(site)
+                # Racks of different sites are different racks
+                racks.add((site, props.get_prop(consts.AUX_PROP_PREFIX + "rack")))
+            site_spread.append(len(sites))
+            rack_spread.append(len(racks))
+        # Each node reports its storage pool data once per report interval
+        for (node_idx, node_name) in enumerate(sorted(nodes.iterkeys())):
+            if (placement_idx + node_idx) % report_interval == 0:
+                nodes[node_name].set_pool(POOL_KIB, max(0, POOL_KIB - used[node_name]))
+    return placed, used, site_spread, rack_spread, latencies
+
+
+def main():
+    placements      = DEFAULT_PLACEMENTS
+    node_count      = DEFAULT_NODES
+    report_interval = DEFAULT_REPORT_INTERVAL
+    if len(sys.argv) >= 2:
+        placements = int(sys.argv[1])
+    if len(sys.argv) >= 3:
+        node_count = int(sys.argv[2])
+    if len(sys.argv) >= 4:
+        report_interval = int(sys.argv[3])
+
+    reservation_deployer = ReservationDeployer(None)
+    reservation_deployer.set_config({
+        ReservationDeployer.KEY_FAILURE_DOMAIN: "rack"
+    })
+    deployers = [
+        ("balanced-deployer", BalancedDeployer(None)),
+        ("reservation-deployer", reservation_deployer),
+    ]
+    sys.stdout.write(
+        "%d placements, %d nodes, %d replicas, report interval %d\n"
+        % (placements, node_count, REPLICAS, report_interval)
+    )
+    sys.stdout.write(
+        "%-22s %8s %10s %10s %8s %8s %10s %10s\n"
+        % ("deployer", "placed", "min used", "max used", "sites", "racks",
+           "mean [us]", "p99 [us]")
+    )
+    for (name, deployer) in deployers:
+        placed, used, site_spread, rack_spread, latencies = simulate(
+            deployer, placements, node_count, report_interval
+        )
+        used_pct = [(100.0 * value) / POOL_KIB for value in used.itervalues()]
+        latencies.sort()
+        mean_lat = sum(latencies) / len(latencies)
+        p99_lat = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        mean_sites = 0.0
+        mean_racks = 0.0
+        if len(rack_spread) > 0:
+            mean_sites = float(sum(site_spread)) / len(site_spread)
+            mean_racks = float(sum(rack_spread)) / len(rack_spread)
+        sys.stdout.write(
+            "%-22s %8d %9.1f%% %9.1f%% %8.2f %8.2f %10.1f %10.1f\n"
+            % (name, placed, min(used_pct), max(used_pct), mean_sites,
+               mean_racks, mean_lat * 1000000, p99_lat * 1000000)
+        )
+
+
+if __name__ == "__main__":
+    main()
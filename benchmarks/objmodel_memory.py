@@ -0,0 +1,160 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Memory footprint of drbdmanage's object model
+
+Builds synthetic clusters of increasing size from the same objects the
+server loads from the control volume and reports the growth of the
+process' resident set size per cluster and per volume state.
+
+Usage: objmodel_memory.py [nodes] [volumes-per-resource] [replicas]
+"""
+
+import gc
+import sys
+
+from drbdmanage.drbd.drbdcore import (
+    DrbdNode, DrbdResource, DrbdVolume, DrbdVolumeState, Assignment
+)
+from drbdmanage.storage.storagecore import MinorNr
+import drbdmanage.consts as consts
+
+# Number of resources of the clusters that are built
+CLUSTER_SIZES = [1000, 5000, 10000, 25000]
+
+DEFAULT_NODES    = 32
+DEFAULT_VOLUMES  = 2
+DEFAULT_REPLICAS = 3
+
+VOLUME_SIZE_KIB = 1048576
+PORT_BASE       = 7000
+
+
+def get_serial():
+    return 1
+
+
+def get_rss_kiB():
+    """
+    Returns the resident set size of the process in kiB
+    """
+    rss_kiB = 0
+    with open("/proc/self/status") as status_file:
+        for line in status_file:
+            if line.startswith("VmRSS:"):
+                rss_kiB = int(line.split()[1])
+                break
+    return rss_kiB
+
+
+def build_cluster(node_count, res_count, vol_count, replicas):
+    """
+    Builds a cluster of nodes and resources that are assigned to nodes
+
+    @return: tuple (nodes, resources, number of volume states)
+    """
+    nodes = {}
+    for node_idx in xrange(node_count):
+        node_name = "node%03d" % (node_idx)
+        nodes[node_name] = DrbdNode(
+            node_name, "10.0.%d.%d" % (node_idx / 250, node_idx % 250 + 1),
+            consts.AF_IPV4, node_idx, 0, 0, 0,
+            get_serial, None, None
+        )
+    node_list = [nodes[name] for name in sorted(nodes.iterkeys())]
+
+    resources = {}
+    vol_state_count = 0
+    minor_nr = 100
+    for res_idx in xrange(res_count):
+        res_name = "res%06d" % (res_idx)
+        volumes = []
+        for vol_id in xrange(vol_count):
+            volumes.append(
+                DrbdVolume(
+                    vol_id, VOLUME_SIZE_KIB, MinorNr(minor_nr), 0,
+                    get_serial, None, None
+                )
+            )
+            minor_nr += 1
+        resource = DrbdResource(
+            res_name, PORT_BASE + res_idx, "secret", 0, volumes,
+            get_serial, None, None
+        )
+        resources[res_name] = resource
+        for replica_idx in xrange(replicas):
+            node = node_list[(res_idx + replica_idx) % node_count]
+            vol_states = []
+            for volume in volumes:
+                bd_name = "%s_%02d" % (res_name, volume.get_id())
+                vol_states.append(
+                    DrbdVolumeState(
+                        volume, 0, 0, bd_name, "/dev/drbdpool/" + bd_name,
+                        get_serial, None, None
+                    )
+                )
+            assignment = Assignment(
+                node, resource, replica_idx, 0, 0, 0, vol_states,
+                get_serial, None, None
+            )
+            node.init_add_assignment(assignment)
+            resource.init_add_assignment(assignment)
+            vol_state_count += len(vol_states)
+    return nodes, resources, vol_state_count
+
+
+def main():
+    node_count = DEFAULT_NODES
+    vol_count  = DEFAULT_VOLUMES
+    replicas   = DEFAULT_REPLICAS
+    if len(sys.argv) >= 2:
+        node_count = int(sys.argv[1])
+    if len(sys.argv) >= 3:
+        vol_count = int(sys.argv[2])
+    if len(sys.argv) >= 4:
+        replicas = int(sys.argv[3])
+    replicas = min(replicas, node_count)
+
+    sys.stdout.write(
+        "%d nodes, %d volumes per resource, %d replicas\n"
+        % (node_count, vol_count, replicas)
+    )
+    sys.stdout.write(
+        "%10s %12s %12s %14s\n"
+        % ("resources", "vol-states", "RSS [kiB]", "B/vol-state")
+    )
+    for res_count in CLUSTER_SIZES:
+        gc.collect()
+        base_rss = get_rss_kiB()
+        cluster = build_cluster(node_count, res_count, vol_count, replicas)
+        gc.collect()
+        cluster_rss = get_rss_kiB() - base_rss
+        vol_state_count = cluster[2]
+        sys.stdout.write(
+            "%10d %12d %12d %14d\n"
+            % (res_count, vol_state_count, cluster_rss,
+               (cluster_rss * 1024) / max(vol_state_count, 1))
+        )
+        del cluster
+
+
+if __name__ == "__main__":
+    main()
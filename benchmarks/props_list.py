@@ -0,0 +1,105 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Property access in the list_* code paths
+
+Times the steps the server's list_nodes, list_resources and
+list_assignments functions perform for each object: the serial number
+filter, reading integer properties and generating the properties views.
+Run the script on two revisions to compare them.
+
+Usage: props_list.py [resources] [rounds]
+"""
+
+import sys
+import timeit
+
+from objmodel_memory import build_cluster
+from drbdmanage.utils import serial_filter
+import drbdmanage.consts as consts
+
+DEFAULT_RESOURCES = 5000
+DEFAULT_ROUNDS    = 10
+
+NODE_COUNT = 32
+VOL_COUNT  = 2
+REPLICAS   = 3
+
+
+def list_objects(objects, serial):
+    """
+    Generates the properties views like the server's list_* functions
+    """
+    obj_list = []
+    if serial > 0:
+        objects = serial_filter(serial, objects)
+    for obj in objects:
+        obj_list.append(obj.get_properties(None))
+    return obj_list
+
+
+def read_fail_counts(assignments):
+    """
+    Reads an integer property like the fail count checks of the server
+    """
+    total = 0
+    for assg in assignments:
+        total += assg.get_props().get_int_or_default(consts.FAIL_COUNT, 0)
+    return total
+
+
+def main():
+    res_count = DEFAULT_RESOURCES
+    rounds    = DEFAULT_ROUNDS
+    if len(sys.argv) >= 2:
+        res_count = int(sys.argv[1])
+    if len(sys.argv) >= 3:
+        rounds = int(sys.argv[2])
+
+    nodes, resources, _ = build_cluster(
+        NODE_COUNT, res_count, VOL_COUNT, REPLICAS
+    )
+    assignments = []
+    for resource in resources.itervalues():
+        for assg in resource.iterate_assignments():
+            assg.get_props().set_prop(consts.FAIL_COUNT, "1")
+            assignments.append(assg)
+
+    tests = [
+        ("list_nodes", lambda: list_objects(nodes.itervalues(), 0)),
+        ("list_resources", lambda: list_objects(resources.itervalues(), 0)),
+        ("list_assignments", lambda: list_objects(assignments, 0)),
+        # Every object has serial 1, so the filter selects no objects
+        ("list_resources serial", lambda: list_objects(resources.itervalues(), 1)),
+        ("list_assignments serial", lambda: list_objects(assignments, 1)),
+        ("get_int_or_default", lambda: read_fail_counts(assignments)),
+    ]
+    sys.stdout.write(
+        "%d resources, %d assignments, %d rounds\n"
+        % (len(resources), len(assignments), rounds)
+    )
+    for (name, test_fn) in tests:
+        elapsed = min(timeit.repeat(test_fn, number=1, repeat=rounds))
+        sys.stdout.write("%-26s %10.2f ms\n" % (name, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
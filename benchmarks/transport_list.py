@@ -0,0 +1,147 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+list_assignments through D-Bus and through the RPC socket
+
+Without arguments, encodes and decodes a list_assignments reply of a
+simulated cluster like the transports do: D-Bus marshalling, and the
+framed JSON (and msgpack, if installed) messages of the RPC socket.
+
+With --live, calls list_assignments of a running server through both
+transports. The server's rpc-socket setting must be enabled.
+
+Usage: transport_list.py [resources] [rounds]
+       transport_list.py --live [rounds] [socket path]
+"""
+
+import sys
+import timeit
+
+import dbus
+import dbus.lowlevel
+from objmodel_memory import build_cluster
+import drbdmanage.rpc as rpc
+from drbdmanage.consts import DBUS_DRBDMANAGED, DBUS_SERVICE, DEFAULT_RPC_SOCKET
+from drbdmanage.exceptions import DM_SUCCESS
+
+DEFAULT_RESOURCES = 5000
+DEFAULT_ROUNDS    = 10
+
+NODE_COUNT = 32
+VOL_COUNT  = 2
+REPLICAS   = 3
+
+# Signature of the list_assignments reply, see DBusServer.list_assignments()
+REPLY_SIGNATURE = "a(isa(ss))" "a(ssa{ss}a(ia{ss}))"
+
+
+def build_reply(resources):
+    """
+    Generates the list_assignments reply like the server
+    """
+    assg_list = []
+    for resource in resources.itervalues():
+        for assg in resource.iterate_assignments():
+            vol_state_list = []
+            for vol_state in assg.iterate_volume_states():
+                vol_state_list.append(
+                    [vol_state.get_id(), dict(vol_state.get_properties(None))]
+                )
+            assg_list.append([
+                assg.get_node().get_name(), assg.get_resource().get_name(),
+                dict(assg.get_properties(None)), vol_state_list
+            ])
+    return [[DM_SUCCESS, "", []]], assg_list
+
+
+def dbus_roundtrip(reply):
+    msg = dbus.lowlevel.SignalMessage(DBUS_SERVICE, DBUS_DRBDMANAGED, "reply")
+    msg.append(*reply, signature=REPLY_SIGNATURE)
+    return msg.get_args_list()
+
+
+def rpc_roundtrip(codec, reply):
+    data = rpc.frame(codec.encode({"jsonrpc": "2.0", "id": 1, "result": reply}))
+    # Clients use the decoded unicode strings like the dbus.String objects
+    # of D-Bus replies, only the server converts the requests, see to_str()
+    return codec.decode(data[rpc.FRAME_HEADER.size:])
+
+
+def run_offline(res_count, rounds):
+    nodes, resources, _ = build_cluster(
+        NODE_COUNT, res_count, VOL_COUNT, REPLICAS
+    )
+    reply = build_reply(resources)
+    tests = [
+        ("dbus marshalling", lambda: dbus_roundtrip(reply)),
+        ("rpc json", lambda: rpc_roundtrip(rpc.JsonCodec, reply)),
+    ]
+    if rpc.msgpack is not None:
+        tests.append(("rpc msgpack", lambda: rpc_roundtrip(rpc.MsgpackCodec, reply)))
+    sys.stdout.write(
+        "%d resources, %d assignments, %d rounds\n"
+        % (len(resources), len(reply[1]), rounds)
+    )
+    for (name, test_fn) in tests:
+        elapsed = min(timeit.repeat(test_fn, number=1, repeat=rounds))
+        sys.stdout.write("%-26s %10.2f ms\n" % (name, elapsed * 1000))
+
+
+def run_live(rounds, path):
+    dbus_server = dbus.SystemBus().get_object(DBUS_DRBDMANAGED, DBUS_SERVICE)
+    tests = [("dbus", dbus_server)]
+    json_client = rpc.RpcClient(path, use_msgpack=False)
+    tests.append(("rpc json", json_client))
+    if rpc.msgpack is not None:
+        tests.append(("rpc msgpack", rpc.RpcClient(path)))
+
+    server_rc, assg_list = json_client.list_assignments([], [], 0, {}, [])
+    sys.stdout.write("%d assignments, %d rounds\n" % (len(assg_list), rounds))
+    for (name, server) in tests:
+        test_fn = lambda: server.list_assignments(
+            dbus.Array([], signature="s"), dbus.Array([], signature="s"), 0,
+            dbus.Dictionary({}, signature="ss"), dbus.Array([], signature="s")
+        )
+        elapsed = min(timeit.repeat(test_fn, number=1, repeat=rounds))
+        sys.stdout.write("%-26s %10.2f ms\n" % (name, elapsed * 1000))
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "--live":
+        rounds = DEFAULT_ROUNDS
+        path   = DEFAULT_RPC_SOCKET
+        if len(sys.argv) >= 3:
+            rounds = int(sys.argv[2])
+        if len(sys.argv) >= 4:
+            path = sys.argv[3]
+        run_live(rounds, path)
+    else:
+        res_count = DEFAULT_RESOURCES
+        rounds    = DEFAULT_ROUNDS
+        if len(sys.argv) >= 2:
+            res_count = int(sys.argv[1])
+        if len(sys.argv) >= 3:
+            rounds = int(sys.argv[2])
+        run_offline(res_count, rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from bisect import bisect_left, insort
+from drbdmanage.propscontainer import PropsContainer
+from drbdmanage.utils import is_set
+from drbdmanage.drbd.drbdcore import DrbdNode
+
+
+class CapacityIndex(object):
+
+    """
+    Index of the storage pool capacity of the nodes, per site
+
+    For each site, and for all nodes regardless of their site, the index
+    keeps the known amount of free space of the storage nodes in a sorted
+    list, and the sum of the storage pool sizes of all nodes.
+    Nodes update their entries whenever their storage pool or their state
+    changes, see DrbdNode.set_capacity_index().
+    """
+
+    # Key of the entries for all nodes, regardless of their site
+    ALL_SITES = None
+
+    # Nodes map the index was built from
+    _nodes      = None
+    # site = sorted list of (poolfree, node name) of the storage nodes
+    #        with known free space
+    _free       = None
+    # site = sum of the known storage pool sizes
+    _total      = None
+    # node name = (site, poolsize, free space entry or None)
+    _entries    = None
+
+    def __init__(self, nodes):
+        """
+        Builds the index for the nodes in a nodes map
+
+        @param   nodes: the server's nodes map
+        """
+        self._nodes   = nodes
+        self._free    = {self.ALL_SITES: []}
+        self._total   = {self.ALL_SITES: 0}
+        self._entries = {}
+        for node in nodes.itervalues():
+            self.update(node)
+            node.set_capacity_index(self)
+
+    def uses_nodes(self, nodes):
+        """
+        Checks whether the index was built from the specified nodes map
+        """
+        return self._nodes is nodes
+
+    @staticmethod
+    def get_site(node):
+        """
+        Returns the key of the site a node belongs to; None if it has no site
+        """
+        ns = PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+        node_site = node.get_props().get_prop('site', ns)
+        return node_site.strip() if node_site else None
+
+    @classmethod
+    def site_key(cls, allowed_site):
+        """
+        Returns the key of the entries for a site selection
+
+        @param   allowed_site: site name; empty for all nodes
+        """
+        return allowed_site.strip() if allowed_site else cls.ALL_SITES
+
+    def update(self, node):
+        """
+        Updates the entries of a node
+
+        @param   node: DrbdNode object that has been added or changed
+        """
+        node_name = node.get_name()
+        self.remove(node_name)
+
+        site = self.get_site(node)
+        poolsize = max(0, node.get_poolsize())
+        entry = None
+        poolfree = node.get_poolfree()
+        if is_set(node.get_state(), DrbdNode.FLAG_STORAGE) and poolfree != -1:
+            entry = (poolfree, node_name)
+
+        for key in self._keys(site):
+            self._total[key] = self._total.get(key, 0) + poolsize
+            if entry is not None:
+                insort(self._free.setdefault(key, []), entry)
+        self._entries[node_name] = (site, poolsize, entry)
+
+    def _keys(self, site):
+        """
+        Returns the keys of the entries a node of the specified site has
+        """
+        if site is None:
+            return (self.ALL_SITES,)
+        return (self.ALL_SITES, site)
+
+    def remove(self, node_name):
+        """
+        Removes the entries of a node
+
+        @param   node_name: name of a node that has been removed
+        """
+        node_entry = self._entries.pop(node_name, None)
+        if node_entry is not None:
+            site, poolsize, entry = node_entry
+            for key in self._keys(site):
+                self._total[key] -= poolsize
+                if entry is not None:
+                    free_list = self._free[key]
+                    del free_list[bisect_left(free_list, entry)]
+
+    def get_total(self, allowed_site=''):
+        """
+        Returns the sum of the storage pool sizes of a site's nodes
+
+        @param   allowed_site: site name; empty for all nodes
+        @return: storage pool size in kiB
+        """
+        return self._total.get(self.site_key(allowed_site), 0)
+
+    def get_free_count(self, allowed_site=''):
+        """
+        Returns the number of a site's storage nodes with known free space
+        """
+        return len(self._free.get(self.site_key(allowed_site), []))
+
+    def get_nth_free(self, nth, allowed_site=''):
+        """
+        Returns the nth-largest amount of free space of a site's nodes
+
+        @param   nth: rank of the node, starting at 1 for the node with the
+                 most free space
+        @param   allowed_site: site name; empty for all nodes
+        @return: free space in kiB; None if there are fewer than nth nodes
+        """
+        free_list = self._free.get(self.site_key(allowed_site), [])
+        if nth < 1 or nth > len(free_list):
+            return None
+        return free_list[-nth][0]
+
+    def iterate_largest(self, min_free=0, allowed_site=''):
+        """
+        Iterates over the names of a site's storage nodes in descending
+        order of free space
+
+        @param   min_free: stop at nodes with less free space than min_free
+        @param   allowed_site: site name; empty for all nodes
+        @return: generator of (free space, node name) tuples
+        """
+        free_list = self._free.get(self.site_key(allowed_site), [])
+        stop_idx = bisect_left(free_list, (min_free, ''))
+        idx = len(free_list)
+        while idx > stop_idx:
+            idx -= 1
+            yield free_list[idx]
@@ -0,0 +1,485 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from bisect import bisect_right
+import drbdmanage.consts as consts
+from drbdmanage.propscontainer import PropsIndex
+
+
+class ChangeLog(object):
+
+    """
+    Serial-ordered log of the changes of one type of objects
+
+    Every change of an object appends the object's key and the serial number
+    of the change to the log. Removed objects are recorded as tombstones.
+    Since the serial numbers of changes never decrease, the log is sorted by
+    serial number, and the objects changed since a given serial number are
+    found by bisecting the log.
+    """
+
+    # Compact the log if it contains more than twice as many entries as
+    # there are keys plus this number of entries
+    COMPACT_MIN     = 256
+    # Maximum number of tombstones kept after compacting the log
+    MAX_TOMBSTONES  = 1024
+
+    # List of serial numbers, sorted in ascending order
+    _serials  = None
+    # List of keys, _keys[idx] changed with serial number _serials[idx]
+    _keys     = None
+    # key = serial number of the most recent change of the object
+    _current  = None
+    # key = object; None for removed objects (tombstones)
+    _objects  = None
+    # Removed objects that changed with serial numbers up to this one
+    # may have been dropped
+    _horizon  = 0
+
+    def __init__(self):
+        self._serials = []
+        self._keys    = []
+        self._current = {}
+        self._objects = {}
+
+
+    def record(self, key, obj, serial):
+        """
+        Records the change of an object
+
+        @param   key: unique key of the object
+        @param   obj: the object; None if the object was removed
+        @param   serial: serial number of the change
+        """
+        if len(self._serials) > 0 and serial < self._serials[-1]:
+            # Never report a change as older than changes that have
+            # been recorded already
+            serial = self._serials[-1]
+        self._serials.append(serial)
+        self._keys.append(key)
+        self._current[key] = serial
+        self._objects[key] = obj
+        if len(self._keys) > len(self._current) * 2 + ChangeLog.COMPACT_MIN:
+            self.compact()
+
+
+    def load(self, key, obj, serial):
+        """
+        Records the current state of an object while building the log
+
+        The entries recorded by load() are not in serial number order,
+        so compact() must be called after loading all objects.
+        """
+        self._serials.append(serial)
+        self._keys.append(key)
+        self._current[key] = serial
+        self._objects[key] = obj
+
+
+    def set_horizon(self, serial):
+        """
+        Sets the serial number up to which removed objects are not known
+        """
+        self._horizon = serial
+
+
+    def get_object(self, key):
+        return self._objects.get(key)
+
+
+    def get_keys(self):
+        """
+        Returns the keys of all objects that exist
+        """
+        return [key for (key, obj) in self._objects.iteritems() if obj is not None]
+
+
+    def is_tracked(self, key, obj):
+        """
+        Indicates whether the specified object is the tracked object of a key
+        """
+        return obj is not None and self._objects.get(key) is obj
+
+
+    def get_changed(self, serial):
+        """
+        Returns the objects that changed after the specified serial number
+
+        @return: list of the objects that exist and changed with a serial
+                 number greater than the specified one
+        """
+        changed = []
+        for key in self._changed_keys(serial):
+            obj = self._objects[key]
+            if obj is not None:
+                changed.append(obj)
+        return changed
+
+
+    def get_removed(self, serial):
+        """
+        Returns the keys of objects that were removed after the specified
+        serial number
+
+        @return: list of keys; None if tombstones of objects removed
+                 after the specified serial number may have been dropped
+        """
+        removed = None
+        if serial >= self._horizon:
+            removed = []
+            for key in self._changed_keys(serial):
+                if self._objects[key] is None:
+                    removed.append(key)
+        return removed
+
+
+    def get_changed_keys(self, serial):
+        """
+        Returns the keys of objects that changed or were removed after the
+        specified serial number
+
+        @return: list of keys; None if tombstones of objects removed
+                 after the specified serial number may have been dropped
+        """
+        changed_keys = None
+        if serial >= self._horizon:
+            changed_keys = self._changed_keys(serial)
+        return changed_keys
+
+
+    def _changed_keys(self, serial):
+        keys = []
+        known_keys = set()
+        index = bisect_right(self._serials, serial)
+        for key_index in xrange(index, len(self._keys)):
+            key = self._keys[key_index]
+            if key not in known_keys:
+                known_keys.add(key)
+                keys.append(key)
+        return keys
+
+
+    def compact(self):
+        """
+        Drops superseded log entries and the oldest tombstones
+        """
+        entries = sorted(
+            [(serial, key) for (key, serial) in self._current.iteritems()]
+        )
+        tombstones = [
+            entry for entry in entries if self._objects[entry[1]] is None
+        ]
+        drop_count = len(tombstones) - ChangeLog.MAX_TOMBSTONES
+        if drop_count > 0:
+            for (serial, key) in tombstones[:drop_count]:
+                del self._current[key]
+                del self._objects[key]
+                self._horizon = max(self._horizon, serial)
+            entries = [entry for entry in entries if entry[1] in self._current]
+        self._serials = [serial for (serial, key) in entries]
+        self._keys    = [key for (serial, key) in entries]
+
+
+class ChangeIndex(object):
+
+    """
+    Index of the changed and removed objects of the configuration
+
+    Tracks nodes, resources, volumes, assignments, snapshots and snapshot
+    assignments. Changes of tracked objects are reported by their properties
+    containers, see PropsContainer.set_observer(). Objects that are added to
+    or removed from a tracked resource or snapshot are found when the
+    resource's or snapshot's children are compared with the known children
+    before answering a query. Nodes and resources that are added to or
+    removed from the server's nodes or resources map are found after a call
+    of root_changed().
+
+    The properties of tracked objects are registered under the objects' keys
+    with an inverted property index per object type, which answers
+    filter_props queries.
+    """
+
+    OBJ_NODE       = "node"
+    OBJ_RESOURCE   = "resource"
+    OBJ_VOLUME     = "volume"
+    OBJ_ASSIGNMENT = "assignment"
+    OBJ_SNAPSHOT   = "snapshot"
+    OBJ_SNAPS_ASSG = "snaps_assg"
+
+    OBJ_TYPES = [
+        OBJ_NODE, OBJ_RESOURCE, OBJ_VOLUME,
+        OBJ_ASSIGNMENT, OBJ_SNAPSHOT, OBJ_SNAPS_ASSG
+    ]
+
+    # Filter keys that the objects' filter_match() methods match against
+    # object attributes instead of properties
+    SPECIAL_FILTER_KEYS = frozenset([
+        consts.NODE_NAME, consts.NODE_ADDR, consts.NODE_AF, consts.NODE_ID,
+        consts.NODE_POOLSIZE, consts.NODE_POOLFREE,
+        consts.RES_NAME, consts.RES_PORT, consts.RES_SECRET,
+        consts.VOL_ID, consts.VOL_MINOR, consts.VOL_SIZE, consts.VOL_BDEV
+    ])
+    SPECIAL_FILTER_PREFIXES = (consts.TSTATE_PREFIX, consts.CSTATE_PREFIX)
+
+    # Server's nodes map
+    _nodes      = None
+    # Server's resources map
+    _resources  = None
+    # Function that returns the current serial number without changing it
+    _peek_serial_fn = None
+    # object type = ChangeLog
+    _logs       = None
+    # object type = PropsIndex
+    _props_indexes = None
+    # (object type, key) = object whose children must be reconciled
+    _dirty      = None
+    # (object type, key) = { child object type: set of child keys }
+    _children   = None
+    # Set if nodes or resources were added or removed
+    _root_dirty = False
+
+    def __init__(self, nodes, resources, peek_serial_fn):
+        self._nodes          = nodes
+        self._resources      = resources
+        self._peek_serial_fn = peek_serial_fn
+        self._logs = {}
+        self._props_indexes = {}
+        for obj_type in ChangeIndex.OBJ_TYPES:
+            self._logs[obj_type] = ChangeLog()
+            self._props_indexes[obj_type] = PropsIndex()
+        self._dirty    = {}
+        self._children = {}
+
+        for node in nodes.itervalues():
+            self._track(ChangeIndex.OBJ_NODE, node.get_name(), node, True)
+        for resource in resources.itervalues():
+            self._track(ChangeIndex.OBJ_RESOURCE, resource.get_name(), resource, True)
+        # Sort the loaded entries by serial number; removed objects are
+        # only known from here on
+        serial = self._peek_serial_fn()
+        for log in self._logs.itervalues():
+            log.compact()
+            log.set_horizon(serial)
+
+
+    def uses_objects(self, nodes, resources):
+        """
+        Indicates whether the index tracks the specified maps
+        """
+        return self._nodes is nodes and self._resources is resources
+
+
+    def root_changed(self):
+        """
+        Marks the server's nodes or resources map as changed
+        """
+        self._root_dirty = True
+
+
+    def get_changed(self, obj_type, serial):
+        """
+        Returns the objects of the specified type changed after serial
+        """
+        self._reconcile()
+        return self._logs[obj_type].get_changed(serial)
+
+
+    def get_removed(self, obj_type, serial):
+        """
+        Returns the keys of the objects of the specified type that were
+        removed after serial
+
+        @return: list of keys; None if the removed objects are not known
+                 for the specified serial number
+        """
+        self._reconcile()
+        return self._logs[obj_type].get_removed(serial)
+
+
+    def get_changed_keys(self, obj_type, serial):
+        """
+        Returns the keys of the objects of the specified type that changed
+        or were removed after serial
+
+        @return: list of keys; None if the removed objects are not known
+                 for the specified serial number
+        """
+        self._reconcile()
+        return self._logs[obj_type].get_changed_keys(serial)
+
+
+    def find_props(self, obj_type, filter_props):
+        """
+        Returns the objects of the specified type that match filter_props
+
+        Objects match if any of their properties matches any of the filter
+        properties, like with GenericDrbdObject.properties_match().
+
+        @return: dict of key = object; None if filter_props contains keys
+                 that filter_match() matches against object attributes,
+                 which are not indexed
+        """
+        matches = None
+        for key in filter_props.iterkeys():
+            if (key in ChangeIndex.SPECIAL_FILTER_KEYS or
+                key.startswith(ChangeIndex.SPECIAL_FILTER_PREFIXES)):
+                break
+        else:
+            self._reconcile()
+            log = self._logs[obj_type]
+            matches = {}
+            for key in self._props_indexes[obj_type].find(filter_props):
+                matches[key] = log.get_object(key)
+        return matches
+
+
+    @staticmethod
+    def _get_serial(obj):
+        serial = 0
+        try:
+            serial = obj.get_props().get_serial()
+        except (TypeError, ValueError):
+            pass
+        return serial
+
+
+    def _track(self, obj_type, key, obj, loading=False):
+        """
+        Starts tracking the changes of an object and of its children
+        """
+        log = self._logs[obj_type]
+        if loading:
+            log.load(key, obj, ChangeIndex._get_serial(obj))
+        else:
+            log.record(key, obj, ChangeIndex._get_serial(obj))
+
+        def observer(serial):
+            if log.is_tracked(key, obj):
+                log.record(key, obj, serial)
+                if (obj_type, key) in self._children:
+                    self._dirty[(obj_type, key)] = obj
+        obj.get_props().set_observer(observer)
+        obj.get_props().set_index(self._props_indexes[obj_type], key)
+
+        children = self._get_children(obj_type, obj)
+        if children is not None:
+            self._children[(obj_type, key)] = {}
+            for (child_type, child_map) in children.iteritems():
+                self._children[(obj_type, key)][child_type] = set(child_map.iterkeys())
+                for (child_key, child) in child_map.iteritems():
+                    self._track(child_type, child_key, child, loading)
+
+
+    def _untrack(self, obj_type, key, serial):
+        """
+        Records the removal of an object and of its children
+        """
+        log = self._logs[obj_type]
+        obj = log.get_object(key)
+        if obj is not None:
+            obj.get_props().set_index(None, None)
+        log.record(key, None, serial)
+        self._dirty.pop((obj_type, key), None)
+        children = self._children.pop((obj_type, key), None)
+        if children is not None:
+            for (child_type, child_keys) in children.iteritems():
+                for child_key in child_keys:
+                    self._untrack(child_type, child_key, serial)
+
+
+    def _get_children(self, obj_type, obj):
+        """
+        Returns the tracked children of an object
+
+        @return: dict of child object type = { child key = child object };
+                 None for types of objects that do not have children
+        """
+        children = None
+        if obj_type == ChangeIndex.OBJ_RESOURCE:
+            res_name = obj.get_name()
+            volumes = {}
+            for volume in obj.iterate_volumes():
+                volumes[(res_name, volume.get_id())] = volume
+            assignments = {}
+            for assg in obj.iterate_assignments():
+                assignments[(assg.get_node().get_name(), res_name)] = assg
+            snapshots = {}
+            for snapshot in obj.iterate_snapshots():
+                snapshots[(res_name, snapshot.get_name())] = snapshot
+            children = {
+                ChangeIndex.OBJ_VOLUME:     volumes,
+                ChangeIndex.OBJ_ASSIGNMENT: assignments,
+                ChangeIndex.OBJ_SNAPSHOT:   snapshots
+            }
+        elif obj_type == ChangeIndex.OBJ_SNAPSHOT:
+            res_name = obj.get_resource().get_name()
+            snaps_name = obj.get_name()
+            snaps_assgs = {}
+            for snaps_assg in obj.iterate_snaps_assgs():
+                node_name = snaps_assg.get_assignment().get_node().get_name()
+                snaps_assgs[(res_name, snaps_name, node_name)] = snaps_assg
+            children = {ChangeIndex.OBJ_SNAPS_ASSG: snaps_assgs}
+        return children
+
+
+    def _reconcile(self):
+        """
+        Tracks added objects and records removed objects
+        """
+        if self._root_dirty:
+            self._root_dirty = False
+            serial = self._peek_serial_fn()
+            self._reconcile_map(ChangeIndex.OBJ_NODE, self._nodes, serial)
+            self._reconcile_map(ChangeIndex.OBJ_RESOURCE, self._resources, serial)
+        while len(self._dirty) > 0:
+            ((obj_type, key), obj) = self._dirty.popitem()
+            known_children = self._children.get((obj_type, key))
+            if known_children is None:
+                continue
+            serial = ChangeIndex._get_serial(obj)
+            children = self._get_children(obj_type, obj)
+            for (child_type, child_map) in children.iteritems():
+                known_keys = known_children[child_type]
+                for child_key in [
+                    child_key for child_key in known_keys
+                    if child_key not in child_map
+                ]:
+                    known_keys.discard(child_key)
+                    self._untrack(child_type, child_key, serial)
+                for (child_key, child) in child_map.iteritems():
+                    if child_key not in known_keys:
+                        known_keys.add(child_key)
+                        self._track(child_type, child_key, child)
+                    elif not self._logs[child_type].is_tracked(child_key, child):
+                        # Replaced by another object with the same key
+                        self._untrack(child_type, child_key, serial)
+                        self._track(child_type, child_key, child)
+
+
+    def _reconcile_map(self, obj_type, obj_map, serial):
+        log = self._logs[obj_type]
+        for key in log.get_keys():
+            if key not in obj_map:
+                self._untrack(obj_type, key, serial)
+        for (key, obj) in obj_map.iteritems():
+            if not log.is_tracked(key, obj):
+                if log.get_object(key) is not None:
+                    self._untrack(obj_type, key, serial)
+                self._track(obj_type, key, obj)
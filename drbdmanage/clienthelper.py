@@ -47,6 +47,17 @@ def lError(text):
 
 class DrbdManageClientHelper(object):
 
+    # wait_for plugin = wait type of the server's wait_for() method
+    POLICY_WAIT_TYPES = {
+        'drbdmanage.plugins.plugins.wait_for.WaitForResource': 'resource',
+        'drbdmanage.plugins.plugins.wait_for.WaitForSnapshot': 'snapshot',
+        'drbdmanage.plugins.plugins.wait_for.WaitForVolumeSize': 'volume-size',
+    }
+    # D-Bus reply timeout (in seconds) added to the policy's timeout
+    WAIT_FOR_REPLY_GRACE = 30.0
+    # D-Bus reply timeout (in seconds) for policies without a timeout
+    WAIT_FOR_REPLY_MAX = 86400.0
+
     def __init__(self):
         self.empty_list = dbus.Array([], signature='a(s)')
         self.empty_dict = dbus.Array([], signature='a(ss)')
@@ -89,14 +100,14 @@ class DrbdManageClientHelper(object):
             time.sleep(2)
         # no consequences needed here, the next call to call_or_reconnect handles the answer
 
-    def call_or_reconnect(self, fn, *args):
+    def call_or_reconnect(self, fn, *args, **kwargs):
         """Call DBUS function; on a disconnect try once to reconnect."""
         try:
             retries_max = 15
             tries = 0
             server_rc = None
             while tries < retries_max:
-                server_rc = fn(*args)
+                server_rc = fn(*args, **kwargs)
                 chk = dm_utils.mangle_server_rc(server_rc)
                 if not dm_utils.is_rc_retry(chk):
                     break
@@ -107,7 +118,7 @@ class DrbdManageClientHelper(object):
             self.logger.warning(self._LW('Got disconnected; trying to reconnect. (%s)') % e)
             self.dbus_connect()
             # Old function object is invalid, get new one.
-            return getattr(self.odm, fn._method_name)(*args)
+            return getattr(self.odm, fn._method_name)(*args, **kwargs)
 
     def _fetch_answer_data(self, res, key, level=None, req=True):
         for code, fmt, data in res:
@@ -167,8 +178,25 @@ class DrbdManageClientHelper(object):
         """Returns True for done, False for timeout."""
 
         pol_inp_data = dict(pol_base)
-        pol_inp_data.update(pol_this,
-                            starttime=str(time.time()))
+        pol_inp_data.update(pol_this)
+
+        wait_type = self.POLICY_WAIT_TYPES.get(plugin)
+        if wait_type is not None:
+            # The server replies once the policy is fulfilled or timed out
+            reply_timeout = self.WAIT_FOR_REPLY_MAX
+            if 'timeout' in pol_inp_data:
+                reply_timeout = float(pol_inp_data['timeout']) + self.WAIT_FOR_REPLY_GRACE
+            try:
+                res, pol_result = self.call_or_reconnect(
+                    self.odm.wait_for, wait_type, pol_inp_data,
+                    timeout=reply_timeout)
+                self._check_result(res)
+                return pol_result['result'] == dm_const.BOOL_TRUE
+            except dbus.DBusException as e:
+                # Servers without the wait_for method; poll the plugin
+                self.logger.warning(self._LW('Cannot wait for the policy, polling instead. (%s)') % e)
+
+        pol_inp_data.update(starttime=str(time.time()))
 
         retry = 0
         while True:
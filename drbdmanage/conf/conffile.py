@@ -31,7 +31,104 @@ is_set   = dmutils.is_set
 is_unset = dmutils.is_unset
 
 
+class SiteTopology(object):
+
+    """
+    Site membership of the cluster's nodes and net options between sites
+
+    Shared by the DrbdConnectionConf objects of all resources as long as
+    neither the common configuration nor any node has changed, see
+    DrbdConnectionConf.get_topology()
+    """
+
+    def __init__(self, objects_root, key):
+        self.key = key
+        self._common = objects_root.get("common")
+        # node name = site name
+        self._node_sites = {}
+        # (site name, site name) = net options
+        self._net_opts = {}
+        # (server names, client names) = list of meshes (sets of node names)
+        self._meshes = {}
+
+        nodes = objects_root.get("nodes")
+        if nodes is not None:
+            for node in nodes.itervalues():
+                self._node_sites[node.get_name()] = self._read_site(node)
+
+    @staticmethod
+    def gen_key(objects_root):
+        """
+        Generates a key that changes whenever the topology may have changed
+        """
+        common_key = None
+        common = objects_root.get("common")
+        if common is not None:
+            common_key = (id(common), common.get_props().get_serial())
+        nodes_key = None
+        nodes = objects_root.get("nodes")
+        if nodes is not None:
+            nodes_key = frozenset(
+                [(node.get_name(), id(node), node.get_props().get_serial())
+                 for node in nodes.itervalues()]
+            )
+        return (common_key, nodes_key)
+
+    @staticmethod
+    def _read_site(node):
+        ns = PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+        return node.get_props().get_prop('site', ns)
+
+    def get_site(self, node):
+        try:
+            return self._node_sites[node.get_name()]
+        except KeyError:
+            return self._read_site(node)
+
+    def get_meshes(self, servers, clients):
+        """
+        Returns the meshes formed by nodes of the same site
+
+        Every mesh is a set of names of non-diskless nodes that are part of
+        the same site as at least one other node.
+        """
+        server_names = frozenset([node.get_name() for node in servers])
+        client_names = frozenset([node.get_name() for node in clients])
+        meshes = self._meshes.get((server_names, client_names))
+        if meshes is None:
+            site_members = {}
+            for node in servers + clients:
+                site = self.get_site(node)
+                if site:
+                    site_members.setdefault(site, set()).add(node.get_name())
+            meshes = []
+            for members in site_members.itervalues():
+                if len(members) > 1:
+                    mesh = set([name for name in members if name not in client_names])
+                    if mesh:
+                        meshes.append(mesh)
+            self._meshes[(server_names, client_names)] = meshes
+        return meshes
+
+    def get_net_opts(self, site_a, site_b):
+        netopts = self._net_opts.get((site_a, site_b))
+        if netopts is None:
+            netopts = {}
+            if self._common is not None:
+                ns = PropsContainer.NAMESPACES[PropsContainer.KEY_SITES]
+                # should be symmetric, but...
+                netopts = self._common.get_props().get_all_props(ns + site_a + ':' + site_b + '/neto')
+                if not netopts:
+                    # fallback
+                    netopts = self._common.get_props().get_all_props(ns + site_b + ':' + site_a + '/neto')
+            self._net_opts[(site_a, site_b)] = netopts
+        return netopts
+
+
 class DrbdConnectionConf(object):
+    # SiteTopology shared by all instances, see get_topology()
+    _topology = None
+
     def __init__(self, servers, clients, objects_root, stream, target_node=None):
         self.objects_root = objects_root
         self.servers = servers
@@ -42,63 +139,43 @@ class DrbdConnectionConf(object):
         self._all_nodes = set(servers + clients)
         self._meshes = []  # list of sets, every set is list of nodes, a set represents a mesh
         self._nodes_interesting = set()  # nodes we have a connection to (+ self)
+        self._topology = DrbdConnectionConf.get_topology(objects_root)
 
         self._indentwidth = 3
 
-    def _is_part_of_site(self, node):
-        ns = PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
-        site_name = node.get_props().get_prop('site', ns)
-        return site_name
-
-    def _is_diskless(self, node):
-        return node in self.clients
-
-    def _get_other_site_nodes(self, node, site_name):
-        others = []
-
-        for n in self._all_nodes:
-            other_site = self._is_part_of_site(n)
-            if other_site and other_site == site_name and n != node:
-                others.append(n)
-
-        return others
+    @classmethod
+    def get_topology(cls, objects_root):
+        """
+        Returns the SiteTopology for the current configuration
 
-    def _gen_mesh(self, base_node, others):
-        if self._is_diskless(base_node):
-            return
+        The topology is recalculated if the common configuration or any
+        node has changed since it was calculated, or if it has been
+        invalidated by invalidate_topology()
+        """
+        key = SiteTopology.gen_key(objects_root)
+        topology = cls._topology
+        if topology is None or topology.key != key:
+            topology = SiteTopology(objects_root, key)
+            cls._topology = topology
+        return topology
 
-        others = [o for o in others if not self._is_diskless(o)]
+    @classmethod
+    def invalidate_topology(cls):
+        cls._topology = None
 
-        # existing mesh?
-        for m in self._meshes:
-            if base_node in m:
-                m.update(others)
-                return
+    def _is_part_of_site(self, node):
+        return self._topology.get_site(node)
 
-        # new mesh
-        s = set([base_node] + others)
-        if s:
-            self._meshes.append(s)
+    def _is_diskless(self, node):
+        return node in self.clients
 
     def _gen_meshes(self):
-        for n in self._all_nodes:
-            n_site = self._is_part_of_site(n)
-            if n_site:
-                others = self._get_other_site_nodes(n, n_site)
-                if others:
-                    self._gen_mesh(n, others)
+        nodes_by_name = dict([(node.get_name(), node) for node in self._all_nodes])
+        for mesh_names in self._topology.get_meshes(self.servers, self.clients):
+            self._meshes.append(set([nodes_by_name[name] for name in mesh_names]))
 
     def _get_net_opts(self, site_a, site_b):
-        common = self.objects_root["common"]
-        ns = PropsContainer.NAMESPACES[PropsContainer.KEY_SITES]
-        # should be symmetric, but...
-        netopts = common.get_props().get_all_props(ns + site_a + ':' + site_b + '/neto')
-        if netopts:
-            return netopts
-
-        # fallback
-        netopts = common.get_props().get_all_props(ns + site_b + ':' + site_a + '/neto')
-        return netopts
+        return self._topology.get_net_opts(site_a, site_b)
 
     def _get_server_instance(self):
         if self.target_node is not None:
@@ -303,6 +380,15 @@ class DrbdAdmConf(object):
 
             curstream.write("%s}\n" % (' ' * indentlevel * self.indentwidth))
 
+    def write_global(self, globalstream):
+        """
+        Writes the common section of the global configuration file
+
+        The stream is closed afterwards.
+        @return: True if the global configuration was written, False otherwise
+        """
+        return self._write_global_stream(globalstream)
+
     def _write_global_stream(self, globalstream):
         wrote_global = False
 
@@ -337,7 +423,14 @@ class DrbdAdmConf(object):
 
 # TODO: only have a single writer that returns a template and a dict of substitutions,
 # and use that in all the functions below.
-    def write(self, stream, assignment, undeployed_flag, globalstream=False):
+    def write(self, stream, assignment, undeployed_flag, globalstream=False, global_path=None):
+        """
+        Writes the configuration file of an assignment to a stream
+
+        If globalstream is set, the global configuration is written to that
+        stream, otherwise the resource refers to the global configuration file
+        at global_path, if it is set (see write_global()).
+        """
         try:
             wrote_global = self._write_global_stream(globalstream)
 
@@ -356,6 +449,8 @@ class DrbdAdmConf(object):
 
             if wrote_global:
                 stream.write('template-file "%s";\n\n' % (self._get_stream_final_path(globalstream)))
+            elif global_path is not None:
+                stream.write('template-file "%s";\n\n' % (global_path))
 
             # begin resource/net-options
             netopts = self._get_setup_props(resource, "neto/")
@@ -471,9 +566,11 @@ class DrbdAdmConf(object):
                           "unhandled exception: %s" % str(exc))
 
 
-    def write_excerpt(self, stream, assignment, nodes, vol_states, globalstream=False):
+    def write_excerpt(self, stream, assignment, nodes, vol_states, globalstream=False,
+                      global_path=None):
         """
         Writes an excerpt of the configuration file to a stream.
+        The globalstream and global_path arguments work like those of write().
         Used for adjusting resources to an intermediate state
         (a state somewhere between current state and target state),
         for example, when deploying or undeploying multiple volumes
@@ -498,6 +595,8 @@ class DrbdAdmConf(object):
 
             if wrote_global:
                 stream.write('template-file "%s";\n\n' % (self._get_stream_final_path(globalstream)))
+            elif global_path is not None:
+                stream.write('template-file "%s";\n\n' % (global_path))
 
             # begin resource/net-options
             netopts = self._get_setup_props(resource, "neto/")
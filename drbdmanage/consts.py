@@ -29,6 +29,8 @@ except:
 
 DBUS_DRBDMANAGED = "org.drbd.drbdmanaged"
 DBUS_SERVICE     = "/interface"
+# Object path of the change feed signal, see DBusChangeFeed
+DBUS_CHANGE_FEED = "/changes"
 
 DRBDADM_UTIL   = "drbdadm"
 DRBDMETA_UTIL  = "drbdmeta"
@@ -139,6 +141,16 @@ KEY_SITE = 'site'
 KEY_COLORS = "colors"
 KEY_UTF8 = "utf8"
 
+# Path of the local RPC socket of the server; no socket if not configured
+KEY_RPC_SOCKET     = "rpc-socket"
+DEFAULT_RPC_SOCKET = "/var/run/drbdmanage/rpc.sock"
+
+# File the server writes its metrics to for the Prometheus textfile
+# collector, and the interval (in seconds) of the writes; no file if not configured
+KEY_METRICS_FILE         = "metrics-textfile"
+KEY_METRICS_INTERVAL     = "metrics-interval"
+DEFAULT_METRICS_INTERVAL = 60
+
 # auxiliary property prefix
 AUX_PROP_PREFIX     = "aux:"
 
@@ -24,7 +24,8 @@ import dbus.service
 import dbus.mainloop.glib
 from drbdmanage.utils import add_rc_entry
 from drbdmanage.dbustracer import DbusTracer
-from drbdmanage.consts import (DBUS_DRBDMANAGED, DBUS_SERVICE)
+from drbdmanage.metrics import timed, GROUP_DBUS
+from drbdmanage.consts import (DBUS_DRBDMANAGED, DBUS_SERVICE, DBUS_CHANGE_FEED)
 from drbdmanage.exceptions import (DM_ENOENT, DM_SUCCESS, dm_exc_text)
 
 
@@ -32,6 +33,11 @@ class DBusServer(dbus.service.Object):
 
     """
     dbus API to the drbdmanage server API
+
+    Methods that may modify the configuration reply asynchronously through
+    the server's writer queue, see DrbdManageServer.dispatch_write(). The
+    list methods reply asynchronously from reader threads, see
+    DrbdManageServer.dispatch_read().
     """
 
     _dbus   = None
@@ -57,6 +63,7 @@ class DBusServer(dbus.service.Object):
         """
         self._server.run()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="a{ss}",
@@ -84,254 +91,345 @@ class DBusServer(dbus.service.Object):
 
         return fn_rc, fname
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def poke(self, message=None):
+    def poke(self, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.poke(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.poke()
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.poke
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sa{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def create_node(self, node_name, props, message=None):
+    def create_node(self, node_name, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.create_node(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.create_node(node_name, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.create_node,
+            node_name, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sb",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def remove_node(self, node_name, force, message=None):
+    def remove_node(self, node_name, force, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.remove_node(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.remove_node(node_name, force)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.remove_node,
+            node_name, force
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sa{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def create_resource(self, res_name, props, message=None):
+    def create_resource(self, res_name, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.create_resource(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.create_resource(res_name, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.create_resource,
+            res_name, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sittt",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def resize_volume(self, res_name, vol_id, serial, size_kiB, delta_kiB, message=None):
+    def resize_volume(self, res_name, vol_id, serial, size_kiB, delta_kiB,
+                      reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.resize_volume(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.resize_volume(
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.resize_volume,
             res_name, vol_id, serial, size_kiB, delta_kiB
         )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sb",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def remove_resource(self, res_name, force, message=None):
+    def remove_resource(self, res_name, force, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.remove_resource(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.remove_resource(res_name, force)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.remove_resource,
+            res_name, force
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sxa{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def create_volume(self, res_name, size_kiB, props, message=None):
+    def create_volume(self, res_name, size_kiB, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.create_volume(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.create_volume(res_name, size_kiB, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.create_volume,
+            res_name, size_kiB, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sib",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def remove_volume(self, res_name, vol_id, force, message=None):
+    def remove_volume(self, res_name, vol_id, force, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.remove_volume(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.remove_volume(res_name, vol_id, force)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.remove_volume,
+            res_name, vol_id, force
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssb",
-        out_signature="a(isa(ss))"
+        out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
     )
-    def connect(self, node_name, res_name, reconnect):
+    def connect(self, node_name, res_name, reconnect, reply_handler, error_handler):
         """
         D-Bus interface for DrbdManageServer.connect(...)
         """
-        return self._server.connect(node_name, res_name, reconnect)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.connect,
+            node_name, res_name, reconnect
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssb",
-        out_signature="a(isa(ss))"
+        out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
     )
-    def disconnect(self, node_name, res_name, force):
+    def disconnect(self, node_name, res_name, force, reply_handler, error_handler):
         """
         D-Bus interface for DrbdManageServer.disconnect(...)
         """
-        return self._server.disconnect(node_name, res_name, force)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.disconnect,
+            node_name, res_name, force
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sta{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def modify_node(self, node_name, serial, props, message=None):
+    def modify_node(self, node_name, serial, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.modify_node(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.modify_node(node_name, serial, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.modify_node,
+            node_name, serial, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sta{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def modify_resource(self, res_name, serial, props, message=None):
+    def modify_resource(self, res_name, serial, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.modify_resource(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.modify_resource(res_name, serial, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.modify_resource,
+            res_name, serial, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sita{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def modify_volume(self, res_name, vol_id, serial, props, message=None):
+    def modify_volume(self, res_name, vol_id, serial, props,
+                      reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.modify_volume(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.modify_volume(res_name, vol_id, serial, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.modify_volume,
+            res_name, vol_id, serial, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssta{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def modify_assignment(self, res_name, node_name, serial, props, message=None):
+    def modify_assignment(self, res_name, node_name, serial, props,
+                          reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.modify_state(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.modify_assignment(res_name, node_name, serial, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.modify_assignment,
+            res_name, node_name, serial, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssi",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def attach(self, node_name, res_name, vol_id, message=None):
+    def attach(self, node_name, res_name, vol_id, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.attach(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.attach(node_name, res_name, vol_id)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.attach,
+            node_name, res_name, vol_id
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssi",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def detach(self, node_name, res_name, vol_id, message=None):
+    def detach(self, node_name, res_name, vol_id, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.detach(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.detach(node_name, res_name, vol_id)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.detach,
+            node_name, res_name, vol_id
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssa{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def assign(self, node_name, res_name, props, message=None):
+    def assign(self, node_name, res_name, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.assign(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.assign(node_name, res_name, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.assign,
+            node_name, res_name, dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssb",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def unassign(self, node_name, res_name, force, message=None):
+    def unassign(self, node_name, res_name, force, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.unassign(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.unassign(node_name, res_name, force)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.unassign,
+            node_name, res_name, force
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="i",
@@ -346,6 +444,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.cluster_free_query(redundancy)
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="is",
@@ -360,103 +459,180 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.cluster_free_query(redundancy, allowed_site)
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="siib",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def auto_deploy(self, res_name, count, delta, site_clients, message=None):
+    def auto_deploy(self, res_name, count, delta, site_clients,
+                    reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.auto_deploy(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.auto_deploy(res_name, int(count), int(delta), site_clients)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.auto_deploy,
+            res_name, int(count), int(delta), site_clients
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="siibs",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def auto_deploy_site(self, res_name, count, delta, site_clients, allowed_site, message=None):
+    def auto_deploy_site(self, res_name, count, delta, site_clients, allowed_site,
+                         reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.auto_deploy(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.auto_deploy(res_name, int(count), int(delta), site_clients, allowed_site)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.auto_deploy,
+            res_name, int(count), int(delta), site_clients, allowed_site
+        )
 
+    @timed(GROUP_DBUS)
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asiibs",
+        out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
+        message_keyword='message',
+    )
+    def auto_deploy_many(self, res_names, count, delta, site_clients, allowed_site,
+                         reply_handler, error_handler, message=None):
+        """
+        D-Bus interface for DrbdManageServer.auto_deploy_many(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.auto_deploy_many,
+            [str(res_name) for res_name in res_names], int(count), int(delta), site_clients,
+            allowed_site
+        )
+
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sb",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def auto_undeploy(self, res_name, force, message=None):
+    def auto_undeploy(self, res_name, force, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.auto_undeploy(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.auto_undeploy(res_name, force)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.auto_undeploy,
+            res_name, force
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def update_pool_check(self, message=None):
+    def update_pool_check(self, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.update_pool_check()
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.update_pool_check()
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.update_pool_check
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="as",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def update_pool(self, node_names, message=None):
+    def update_pool(self, node_names, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.update_pool(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.update_pool(node_names)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.update_pool,
+            node_names
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="a{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def set_drbdsetup_props(self, props, message=None):
+    def set_drbdsetup_props(self, props, reply_handler, error_handler, message=None):
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.set_drbdsetup_props(dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.set_drbdsetup_props,
+            dict(props)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asta{ss}as",
         out_signature="a(isa(ss))" "a(sa{ss})",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def list_nodes(self, node_names, serial, filter_props, req_props, message=None):
+    def list_nodes(self, node_names, serial, filter_props, req_props,
+                   reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.list_nodes(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.list_nodes(
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_nodes,
             node_names, serial, filter_props, req_props
         )
 
+    @timed(GROUP_DBUS)
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asta{ss}assu",
+        out_signature="a(isa(ss))" "s" "a(sa{ss})",
+        async_callbacks=('reply_handler', 'error_handler'),
+        message_keyword='message',
+    )
+    def list_nodes_page(self, node_names, serial, filter_props, req_props,
+                        cursor, limit, reply_handler, error_handler, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_nodes_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_nodes_page,
+            node_names, serial, dict(filter_props), req_props, str(cursor), int(limit)
+        )
+
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -468,6 +644,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.get_config_keys()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -479,6 +656,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.get_plugin_default_config()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -490,6 +668,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.get_cluster_config()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="as",
@@ -501,6 +680,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.get_selected_config_values(keys)
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -512,82 +692,165 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.get_site_config()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="a(s(a{ss}))",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def set_cluster_config(self, cfgdict, message=None):
+    def set_cluster_config(self, cfgdict, reply_handler, error_handler, message=None):
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.set_cluster_config(dict(cfgdict))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.set_cluster_config,
+            dict(cfgdict)
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asta{ss}as",
         out_signature="a(isa(ss))" "a(sa{ss})",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def list_resources(self, res_names, serial, filter_props, req_props, message=None):
+    def list_resources(self, res_names, serial, filter_props, req_props,
+                       reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.list_resources(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.list_resources(
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_resources,
             res_names, serial, dict(filter_props), req_props
         )
 
+    @timed(GROUP_DBUS)
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asta{ss}assu",
+        out_signature="a(isa(ss))" "s" "a(sa{ss})",
+        async_callbacks=('reply_handler', 'error_handler'),
+        message_keyword='message',
+    )
+    def list_resources_page(self, res_names, serial, filter_props, req_props,
+                            cursor, limit, reply_handler, error_handler, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_resources_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_resources_page,
+            res_names, serial, dict(filter_props), req_props, str(cursor), int(limit)
+        )
+
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asta{ss}as",
         out_signature="a(isa(ss))" "a(sa{ss}a(ia{ss}))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def list_volumes(self, res_names, serial, filter_props, req_props, message=None):
+    def list_volumes(self, res_names, serial, filter_props, req_props,
+                     reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.list_volumes(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.list_volumes(
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_volumes,
             res_names, serial, dict(filter_props), req_props
         )
 
+    @timed(GROUP_DBUS)
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asta{ss}assu",
+        out_signature="a(isa(ss))" "s" "a(sa{ss}a(ia{ss}))",
+        async_callbacks=('reply_handler', 'error_handler'),
+        message_keyword='message',
+    )
+    def list_volumes_page(self, res_names, serial, filter_props, req_props,
+                          cursor, limit, reply_handler, error_handler, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_volumes_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_volumes_page,
+            res_names, serial, dict(filter_props), req_props, str(cursor), int(limit)
+        )
+
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asasta{ss}as",
         out_signature="a(isa(ss))" "a(ssa{ss}a(ia{ss}))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
     def list_assignments(self, node_names, res_names,
-                         serial, filter_props, req_props, message=None):
+                         serial, filter_props, req_props,
+                         reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.list_assignments(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.list_assignments(
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_assignments,
             node_names, res_names, serial, dict(filter_props), req_props
         )
 
+    @timed(GROUP_DBUS)
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asasta{ss}assu",
+        out_signature="a(isa(ss))" "s" "a(ssa{ss}a(ia{ss}))",
+        async_callbacks=('reply_handler', 'error_handler'),
+        message_keyword='message',
+    )
+    def list_assignments_page(self, node_names, res_names, serial,
+                              filter_props, req_props, cursor, limit,
+                              reply_handler, error_handler, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_assignments_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        self._server.dispatch_read(
+            reply_handler, error_handler, self._server.list_assignments_page,
+            node_names, res_names, serial, dict(filter_props), req_props, str(cursor), int(limit)
+        )
+
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssasa{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def create_snapshot(self, res_name, snaps_name, node_names, props, message=None):
+    def create_snapshot(self, res_name, snaps_name, node_names, props,
+                        reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.create_snapshot(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.create_snapshot(
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.create_snapshot,
             res_name, snaps_name, node_names, dict(props)
         )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asasta{ss}as",
@@ -605,6 +868,7 @@ class DBusServer(dbus.service.Object):
             res_names, snaps_names, serial, dict(filter_props), req_props
         )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asasasta{ss}as",
@@ -623,123 +887,176 @@ class DBusServer(dbus.service.Object):
             dict(filter_props), req_props
         )
 
+    @timed(GROUP_DBUS)
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="st",
+        out_signature="a(isa(ss))" "aas",
+        message_keyword='message',
+    )
+    def list_removed(self, obj_type, serial, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_removed(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        return self._server.list_removed(str(obj_type), serial)
+
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sssa(ss)a(ia(ss))",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
     def restore_snapshot(self, res_name, snaps_res_name, snaps_name,
-                         res_props, vols_props, message=None):
+                         res_props, vols_props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.restore_snapshot(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.restore_snapshot(res_name, snaps_res_name,
-                                             snaps_name, res_props, vols_props)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.restore_snapshot,
+            res_name, snaps_res_name, snaps_name, res_props, vols_props
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sssb",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
     def remove_snapshot_assignment(self, res_name, snaps_name, node_name,
-                                   force, message=None):
+                                   force, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.remove_snapshot_assignment(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.remove_snapshot_assignment(
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.remove_snapshot_assignment,
             res_name, snaps_name, node_name, force
         )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssb",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def remove_snapshot(self, res_name, snaps_name, force, message=None):
+    def remove_snapshot(self, res_name, snaps_name, force,
+                        reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.remove_snapshot(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.remove_snapshot(res_name, snaps_name, force)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.remove_snapshot,
+            res_name, snaps_name, force
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ss",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def resume(self, node_name, res_name, message=None):
+    def resume(self, node_name, res_name, reply_handler, error_handler, message=None):
         """
         Clear the fail count of a resource's assignments
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.resume(node_name, res_name)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.resume,
+            node_name, res_name
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def resume_all(self, message=None):
+    def resume_all(self, reply_handler, error_handler, message=None):
         """
         Clear the fail count of a resource's assignments
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.resume_all()
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.resume_all
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="s",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def export_conf(self, res_name, message=None):
+    def export_conf(self, res_name, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.export_conf(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.export_conf(res_name)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.export_conf,
+            res_name
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sa{ss}b",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def quorum_control(self, node_name, props, override_quorum, message=None):
+    def quorum_control(self, node_name, props, override_quorum,
+                       reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.quorum_control(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.quorum_control(node_name, props, override_quorum)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.quorum_control,
+            node_name, props, override_quorum
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def reconfigure(self, message=None):
+    def reconfigure(self, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.reconfigure()
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.reconfigure()
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.reconfigure
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="as",
@@ -754,20 +1071,26 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.text_query(command)
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sa{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def init_node(self, node_name, props, message=None):
+    def init_node(self, node_name, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.init_node(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.init_node(node_name, props)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.init_node,
+            node_name, props
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -779,6 +1102,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.role()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="a{ss}",
@@ -790,62 +1114,103 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.reelect(props, False)
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="a{ss}",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def join_node(self, props, message=None):
+    def join_node(self, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.join_node(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.join_node(props)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.join_node,
+            props
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sa{ss}",
         out_signature="a(isa(ss))" "a{ss}",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def run_external_plugin(self, plugin_name, props, message=None):
+    def run_external_plugin(self, plugin_name, props, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.run_external_plugin(...)
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.run_external_plugin(plugin_name, dict(props))
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.run_external_plugin,
+            plugin_name, dict(props)
+        )
+
+    @timed(GROUP_DBUS)
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="sa{ss}",
+        out_signature="a(isa(ss))" "a{ss}",
+        async_callbacks=('reply_handler', 'error_handler'),
+        message_keyword='message',
+    )
+    def wait_for(self, wait_type, props, reply_handler, error_handler, message=None):
+        """
+        D-Bus interface for DrbdManageServer.wait_for(...)
+
+        The reply is sent when the wait finishes, which may be long after
+        this method has returned
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        props = dict([(str(key), str(val)) for (key, val) in props.iteritems()])
+        result = self._server.wait_for(str(wait_type), props, reply_handler)
+        if result is not None:
+            reply_handler(*result)
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def load_conf(self, message=None):
+    def load_conf(self, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.load_conf()
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.dbus_load_conf()
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.dbus_load_conf
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def save_conf(self, message=None):
+    def save_conf(self, reply_handler, error_handler, message=None):
         """
         D-Bus interface for DrbdManageServer.save_conf()
         """
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.dbus_save_conf()
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.dbus_save_conf
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -865,6 +1230,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return 0
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -876,6 +1242,7 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.wait_for_startup()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -887,17 +1254,23 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.get_ctrlvol()
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="s",
         out_signature="a(isa(ss))",
+        async_callbacks=('reply_handler', 'error_handler'),
         message_keyword='message',
     )
-    def set_ctrlvol(self, jsonblob, message=None):
+    def set_ctrlvol(self, jsonblob, reply_handler, error_handler, message=None):
         if self._dbustracer_running:
             self._dbustracer.record(message.get_member(), message.get_args_list())
-        return self._server.set_ctrlvol(jsonblob)
+        self._server.dispatch_write(
+            reply_handler, error_handler, self._server.set_ctrlvol,
+            jsonblob
+        )
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="a{ss}",
@@ -913,6 +1286,7 @@ class DBusServer(dbus.service.Object):
         logging.info("server shutdown requested through D-Bus")
         self._server.shutdown(dict(props))
 
+    @timed(GROUP_DBUS)
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="s",
@@ -975,6 +1349,38 @@ class DBusSignal(dbus.service.Object):
             self.remove_from_connection()
 
 
+class DBusChangeFeed(dbus.service.Object):
+    """
+    Cluster-level change feed
+
+    Announces the objects that changed whenever the server saves the
+    configuration, so that clients can watch the configuration instead of
+    polling the list_* functions.
+    """
+
+    def __init__(self):
+        dbus.service.Object.__init__(self, dbus.SystemBus(), DBUS_CHANGE_FEED)
+        logging.debug("DBusChangeFeed '%s': Instance created" % DBUS_CHANGE_FEED)
+
+    @dbus.service.signal(DBUS_DRBDMANAGED, signature="tsaas")
+    def changed(self, serial, obj_type, obj_keys):
+        """
+        Signal to notify subscribers of changed objects
+
+        @param   serial: serial number of the configuration that contains
+                 the changes
+        @param   obj_type: one of the ChangeIndex.OBJ_* object types
+        @param   obj_keys: keys of the objects that changed or were removed,
+                 in the format of list_removed(); empty if the changed
+                 objects are not known, in which case subscribers must
+                 reload all objects of that type
+        """
+        logging.debug(
+            "DBusChangeFeed: changed(%d, %s, %d keys)"
+            % (serial, obj_type, len(obj_keys))
+        )
+
+
 class DBusSignalFactory():
     """
     Instance factory for the DBusSignal class
@@ -989,3 +1395,6 @@ class DBusSignalFactory():
 
     def create_signal(self, path):
         return DBusSignal(path)
+
+    def create_change_feed(self):
+        return DBusChangeFeed()
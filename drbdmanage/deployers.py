@@ -18,9 +18,46 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import heapq
+import time
+import drbdmanage.consts as consts
 import drbdmanage.utils
 
 from drbdmanage.exceptions import DM_SUCCESS, DM_ENOSPC
+from drbdmanage.propscontainer import PropsContainer
+
+
+class PlannedNode(object):
+
+    """
+    Node as seen by deployer plugins while multiple resources are deployed
+
+    The storage that resources placed earlier in the same batch will occupy
+    on the node is subtracted from the node's free memory. All other
+    functions are forwarded to the node. The node's pool data is not
+    modified.
+    """
+
+    # The DrbdNode object
+    _node        = None
+    # Storage planned for the earlier resources of the batch, in kiB
+    _planned_kiB = 0
+
+    def __init__(self, node, planned_kiB):
+        self._node        = node
+        self._planned_kiB = planned_kiB
+
+    def get_node(self):
+        return self._node
+
+    def get_poolfree(self):
+        poolfree = self._node.get_poolfree()
+        if poolfree != -1:
+            poolfree = max(0, poolfree - self._planned_kiB)
+        return poolfree
+
+    def __getattr__(self, name):
+        return getattr(self._node, name)
 
 
 class BalancedDeployer(object):
@@ -30,6 +67,12 @@ class BalancedDeployer(object):
     the greatest amount of free memory
     """
 
+    # deploy_select() accepts the nodes that the resource is assigned to
+    # already in the result list and counts them towards the number of
+    # required nodes; plugins without this attribute receive an empty
+    # result list and the number of nodes to add instead
+    COUNTS_ASSIGNED = True
+
     def __init__(self, server):
         pass
 
@@ -54,9 +97,11 @@ class BalancedDeployer(object):
 
         @param   nodes: nodes that may be eligible for deploying the resource
         @type    nodes: dict of DrbdNode objects
+        @param   result: list of the nodes that the resource is deployed on
+                   already; the selected nodes are appended
         @param   size_kiB: amount of free storage required on a node for
                    deploying the resource
-        @param   count: number of required nodes
+        @param   count: number of required nodes, including those in result
         @param   deploy_unknown: allow deploying to nodes with unknown
                    storage status
         @type    deploy_unknown: bool
@@ -72,8 +117,9 @@ class BalancedDeployer(object):
                     selected.append(node)
             else:
                 wildcat.append(node)
-        selected = sorted(selected, key=lambda node: node.get_poolfree(),
-                          reverse=True)
+        # Only the count nodes with the most free memory can be selected
+        selected = heapq.nlargest(count, selected,
+                                  key=lambda node: node.get_poolfree())
         drbdmanage.utils.fill_list(selected, result, count)
         if len(result) < count:
             if deploy_unknown:
@@ -122,7 +168,295 @@ class BalancedDeployer(object):
         if unknown_first:
             drbdmanage.utils.fill_list(wildcat, result, count)
         if len(result) < count:
-            selected = sorted(selected, key=lambda node: node.get_poolfree())
+            selected = heapq.nsmallest(count, selected,
+                                       key=lambda node: node.get_poolfree())
+            drbdmanage.utils.fill_list(selected, result, count)
+        if not unknown_first:
+            drbdmanage.utils.fill_list(wildcat, result, count)
+
+
+class ReservationDeployer(object):
+
+    """
+    Reservation-aware deployment strategy - deploy resources on nodes that
+    have the greatest amount of free memory after subtracting the storage
+    reserved by previous deployments, spread over sites first and over
+    failure domains within each site
+
+    A node's free memory is only updated when the node reports its storage
+    pool data again. Until then, the storage selected for deployment by this
+    deployer is recorded as reserved on the node, so that subsequent
+    deployments do not select the same nodes based on outdated data.
+    """
+
+    # The reservations already account for the storage of resources
+    # placed earlier in a batch, see DrbdManageServer.auto_deploy_many()
+    PLANS_STORAGE = True
+
+    # deploy_select() accepts the nodes that the resource is assigned to
+    # already in the result list, see BalancedDeployer.COUNTS_ASSIGNED
+    COUNTS_ASSIGNED = True
+
+    # Name of the auxiliary node property that identifies a node's failure
+    # domain (e.g. the rack); empty to spread over sites only
+    KEY_FAILURE_DOMAIN  = "failure-domain-prop"
+    # Number of seconds after which a reservation is dropped if the node
+    # did not report its storage pool data
+    KEY_RESERVATION_TTL = "reservation-timeout"
+
+    CONF_DEFAULTS = {
+        KEY_FAILURE_DOMAIN:  "",
+        KEY_RESERVATION_TTL: "600"
+    }
+
+    DEFAULT_RESERVATION_TTL = 600
+
+    # Loaded module configuration
+    _conf            = None
+    # Cached settings
+    _domain_prop     = None
+    _reservation_ttl = DEFAULT_RESERVATION_TTL
+
+    # node name = list of reservations [size_kiB, poolfree, time]
+    _ledger          = None
+    # node name = (properties container, serial number, site, domain)
+    _domains         = None
+
+    def __init__(self, server):
+        self._ledger  = {}
+        self._domains = {}
+        self.reconfigure()
+
+    def get_default_config(self):
+        return ReservationDeployer.CONF_DEFAULTS.copy()
+
+    def set_config(self, config):
+        return self.reconfigure(config)
+
+    def get_config(self):
+        return self._conf
+
+    def reconfigure(self, config=None):
+        if config:
+            self._conf = config
+        else:
+            self._conf = ReservationDeployer.CONF_DEFAULTS.copy()
+        domain_prop = self._conf.get(self.KEY_FAILURE_DOMAIN, "")
+        self._domain_prop = None
+        self._domains = {}
+        if domain_prop:
+            self._domain_prop = consts.AUX_PROP_PREFIX + domain_prop
+        self._reservation_ttl = self.DEFAULT_RESERVATION_TTL
+        try:
+            self._reservation_ttl = int(
+                self._conf.get(self.KEY_RESERVATION_TTL)
+            )
+        except (ValueError, TypeError):
+            # Unparseable configuration value;
+            # no-op: keep default value
+            pass
+        return True
+
+    def get_reserved_kiB(self, node):
+        """
+        Returns the amount of storage reserved on a node
+
+        Reservations made before the node last reported its storage pool
+        data are already included in the node's free memory and are dropped,
+        as are reservations that are older than the reservation timeout.
+
+        @param   node: DrbdNode object
+        @return: reserved storage in kiB
+        """
+        return self._get_reserved_kiB(
+            node, node.get_poolfree(), time.time() - self._reservation_ttl
+        )
+
+    def _get_reserved_kiB(self, node, poolfree, expired):
+        """
+        Implementation - see get_reserved_kiB()
+
+        @param   poolfree: the node's current free memory
+        @param   expired: time before which reservations are expired
+        """
+        reservations = self._ledger.get(node.get_name())
+        if reservations is None:
+            return 0
+        reservations = [
+            entry for entry in reservations
+            if entry[1] == poolfree and entry[2] >= expired
+        ]
+        if len(reservations) > 0:
+            self._ledger[node.get_name()] = reservations
+        else:
+            del self._ledger[node.get_name()]
+        return sum([entry[0] for entry in reservations])
+
+    def reserve(self, node, size_kiB):
+        """
+        Records storage selected for deployment on a node as reserved
+
+        @param   node: DrbdNode object
+        @param   size_kiB: gross size of the deployed resource's volumes
+        """
+        poolfree = node.get_poolfree()
+        if poolfree != -1 and size_kiB > 0:
+            self._ledger.setdefault(node.get_name(), []).append(
+                [size_kiB, poolfree, time.time()]
+            )
+
+    def _get_domain(self, node):
+        """
+        Returns the site and the failure domain a node belongs to
+
+        The properties are read again whenever the serial number of the
+        node's properties changes.
+
+        @return: tuple (site, failure domain); None for either if the node
+                 does not have the property
+        """
+        props = node.get_props()
+        serial = props.get_serial()
+        entry = self._domains.get(node.get_name())
+        if entry is None or entry[0] is not props or entry[1] != serial:
+            site = props.get_prop(
+                consts.KEY_SITE,
+                PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+            )
+            domain = None
+            if self._domain_prop is not None:
+                domain = props.get_prop(self._domain_prop)
+            entry = (props, serial, site, domain)
+            self._domains[node.get_name()] = entry
+        return entry[2], entry[3]
+
+    def deploy_select(self, nodes, result, count, size_kiB, deploy_unknown):
+        """
+        Find nodes that have enough memory to deploy the resource,
+        preferring sites, and failure domains within a site, that have
+        the fewest of the resource's nodes. If deploy_unknown is set and
+        there are not enough nodes that have enough memory, also use nodes
+        that do not know the state of their storage pool
+
+        Storage is only reserved on the selected nodes if enough nodes
+        were found.
+
+        @param   nodes: nodes that may be eligible for deploying the resource
+        @type    nodes: dict of DrbdNode objects
+        @param   result: list of the nodes that the resource is deployed on
+                   already; the selected nodes are appended
+        @param   size_kiB: amount of free storage required on a node for
+                   deploying the resource
+        @param   count: number of required nodes, including those in result
+        @param   deploy_unknown: allow deploying to nodes with unknown
+                   storage status
+        @type    deploy_unknown: bool
+        """
+        fn_rc = DM_SUCCESS
+        expired = time.time() - self._reservation_ttl
+        # site = { failure domain = heap of (-available memory, node name, node) }
+        sites = {}
+        # nodes with unknown free memory
+        wildcat = []
+        for node in nodes.itervalues():
+            poolfree = node.get_poolfree()
+            if poolfree != -1:
+                available = poolfree - self._get_reserved_kiB(node, poolfree, expired)
+                if available >= size_kiB:
+                    site, domain = self._get_domain(node)
+                    sites.setdefault(site, {}).setdefault(domain, []).append(
+                        (-available, node.get_name(), node)
+                    )
+            else:
+                wildcat.append(node)
+        for domains in sites.itervalues():
+            for node_heap in domains.itervalues():
+                heapq.heapify(node_heap)
+
+        # Number of the resource's nodes per site and per (site, domain)
+        site_used = {}
+        domain_used = {}
+        for node in result:
+            site, domain = self._get_domain(node)
+            site_used[site] = site_used.get(site, 0) + 1
+            domain_used[(site, domain)] = domain_used.get((site, domain), 0) + 1
+
+        def domain_key(site, domain):
+            return (
+                site_used.get(site, 0),
+                domain_used.get((site, domain), 0),
+                sites[site][domain][0]
+            )
+
+        # Heap of (key, site, domain) for the failure domains that have nodes
+        # left; the key orders the domains by the number of the resource's
+        # nodes in the site, then in the domain, then by the greatest
+        # available memory of the domain's nodes. Selecting a node only
+        # increases keys, so an entry whose key is outdated is pushed again
+        # with its current key when it reaches the top of the heap.
+        domain_heap = []
+        for (site, domains) in sites.iteritems():
+            for domain in domains.iterkeys():
+                domain_heap.append((domain_key(site, domain), site, domain))
+        heapq.heapify(domain_heap)
+
+        selected = []
+        while len(selected) < count - len(result) and len(domain_heap) > 0:
+            key, site, domain = heapq.heappop(domain_heap)
+            current_key = domain_key(site, domain)
+            if key != current_key:
+                heapq.heappush(domain_heap, (current_key, site, domain))
+                continue
+            node_heap = sites[site][domain]
+            selected.append(heapq.heappop(node_heap)[2])
+            site_used[site] = site_used.get(site, 0) + 1
+            domain_used[(site, domain)] = domain_used.get((site, domain), 0) + 1
+            if len(node_heap) > 0:
+                heapq.heappush(domain_heap, (domain_key(site, domain), site, domain))
+
+        drbdmanage.utils.fill_list(selected, result, count)
+        if len(result) < count and deploy_unknown:
+            drbdmanage.utils.fill_list(wildcat, result, count)
+        if len(result) < count:
+            fn_rc = DM_ENOSPC
+        else:
+            for node in selected:
+                self.reserve(node, size_kiB)
+        return fn_rc
+
+    def undeploy_select(self, nodes, result, count, unknown_first):
+        """
+        Undeploy resource from nodes that have the least amount of free
+        memory after subtracting reserved storage
+
+        If unkown_first is set, then if there are nodes that have the resource
+        deployed and have unknown storage status, undeploy from those nodes
+        first.
+
+        @param   nodes: nodes that may be eligible for deploying the resource
+        @type    nodes: dict of DrbdNode objects
+        @param   count: number of required nodes
+        @param   deploy_unknown: first undeploy from nodes with unknown
+                   storage status
+        @type    undeploy_unknown: bool
+        """
+        expired = time.time() - self._reservation_ttl
+        selected = []
+        # nodes with unknown free memory
+        wildcat = []
+        for node in nodes.itervalues():
+            poolfree = node.get_poolfree()
+            if poolfree != -1:
+                selected.append(
+                    (poolfree - self._get_reserved_kiB(node, poolfree, expired),
+                     node.get_name(), node)
+                )
+            else:
+                wildcat.append(node)
+        if unknown_first:
+            drbdmanage.utils.fill_list(wildcat, result, count)
+        if len(result) < count:
+            selected = [entry[2] for entry in heapq.nsmallest(count, selected)]
             drbdmanage.utils.fill_list(selected, result, count)
         if not unknown_first:
             drbdmanage.utils.fill_list(wildcat, result, count)
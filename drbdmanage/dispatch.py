@@ -0,0 +1,350 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import logging
+import threading
+import collections
+import Queue
+import gobject
+import drbdmanage.drbd.persistence
+from drbdmanage.changeindex import ChangeIndex
+
+
+class ConfigSnapshot(object):
+
+    """
+    Read-only copy of the nodes, resources and assignments of the configuration
+
+    A snapshot is built from the containers of a configuration that the
+    persistence layer saved or loaded, see BasePersistence.get_containers().
+    Its objects are never modified, therefore threads other than the main
+    loop's can read them while the server modifies the configuration.
+    """
+
+    # (serial number, containers) the snapshot was built from
+    _source       = None
+    # node name = DrbdNode object
+    _nodes        = None
+    # resource name = DrbdResource object
+    _resources    = None
+    # Index of changed objects; built on demand, see get_change_index()
+    _change_index = None
+    # Lock for building the index of changed objects
+    _index_lock   = None
+
+    def __init__(self, source):
+        """
+        Builds the snapshot
+
+        @param   source: tuple (serial number, containers)
+        """
+        self._source = source
+        nodes_con, res_con, assg_con = source[1][:3]
+        persistence = drbdmanage.drbd.persistence.BasePersistence
+        self._nodes, self._resources = persistence.load_objects(
+            nodes_con, res_con, assg_con, self.get_serial
+        )
+        self._index_lock = threading.Lock()
+
+    def get_source(self):
+        return self._source
+
+    def get_serial(self):
+        """
+        Returns the serial number of the configuration the snapshot was built from
+        """
+        return self._source[0]
+
+    def get_nodes(self):
+        return self._nodes
+
+    def get_resources(self):
+        return self._resources
+
+    def get_change_index(self):
+        """
+        Returns the index of changed objects of the snapshot
+
+        After it has been built, the index is not modified by queries,
+        because the snapshot's objects do not change.
+        """
+        with self._index_lock:
+            if self._change_index is None:
+                change_index = ChangeIndex(self._nodes, self._resources, self.get_serial)
+                # Track the children of all objects before the index is shared
+                change_index.get_changed(ChangeIndex.OBJ_NODE, self.get_serial())
+                self._change_index = change_index
+        return self._change_index
+
+
+class RequestDispatcher(object):
+
+    """
+    Dispatches client requests to the writer queue or to reader threads
+
+    Requests that may modify the configuration are queued and run one at a
+    time on the main loop. The main loop serves its other event sources,
+    like the drbdsetup events, satellite pings and other clients' requests,
+    between two queued requests.
+
+    Read requests run on reader threads against a snapshot of the
+    configuration that the server saved or loaded, see publish().
+    They neither block the main loop nor wait for queued or running
+    modifications. The replies of all requests are sent from the main loop.
+
+    After a configuration has been published, the next read request starts
+    a builder thread that builds the new snapshot. Read requests never wait
+    for a snapshot to be built. Requests that were queued before the
+    configuration was published are served from the previous snapshot.
+    Requests that were queued after it was published must see the
+    modifications that were published before, e.g. a client that lists
+    the volumes after creating a resource must see the new resource;
+    until the new snapshot is complete, these requests are queued like
+    write requests and run on the main loop against the server's
+    configuration. Each snapshot is built from the containers of one
+    configuration and is therefore consistent in itself.
+    Only one snapshot is built at a time; configurations that are
+    published while a snapshot is built are coalesced, and the builder
+    continues with the one that was published last.
+
+    Only the read requests are taken off the main loop. A long running
+    modification still blocks the main loop, and with it the other event
+    sources and the sending of the replies of completed read requests.
+
+    Requests are functions that return a tuple of the reply's values, or a
+    single value if the reply has only one value.
+    """
+
+    # Number of reader threads
+    READER_COUNT = 4
+
+    # Queue of (function, arguments, reply function, error function) tuples
+    _writes          = None
+    # Set if running the queued writes is scheduled
+    _write_scheduled = False
+    # Queue of the read requests for the reader threads; each entry also
+    # contains the generation of the configuration published when the
+    # request was queued
+    _reads           = None
+    # Reader threads; started on the first read request
+    _readers         = None
+    # (serial number, containers) of the configuration published last
+    _published       = None
+    # Generation of the published configuration; counts the publications
+    _published_gen   = 0
+    # Snapshot that is served to the read requests
+    _snapshot        = None
+    # Generation of the configuration the snapshot was built from
+    _snapshot_gen    = 0
+    # Thread that builds a new snapshot; None if no snapshot is being built
+    _builder         = None
+    # Lock for the published configuration, the snapshot and the builder;
+    # never held while a snapshot is built
+    _snapshot_lock   = None
+
+    def __init__(self):
+        self._writes        = collections.deque()
+        self._reads         = Queue.Queue()
+        self._readers       = []
+        self._snapshot_lock = threading.Lock()
+
+    def write(self, fn, args, reply_fn, error_fn):
+        """
+        Queues a request that may modify the configuration
+
+        Must be called from the main loop.
+
+        @param   fn: function that runs the request
+        @param   args: list of the function's arguments
+        @param   reply_fn: function called with the reply's values
+        @param   error_fn: function called with the exception if fn fails
+        """
+        self._writes.append((fn, args, reply_fn, error_fn))
+        if not self._write_scheduled:
+            self._write_scheduled = True
+            gobject.idle_add(self._run_write, priority=gobject.PRIORITY_DEFAULT)
+
+    def read(self, fn, args, reply_fn, error_fn):
+        """
+        Queues a read request for the reader threads
+
+        The function is called with the additional keyword argument
+        view=ConfigSnapshot object. If no configuration has been published
+        yet, or if the snapshot of the configuration that is published now
+        is not built yet when a reader thread takes the request, the request
+        is queued like a write request instead, and fn is called without
+        the view argument.
+
+        @param   fn: function that runs the request
+        @param   args: list of the function's arguments
+        @param   reply_fn: function called with the reply's values
+        @param   error_fn: function called with the exception if fn fails
+        """
+        if len(self._readers) == 0:
+            for reader_idx in xrange(RequestDispatcher.READER_COUNT):
+                reader = threading.Thread(
+                    target=self._reader, name="reader-%d" % (reader_idx)
+                )
+                reader.daemon = True
+                reader.start()
+                self._readers.append(reader)
+        self._reads.put((fn, args, reply_fn, error_fn, self._published_gen))
+
+    def publish(self, serial, containers):
+        """
+        Publishes the configuration for the read requests
+
+        Called from the main loop whenever the configuration has been saved
+        or loaded. The snapshot is built after the next read request,
+        see get_snapshot().
+
+        @param   serial: serial number of the configuration
+        @param   containers: containers of the configuration, see
+                 BasePersistence.get_containers(); None to serve the read
+                 requests from the server's configuration on the main loop
+        """
+        with self._snapshot_lock:
+            published = self._published
+            if containers is None:
+                self._published = None
+                self._snapshot  = None
+            elif published is None or published[1] is not containers:
+                self._published = (serial, containers)
+                self._published_gen += 1
+
+    def get_snapshot(self, min_gen=0):
+        """
+        Returns the snapshot for a read request
+
+        Does not wait for a snapshot to be built. If the snapshot is older
+        than the configuration that was published last, a builder thread
+        is started, unless one is running already.
+
+        @param   min_gen: generation of the configuration that was published
+                 when the request was queued; the snapshot is only returned
+                 if it was built from that or a later configuration
+        @return: ConfigSnapshot object; None if no configuration is published
+                 or if no snapshot of generation min_gen or later is built yet
+        """
+        with self._snapshot_lock:
+            published = self._published
+            if published is None:
+                return None
+            snapshot = self._snapshot
+            if ((snapshot is None or snapshot.get_source() is not published) and
+                    self._builder is None):
+                self._builder = threading.Thread(
+                    target=self._build_snapshots, name="snapshot-builder"
+                )
+                self._builder.daemon = True
+                self._builder.start()
+            if self._snapshot_gen < min_gen:
+                snapshot = None
+        return snapshot
+
+    def _build_snapshots(self):
+        """
+        Builds snapshots until the snapshot matches the published configuration
+
+        Runs on the builder thread, see get_snapshot().
+        """
+        while True:
+            with self._snapshot_lock:
+                published     = self._published
+                published_gen = self._published_gen
+                snapshot      = self._snapshot
+                if (published is None or
+                        (snapshot is not None and snapshot.get_source() is published)):
+                    self._builder = None
+                    return
+            try:
+                snapshot = ConfigSnapshot(published)
+                # Build the index before the snapshot is shared, so that
+                # readers do not wait for it either
+                snapshot.get_change_index()
+            except Exception as exc:
+                logging.error(
+                    "Cannot build a snapshot of the configuration: %s" % str(exc)
+                )
+                with self._snapshot_lock:
+                    self._builder = None
+                return
+            with self._snapshot_lock:
+                # The configuration may have been unpublished meanwhile
+                if self._published is not None:
+                    self._snapshot     = snapshot
+                    self._snapshot_gen = published_gen
+
+    def get_queue_lengths(self):
+        """
+        Returns the numbers of queued write and read requests
+        """
+        return len(self._writes), self._reads.qsize()
+
+    def _run_write(self):
+        fn, args, reply_fn, error_fn = self._writes.popleft()
+        self._send(*self._call(fn, args, {}, reply_fn, error_fn))
+        if len(self._writes) == 0:
+            self._write_scheduled = False
+        # Keep running while requests are queued
+        return self._write_scheduled
+
+    def _reader(self):
+        while True:
+            fn, args, reply_fn, error_fn, min_gen = self._reads.get()
+            snapshot = self.get_snapshot(min_gen)
+            if snapshot is None:
+                # Run on the main loop, so that the request sees the
+                # modifications that were published before it was queued
+                gobject.idle_add(self.write, fn, args, reply_fn, error_fn)
+            else:
+                gobject.idle_add(
+                    self._send,
+                    *self._call(fn, args, {"view": snapshot}, reply_fn, error_fn)
+                )
+
+    @staticmethod
+    def _call(fn, args, kwargs, reply_fn, error_fn):
+        """
+        Runs a request
+
+        @return: tuple (reply function or error function, values to send)
+        """
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            logging.error(
+                "Request %s failed, unhandled exception: %s"
+                % (fn.__name__, str(exc))
+            )
+            return error_fn, (exc,)
+        if not isinstance(result, tuple):
+            result = (result,)
+        return reply_fn, result
+
+    @staticmethod
+    def _send(send_fn, values):
+        try:
+            send_fn(*values)
+        except Exception as exc:
+            # The client may have disconnected
+            logging.warning("Cannot send the reply to a client: %s" % str(exc))
+        # Run only once
+        return False
@@ -21,6 +21,7 @@
 import errno
 import logging
 import os
+import threading
 import drbdmanage.utils as utils
 import drbdmanage.consts as consts
 
@@ -38,6 +39,10 @@ class DrbdAdm(object):
     # Used as a return code to indicate that drbdadm could not be executed
     DRBDUTIL_EXEC_FAILED = 127
 
+    # Maximum number of drbdadm processes that create_md_many() runs
+    # concurrently; 1 creates the metadata one volume after another
+    MAX_CONCURRENT_CREATE = 8
+
     def __init__(self, conf_path):
         self.conf_path = conf_path
 
@@ -188,6 +193,39 @@ class DrbdAdm(object):
                       "--", "--force", "create-md", res_name + "/" + str(vol_id)]
         return self._run_drbdutils(exec_args)
 
+    def create_md_many(self, res_name, vol_ids, peers):
+        """
+        Creates the metadata for multiple volumes of a resource concurrently
+
+        Each volume has its own backing device, so the drbdadm processes
+        do not interfere with each other. Up to MAX_CONCURRENT_CREATE
+        drbdadm processes run concurrently.
+        @return: dict of volume id = exit code of the drbdadm process
+        """
+        results = {}
+
+        def create_md_worker(vol_id):
+            results[vol_id] = self.create_md(res_name, vol_id, peers)
+
+        vol_ids = list(vol_ids)
+        max_concurrent = max(1, self.MAX_CONCURRENT_CREATE)
+        for start in xrange(0, len(vol_ids), max_concurrent):
+            batch = vol_ids[start:start + max_concurrent]
+            if len(batch) == 1:
+                create_md_worker(batch[0])
+            else:
+                workers = []
+                for vol_id in batch:
+                    worker = threading.Thread(
+                        target=create_md_worker, args=(vol_id,),
+                        name="create-md-%s/%s" % (res_name, str(vol_id))
+                    )
+                    worker.start()
+                    workers.append(worker)
+                for worker in workers:
+                    worker.join()
+        return results
+
     def set_gi(self, node_id, minor_nr, bd_path, current_gi, history_1_gi=None, set_flags=False):
         """
         Calls drbdadm to create the metadata information for a volume
@@ -10,7 +10,7 @@ class GenericDrbdObject(object):
     Super class of Drbd* objects with a property list
     """
 
-    _props = None
+    __slots__ = ("_props",)
 
 
     def __init__(self, get_serial_fn, init_serial, init_props):
@@ -54,6 +54,26 @@ class GenericDrbdObject(object):
         return self._props
 
 
+    def add_props_properties(self, properties, req_props):
+        """
+        Adds the entries of the properties container to a properties view
+
+        If req_props is a non-empty collection of keys, only the entries for
+        those keys are looked up, instead of iterating over all entries of
+        the properties container.
+
+        @param   properties: dictionary of the view's properties
+        @param   req_props: collection of the requested keys; None or empty
+                 for all entries
+        """
+        if req_props is not None and len(req_props) > 0:
+            properties.update(self._props.get_selected_props(req_props))
+        else:
+            for (key, val) in self._props.iteritems():
+                if val is not None:
+                    properties[key] = str(val)
+
+
     def properties_match(self, filter_props):
         """
         Returns True if any of the criteria match the object's properties
@@ -47,6 +47,7 @@ WARNING!
 """
 from drbdmanage.storage.storagecommon import GenericStorage
 from drbdmanage.drbd.drbdcommon import GenericDrbdObject
+from drbdmanage.metrics import timed, GROUP_CORE
 from drbdmanage.exceptions import (
     InvalidAddrFamException, VolSizeRangeException, PersistenceException, QuorumException
 )
@@ -95,6 +96,7 @@ class DrbdManager(object):
     #       trying to load the new configuration. If DrbdManager fails
     #       to load the configuration, it should probably rather stop
     #       than loop at some point.
+    @timed(GROUP_CORE, "DrbdManager.run")
     @log_in_out
     def run(self, override_hash_check, poke_cluster, lock_already_hold=False):
         """
@@ -262,6 +264,15 @@ class DrbdManager(object):
             self._server.get_message_log().add_entry(msglog.MessageLog.WARN, log_message)
             return False, False
 
+        # Regenerate the global configuration file once for this run
+        self._server.invalidate_global_conf()
+
+        # Volumes may have been changed outside of drbdmanage since the last
+        # run; make the storage plugin reload its view of the backend
+        bd_mgr = self._server.get_bd_mgr()
+        if bd_mgr is not None:
+            bd_mgr.invalidate_inventory()
+
         """
         Check for changes of the cluster configuration (node members)
         """
@@ -409,7 +420,9 @@ class DrbdManager(object):
         self._server.cleanup()
 
         if pool_changed:
-            self._server.update_pool_data()
+            # The storage plugin is queried in the background; the node's
+            # pool data is updated by the server once the query has completed
+            self._server.invalidate_pool_data()
 
         return state_changed, failed_actions
 
@@ -511,9 +524,12 @@ class DrbdManager(object):
                 (actions that concern a single volume of a resource)
                 ============================================================
                 """
+                # Allocate the block devices of all volumes that are
+                # deployed by this run at once
+                prealloc = self._deploy_volumes_blockdevs(assg)
                 for vol_state in assg.iterate_volume_states():
                     (set_state_changed, set_pool_changed, set_failed_actions) = (
-                        self._volume_actions(assg, vol_state)
+                        self._volume_actions(assg, vol_state, prealloc)
                     )
                     if set_state_changed:
                         state_changed = True
@@ -614,9 +630,11 @@ class DrbdManager(object):
 
 
     @log_in_out
-    def _volume_actions(self, assg, vol_state):
+    def _volume_actions(self, assg, vol_state, prealloc={}):
         """
         Deploy or undeploy a volume
+
+        @param   prealloc: see _deploy_volumes_blockdevs()
         """
         state_changed  = False
         pool_changed   = False
@@ -646,7 +664,7 @@ class DrbdManager(object):
             if vol_state.requires_deploy():
                 pool_changed = True
                 state_changed = True
-                fn_rc = self._deploy_volume_actions(assg, vol_state, max_peers)
+                fn_rc = self._deploy_volume_actions(assg, vol_state, max_peers, prealloc)
                 assg.set_rc(fn_rc)
                 if fn_rc != 0:
                     failed_actions = True
@@ -1155,10 +1173,157 @@ class DrbdManager(object):
         file_name = ("/var/lib/drbd/drbd-minor-%d.lkbd" % (minor_nr))
         self._server.remove_file(file_name)
 
+    def _get_max_peers(self):
+        max_peers = self._server.DEFAULT_MAX_PEERS
+        try:
+            max_peers = int(
+                self._server.get_conf_value(
+                    self._server.KEY_MAX_PEERS
+                )
+            )
+        except ValueError:
+            pass
+        return max_peers
+
+    @log_in_out
+    def _deploy_volumes_blockdevs(self, assignment):
+        """
+        Allocates the block devices for multiple volumes of an assignment
+
+        If multiple volumes of the assignment require a new empty block
+        device, the block devices are allocated concurrently. Either all
+        of them are allocated or none of them. Afterwards, the meta data
+        for all of those volumes is created concurrently, too.
+        The per-volume deployment actions use the results instead of
+        allocating block devices and creating meta data by themselves.
+
+        @return: dict of volume id = tuple (BlockDevice object or None,
+                 exit code of the meta data creation or None)
+        """
+        prealloc = {}
+        if is_set(assignment.get_tstate(), Assignment.FLAG_DISKLESS):
+            return prealloc
+
+        deploy_vol_states = []
+        for vol_state in assignment.iterate_volume_states():
+            if ((not vol_state.requires_undeploy()) and vol_state.requires_deploy() and
+                    vol_state.get_props().get_prop(consts.SNAPS_SRC_BLOCKDEV) is None):
+                deploy_vol_states.append(vol_state)
+        if len(deploy_vol_states) < 2:
+            # Nothing to gain, leave it to the per-volume actions
+            return prealloc
+
+        bd_mgr    = self._server.get_bd_mgr()
+        resource  = assignment.get_resource()
+        res_name  = resource.get_name()
+        max_peers = self._get_max_peers()
+        try:
+            requests = []
+            for vol_state in deploy_vol_states:
+                volume = resource.get_volume(vol_state.get_id())
+                gross_size = self._blockdev_gross_size(resource, volume, vol_state, max_peers)
+                requests.append((res_name, volume.get_id(), gross_size))
+        except md.MetaDataException:
+            # Reported by the per-volume actions
+            return prealloc
+
+        blockdevs = bd_mgr.create_blockdevices(requests)
+        md_vol_ids = []
+        for vol_state, blockdev in zip(deploy_vol_states, blockdevs):
+            prealloc[vol_state.get_id()] = (blockdev, None)
+            if blockdev is not None:
+                vol_state.set_bd(blockdev.get_name(), blockdev.get_path())
+                md_vol_ids.append(vol_state.get_id())
+
+        if len(md_vol_ids) > 0:
+            for vol_state in deploy_vol_states:
+                self._delete_drbd_info_file(vol_state.get_volume())
+            self._server.export_assignment_conf(assignment)
+            nodes, vol_states = self._deploy_conf_vol_states(assignment, deploy_vol_states)
+            assg_conf = self._server.open_assignment_conf(res_name)
+            self._resconf.write_excerpt(assg_conf, assignment, nodes, vol_states,
+                                        global_path=self._server.get_global_conf_path())
+            self._server.close_assignment_conf(assg_conf)
+            self._server.update_assignment_conf(res_name)
+
+            md_results = self._drbdadm.create_md_many(res_name, md_vol_ids, max_peers)
+            for vol_id, md_rc in md_results.iteritems():
+                blockdev, _ = prealloc[vol_id]
+                prealloc[vol_id] = (blockdev, md_rc)
+        return prealloc
+
+    def _deploy_conf_vol_states(self, assignment, deploy_vol_states):
+        """
+        Selects the nodes and volume states for writing the configuration
+        file that is used for deploying volumes
+
+        @return: tuple (list of DrbdNode objects, dict of node name =
+                 list of DrbdVolumeState objects)
+        """
+        resource = assignment.get_resource()
+
+        # add all the (peer) nodes that have or will have this
+        # resource deployed
+        nodes = []
+        for peer_assg in resource.iterate_assignments():
+            if is_set(peer_assg.get_tstate(), Assignment.FLAG_DEPLOY):
+                nodes.append(peer_assg.get_node())
+
+        local_node       = assignment.get_node()
+        local_vol_states = []
+        vol_states       = {}
+        deploy_flag      = DrbdVolumeState.FLAG_DEPLOY
+        assg_res         = assignment.get_resource()
+
+        # LOCAL NODE
+        # - add the volumes that are being deployed no matter what
+        #   their current state or target state is, so drbdadm
+        #   can see them in the configuration and operate on them
+        # - add those other volumes that are already deployed
+        local_vol_states.extend(deploy_vol_states)
+        for vstate in assignment.iterate_volume_states():
+            if ((is_set(vstate.get_tstate(), deploy_flag) and
+                is_set(vstate.get_cstate(), deploy_flag))):
+                    # do not add the same volume state object
+                    # twice; the volume states for the volumes that are
+                    # being deployed have already been added
+                    if vstate not in deploy_vol_states:
+                        local_vol_states.append(vstate)
+        vol_states[local_node.get_name()] = local_vol_states
+
+        # OTHER NODES
+        # - pretend that all volumes that the local node has are also
+        #   on all other nodes
+        for assg_node in nodes:
+            peer_assg = assg_node.get_assignment(assg_res.get_name())
+            # prevent adding the local node twice
+            if peer_assg is not assignment:
+                assg_vol_states = []
+                for local_vstate in local_vol_states:
+                    peer_vstate = peer_assg.get_volume_state(
+                        local_vstate.get_id()
+                    )
+                    if peer_vstate is not None:
+                        assg_vol_states.append(peer_vstate)
+                    else:
+                        # The volume state list should be the same for
+                        # all assignments; if it is not, log an error
+                        log_message = (
+                            "Volume state list mismatch between multiple "
+                            "assignments for resource %s"
+                            % (assg_res.get_name())
+                        )
+                        logging.error(log_message)
+                        self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
+                vol_states[assg_node.get_name()] = assg_vol_states
+        return nodes, vol_states
+
     @log_in_out
-    def _deploy_volume_actions(self, assignment, vol_state, max_peers):
+    def _deploy_volume_actions(self, assignment, vol_state, max_peers, prealloc={}):
         """
         Deploys a volumes or restores a snapshot
+
+        @param   prealloc: see _deploy_volumes_blockdevs()
         """
         # Attempt to delete any old DRBD block device info file for the new volume's minor number
         self._delete_drbd_info_file(vol_state.get_volume())
@@ -1190,7 +1355,7 @@ class DrbdManager(object):
         else:
             if not diskless:
                 fn_rc, blockdev = self._deploy_volume_blockdev(
-                    assignment, vol_state, max_peers
+                    assignment, vol_state, max_peers, prealloc
                 )
                 if fn_rc != 0 or blockdev is None:
                     failed_actions = True
@@ -1210,61 +1375,7 @@ class DrbdManager(object):
             # ============================================================
             # Prepare datastructures for writing DRBD configuration files
             # ============================================================
-
-            # add all the (peer) nodes that have or will have this
-            # resource deployed
-            nodes = []
-            for peer_assg in resource.iterate_assignments():
-                if is_set(peer_assg.get_tstate(), Assignment.FLAG_DEPLOY):
-                    nodes.append(peer_assg.get_node())
-
-            local_node       = assignment.get_node()
-            local_vol_states = []
-            vol_states       = {}
-            deploy_flag      = DrbdVolumeState.FLAG_DEPLOY
-            assg_res         = assignment.get_resource()
-
-            # LOCAL NODE
-            # - add the current volume no matter what
-            #   its current state or target state is, so drbdadm
-            #   can see it in the configuration and operate on it
-            # - add those other volumes that are already deployed
-            local_vol_states.append(vol_state)
-            for vstate in assignment.iterate_volume_states():
-                if ((is_set(vstate.get_tstate(), deploy_flag) and
-                    is_set(vstate.get_cstate(), deploy_flag))):
-                        # do not add the same volume state object
-                        # twice; the volume state for the current
-                        # volume has already been added
-                        if vstate is not vol_state:
-                            local_vol_states.append(vstate)
-            vol_states[local_node.get_name()] = local_vol_states
-
-            # OTHER NODES
-            # - pretend that all volumes that the local node has are also
-            #   on all other nodes
-            for assg_node in nodes:
-                peer_assg = assg_node.get_assignment(assg_res.get_name())
-                # prevent adding the local node twice
-                if peer_assg is not assignment:
-                    assg_vol_states = []
-                    for local_vstate in local_vol_states:
-                        peer_vstate = peer_assg.get_volume_state(
-                            local_vstate.get_id()
-                        )
-                        if peer_vstate is not None:
-                            assg_vol_states.append(peer_vstate)
-                        else:
-                            # The volume state list should be the same for
-                            # all assignments; if it is not, log an error
-                            log_message = (
-                                "Volume state list mismatch between multiple "
-                                "assignments for resource %s"
-                                % (assg_res.get_name())
-                            )
-                            logging.error(log_message)
-                            self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
-                    vol_states[assg_node.get_name()] = assg_vol_states
+            nodes, vol_states = self._deploy_conf_vol_states(assignment, [vol_state])
 
             # ============================================================
             # Meta-data creation
@@ -1275,7 +1386,7 @@ class DrbdManager(object):
             if (not failed_actions) and (not diskless) and src_bd_name is None:
                 fn_rc = self._deploy_volume_metadata(
                     assignment, vol_state, max_peers, nodes, vol_states,
-                    thin_flag, initial_flag
+                    thin_flag, initial_flag, prealloc
                 )
                 if fn_rc != 0:
                     failed_actions = True
@@ -1293,10 +1404,10 @@ class DrbdManager(object):
                 #        creation failed
                 # Adjust the DRBD resource to configure the volume
                 res_name = resource.get_name()
-                assg_conf, global_conf = self._server.open_assignment_conf(res_name)
-                self._resconf.write_excerpt(assg_conf, assignment,
-                                            nodes, vol_states, global_conf)
-                self._server.close_assignment_conf(assg_conf, global_conf)
+                assg_conf = self._server.open_assignment_conf(res_name)
+                self._resconf.write_excerpt(assg_conf, assignment, nodes, vol_states,
+                                            global_path=self._server.get_global_conf_path())
+                self._server.close_assignment_conf(assg_conf)
                 self._server.update_assignment_conf(res_name)
 
                 vol_id = vol_state.get_id()
@@ -1348,21 +1459,14 @@ class DrbdManager(object):
         logging.debug("DrbdManager: _deploy_volume_actions(): fn_rc = %d" % (fn_rc))
         return fn_rc
 
-    @log_in_out
-    def _deploy_volume_blockdev(self, assignment, vol_state, max_peers):
+    def _blockdev_gross_size(self, resource, volume, vol_state, max_peers):
         """
-        Creates a new empty block device for a new volume
-        """
-        fn_rc    = -1
-        bd_mgr   = self._server.get_bd_mgr()
-        resource = assignment.get_resource()
-        volume   = resource.get_volume(vol_state.get_id())
-        blockdev = None
+        Calculates the size of the block device for a new volume
 
+        @raise   MetaDataException: if the volume size is out of range
+        """
         net_size = volume.get_size_kiB()
-        is_resizing = False
         if vol_state.requires_resize_storage():
-            is_resizing = True
             try:
                 net_size = volume.get_resize_value()
             except ValueError:
@@ -1371,15 +1475,37 @@ class DrbdManager(object):
                     "Resource '%s, Volume %d"
                     % (resource.get_name(), volume.get_id())
                 )
+        return md.MetaData.get_gross_kiB(
+            net_size, max_peers, md.MetaData.DEFAULT_AL_STRIPES, md.MetaData.DEFAULT_AL_kiB
+        )
+
+    @log_in_out
+    def _deploy_volume_blockdev(self, assignment, vol_state, max_peers, prealloc={}):
+        """
+        Creates a new empty block device for a new volume
+
+        Uses the block device from prealloc if it has been allocated
+        already by _deploy_volumes_blockdevs()
+        """
+        fn_rc    = -1
+        bd_mgr   = self._server.get_bd_mgr()
+        resource = assignment.get_resource()
+        volume   = resource.get_volume(vol_state.get_id())
+        blockdev = None
+
+        is_resizing = vol_state.requires_resize_storage()
         try:
-            gross_size = md.MetaData.get_gross_kiB(
-                net_size, max_peers, md.MetaData.DEFAULT_AL_STRIPES, md.MetaData.DEFAULT_AL_kiB
-            )
-            blockdev = bd_mgr.create_blockdevice(
-                resource.get_name(),
-                volume.get_id(),
-                gross_size
-            )
+            if volume.get_id() in prealloc:
+                blockdev, _ = prealloc[volume.get_id()]
+            else:
+                gross_size = self._blockdev_gross_size(
+                    resource, volume, vol_state, max_peers
+                )
+                blockdev = bd_mgr.create_blockdevice(
+                    resource.get_name(),
+                    volume.get_id(),
+                    gross_size
+                )
 
             if blockdev is not None:
                 vol_state.set_bd(
@@ -1491,22 +1617,30 @@ class DrbdManager(object):
 
     @log_in_out
     def _deploy_volume_metadata(self, assignment, vol_state, max_peers,
-                                nodes, vol_states, thin_flag, initial_flag):
+                                nodes, vol_states, thin_flag, initial_flag,
+                                prealloc={}):
         """
         Creates DRBD metadata on a volume
+
+        The metadata is not created again if it has been created already
+        by _deploy_volumes_blockdevs()
         """
         fn_rc    = -1
         resource = assignment.get_resource()
 
         res_name = assignment.get_resource().get_name()
-        assg_conf, global_conf = self._server.open_assignment_conf(res_name)
-        self._resconf.write_excerpt(assg_conf, assignment,
-                                    nodes, vol_states, global_conf)
-        self._server.close_assignment_conf(assg_conf, global_conf)
+        assg_conf = self._server.open_assignment_conf(res_name)
+        self._resconf.write_excerpt(assg_conf, assignment, nodes, vol_states,
+                                    global_path=self._server.get_global_conf_path())
+        self._server.close_assignment_conf(assg_conf)
         self._server.update_assignment_conf(res_name)
 
         # Initialize DRBD metadata
-        fn_rc = self._drbdadm.create_md(resource.get_name(), vol_state.get_id(), max_peers)
+        _, md_rc = prealloc.get(vol_state.get_id(), (None, None))
+        if md_rc is not None:
+            fn_rc = md_rc
+        else:
+            fn_rc = self._drbdadm.create_md(resource.get_name(), vol_state.get_id(), max_peers)
 
         if fn_rc == 0:
             if initial_flag or thin_flag:
@@ -1593,10 +1727,10 @@ class DrbdManager(object):
 
         # Update the configuration file
         res_name = resource.get_name()
-        assg_conf, global_conf = self._server.open_assignment_conf(res_name)
-        self._resconf.write_excerpt(assg_conf, assignment,
-                                    nodes, vol_states, global_conf)
-        self._server.close_assignment_conf(assg_conf, global_conf)
+        assg_conf = self._server.open_assignment_conf(res_name)
+        self._resconf.write_excerpt(assg_conf, assignment, nodes, vol_states,
+                                    global_path=self._server.get_global_conf_path())
+        self._server.close_assignment_conf(assg_conf)
         self._server.update_assignment_conf(res_name)
 
         fn_rc = -1
@@ -1648,7 +1782,9 @@ class DrbdManager(object):
             fn_rc = -1
             bd_name = vol_state.get_bd_name()
             if bd_name is not None:
-                fn_rc = bd_mgr.remove_blockdevice(bd_name)
+                # The storage plugin reclaims the space in the background,
+                # so a large undeploy does not hold up the rest of this run
+                fn_rc = bd_mgr.trash_blockdevice(bd_name)
             if fn_rc == DM_SUCCESS or bd_name is None:
                 fn_rc = 0
                 vol_state.set_bd(None, None)
@@ -2481,6 +2617,10 @@ class DrbdResource(GenericDrbdObject):
         return self._assignments.itervalues()
 
 
+    def num_assignments(self):
+        return len(self._assignments)
+
+
     def has_assignments(self):
         return len(self._assignments) > 0
 
@@ -2683,10 +2823,7 @@ class DrbdResource(GenericDrbdObject):
             properties[consts.TSTATE_PREFIX + consts.FLAG_REMOVE] = (
                 bool_to_string(is_set(self._state, self.FLAG_REMOVE))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
         return properties
 
 
@@ -2701,13 +2838,14 @@ class DrbdVolume(GenericStorage, GenericDrbdObject):
     DrbdResource objects.
     """
 
-    _id          = None
-    _size_kiB    = None
-    _minor       = None
-    _state       = None
-
-    # Reference to the server's get_serial() function
-    _get_serial = None
+    __slots__ = (
+        "_id",
+        "_size_kiB",
+        "_minor",
+        "_state",
+        # Reference to the server's get_serial() function
+        "_get_serial",
+    )
 
     FLAG_REMOVE  = 0x1
 
@@ -2735,6 +2873,7 @@ class DrbdVolume(GenericStorage, GenericDrbdObject):
             raise ValueError
         self._size_kiB     = size_kiB
         self._minor        = minor
+        self._state        = None
 
         checked_state = None
         if state is not None:
@@ -2875,10 +3014,7 @@ class DrbdVolume(GenericStorage, GenericDrbdObject):
             properties[consts.TSTATE_PREFIX + consts.FLAG_REMOVE] = (
                 bool_to_string(is_set(self._state, self.FLAG_REMOVE))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
         return properties
 
 
@@ -2914,6 +3050,10 @@ class DrbdNode(GenericDrbdObject):
     # Reference to the server's get_serial() function
     _get_serial = None
 
+    # Capacity index that is updated when the storage pool or the state
+    # of the node changes, see set_capacity_index()
+    _capacity_index = None
+
     FLAG_REMOVE   =     0x1
     FLAG_UPDATE   =     0x2
     FLAG_DRBDCTRL =     0x4
@@ -3014,6 +3154,7 @@ class DrbdNode(GenericDrbdObject):
         self._state = state & self.STATE_MASK
         if saved_state != self._state:
             self.get_props().new_serial()
+            self._capacity_changed()
 
 
     def set_state_flags(self, flags):
@@ -3021,6 +3162,7 @@ class DrbdNode(GenericDrbdObject):
         self._state = (self._state | flags) & self.STATE_MASK
         if saved_state != self._state:
             self.get_props().new_serial()
+            self._capacity_changed()
 
 
     def clear_state_flags(self, flags):
@@ -3028,6 +3170,7 @@ class DrbdNode(GenericDrbdObject):
         self._state = ((self._state | flags) ^ flags) & self.STATE_MASK
         if saved_state != self._state:
             self.get_props().new_serial()
+            self._capacity_changed()
 
 
     def get_poolsize(self):
@@ -3042,6 +3185,7 @@ class DrbdNode(GenericDrbdObject):
         if size != self._poolsize:
             self._poolsize = size
             self.get_props().new_serial()
+            self._capacity_changed()
 
 
 
@@ -3049,6 +3193,7 @@ class DrbdNode(GenericDrbdObject):
         if size != self._poolfree:
             self._poolfree = size
             self.get_props().new_serial()
+            self._capacity_changed()
 
 
     def set_pool(self, size, free):
@@ -3056,6 +3201,21 @@ class DrbdNode(GenericDrbdObject):
             self._poolsize = size
             self._poolfree = free
             self.get_props().new_serial()
+            self._capacity_changed()
+
+
+    def set_capacity_index(self, capacity_index):
+        """
+        Sets the capacity index that keeps track of the node's storage pool
+
+        @param   capacity_index: CapacityIndex instance; or None
+        """
+        self._capacity_index = capacity_index
+
+
+    def _capacity_changed(self):
+        if self._capacity_index is not None:
+            self._capacity_index.update(self)
 
 
     def remove(self):
@@ -3107,6 +3267,10 @@ class DrbdNode(GenericDrbdObject):
         return len(self._assignments) > 0
 
 
+    def num_assignments(self):
+        return len(self._assignments)
+
+
     def iterate_assignments(self):
         return self._assignments.itervalues()
 
@@ -3201,10 +3365,7 @@ class DrbdNode(GenericDrbdObject):
             properties[consts.TSTATE_PREFIX + consts.FLAG_QIGNORE] = (
                 bool_to_string(is_set(self._state, self.FLAG_QIGNORE))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
         return properties
 
 
@@ -3219,14 +3380,15 @@ class DrbdVolumeState(GenericDrbdObject):
     objects.
     """
 
-    _volume  = None
-    _bd_path = None
-    _bd_name = None
-    _cstate  = 0
-    _tstate  = 0
-
-    # Reference to the server's get_serial() function
-    _get_serial = None
+    __slots__ = (
+        "_volume",
+        "_bd_path",
+        "_bd_name",
+        "_cstate",
+        "_tstate",
+        # Reference to the server's get_serial() function
+        "_get_serial",
+    )
 
     FLAG_DEPLOY    = 0x1
     FLAG_ATTACH    = 0x2
@@ -3260,7 +3422,9 @@ class DrbdVolumeState(GenericDrbdObject):
         super(DrbdVolumeState, self).__init__(
             get_serial_fn, init_serial, init_props
         )
-        self._volume = volume
+        self._volume  = volume
+        self._bd_name = None
+        self._bd_path = None
 
         if bd_name is not None and bd_path is not None:
             self._bd_name = bd_name
@@ -3537,10 +3701,7 @@ class DrbdVolumeState(GenericDrbdObject):
             properties[consts.CSTATE_PREFIX + consts.FLAG_ATTACH] = (
                 bool_to_string(is_set(self._cstate, self.FLAG_ATTACH))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
         return properties
 
 
@@ -3553,21 +3714,21 @@ class Assignment(GenericDrbdObject):
     assigned to a node.
     """
 
-    _node        = None
-    _resource    = None
-    _vol_states  = None
-    _node_id     = None
-    _snaps_assgs = None
-    _cstate      = 0
-    _tstate      = 0
-    # return code of operations
-    _rc          = 0
-
-    # Reference to the server's get_serial() function
-    _get_serial = None
-
-    # Signal for status change notifications
-    _signal     = None
+    __slots__ = (
+        "_node",
+        "_resource",
+        "_vol_states",
+        "_node_id",
+        "_snaps_assgs",
+        "_cstate",
+        "_tstate",
+        # return code of operations
+        "_rc",
+        # Reference to the server's get_serial() function
+        "_get_serial",
+        # Signal for status change notifications
+        "_signal",
+    )
 
     FLAG_DEPLOY    = 0x1
     FLAG_CONNECT   = 0x2
@@ -3649,6 +3810,7 @@ class Assignment(GenericDrbdObject):
         self._tstate       = tstate
         self._rc           = 0
         self._get_serial   = get_serial_fn
+        self._signal       = None
 
 
     def get_node(self):
@@ -4398,9 +4560,6 @@ class Assignment(GenericDrbdObject):
                 )
             )
 
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
 
         return properties
@@ -36,6 +36,7 @@ from drbdmanage.exceptions import PersistenceException
 from drbdmanage.utils import DataHash
 from drbdmanage.utils import map_val_or_dflt
 from drbdmanage.persistence import GenericPersistence
+from drbdmanage.metrics import timed, GROUP_PERSISTENCE
 from drbdmanage.storage.storagecore import MinorNr
 
 def create_server_persistence(ref_server):
@@ -82,6 +83,10 @@ class DummyPersistence(object):
         pass
 
 
+    def get_containers(self):
+        return None
+
+
     def open(self, modify):
         return True
 
@@ -102,6 +107,9 @@ class BasePersistence(object):
     _json_data      = None
     _json_data_hash = None
 
+    # Containers of the configuration that was saved or loaded last
+    _containers     = None
+
 
     def __init__(self, ref_server):
         self._json_data = ""
@@ -125,6 +133,20 @@ class BasePersistence(object):
         return self._json_data_hash
 
 
+    def get_containers(self):
+        """
+        Returns the containers of the configuration that was saved or loaded last
+
+        The containers are not referenced by the server's objects and are
+        never modified after they have been saved or loaded.
+
+        @return: tuple (nodes, resources, assignments, cluster configuration,
+                 common configuration); None if no configuration was saved
+                 or loaded yet
+        """
+        return self._containers
+
+
     def container_to_json(self, container):
         """
         Serializes a dictionary into a JSON string
@@ -169,30 +191,9 @@ class BasePersistence(object):
             if len(node_assg_map) > 0:
                 assg_map_cache[node.get_name()] = node_assg_map
 
-        # Load nodes
-        loaded_nodes = {}
-        for properties in nodes_con.itervalues():
-            node = DrbdNodePersistence.load(
-                properties,
-                self._server.get_serial
-            )
-            loaded_nodes[node.get_name()] = node
-
-        # Load resources
-        loaded_resources = {}
-        for properties in res_con.itervalues():
-            resource = DrbdResourcePersistence.load(
-                properties,
-                self._server.get_serial
-            )
-            loaded_resources[resource.get_name()] = resource
-
-        # Load assignments
-        for properties in assg_con.itervalues():
-            AssignmentPersistence.load(
-                properties, loaded_nodes, loaded_resources,
-                self._server.get_serial
-            )
+        loaded_nodes, loaded_resources = self.load_objects(
+            nodes_con, res_con, assg_con, self._server.get_serial
+        )
 
         # Reestablish assignments and snapshot assignments signals
         for node in loaded_nodes.itervalues():
@@ -297,6 +298,7 @@ class BasePersistence(object):
         objects_root[drbdmanage.server.DrbdManageServer.OBJ_COMMON_NAME]    = loaded_common_conf
         # NOTE: Caller must update the server's objects directory cache
 
+        self._containers = (nodes_con, res_con, assg_con, cconf_con, common_con)
         self._server.update_objects()
 
         # Quorum: Clear the quorum-ignore flag on each node that is
@@ -333,7 +335,35 @@ class BasePersistence(object):
         common_conf_con = {}
         DrbdCommonPersistence(common_conf).save(common_conf_con)
 
-        return (nodes_con, res_con, assg_con, cluster_conf_con, common_conf_con)
+        self._containers = (nodes_con, res_con, assg_con, cluster_conf_con, common_conf_con)
+        return self._containers
+
+
+    @staticmethod
+    def load_objects(nodes_con, res_con, assg_con, get_serial_fn):
+        """
+        Creates the nodes, resources and assignments from their key/value maps
+
+        @return: tuple (nodes map, resources map)
+        """
+        # Load nodes
+        loaded_nodes = {}
+        for properties in nodes_con.itervalues():
+            node = DrbdNodePersistence.load(properties, get_serial_fn)
+            loaded_nodes[node.get_name()] = node
+
+        # Load resources
+        loaded_resources = {}
+        for properties in res_con.itervalues():
+            resource = DrbdResourcePersistence.load(properties, get_serial_fn)
+            loaded_resources[resource.get_name()] = resource
+
+        # Load assignments
+        for properties in assg_con.itervalues():
+            AssignmentPersistence.load(
+                properties, loaded_nodes, loaded_resources, get_serial_fn
+            )
+        return loaded_nodes, loaded_resources
 
 
     def json_import(self, objects_root):
@@ -417,6 +447,7 @@ class SatellitePersistence(BasePersistence):
         super(SatellitePersistence, self).__init__(ref_server)
 
 
+    @timed(GROUP_PERSISTENCE, "open")
     def open(self, modify):
         return True
 
@@ -429,10 +460,12 @@ class SatellitePersistence(BasePersistence):
         self._data_hash = None
 
 
+    @timed(GROUP_PERSISTENCE, "load")
     def load(self, objects_root):
         self.json_import(objects_root)
 
 
+    @timed(GROUP_PERSISTENCE, "save")
     def save(self, objects_root):
         self.json_export(objects_root)
         self._data_hash = DataHash()
@@ -508,6 +541,7 @@ class ServerDualPersistence(BasePersistence):
         super(ServerDualPersistence, self).__init__(ref_server)
 
 
+    @timed(GROUP_PERSISTENCE, "open")
     def open(self, modify):
         """
         Open the persistent storage for reading or writing, depending on
@@ -621,6 +655,7 @@ class ServerDualPersistence(BasePersistence):
                 pass
 
 
+    @timed(GROUP_PERSISTENCE, "load")
     def load(self, objects_root):
         """
         Loads the configuration from the drbdmanage control volume
@@ -684,6 +719,7 @@ class ServerDualPersistence(BasePersistence):
             raise PersistenceException
 
 
+    @timed(GROUP_PERSISTENCE, "save")
     def save(self, objects_root):
         """
         Saves the configuration to the drbdmanage control volume
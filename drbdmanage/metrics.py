@@ -0,0 +1,340 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Latency metrics of the server's operations
+
+The durations of D-Bus methods, RPC socket methods, runs of the
+DrbdManager, persistence operations, satellite proxy commands and external
+commands are counted in histograms with logarithmic buckets. The metrics
+are queried through the "metrics" text query and can be written
+periodically to a file for the Prometheus node exporter's textfile
+collector.
+"""
+
+import os
+import math
+import time
+import threading
+from functools import wraps
+
+
+GROUP_DBUS        = "dbus"
+GROUP_RPC         = "rpc"
+GROUP_CORE        = "core"
+GROUP_PERSISTENCE = "persistence"
+GROUP_PROXY       = "proxy"
+GROUP_COMMAND     = "command"
+
+# group = (name of the Prometheus label, description)
+GROUPS = {
+    GROUP_DBUS:        ("method",     "D-Bus method calls, until the reply is sent"),
+    GROUP_RPC:         ("method",     "RPC socket method calls, until the reply is sent"),
+    GROUP_CORE:        ("operation",  "Runs of the DrbdManager"),
+    GROUP_PERSISTENCE: ("operation",  "Operations of the persistence layer"),
+    GROUP_PROXY:       ("opcode",     "Commands sent to satellites by the proxy"),
+    GROUP_COMMAND:     ("executable", "External commands")
+}
+
+# Upper bound of the first bucket in seconds; each further bucket
+# doubles the upper bound, the last bucket has no upper bound
+BUCKET_BASE  = 0.0001
+BUCKET_COUNT = 20
+
+METRIC_PREFIX = "drbdmanage_"
+
+
+def bucket_index(duration):
+    """
+    Returns the index of the bucket a duration is counted in
+
+    @param   duration: duration in seconds
+    @return: index of the bucket, 0 to BUCKET_COUNT
+    """
+    if duration <= BUCKET_BASE:
+        return 0
+    idx = int(math.ceil(math.log(duration / BUCKET_BASE, 2)))
+    return min(idx, BUCKET_COUNT)
+
+
+def bucket_bound(idx):
+    """
+    Returns the upper bound of a bucket in seconds
+
+    @return: upper bound; None for the last bucket
+    """
+    if idx >= BUCKET_COUNT:
+        return None
+    return BUCKET_BASE * (2 ** idx)
+
+
+class Metric(object):
+
+    """
+    Number, total duration and histogram of the durations of an operation
+    """
+
+    # Number of observed durations
+    count   = 0
+    # Sum of the observed durations in seconds
+    total   = 0.0
+    # Number of durations per bucket, see bucket_index()
+    buckets = None
+
+    def __init__(self):
+        self.buckets = [0] * (BUCKET_COUNT + 1)
+
+    def observe(self, duration):
+        self.count += 1
+        self.total += duration
+        self.buckets[bucket_index(duration)] += 1
+
+    def get_mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def get_percentile(self, fraction):
+        """
+        Estimates a percentile of the durations
+
+        @param   fraction: percentile as a fraction between 0 and 1
+        @return: upper bound of the bucket that contains the percentile;
+                 None if it is in the last bucket or if there are no durations
+        """
+        if self.count == 0:
+            return None
+        rank = max(1, int(math.ceil(fraction * self.count)))
+        seen = 0
+        for idx in xrange(len(self.buckets)):
+            seen += self.buckets[idx]
+            if seen >= rank:
+                return bucket_bound(idx)
+        return None
+
+
+class MetricsRegistry(object):
+
+    """
+    Metrics of the server's operations by group and name
+
+    Durations are observed by the main loop as well as by the reader
+    threads, therefore the registry is locked.
+    """
+
+    # (group, name) = Metric object
+    _metrics = None
+    # Lock for the metrics
+    _lock    = None
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock    = threading.Lock()
+
+    def observe(self, group, name, duration):
+        """
+        Counts the duration of an operation
+
+        @param   group: one of the GROUP_* constants
+        @param   name: name of the operation within the group
+        @param   duration: duration in seconds
+        """
+        with self._lock:
+            metric = self._metrics.get((group, name))
+            if metric is None:
+                metric = Metric()
+                self._metrics[(group, name)] = metric
+            metric.observe(duration)
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+
+    def get_metrics(self, group=None):
+        """
+        Returns a copy of the metrics, sorted by group and name
+
+        @param   group: only return the metrics of this group; None for all
+        @return: list of (group, name, count, total, buckets) tuples
+        """
+        with self._lock:
+            result = [
+                (m_group, name, metric.count, metric.total, list(metric.buckets))
+                for ((m_group, name), metric) in self._metrics.iteritems()
+                if group is None or m_group == group
+            ]
+        result.sort()
+        return result
+
+    def format_text(self, group=None):
+        """
+        Formats the metrics as a table for the "metrics" text query
+
+        The percentiles are the upper bounds of the buckets that
+        contain them.
+
+        @return: list of lines
+        """
+        lines = [
+            "%-12s %-32s %8s %12s %10s %10s %10s"
+            % ("group", "name", "count", "total [s]", "mean [ms]", "p50 [ms]", "p99 [ms]")
+        ]
+        for (m_group, name, count, total, buckets) in self.get_metrics(group):
+            metric = Metric()
+            metric.count   = count
+            metric.total   = total
+            metric.buckets = buckets
+            lines.append(
+                "%-12s %-32s %8d %12.3f %10.2f %10s %10s"
+                % (m_group, name, count, total, metric.get_mean() * 1000,
+                   self._format_bound(metric.get_percentile(0.5)),
+                   self._format_bound(metric.get_percentile(0.99)))
+            )
+        return lines
+
+    def format_prometheus(self):
+        """
+        Formats the metrics in the Prometheus text exposition format
+
+        Each group is a histogram named drbdmanage_<group>_seconds with the
+        operation's name as a label.
+
+        @return: text of the metrics
+        """
+        lines = []
+        metrics = self.get_metrics()
+        for group in sorted(GROUPS.iterkeys()):
+            label, description = GROUPS[group]
+            group_metrics = [entry for entry in metrics if entry[0] == group]
+            if len(group_metrics) == 0:
+                continue
+            metric_name = METRIC_PREFIX + group + "_seconds"
+            lines.append("# HELP %s %s" % (metric_name, description))
+            lines.append("# TYPE %s histogram" % (metric_name))
+            for (m_group, name, count, total, buckets) in group_metrics:
+                label_value = self._escape_label(name)
+                cumulative = 0
+                for idx in xrange(len(buckets)):
+                    cumulative += buckets[idx]
+                    bound = bucket_bound(idx)
+                    le = "+Inf" if bound is None else repr(bound)
+                    lines.append(
+                        '%s_bucket{%s="%s",le="%s"} %d'
+                        % (metric_name, label, label_value, le, cumulative)
+                    )
+                lines.append(
+                    '%s_sum{%s="%s"} %r' % (metric_name, label, label_value, total)
+                )
+                lines.append(
+                    '%s_count{%s="%s"} %d' % (metric_name, label, label_value, count)
+                )
+        return "".join([line + "\n" for line in lines])
+
+    @staticmethod
+    def _format_bound(bound):
+        if bound is None:
+            return "-"
+        return "%.1f" % (bound * 1000)
+
+    @staticmethod
+    def _escape_label(value):
+        return (
+            str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        )
+
+
+# The server's metrics
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+def observe(group, name, duration):
+    _registry.observe(group, name, duration)
+
+
+def write_prometheus_file(path):
+    """
+    Writes the metrics to a file for the Prometheus textfile collector
+
+    The file is replaced atomically, so that the collector never reads
+    a partially written file.
+
+    @param   path: path of the file, should end with ".prom"
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as out_file:
+        out_file.write(_registry.format_prometheus())
+    os.rename(tmp_path, path)
+
+
+def timed(group, name=None):
+    """
+    Decorator that counts the durations of a function's calls
+
+    If the function is called with the keyword argument reply_handler, like
+    D-Bus methods with asynchronous replies, the duration is counted when
+    the reply_handler or the error_handler is called, instead of when the
+    function returns.
+
+    @param   group: one of the GROUP_* constants
+    @param   name: name of the operation; None for the function's name, or
+             a function that is called with the arguments of the call and
+             returns the name
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if name is None:
+                op_name = fn.__name__
+            elif callable(name):
+                op_name = name(*args, **kwargs)
+            else:
+                op_name = name
+            start = time.time()
+            reply_handler = kwargs.get("reply_handler")
+            if reply_handler is not None:
+                error_handler = kwargs.get("error_handler")
+
+                def timed_reply(*values):
+                    observe(group, op_name, time.time() - start)
+                    reply_handler(*values)
+
+                def timed_error(exc):
+                    observe(group, op_name, time.time() - start)
+                    error_handler(exc)
+
+                kwargs["reply_handler"] = timed_reply
+                if error_handler is not None:
+                    kwargs["error_handler"] = timed_error
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    # No handler will be called
+                    observe(group, op_name, time.time() - start)
+                    raise
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(group, op_name, time.time() - start)
+        return wrapper
+    return decorator
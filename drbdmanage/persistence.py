@@ -43,15 +43,39 @@ class GenericPersistence(object):
         @rtype:  dict
         """
         properties = {}
+        obj_dict = getattr(self._obj, "__dict__", None)
         for key in serializable:
             try:
-                val = self._obj.__dict__[key]
+                if obj_dict is not None and key in obj_dict:
+                    val = obj_dict[key]
+                elif self._is_slot(key):
+                    val = getattr(self._obj, key)
+                else:
+                    continue
                 properties[key] = val
-            except KeyError:
+            except AttributeError:
                 pass
         return properties
 
 
+    def _is_slot(self, key):
+        """
+        Checks whether an object variable is stored in a slot
+
+        Class level defaults of objects without __slots__ are not
+        serialized, therefore variables that are neither in the object's
+        __dict__ nor in one of its slots are skipped by load_dict().
+
+        @param   key: name of the object variable
+        @return: True if the variable is a slot of the object's class
+        @rtype:  bool
+        """
+        for cls in type(self._obj).__mro__:
+            if key in cls.__dict__.get("__slots__", ()):
+                return True
+        return False
+
+
     def serialize(self, properties):
         """
         Serialize a dictionary (dict) into a JSON string
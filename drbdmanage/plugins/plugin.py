@@ -38,6 +38,7 @@ class PluginManager():
         self._server = server
         self._known = {
             'drbdmanage.deployers.BalancedDeployer': 'balanced-deployer',
+            'drbdmanage.deployers.ReservationDeployer': 'reservation-deployer',
             'drbdmanage.storage.lvm.Lvm': Lvm.NAME,
             'drbdmanage.storage.lvm_thinlv.LvmThinLv': LvmThinLv.NAME,
             'drbdmanage.storage.lvm_thinpool.LvmThinPool': LvmThinPool.NAME,
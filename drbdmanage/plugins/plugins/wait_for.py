@@ -155,8 +155,20 @@ class PolicyBase(object):
                             policy=policies,
                             result=False)
 
-    def get_resource(self, res_name):
+    def run(self):
         self._server.request_ctrlvol()
+        return self.evaluate(True)
+
+    def evaluate(self, check_timeout=False):
+        """Evaluates the policy with the server's current configuration.
+
+        Unlike run(), this does not request the control volume first;
+        the server's waiter registry calls this whenever the configuration
+        was saved or reloaded.
+        """
+        raise RuntimeError("Virtual method")
+
+    def get_resource(self, res_name):
         res = self._server._resources.get(res_name)
         if not res:
             return ([(dm_exc.DM_ENOENT,
@@ -217,7 +229,7 @@ class WaitForResource(PolicyBase):
     def filter_good(self, assg):
         return [a for a in assg if a]
 
-    def run(self):
+    def evaluate(self, check_timeout=False):
 
         # Get config
         cnf = self._conf
@@ -236,9 +248,10 @@ class WaitForResource(PolicyBase):
             vols = int(vols, base=10)
 
         # Check timeout
-        to = self.check_timeout(cnf)
-        if to:
-            return to
+        if check_timeout:
+            to = self.check_timeout(cnf)
+            if to:
+                return to
 
         # Get list of diskful assignments
         diskful = self._get_assignments(res, vols)
@@ -260,7 +273,7 @@ class WaitForSnapshot(PolicyBase):
     def filter_good(self, xlist):
         return [a for a in xlist if a.is_deployed()]
 
-    def run(self):
+    def evaluate(self, check_timeout=False):
 
         # Get config
         cnf = self._conf
@@ -273,9 +286,10 @@ class WaitForSnapshot(PolicyBase):
             return res
 
         # Check timeout
-        to = self.check_timeout(cnf)
-        if to:
-            return to
+        if check_timeout:
+            to = self.check_timeout(cnf)
+            if to:
+                return to
 
         snap = res.get_snapshot(snap_name)
         if not snap:
@@ -295,7 +309,7 @@ class WaitForVolumeSize(PolicyBase):
     Needs 'resource', 'volnr' and 'req_size' (in KB) as inputs.
     """
 
-    def run(self):
+    def evaluate(self, check_timeout=False):
 
         # Get config
         cnf = self._conf
@@ -316,9 +330,10 @@ class WaitForVolumeSize(PolicyBase):
                     {})
 
         # Check timeout
-        to = self.check_timeout(cnf)
-        if to:
-            return to
+        if check_timeout:
+            to = self.check_timeout(cnf)
+            if to:
+                return to
 
         size = vol.get_size_kiB()
         # TODO(LINBIT): using ">=" means that shrinking is not supported (yet)
@@ -3,11 +3,17 @@
 Module for the PropsContainer class and related classes
 """
 
+import os
 import drbdmanage.consts as consts
 
+# namespace = normalized namespace, see Props._normalize_namespace()
+_norm_namespaces = {}
+# Maximum number of cached normalized namespaces
+_NORM_NAMESPACES_MAX = 256
+
 
 class Props(object):
-    _props = None
+    __slots__ = ("_props",)
 
     """
     Namespaces:
@@ -34,18 +40,28 @@ class Props(object):
         # Load initial properties, if present
         if ins_props is not None:
             for (key, value) in ins_props.iteritems():
-                self._props[str(key)] = str(value)
+                self._props[intern(str(key))] = str(value)
 
     def _normalize_namespace(self, namespace):
         """
         Namespace has to be a string, but can be an empty string ("")
+
+        Normalized namespaces are cached, because the same few namespaces
+        are used for every property lookup.
         """
-        import os
         if namespace is not None and len(namespace) >= 1:
-            namespace = namespace.strip()
-            namespace = os.path.normpath(namespace)
-            namespace = namespace if namespace[0] == '/' else '/' + namespace
-            namespace = namespace if namespace[-1] == '/' else namespace + '/'
+            norm_namespace = _norm_namespaces.get(namespace)
+            if norm_namespace is None:
+                norm_namespace = namespace.strip()
+                norm_namespace = os.path.normpath(norm_namespace)
+                if norm_namespace[0] != '/':
+                    norm_namespace = '/' + norm_namespace
+                if norm_namespace[-1] != '/':
+                    norm_namespace = norm_namespace + '/'
+                if len(_norm_namespaces) >= _NORM_NAMESPACES_MAX:
+                    _norm_namespaces.clear()
+                _norm_namespaces[namespace] = norm_namespace
+            namespace = norm_namespace
         return namespace
 
     def _normalize_key(self, key, namespace):
@@ -215,14 +231,36 @@ class PropsContainer(Props):
     Container for managing property dictionary
     """
 
-    _get_serial = None
+    __slots__ = (
+        "_get_serial",
+        # Function called with the new serial number on every change
+        "_observer",
+        # PropsIndex that the properties are registered with, see set_index()
+        "_index",
+        # Object registered with the index for the properties
+        "_index_owner",
+        # Properties as currently registered with the index
+        "_indexed",
+        # Serial number as an integer; always equal to the SERIAL property,
+        # which stays a string like all other properties, because property
+        # maps are sent as a{ss} over D-Bus and saved as strings
+        "_serial",
+        # Integer values of properties, see get_long_or_default();
+        # None until a value is requested, cleared on every change
+        "_typed",
+    )
 
     def __init__(self, get_serial_fn, init_serial, ins_props):
         """
         Initializes a new properties container
         """
         super(PropsContainer, self).__init__(ins_props)
-        self._get_serial = get_serial_fn
+        self._get_serial  = get_serial_fn
+        self._observer    = None
+        self._index       = None
+        self._index_owner = None
+        self._indexed     = None
+        self._typed       = None
 
         # Set the initial serial number
         checked_serial = None
@@ -231,9 +269,7 @@ class PropsContainer(Props):
                 checked_serial = int(init_serial)
             except ValueError:
                 pass
-        if checked_serial is not None:
-            self._props[consts.SERIAL] = str(checked_serial)
-        else:
+        if checked_serial is None:
             current_serial = self._props.get(consts.SERIAL)
             if current_serial is not None:
                 try:
@@ -242,9 +278,11 @@ class PropsContainer(Props):
                     pass
             if checked_serial is None:
                 if self._get_serial is not None:
-                    self._props[consts.SERIAL] = str(self._get_serial())
+                    checked_serial = self._get_serial()
                 else:
-                    self._props[consts.SERIAL] = str(1)
+                    checked_serial = 1
+        self._serial = checked_serial
+        self._props[consts.SERIAL] = intern(str(checked_serial))
 
     def set_prop(self, key, value, namespace=""):
         super(PropsContainer, self).set_prop(key, value, namespace)
@@ -281,9 +319,85 @@ class PropsContainer(Props):
         changes of the container's data is unnecessary.
         """
         serial = self._get_serial()
-        self._props[consts.SERIAL] = str(serial)
+        self._typed = None
+        if serial != self._serial or consts.SERIAL not in self._props:
+            self._serial = serial
+            # All containers changed within the same generation share one
+            # serial number string
+            self._props[consts.SERIAL] = intern(str(serial))
+        if self._index is not None:
+            self._indexed = self._index.update(
+                self._index_owner, self._indexed, self._props
+            )
+        if self._observer is not None:
+            self._observer(serial)
         return serial
 
+    def get_serial(self):
+        """
+        Returns the container's serial number
+
+        @return: serial number of the container's current generation
+        @rtype:  int
+        """
+        return self._serial
+
+    def get_int_or_default(self, key, default, namespace=""):
+        """
+        Returns a property as an int type if possible, otherwise the default
+        """
+        value = self.get_long_or_default(key, None, namespace)
+        return int(value) if value is not None else default
+
+    def get_long_or_default(self, key, default, namespace=""):
+        """
+        Returns a property as a long type if possible, otherwise the default
+
+        The value is parsed once per change generation of the container.
+        """
+        norm_key = self._normalize_key(key, namespace)
+        if self._typed is None:
+            self._typed = {}
+        try:
+            value = self._typed[norm_key]
+        except KeyError:
+            value = None
+            try:
+                value = long(self._props[norm_key])
+            except (KeyError, ValueError):
+                pass
+            self._typed[norm_key] = value
+        return value if value is not None else default
+
+    def set_observer(self, observer_fn):
+        """
+        Sets a function that is called whenever the container's serial
+        number is updated
+
+        The function is called with the new serial number as its only
+        argument. Setting None removes the current observer.
+        """
+        self._observer = observer_fn
+
+    def set_index(self, props_index, owner):
+        """
+        Registers the container's properties with an inverted index
+
+        The index is updated whenever the container's data changes.
+        Setting None removes the properties from the current index.
+
+        @param   props_index: PropsIndex instance; or None
+        @param   owner: object (or key of the object) the properties
+                 belong to
+        """
+        if self._index is not None:
+            self._index.update(self._index_owner, self._indexed, {})
+        self._index = props_index
+        self._index_owner = owner
+        self._indexed = {}
+        if props_index is not None:
+            self._indexed = props_index.update(owner, self._indexed, self._props)
+
     def new_serial_gen(self):
         """
         Creates a new instance of the SerialNrGen class
@@ -301,6 +415,8 @@ class SerialGen(object):
 
     _props_store = None
     _change_open = False
+    # Serial number of the open change generation
+    _serial      = 0
 
     def __init__(self, props_store_ref):
         """
@@ -317,6 +433,8 @@ class SerialGen(object):
         the same serial number is returned until the change generation is
         closed by calling close_serial().
         """
+        if self._change_open:
+            return self._serial
         serial = 0
         try:
             serial_str = self._props_store[consts.SERIAL]
@@ -324,10 +442,9 @@ class SerialGen(object):
                 serial = int(serial_str)
         except TypeError:
             pass
-        if not self._change_open:
-            self._change_open = True
-            serial += 1
-        return serial
+        self._change_open = True
+        self._serial = serial + 1
+        return self._serial
 
     def close_serial(self):
         """
@@ -338,3 +455,62 @@ class SerialGen(object):
         will return a new serial number.
         """
         self._change_open = False
+
+
+class PropsIndex(object):
+
+    """
+    Inverted index of the properties of a number of objects
+
+    Maps each property key and value to the set of objects that have that
+    property value. The properties' serial numbers are not indexed.
+    """
+
+    # key = { value = set of objects }
+    _index = None
+
+    def __init__(self):
+        self._index = {}
+
+    def update(self, owner, indexed, props):
+        """
+        Updates the index entries of an object
+
+        @param   owner: the object the properties belong to
+        @param   indexed: dictionary of the currently indexed properties
+        @param   props: dictionary of the object's properties
+        @return: dictionary of the indexed properties after the update
+        """
+        for (key, value) in indexed.iteritems():
+            if props.get(key) != value:
+                values = self._index[key]
+                owners = values[value]
+                owners.discard(owner)
+                if len(owners) == 0:
+                    del values[value]
+                    if len(values) == 0:
+                        del self._index[key]
+        updated = {}
+        for (key, value) in props.iteritems():
+            if key != consts.SERIAL:
+                if indexed.get(key) != value:
+                    values = self._index.setdefault(key, {})
+                    values.setdefault(value, set()).add(owner)
+                updated[key] = value
+        return updated
+
+    def find(self, filter_props):
+        """
+        Returns the objects that have any of the specified property values
+
+        @param   filter_props: dictionary of property keys and values
+        @return: set of objects
+        """
+        matches = set()
+        for (key, value) in filter_props.iteritems():
+            values = self._index.get(key)
+            if values is not None:
+                owners = values.get(value)
+                if owners is not None:
+                    matches.update(owners)
+        return matches
@@ -52,6 +52,7 @@ from drbdmanage.consts import (
     DEFAULT_SAT_CFG_TCP_KEEPINTVL,
     DEFAULT_SAT_CFG_TCP_KEEPCNT,
 )
+from drbdmanage.metrics import timed, GROUP_PROXY
 
 
 class ThreadedTCPRequestHandler(SocketServer.BaseRequestHandler):
@@ -99,7 +100,7 @@ class ThreadedTCPRequestHandler(SocketServer.BaseRequestHandler):
                 elif opcode == opcodes[KEY_S_CMD_UPPOOL]:
                     self.server.dmserver._persist.set_json_data(payload)
                     self.server.dmserver._persist.load(self.server.dmserver._objects_root)
-                    self.server.dmserver.update_pool_data(force=True)
+                    self.server.dmserver.update_pool_data(force=True, refresh=True)
                     self.server.dmserver._persist.save(self.server.dmserver._objects_root)
                     answer_payload = self.server.dmserver._persist.get_json_data()
                     cmd = KEY_S_ANS_OK
@@ -427,6 +428,7 @@ class DrbdManageProxy(object):
     # it on the next call.
     # important, the E_COMM is returned to the caller, it is up to the caller if he immediately tries
     # to resend if the first attempt failed.
+    @timed(GROUP_PROXY, lambda self, peer_name, cmd, *args, **kwargs: cmd)
     def send_cmd(self, peer_name, cmd, port=_DEFAULT_PORT_NR, override_data='', override_ip=''):
         payload = override_data
         short_timeout = 2.0
@@ -0,0 +1,590 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Replays the D-Bus traces recorded by DbusTracer
+
+The traces that 'drbdmanage dbus-tracer' writes are python scripts that
+call the server's methods with the recorded arguments. The replay tool
+reads the calls and their delays from such a script without running it,
+and calls the methods of a server from a number of concurrent clients,
+optionally faster than recorded. It reports the latency percentiles of
+each method and the throughput of the replay.
+
+Replays modify the server's configuration like the recorded calls did,
+therefore traces should be replayed against a test cluster only. The
+tool can create fake LVM and drbdadm executables for the test servers,
+see write_fake_tools().
+"""
+
+import ast
+import os
+import sys
+import time
+import threading
+import Queue
+import dbus
+import dbus.mainloop.glib
+import drbdmanage.rpc
+import drbdmanage.argparse.argparse as argparse
+from drbdmanage.consts import (
+    DBUS_DRBDMANAGED, DBUS_SERVICE, DRBDCTRL_RES_NAME, KEY_VG_NAME,
+    KEY_RPC_SOCKET, DEFAULT_RPC_SOCKET
+)
+from drbdmanage.exceptions import DM_SUCCESS, DM_INFO
+from drbdmanage.utils import percentile, load_server_conf_file
+
+
+# Methods that are not replayed, because they would stop the test server
+SKIP_METHODS = ("shutdown",)
+
+# Timeout in seconds for replayed calls; covers long-running calls like
+# wait_for, which the default D-Bus timeout does not
+CALL_TIMEOUT = 300
+
+# D-Bus types that may occur in the arguments of a trace
+DBUS_TYPES = (
+    "Array", "Boolean", "Byte", "ByteArray", "Dictionary", "Double",
+    "Int16", "Int32", "Int64", "ObjectPath", "Signature", "String",
+    "Struct", "UInt16", "UInt32", "UInt64", "UTF8String"
+)
+
+# Storage pool size reported by the fake LVM executables, in kiB
+FAKE_POOL_KIB = 1024 * 1024 * 1024
+# Volume group of the fake LVM executables
+FAKE_VG_NAME  = "drbdreplay"
+
+
+class TraceFormatError(Exception):
+
+    """
+    Raised if a line of a trace cannot be parsed
+    """
+
+    pass
+
+
+def load_trace(path):
+    """
+    Reads the calls of a trace that DbusTracer recorded
+
+    Only the calls and delays are read from the trace script, the script
+    is not run. The arguments are rebuilt as D-Bus types, see parse_args().
+
+    @param   path: path of the trace script
+    @return: list of (delay in seconds, method name, arguments) tuples,
+             like the log of DbusTracer
+    """
+    trace = []
+    delay = 0.0
+    with open(path) as trace_file:
+        for (line_nr, line) in enumerate(trace_file, 1):
+            line = line.strip()
+            try:
+                if line.startswith("dt_sleep(") and line.endswith(")"):
+                    delay = float(line[len("dt_sleep("):-1])
+                elif line.startswith("_server.") and line.endswith(")"):
+                    method, args = line[len("_server."):-1].split("(", 1)
+                    trace.append((delay, method, parse_args(args)))
+                    delay = 0.0
+            except (ValueError, SyntaxError, TraceFormatError) as exc:
+                raise TraceFormatError("%s, line %d: %s" % (path, line_nr, str(exc)))
+    return trace
+
+
+def parse_args(args_text):
+    """
+    Rebuilds the arguments of a call from their text in a trace
+
+    The text contains the repr() of the D-Bus types of the recorded
+    arguments. Only literals and constructors of D-Bus types are evaluated.
+
+    @param   args_text: comma separated arguments
+    @return: list of arguments
+    """
+    call = ast.parse("call(" + args_text + ")", mode="eval").body
+    if call.starargs is not None or call.kwargs is not None or len(call.keywords) > 0:
+        raise TraceFormatError("Unexpected keyword arguments")
+    return [_eval_node(node) for node in call.args]
+
+
+def _eval_node(node):
+    if isinstance(node, ast.Str):
+        return node.s
+    elif isinstance(node, ast.Num):
+        return node.n
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_eval_node(node.operand)
+    elif isinstance(node, ast.Name) and node.id in ("True", "False", "None"):
+        return {"True": True, "False": False, "None": None}[node.id]
+    elif isinstance(node, ast.List):
+        return [_eval_node(item) for item in node.elts]
+    elif isinstance(node, ast.Tuple):
+        return tuple([_eval_node(item) for item in node.elts])
+    elif isinstance(node, ast.Dict):
+        return dict(zip(
+            [_eval_node(key) for key in node.keys],
+            [_eval_node(value) for value in node.values]
+        ))
+    elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and
+          isinstance(node.func.value, ast.Name) and node.func.value.id == "dbus" and
+          node.func.attr in DBUS_TYPES and
+          node.starargs is None and node.kwargs is None):
+        args = [_eval_node(arg) for arg in node.args]
+        kwargs = dict([(keyword.arg, _eval_node(keyword.value)) for keyword in node.keywords])
+        return getattr(dbus, node.func.attr)(*args, **kwargs)
+    raise TraceFormatError("Unexpected expression '%s'" % (node.__class__.__name__))
+
+
+class MethodStats(object):
+
+    """
+    Latencies and failures of the replayed calls of a method
+    """
+
+    # Latencies of the calls in seconds
+    _latencies = None
+    # Number of calls that raised an exception
+    _failed    = 0
+    # Number of calls that replied with an error return code
+    _rc_errors = 0
+
+    def __init__(self):
+        self._latencies = []
+
+    def add(self, latency, failed, rc_error):
+        self._latencies.append(latency)
+        if failed:
+            self._failed += 1
+        if rc_error:
+            self._rc_errors += 1
+
+    def get_calls(self):
+        return len(self._latencies)
+
+    def get_failed(self):
+        return self._failed
+
+    def get_rc_errors(self):
+        return self._rc_errors
+
+    def get_percentiles(self, fractions):
+        """
+        Returns the latency percentiles in seconds
+
+        @param   fractions: list of percentiles as fractions, e.g. 0.99
+        @return: list of latencies
+        """
+        latencies = sorted(self._latencies)
+        return [percentile(latencies, fraction) for fraction in fractions]
+
+
+class Replayer(object):
+
+    """
+    Replays a trace from a number of concurrent clients
+
+    The calls are started in the order of the trace. Each client runs one
+    call at a time, therefore calls may be delayed if all clients are busy.
+    """
+
+    # List of (delay, method name, arguments) tuples, see load_trace()
+    _trace       = None
+    # Server proxies of the clients; one thread per client
+    _servers     = None
+    # Factor by which the recorded delays are shortened; 0 for no delays
+    _speedup     = 1.0
+    # Queue of the calls for the clients
+    _calls       = None
+    # method name = MethodStats object
+    _stats       = None
+    # Lock for the stats
+    _stats_lock  = None
+    # Number of calls that were not replayed, see SKIP_METHODS
+    _skipped     = 0
+
+    def __init__(self, trace, servers, speedup):
+        """
+        @param   trace: list of calls, see load_trace()
+        @param   servers: list of the server proxy objects of the clients,
+                 either D-Bus proxies or RpcClient objects
+        @param   speedup: factor by which the recorded delays are shortened,
+                 0 to start the calls without delays
+        """
+        self._trace      = trace
+        self._servers    = servers
+        self._speedup    = speedup
+        self._calls      = Queue.Queue()
+        self._stats      = {}
+        self._stats_lock = threading.Lock()
+
+    def run(self, repeat=1):
+        """
+        Replays the trace
+
+        @param   repeat: number of times the trace is replayed
+        @return: duration of the replay in seconds
+        """
+        clients = []
+        for server in self._servers:
+            client = threading.Thread(target=self._client, args=(server,))
+            client.daemon = True
+            client.start()
+            clients.append(client)
+
+        start = time.time()
+        offset = 0.0
+        for _ in xrange(repeat):
+            for (delay, method, args) in self._trace:
+                if method in SKIP_METHODS:
+                    self._skipped += 1
+                    continue
+                if self._speedup > 0:
+                    offset += delay / self._speedup
+                    wait = start + offset - time.time()
+                    if wait > 0:
+                        time.sleep(wait)
+                self._calls.put((method, args))
+        for _ in clients:
+            self._calls.put(None)
+        for client in clients:
+            # join() with a timeout, so that KeyboardInterrupt is delivered
+            while client.is_alive():
+                client.join(1.0)
+        return time.time() - start
+
+    def get_stats(self):
+        return self._stats
+
+    def get_skipped(self):
+        return self._skipped
+
+    def _client(self, server):
+        while True:
+            call = self._calls.get()
+            if call is None:
+                break
+            method, args = call
+            failed = False
+            rc_error = False
+            call_start = time.time()
+            try:
+                result = getattr(server, method)(*args, timeout=CALL_TIMEOUT)
+                rc_error = self._has_error_rc(result)
+            except Exception:
+                failed = True
+            latency = time.time() - call_start
+            with self._stats_lock:
+                method_stats = self._stats.get(method)
+                if method_stats is None:
+                    method_stats = MethodStats()
+                    self._stats[method] = method_stats
+                method_stats.add(latency, failed, rc_error)
+
+    @staticmethod
+    def _has_error_rc(result):
+        """
+        Checks whether a reply's return codes contain an error
+
+        The return codes are the reply's first value, see add_rc_entry().
+        """
+        fn_rc = result[0] if isinstance(result, tuple) and len(result) > 0 else result
+        if not isinstance(fn_rc, list):
+            return False
+        for rc_entry in fn_rc:
+            try:
+                if rc_entry[0] not in (DM_SUCCESS, DM_INFO):
+                    return True
+            except (TypeError, IndexError):
+                return False
+        return False
+
+
+def write_report(out, replayer, duration):
+    """
+    Writes the latency percentiles of each method and the throughput
+    """
+    stats = replayer.get_stats()
+    calls = sum([method_stats.get_calls() for method_stats in stats.itervalues()])
+    failed = sum([method_stats.get_failed() for method_stats in stats.itervalues()])
+    out.write(
+        "%d calls in %.2f s, %.1f calls/s, %d failed, %d skipped\n"
+        % (calls, duration, calls / duration if duration > 0 else 0.0,
+           failed, replayer.get_skipped())
+    )
+    out.write(
+        "%-28s %7s %7s %7s %10s %10s %10s %10s\n"
+        % ("method", "calls", "failed", "rc-err",
+           "p50 [ms]", "p90 [ms]", "p99 [ms]", "max [ms]")
+    )
+    for method in sorted(stats.iterkeys()):
+        method_stats = stats[method]
+        latencies = method_stats.get_percentiles([0.5, 0.9, 0.99, 1.0])
+        out.write(
+            "%-28s %7d %7d %7d %10.2f %10.2f %10.2f %10.2f\n"
+            % tuple([method, method_stats.get_calls(), method_stats.get_failed(),
+                     method_stats.get_rc_errors()] +
+                    [latency * 1000 for latency in latencies])
+        )
+
+
+FAKE_LVM = """#!/usr/bin/env python2
+# Fake LVM executable created by drbdmanage-replay
+#
+# Keeps the logical volumes in a state directory instead of creating
+# them, and creates their device nodes as links to /dev/null
+import os
+import sys
+
+STATE_DIR = %(state_dir)r
+POOL_KIB  = %(pool_kib)d
+LVS_ENOENT = 5
+
+
+def opt_value(args, opts, default):
+    for opt in opts:
+        if opt in args and args.index(opt) + 1 < len(args):
+            return args[args.index(opt) + 1]
+    return default
+
+
+def lv_state(vg_name, lv_name):
+    return os.path.join(STATE_DIR, vg_name, lv_name)
+
+
+def set_lv(vg_name, lv_name, size):
+    if not os.path.isdir(os.path.join(STATE_DIR, vg_name)):
+        os.makedirs(os.path.join(STATE_DIR, vg_name))
+    with open(lv_state(vg_name, lv_name), "w") as state_file:
+        state_file.write(size.rstrip("kK"))
+    dev_dir = os.path.join("/dev", vg_name)
+    if not os.path.isdir(dev_dir):
+        os.makedirs(dev_dir)
+    if not os.path.lexists(os.path.join(dev_dir, lv_name)):
+        os.symlink("/dev/null", os.path.join(dev_dir, lv_name))
+
+
+def remove_lv(vg_name, lv_name):
+    for path in (lv_state(vg_name, lv_name), os.path.join("/dev", vg_name, lv_name)):
+        if os.path.lexists(path):
+            os.unlink(path)
+
+
+def used_kib():
+    used = 0
+    for (dir_path, dir_names, file_names) in os.walk(STATE_DIR):
+        for file_name in file_names:
+            with open(os.path.join(dir_path, file_name)) as state_file:
+                used += int(float(state_file.read() or "0"))
+    return used
+
+
+def main():
+    cmd = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    target = args[-1] if len(args) > 0 else ""
+    vg_name = target.split("/")[0]
+    if cmd == "lvcreate":
+        size = opt_value(args, ("-L", "-V", "--size", "--virtualsize"), "0")
+        set_lv(vg_name, opt_value(args, ("-n", "--name"), "lv"), size)
+    elif cmd == "lvextend":
+        set_lv(vg_name, target.split("/")[-1], opt_value(args, ("-L", "--size"), "0"))
+    elif cmd == "lvremove":
+        remove_lv(vg_name, target.split("/")[-1])
+    elif cmd == "lvs":
+        if "/" in target:
+            lv_name = target.split("/")[-1]
+            if not os.path.exists(lv_state(vg_name, lv_name)):
+                return LVS_ENOENT
+            sys.stdout.write("  %%s\\n" %% (lv_name))
+    elif cmd == "vgs":
+        sys.stdout.write("  %%d.00,%%d.00\\n" %% (POOL_KIB, POOL_KIB - used_kib()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+"""
+
+FAKE_DRBD_UTIL = """#!/bin/sh
+# Fake %(name)s executable created by drbdmanage-replay
+#
+# Runs the real %(name)s for the control volume, and succeeds without
+# changes for all other resources
+for arg in "$@"; do
+    case "$arg" in
+        *%(ctrl_name)s*) exec %(real_path)s "$@" ;;
+    esac
+done
+exit 0
+"""
+
+# Fake executables of the LVM storage plugins
+FAKE_LVM_COMMANDS  = ("lvcreate", "lvextend", "lvremove", "lvs", "vgs", "lvchange", "vgchange")
+# Fake DRBD utilities; drbdsetup is not faked, because the server
+# monitors the control volume through 'drbdsetup events2'
+FAKE_DRBD_COMMANDS = ("drbdadm", "drbdmeta")
+
+
+def write_fake_tools(directory):
+    """
+    Creates fake LVM and DRBD executables for a test server
+
+    The test server runs the fake executables instead of the real ones
+    if its configuration file contains the returned settings. The fake
+    DRBD utilities run the real ones for the control volume only.
+
+    @param   directory: directory for the executables and their state
+    @return: settings for the server's configuration file
+    """
+    lvm_dir = os.path.join(directory, "lvm")
+    bin_dir = os.path.join(directory, "bin")
+    state_dir = os.path.join(directory, "state")
+    for path in (lvm_dir, bin_dir, state_dir):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    lvm_script = os.path.join(lvm_dir, "fake-lvm")
+    _write_executable(lvm_script, FAKE_LVM % {
+        "state_dir": os.path.abspath(state_dir), "pool_kib": FAKE_POOL_KIB
+    })
+    for cmd in FAKE_LVM_COMMANDS:
+        cmd_path = os.path.join(lvm_dir, cmd)
+        if not os.path.lexists(cmd_path):
+            os.symlink("fake-lvm", cmd_path)
+
+    for cmd in FAKE_DRBD_COMMANDS:
+        _write_executable(os.path.join(bin_dir, cmd), FAKE_DRBD_UTIL % {
+            "name": cmd, "ctrl_name": DRBDCTRL_RES_NAME.lstrip("."),
+            "real_path": _find_executable(cmd, bin_dir)
+        })
+
+    return (
+        "[LOCAL]\n"
+        "extend-path = %s\n"
+        "\n"
+        "[Plugin:Lvm]\n"
+        "lvm-path = %s\n"
+        "%s = %s\n"
+        % (os.path.abspath(bin_dir), os.path.abspath(lvm_dir), KEY_VG_NAME, FAKE_VG_NAME)
+    )
+
+
+def _write_executable(path, content):
+    with open(path, "w") as exec_file:
+        exec_file.write(content)
+    os.chmod(path, 0755)
+
+
+def _find_executable(name, exclude_dir):
+    """
+    Returns the path of an executable, ignoring the fake executables
+    """
+    search_path = os.environ.get("PATH", "").split(":") + ["/sbin", "/usr/sbin"]
+    for path_dir in search_path:
+        if len(path_dir) > 0 and os.path.abspath(path_dir) != os.path.abspath(exclude_dir):
+            exec_path = os.path.join(path_dir, name)
+            if os.access(exec_path, os.X_OK):
+                return exec_path
+    return os.path.join("/usr/sbin", name)
+
+
+def connect(transport, socket_path):
+    """
+    Connects a client to the server
+
+    @return: D-Bus proxy object or RpcClient object
+    """
+    if transport == "socket":
+        return drbdmanage.rpc.RpcClient(socket_path)
+    # Each client has its own connection, so that the calls of the
+    # clients are not serialized by a shared connection
+    bus = dbus.SystemBus(private=True)
+    return bus.get_object(DBUS_DRBDMANAGED, DBUS_SERVICE)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="drbdmanage-replay",
+        description="Replays a D-Bus trace recorded by 'drbdmanage dbus-tracer' "
+        "and reports the latency percentiles of each method. The replay "
+        "modifies the configuration like the recorded calls did; use a test "
+        "cluster."
+    )
+    parser.add_argument("trace", nargs="?", help="trace script to replay")
+    parser.add_argument("--transport", choices=("dbus", "socket"), default="dbus",
+                        help="Communicate with the server through D-Bus or "
+                        "through its local RPC socket")
+    parser.add_argument("--socket", help="Path of the server's RPC socket")
+    parser.add_argument("--concurrency", "-c", type=int, default=1,
+                        help="Number of concurrent clients")
+    parser.add_argument("--speedup", "-s", type=float, default=1.0,
+                        help="Factor by which the recorded delays are shortened; "
+                        "0 replays the calls without delays")
+    parser.add_argument("--repeat", "-r", type=int, default=1,
+                        help="Number of times the trace is replayed")
+    parser.add_argument("--fake-tools", metavar="DIRECTORY",
+                        help="Create fake LVM and drbdadm executables for a test "
+                        "server in DIRECTORY, print the settings for the "
+                        "server's configuration file and exit")
+    args = parser.parse_args()
+
+    if args.fake_tools is not None:
+        sys.stdout.write(write_fake_tools(args.fake_tools))
+        return 0
+    if args.trace is None:
+        parser.error("the trace argument is required")
+    if args.concurrency < 1 or args.repeat < 1 or args.speedup < 0:
+        parser.error("invalid --concurrency, --repeat or --speedup value")
+
+    try:
+        trace = load_trace(args.trace)
+    except (IOError, TraceFormatError) as exc:
+        sys.stderr.write("Cannot load the trace: %s\n" % str(exc))
+        return 1
+
+    socket_path = args.socket
+    if socket_path is None:
+        socket_path = load_server_conf_file(localonly=True).get(
+            KEY_RPC_SOCKET, DEFAULT_RPC_SOCKET
+        ).strip()
+    if args.transport == "dbus":
+        dbus.mainloop.glib.threads_init()
+    try:
+        servers = [
+            connect(args.transport, socket_path) for _ in xrange(args.concurrency)
+        ]
+    except dbus.exceptions.DBusException as exc:
+        sys.stderr.write("Cannot connect to the server: %s\n" % str(exc))
+        return 1
+
+    replayer = Replayer(trace, servers, args.speedup)
+    sys.stdout.write(
+        "Replaying %d calls from %s, %d clients, speedup %s, %d times\n"
+        % (len(trace), args.trace, args.concurrency,
+           args.speedup if args.speedup > 0 else "unlimited", args.repeat)
+    )
+    try:
+        duration = replayer.run(args.repeat)
+    except KeyboardInterrupt:
+        sys.stderr.write("Replay interrupted\n")
+        return 1
+    write_report(sys.stdout, replayer, duration)
+    return 0
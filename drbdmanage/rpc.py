@@ -0,0 +1,670 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Local JSON-RPC endpoint of the server
+
+Clients on the same node may call the server's methods through a Unix
+domain socket instead of through D-Bus. The socket serves the methods of
+DBusServer with the same arguments and the same replies.
+
+Messages are framed by a 4 byte length in network byte order, followed by
+the message. Messages are JSON-RPC 2.0 requests and responses:
+
+  {"jsonrpc": "2.0", "id": 1, "method": "list_nodes", "params": [...]}
+  {"jsonrpc": "2.0", "id": 1, "result": [...]}
+  {"jsonrpc": "2.0", "id": 1, "error": {"code": -32601, "message": "..."}}
+
+The result is the list of the reply's values, e.g. [fn_rc, node_list].
+If the msgpack module is installed, clients may send msgpack encoded
+messages instead; the server replies in the encoding of the request.
+"""
+
+import os
+import stat
+import errno
+import socket
+import struct
+import time
+import logging
+import json
+import gobject
+import dbus.exceptions
+from drbdmanage.metrics import observe, GROUP_RPC
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Frame header: length of the message, unsigned 32 bit, network byte order
+FRAME_HEADER = struct.Struct("!I")
+# Maximum length of a request message
+MAX_REQUEST_LEN = 16 * 1024 * 1024
+
+# JSON-RPC 2.0 error codes
+ERR_PARSE            = -32700
+ERR_INVALID_REQUEST  = -32600
+ERR_METHOD_NOT_FOUND = -32601
+ERR_INVALID_PARAMS   = -32602
+ERR_INTERNAL         = -32603
+
+
+class JsonCodec(object):
+
+    """
+    Encodes and decodes JSON messages
+    """
+
+    NAME = "json"
+
+    @staticmethod
+    def encode(message):
+        return json.dumps(message, separators=(",", ":"))
+
+    @staticmethod
+    def decode(data):
+        return json.loads(data)
+
+
+class MsgpackCodec(object):
+
+    """
+    Encodes and decodes msgpack messages
+    """
+
+    NAME = "msgpack"
+
+    @staticmethod
+    def encode(message):
+        return msgpack.packb(message)
+
+    @staticmethod
+    def decode(data):
+        return msgpack.unpackb(data)
+
+
+def get_codec(data):
+    """
+    Selects the codec of a received message
+
+    JSON messages are objects, which start with '{'. A msgpack message
+    is a map, which never starts with that byte.
+
+    @param   data: the received message
+    @return: JsonCodec or MsgpackCodec; None if the message is msgpack
+             encoded and the msgpack module is not installed
+    """
+    if data[:1] == "{":
+        return JsonCodec
+    if msgpack is not None:
+        return MsgpackCodec
+    return None
+
+
+def frame(data):
+    """
+    Prepends the frame header to an encoded message
+    """
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def to_str(value):
+    """
+    Converts the unicode strings of a decoded message to utf-8 str objects
+
+    The server's functions expect the str objects that D-Bus passes to
+    them, e.g. as keys of properties containers.
+    """
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    elif isinstance(value, dict):
+        return dict([(to_str(key), to_str(val)) for (key, val) in value.iteritems()])
+    elif isinstance(value, list):
+        return [to_str(item) for item in value]
+    return value
+
+
+def to_plain(value):
+    """
+    Converts D-Bus types to plain python types for encoding a message
+    """
+    if isinstance(value, dict):
+        return dict([(to_plain(key), to_plain(val)) for (key, val) in value.iteritems()])
+    elif isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    elif isinstance(value, basestring):
+        # dbus.String and dbus.ByteArray are subclasses of the plain types
+        return unicode(value) if isinstance(value, unicode) else str(value)
+    elif isinstance(value, bool):
+        return value
+    elif isinstance(value, (int, long)):
+        # includes dbus.Boolean and the dbus integer types
+        return int(value)
+    elif isinstance(value, float):
+        return float(value)
+    return value
+
+
+class RpcConnection(object):
+
+    """
+    Connection of a client to the server's RPC socket
+    """
+
+    # Size of the blocks read from the socket
+    RECV_SIZE = 65536
+
+    # RpcServer that accepted the connection
+    _rpc_server = None
+    # The connection's socket
+    _sock       = None
+    # Data received but not processed yet
+    _in_data    = ""
+    # Encoded replies that have not been sent yet
+    _out_data   = ""
+    # Source ids of the main loop watches; None if not watched
+    _in_watch   = None
+    _out_watch  = None
+
+    def __init__(self, rpc_server, sock):
+        self._rpc_server = rpc_server
+        self._sock = sock
+        self._sock.setblocking(False)
+        self._in_watch = gobject.io_add_watch(
+            sock.fileno(), gobject.IO_IN | gobject.IO_HUP | gobject.IO_ERR,
+            self._receive
+        )
+
+    def is_open(self):
+        return self._sock is not None
+
+    def send(self, data):
+        """
+        Sends an encoded message to the client
+
+        Data that the socket does not accept immediately is sent when the
+        socket becomes writable.
+
+        @param   data: the encoded message without its frame header
+        """
+        if self._sock is None:
+            # The client has disconnected
+            return
+        self._out_data += frame(data)
+        if self._out_watch is None:
+            if self._flush():
+                self._out_watch = gobject.io_add_watch(
+                    self._sock.fileno(), gobject.IO_OUT, self._writable
+                )
+
+    def close(self):
+        if self._in_watch is not None:
+            gobject.source_remove(self._in_watch)
+            self._in_watch = None
+        if self._out_watch is not None:
+            gobject.source_remove(self._out_watch)
+            self._out_watch = None
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except socket.error:
+                pass
+            self._sock = None
+        self._in_data = ""
+        self._out_data = ""
+
+    def _receive(self, fd, condition):
+        """
+        Reads the data that the client sent and processes complete messages
+        """
+        try:
+            data = self._sock.recv(RpcConnection.RECV_SIZE)
+        except socket.error as sock_exc:
+            if sock_exc.errno in (errno.EAGAIN, errno.EINTR):
+                return True
+            data = ""
+        if len(data) == 0:
+            self._in_watch = None
+            self.close()
+            return False
+
+        self._in_data += data
+        while self._sock is not None:
+            if len(self._in_data) < FRAME_HEADER.size:
+                break
+            msg_len = FRAME_HEADER.unpack_from(self._in_data)[0]
+            if msg_len > MAX_REQUEST_LEN:
+                logging.warning(
+                    "RPC socket: request of %d bytes exceeds the maximum size, "
+                    "closing the connection" % (msg_len)
+                )
+                self._in_watch = None
+                self.close()
+                return False
+            msg_end = FRAME_HEADER.size + msg_len
+            if len(self._in_data) < msg_end:
+                break
+            message = self._in_data[FRAME_HEADER.size:msg_end]
+            self._in_data = self._in_data[msg_end:]
+            self._rpc_server.process(self, message)
+        return self._sock is not None
+
+    def _writable(self, fd, condition):
+        keep_watching = self._flush()
+        if not keep_watching:
+            self._out_watch = None
+        return keep_watching
+
+    def _flush(self):
+        """
+        Sends as much of the pending data as the socket accepts
+
+        @return: True if data remains to be sent, False otherwise
+        """
+        try:
+            while len(self._out_data) > 0:
+                sent = self._sock.send(self._out_data)
+                self._out_data = self._out_data[sent:]
+        except socket.error as sock_exc:
+            if sock_exc.errno in (errno.EAGAIN, errno.EINTR):
+                return True
+            logging.warning(
+                "RPC socket: cannot send the reply to a client: %s" % str(sock_exc)
+            )
+            self.close()
+        return False
+
+
+class RpcServer(object):
+
+    """
+    Serves the methods of DBusServer through a Unix domain socket
+
+    Requests are dispatched like the requests that DBusServer receives:
+    requests that may modify the configuration are queued for the main
+    loop, the list_* requests are served by reader threads, and all other
+    requests run on the main loop immediately.
+    The D-Bus signals, the D-Bus tracer and the debug console are only
+    available through D-Bus.
+    """
+
+    # Dispatch modes of the methods
+    WRITE = 0
+    READ  = 1
+    SYNC  = 2
+    WAIT  = 3
+
+    # method name = (dispatch mode, name of the function that runs it)
+    # Functions whose names start with "_rpc_" are methods of RpcServer,
+    # all other functions are methods of the server
+    METHODS = {
+        "poke":                       (WRITE, "poke"),
+        "create_node":                (WRITE, "create_node"),
+        "remove_node":                (WRITE, "remove_node"),
+        "create_resource":            (WRITE, "create_resource"),
+        "resize_volume":              (WRITE, "resize_volume"),
+        "remove_resource":            (WRITE, "remove_resource"),
+        "create_volume":              (WRITE, "create_volume"),
+        "remove_volume":              (WRITE, "remove_volume"),
+        "connect":                    (WRITE, "connect"),
+        "disconnect":                 (WRITE, "disconnect"),
+        "modify_node":                (WRITE, "modify_node"),
+        "modify_resource":            (WRITE, "modify_resource"),
+        "modify_volume":              (WRITE, "modify_volume"),
+        "modify_assignment":          (WRITE, "modify_assignment"),
+        "attach":                     (WRITE, "attach"),
+        "detach":                     (WRITE, "detach"),
+        "assign":                     (WRITE, "assign"),
+        "unassign":                   (WRITE, "unassign"),
+        "cluster_free_query":         (SYNC,  "cluster_free_query"),
+        "cluster_free_query_site":    (SYNC,  "cluster_free_query"),
+        "auto_deploy":                (WRITE, "auto_deploy"),
+        "auto_deploy_site":           (WRITE, "auto_deploy"),
+        "auto_deploy_many":           (WRITE, "auto_deploy_many"),
+        "auto_undeploy":              (WRITE, "auto_undeploy"),
+        "update_pool_check":          (WRITE, "update_pool_check"),
+        "update_pool":                (WRITE, "update_pool"),
+        "set_drbdsetup_props":        (WRITE, "set_drbdsetup_props"),
+        "list_nodes":                 (READ,  "list_nodes"),
+        "list_nodes_page":            (READ,  "list_nodes_page"),
+        "get_config_keys":            (SYNC,  "get_config_keys"),
+        "get_plugin_default_config":  (SYNC,  "get_plugin_default_config"),
+        "get_cluster_config":         (SYNC,  "get_cluster_config"),
+        "get_selected_config_values": (SYNC,  "get_selected_config_values"),
+        "get_site_config":            (SYNC,  "get_site_config"),
+        "set_cluster_config":         (WRITE, "set_cluster_config"),
+        "list_resources":             (READ,  "list_resources"),
+        "list_resources_page":        (READ,  "list_resources_page"),
+        "list_volumes":               (READ,  "list_volumes"),
+        "list_volumes_page":          (READ,  "list_volumes_page"),
+        "list_assignments":           (READ,  "list_assignments"),
+        "list_assignments_page":      (READ,  "list_assignments_page"),
+        "create_snapshot":            (WRITE, "create_snapshot"),
+        "list_snapshots":             (SYNC,  "list_snapshots"),
+        "list_snapshot_assignments":  (SYNC,  "list_snapshot_assignments"),
+        "list_removed":               (SYNC,  "list_removed"),
+        "restore_snapshot":           (WRITE, "restore_snapshot"),
+        "remove_snapshot_assignment": (WRITE, "remove_snapshot_assignment"),
+        "remove_snapshot":            (WRITE, "remove_snapshot"),
+        "resume":                     (WRITE, "resume"),
+        "resume_all":                 (WRITE, "resume_all"),
+        "export_conf":                (WRITE, "export_conf"),
+        "quorum_control":             (WRITE, "quorum_control"),
+        "reconfigure":                (WRITE, "reconfigure"),
+        "text_query":                 (SYNC,  "text_query"),
+        "init_node":                  (WRITE, "init_node"),
+        "role":                       (SYNC,  "role"),
+        "reelect":                    (SYNC,  "_rpc_reelect"),
+        "join_node":                  (WRITE, "join_node"),
+        "run_external_plugin":        (WRITE, "run_external_plugin"),
+        "wait_for":                   (WAIT,  "wait_for"),
+        "load_conf":                  (WRITE, "dbus_load_conf"),
+        "save_conf":                  (WRITE, "dbus_save_conf"),
+        "ping":                       (SYNC,  "_rpc_ping"),
+        "wait_for_startup":           (SYNC,  "wait_for_startup"),
+        "get_ctrlvol":                (SYNC,  "get_ctrlvol"),
+        "set_ctrlvol":                (WRITE, "set_ctrlvol"),
+        "shutdown":                   (SYNC,  "_rpc_shutdown"),
+    }
+
+    # Reference to the server
+    _server   = None
+    # Path of the socket
+    _path     = None
+    # The listening socket
+    _sock     = None
+
+    def __init__(self, server, path):
+        """
+        Creates the socket and starts accepting connections
+
+        @param   server: the DrbdManageServer object
+        @param   path: path of the socket; a stale socket is replaced
+        """
+        self._server = server
+        self._path = path
+        try:
+            if stat.S_ISSOCK(os.lstat(path).st_mode):
+                os.unlink(path)
+        except OSError:
+            pass
+        sock_dir = os.path.dirname(path)
+        if len(sock_dir) > 0 and not os.path.isdir(sock_dir):
+            os.makedirs(sock_dir, 0700)
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket is only accessible by the server's user
+        saved_umask = os.umask(0177)
+        try:
+            self._sock.bind(path)
+        finally:
+            os.umask(saved_umask)
+        self._sock.listen(16)
+        self._sock.setblocking(False)
+        gobject.io_add_watch(self._sock.fileno(), gobject.IO_IN, self._accept)
+        logging.info("RPC socket: accepting connections on '%s'" % (path))
+
+    def get_path(self):
+        return self._path
+
+    def process(self, connection, message):
+        """
+        Processes a request that a client sent
+
+        @param   connection: RpcConnection the request was received on
+        @param   message: the encoded request
+        """
+        codec = get_codec(message)
+        if codec is None:
+            self._send_error(
+                connection, JsonCodec, None, ERR_PARSE,
+                "Cannot parse the request, msgpack is not supported"
+            )
+            return
+        try:
+            request = codec.decode(message)
+            req_id = request.get("id")
+            method = to_str(request["method"])
+            params = to_str(request.get("params", []))
+        except Exception:
+            self._send_error(connection, codec, None, ERR_PARSE, "Cannot parse the request")
+            return
+        if not isinstance(params, list):
+            self._send_error(
+                connection, codec, req_id, ERR_INVALID_REQUEST, "params is not a list"
+            )
+            return
+        method_entry = RpcServer.METHODS.get(method)
+        if method_entry is None:
+            self._send_error(
+                connection, codec, req_id, ERR_METHOD_NOT_FOUND,
+                "Unknown method '%s'" % (method)
+            )
+            return
+
+        mode, fn_name = method_entry
+        if fn_name.startswith("_rpc_"):
+            fn = getattr(self, fn_name)
+        else:
+            fn = getattr(self._server, fn_name)
+
+        start = time.time()
+
+        def reply_fn(*values):
+            observe(GROUP_RPC, method, time.time() - start)
+            if connection.is_open():
+                connection.send(codec.encode(
+                    {"jsonrpc": "2.0", "id": req_id, "result": list(values)}
+                ))
+
+        def error_fn(exc):
+            observe(GROUP_RPC, method, time.time() - start)
+            self._send_error(connection, codec, req_id, ERR_INTERNAL, str(exc))
+
+        if mode == RpcServer.WRITE:
+            self._server.dispatch_write(reply_fn, error_fn, fn, *params)
+        elif mode == RpcServer.READ:
+            self._server.dispatch_read(reply_fn, error_fn, fn, *params)
+        else:
+            if mode == RpcServer.WAIT:
+                # The reply is sent when the wait finishes
+                params = params + [reply_fn]
+            try:
+                result = fn(*params)
+            except TypeError as exc:
+                self._send_error(connection, codec, req_id, ERR_INVALID_PARAMS, str(exc))
+                return
+            except Exception as exc:
+                logging.error(
+                    "RPC socket: request %s failed, unhandled exception: %s"
+                    % (method, str(exc))
+                )
+                error_fn(exc)
+                return
+            if mode == RpcServer.WAIT:
+                if result is not None:
+                    reply_fn(*result)
+            elif result is None:
+                reply_fn()
+            elif isinstance(result, tuple):
+                reply_fn(*result)
+            else:
+                reply_fn(result)
+
+    def _rpc_reelect(self, props):
+        return self._server.reelect(props, False)
+
+    def _rpc_ping(self):
+        return 0
+
+    def _rpc_shutdown(self, props):
+        logging.info("server shutdown requested through the RPC socket")
+        self._server.shutdown(props)
+
+    def _accept(self, fd, condition):
+        try:
+            client_sock = self._sock.accept()[0]
+            RpcConnection(self, client_sock)
+        except socket.error as sock_exc:
+            if sock_exc.errno not in (errno.EAGAIN, errno.EINTR):
+                logging.warning(
+                    "RPC socket: cannot accept a connection: %s" % str(sock_exc)
+                )
+        # Keep accepting connections
+        return True
+
+    @staticmethod
+    def _send_error(connection, codec, req_id, code, text):
+        if connection.is_open():
+            connection.send(codec.encode({
+                "jsonrpc": "2.0", "id": req_id,
+                "error": {"code": code, "message": text}
+            }))
+
+
+class RpcError(dbus.exceptions.DBusException):
+
+    """
+    Raised if a call through the RPC socket fails
+
+    Derived from DBusException, so that clients handle a failed call
+    like a failed call through D-Bus, regardless of the transport.
+    """
+
+    pass
+
+
+class RpcClient(object):
+
+    """
+    Client of the server's RPC socket
+
+    The server's methods are called like the methods of the D-Bus proxy
+    object of the server: a reply without values returns None, a reply with
+    a single value returns the value, a reply with multiple values returns
+    a tuple of the values.
+    """
+
+    # Path of the socket
+    _path    = None
+    # The connection's socket; None if not connected
+    _sock    = None
+    # Codec of the requests
+    _codec   = None
+    # Id of the next request
+    _next_id = 1
+
+    def __init__(self, path, use_msgpack=True):
+        """
+        Connects to the server's RPC socket
+
+        @param   path: path of the socket
+        @param   use_msgpack: encode requests with msgpack, if it is installed
+        """
+        self._path = path
+        self._codec = MsgpackCodec if use_msgpack and msgpack is not None else JsonCodec
+        try:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(path)
+        except socket.error as sock_exc:
+            self._sock = None
+            raise RpcError(
+                "Cannot connect to the RPC socket '%s': %s" % (path, str(sock_exc))
+            )
+
+    def get_codec_name(self):
+        return self._codec.NAME
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call_method(*args, **kwargs):
+            # keyword arguments of D-Bus calls, like timeout=, do not apply
+            return self.call(name, *args)
+        call_method.__name__ = name
+        return call_method
+
+    def call(self, method, *args):
+        """
+        Calls a method of the server and waits for the reply
+
+        @param   method: name of the method
+        @return: the reply's value, or a tuple of the reply's values
+        """
+        if self._sock is None:
+            raise RpcError("Not connected to the RPC socket '%s'" % (self._path))
+        req_id = self._next_id
+        self._next_id += 1
+        request = {
+            "jsonrpc": "2.0", "id": req_id, "method": method,
+            "params": to_plain(args)
+        }
+        try:
+            self._sock.sendall(frame(self._codec.encode(request)))
+            while True:
+                response = self._codec.decode(self._receive())
+                if response.get("id") == req_id:
+                    break
+        except socket.error as sock_exc:
+            self.close()
+            raise RpcError("RPC socket: %s" % str(sock_exc))
+
+        error = response.get("error")
+        if error is not None:
+            raise RpcError(
+                "RPC socket: method %s failed: %s" % (method, error.get("message"))
+            )
+        values = response.get("result", [])
+        if len(values) == 0:
+            return None
+        elif len(values) == 1:
+            return values[0]
+        return tuple(values)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except socket.error:
+                pass
+            self._sock = None
+
+    def _receive(self):
+        """
+        Receives a message
+
+        @return: the encoded message without its frame header
+        """
+        header = self._receive_len(FRAME_HEADER.size)
+        return self._receive_len(FRAME_HEADER.unpack(header)[0])
+
+    def _receive_len(self, length):
+        chunks = []
+        remaining = length
+        while remaining > 0:
+            chunk = self._sock.recv(min(remaining, RpcConnection.RECV_SIZE))
+            if len(chunk) == 0:
+                raise socket.error(errno.ECONNRESET, "Connection closed by the server")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return "".join(chunks)
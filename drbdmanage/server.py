@@ -38,11 +38,11 @@ import threading
 import StringIO
 import Queue
 from functools import wraps
-from bisect import bisect_left
 import drbdmanage.drbd.persistence
 import drbdmanage.quorum
 import drbdmanage.drbd.metadata as md
 import drbdmanage.messagelog as msglog
+import drbdmanage.metrics as metrics
 
 from drbdmanage.consts import (
     SERIAL, NODE_NAME, NODE_ADDR, NODE_AF, RES_NAME, RES_PORT, VOL_MINOR, VOL_ID,
@@ -64,14 +64,16 @@ from drbdmanage.consts import (
     KEY_S_CMD_UPPOOL,
     KEY_SHUTDOWN_RES, KEY_SHUTDOWN_CTRLVOL, RES_ALL_KEYWORD, MANAGED, CREATEDATE, BOOL_TRUE, BOOL_FALSE, FAKE_LEADER_NAME,
     KEY_ERR_STRATEGY, KEY_ERR_RESUME_NO, KEY_ERR_MAX_BOFF, KEY_ERR_INVTERVAL,
+    KEY_METRICS_FILE, KEY_METRICS_INTERVAL, DEFAULT_METRICS_INTERVAL,
 )
 from drbdmanage.utils import NioLineReader
 from drbdmanage.utils import DrbdSetupOpts
 from drbdmanage.utils import (
-    build_path, extend_path, generate_secret, get_free_number,
-    add_rc_entry, serial_filter, props_filter, string_to_bool, bool_to_string,
+    build_path, extend_path, generate_secret, get_free_number, NumberAllocator,
+    add_rc_entry, serial_filter, page_filter, props_filter, string_to_bool, bool_to_string,
     aux_props_selector, is_set, is_unset, key_value_string, load_server_conf_file,
     filter_prohibited, filter_allowed, generate_gi_hex_string, drbdctrl_has_primary, pickle_dbus,
+    ConfFileBuffer,
 )
 from drbdmanage.exceptions import (
     DM_DEBUG, DM_ECTRLVOL, DM_EEXIST, DM_EINVAL, DM_EMINOR, DM_ENAME,
@@ -92,7 +94,12 @@ from drbdmanage.snapshots.snapshots import (
     DrbdSnapshot, DrbdSnapshotAssignment, DrbdSnapshotVolumeState
 )
 from drbdmanage.storage.storagecore import BlockDeviceManager, StoragePlugin, MinorNr
-from drbdmanage.conf.conffile import DrbdAdmConf
+from drbdmanage.deployers import PlannedNode
+from drbdmanage.conf.conffile import DrbdAdmConf, DrbdConnectionConf
+from drbdmanage.changeindex import ChangeIndex
+from drbdmanage.capacityindex import CapacityIndex
+from drbdmanage.waiters import WaiterRegistry
+from drbdmanage.dispatch import RequestDispatcher
 from drbdmanage.propscontainer import PropsContainer
 
 from drbdmanage.plugins.plugin import PluginManager
@@ -157,6 +164,8 @@ class DrbdManageServer(object):
     KEY_MSGLOG_SIZE    = "message-log-capacity"
     KEY_EXTEND_PATH    = "extend-path"
     KEY_DRBD_CONFPATH  = "drbd-conf-path"
+    KEY_POOL_REFRESH   = "pool-refresh-interval"
+    KEY_POOL_THRESHOLD = "pool-update-threshold"
     DEFAULT_DRBD_CONFPATH = "/var/lib/drbd.d"
 
     KEY_DEBUG_OUT_FILE = "debug-out-file"
@@ -168,6 +177,10 @@ class DrbdManageServer(object):
     DEFAULT_MAX_PORT_NR  = 7999
     DEFAULT_SPACE_CHECK  = BOOL_TRUE
     DEFAULT_MAX_FAIL_COUNT = 3
+    # Interval (in seconds) for refreshing the cached storage pool data
+    DEFAULT_POOL_REFRESH = 60
+    # Minimum change (in kiB) of the storage pool data that is propagated
+    DEFAULT_POOL_THRESHOLD = 65536
     DEFAULT_ERR_MAX_BOFF = 65
     DEFAULT_ERR_INVTERVAL = 30
 
@@ -185,6 +198,8 @@ class DrbdManageServer(object):
         KEY_MAX_PORT_NR    : str(DEFAULT_MAX_PORT_NR),
         KEY_SPACE_CHECK    : str(DEFAULT_SPACE_CHECK),
         KEY_MAX_FAIL_COUNT : str(DEFAULT_MAX_FAIL_COUNT),
+        KEY_POOL_REFRESH   : str(DEFAULT_POOL_REFRESH),
+        KEY_POOL_THRESHOLD : str(DEFAULT_POOL_THRESHOLD),
         KEY_MSGLOG_SIZE    : str(DEFAULT_MSGLOG_SIZE),
         KEY_EXTEND_PATH    : "/sbin:/usr/sbin:/bin:/usr/bin",
         KEY_DRBD_CONFPATH  : DEFAULT_DRBD_CONFPATH,
@@ -197,6 +212,8 @@ class DrbdManageServer(object):
         KEY_SAT_CFG_TCP_KEEPIDLE: str(DEFAULT_SAT_CFG_TCP_KEEPIDLE),
         KEY_SAT_CFG_TCP_KEEPINTVL: str(DEFAULT_SAT_CFG_TCP_KEEPINTVL),
         KEY_SAT_CFG_TCP_KEEPCNT: str(DEFAULT_SAT_CFG_TCP_KEEPCNT),
+        KEY_METRICS_FILE   : "",
+        KEY_METRICS_INTERVAL: str(DEFAULT_METRICS_INTERVAL),
     }
 
     # config stages
@@ -230,6 +247,32 @@ class DrbdManageServer(object):
     # Configuration objects maps
     _nodes     = None
     _resources = None
+
+    # Allocators for the minor numbers of all volumes and the port numbers
+    # of all resources; built on demand, see _get_minor_allocator() and
+    # _get_port_allocator()
+    _minor_alloc = None
+    _port_alloc  = None
+    # The resources map the allocators were built from
+    _alloc_resources = None
+
+    # Index of changed and removed objects for incremental list queries;
+    # built on demand, see _get_change_index()
+    _change_index = None
+    # Change feed signal object, see _announce_changes()
+    _change_feed = None
+    # Serial number up to which changes have been announced
+    _change_feed_serial = None
+
+    # Clients waiting for the policies of wait_for plugins, see wait_for()
+    _waiters = None
+    # Writer queue and reader threads for client requests, see
+    # dispatch_write() and dispatch_read()
+    _dispatcher = None
+
+    # Index of the nodes' storage pool capacity per site;
+    # built on demand, see get_capacity_index()
+    _capacity_index = None
     # Events log pipe
     _evt_file  = None
     # RegEx pattern for events parsing
@@ -246,6 +289,8 @@ class DrbdManageServer(object):
     _run_changes_scheduled = False
     # Flag indicating whether to poke other cluster nodes from run_changes()
     _poke_cluster = False
+    # Flag indicating whether update_pool_check() has been scheduled or not
+    _update_pool_check_scheduled = False
 
     # The name of the node this server is running on
     _instance_node_name = None
@@ -253,6 +298,22 @@ class DrbdManageServer(object):
     # The hash of the currently loaded configuration
     _conf_hash = None
 
+    # Final paths of DRBD configuration files that were regenerated with
+    # unchanged content, see close_assignment_conf()
+    _unchanged_conf_files = None
+    # Flag indicating whether the global configuration file must be
+    # regenerated, see get_global_conf_path()
+    _global_conf_stale = True
+    # Path of the global configuration file; None if there is none
+    _global_conf_path = None
+    # Counters for DRBD configuration file updates (debug show conf-stats)
+    _conf_file_stats = None
+    CONF_STATS_RES_WRITTEN      = "res-written"
+    CONF_STATS_RES_UNCHANGED    = "res-unchanged"
+    CONF_STATS_RES_INVALID      = "res-invalid"
+    CONF_STATS_GLOBAL_WRITTEN   = "global-written"
+    CONF_STATS_GLOBAL_UNCHANGED = "global-unchanged"
+
     # Server configuration (local cache)
     _conf      = None
 
@@ -319,6 +380,7 @@ class DrbdManageServer(object):
 
     KEY_NOTHING = "nothing"
     KEY_TWOINT = "twoint"
+    KEY_PAGE = "page"
     wrapped_returns = {
         'assign': KEY_NOTHING,
         'attach': KEY_NOTHING,
@@ -341,9 +403,13 @@ class DrbdManageServer(object):
         'get_site_config': [],
         'init_node': KEY_NOTHING,
         'list_assignments': [],
+        'list_assignments_page': KEY_PAGE,
         'list_nodes': [],
+        'list_nodes_page': KEY_PAGE,
         'list_resources': [],
+        'list_resources_page': KEY_PAGE,
         'list_volumes': [],
+        'list_volumes_page': KEY_PAGE,
         'list_snapshot_assignments': [],
         'modify_assignment': KEY_NOTHING,
         'modify_resource': KEY_NOTHING,
@@ -364,6 +430,7 @@ class DrbdManageServer(object):
         'set_ctrlvol': KEY_NOTHING,
         'set_drbdsetup_props': KEY_NOTHING,
         'text_query': [],
+        'wait_for': {},
         'unassign': KEY_NOTHING,
         'update_pool': KEY_NOTHING,
         'update_pool_check': KEY_NOTHING,
@@ -375,6 +442,8 @@ class DrbdManageServer(object):
                 return fn_rc
             if self.wrapped_returns[name] == self.KEY_TWOINT:
                 return fn_rc, 0, 0  # might need update if second fkt besides cluster_free_query
+            if self.wrapped_returns[name] == self.KEY_PAGE:
+                return fn_rc, '', []
             else:
                 return fn_rc, self.wrapped_returns[name]
         else:
@@ -448,6 +517,15 @@ class DrbdManageServer(object):
 
         self._pluginmgr = PluginManager(self)
 
+        self._unchanged_conf_files = set()
+        self._conf_file_stats = dict.fromkeys(
+            [
+                self.CONF_STATS_RES_WRITTEN, self.CONF_STATS_RES_UNCHANGED,
+                self.CONF_STATS_RES_INVALID, self.CONF_STATS_GLOBAL_WRITTEN,
+                self.CONF_STATS_GLOBAL_UNCHANGED
+            ], 0
+        )
+
         # Determine the current node's name
         #
         # The "(unknown)" node name never matches, because brackets are not
@@ -500,6 +578,9 @@ class DrbdManageServer(object):
 
         self._proxy = DrbdManageProxy(self)
 
+        self._waiters = WaiterRegistry(self)
+        self._dispatcher = RequestDispatcher()
+
         # Initialize the signal objects source
         if signal_factory is not None:
             self._signal_factory = signal_factory
@@ -562,6 +643,15 @@ class DrbdManageServer(object):
         self._persist      = self._objects_root[srv.OBJ_PERSIST_NAME]
         self._message_log  = self._objects_root[srv.OBJ_MSGLOG_NAME]
 
+        # The configuration may have been reloaded
+        self.invalidate_allocators()
+        self._change_index = None
+        self._capacity_index = None
+        if self._waiters is not None:
+            self._waiters.schedule_evaluation()
+        if self._dispatcher is not None:
+            self._publish_config(self._persist)
+
         # srv.OBJ_MESSAGE_LOG will need to be added here if a future version
         # recreates it by updating the objects root
 
@@ -665,6 +755,8 @@ class DrbdManageServer(object):
         self.schedule_satellite_reintegrate()
         self.schedule_resume()
         self.schedule_satellite_shutdown()
+        self.schedule_pool_refresh()
+        self.schedule_metrics_file()
 
         if not rerun:
             conf_path = self._conf.get(self.KEY_DRBD_CONFPATH, self.DEFAULT_DRBD_CONFPATH)
@@ -1089,7 +1181,7 @@ class DrbdManageServer(object):
                     logging.debug("Node %s removed in ping service" % satellite_name)
             if len(joined) > 0:
                 logging.debug("Node(s) %s joined in ping service" % ', '.join(joined))
-                self.update_pool()
+                self.update_pool(refresh=False)
                 self._poke_cluster = True
                 self.schedule_run_changes()
 
@@ -1150,6 +1242,12 @@ class DrbdManageServer(object):
     def schedule_pseudo_fence(self):
         gobject.timeout_add(3000, self.pseudo_fence)
 
+    def schedule_pool_refresh(self):
+        gobject.timeout_add(self._get_pool_refresh_interval() * 1000, self.pool_refresh)
+
+    def schedule_metrics_file(self):
+        gobject.timeout_add(self._get_metrics_interval() * 1000, self.write_metrics_file)
+
     def schedule_run_changes(self):
         """
         Schedules execution of run_changes() from the GMainLoop
@@ -1167,6 +1265,75 @@ class DrbdManageServer(object):
         self._poke_cluster = True
         self.schedule_run_changes()
 
+    def schedule_update_pool_check(self):
+        """
+        Schedules execution of update_pool_check() from the GMainLoop
+
+        Safe to call from other threads, e.g. from the storage plugin's
+        reclaim worker after it has removed a trashed block device
+        """
+        if not self._update_pool_check_scheduled:
+            self._update_pool_check_scheduled = True
+            gobject.idle_add(self.run_update_pool_check)
+
+    def run_update_pool_check(self):
+        """
+        Performs update_pool_check() from the GMainLoop
+        """
+        self._update_pool_check_scheduled = False
+        if self._server_role_decided:
+            if self._server_role == SAT_SATELLITE:
+                # update_pool_check() would check the leader's pool; have
+                # the leader pull this satellite's pool data instead
+                inst_node = self.get_instance_node()
+                if inst_node is not None:
+                    stor_rc, update_required = self._pool_update_required(inst_node)
+                    if stor_rc == DM_SUCCESS and update_required:
+                        self.update_pool([ inst_node.get_name() ], refresh=False)
+            else:
+                self.update_pool_check()
+        return False
+
+    def pool_refresh(self):
+        """
+        Periodically refreshes the cached storage pool data in the background
+
+        Changes are propagated by update_pool_check(), which is scheduled by
+        the BlockDeviceManager when the refresh has completed
+        """
+        inst_node = self.get_instance_node()
+        if (self._bd_mgr is not None and inst_node is not None and
+                is_set(inst_node.get_state(), DrbdNode.FLAG_STORAGE)):
+            self._bd_mgr.refresh_pool(inst_node)
+        return True
+
+    def write_metrics_file(self):
+        """
+        Periodically writes the metrics for the Prometheus textfile collector
+
+        Nothing is written unless a metrics file is configured
+        """
+        path = self.get_conf_value(KEY_METRICS_FILE)
+        if path is not None and len(path) > 0:
+            try:
+                metrics.write_prometheus_file(path)
+            except (IOError, OSError) as err:
+                logging.warning(
+                    "Cannot write the metrics file '%s': %s" % (path, str(err))
+                )
+        return True
+
+    def invalidate_pool_data(self):
+        """
+        Refreshes the cached storage pool data after storage changes
+
+        The node's pool data is updated by update_pool_check() when the
+        refresh has completed
+        """
+        inst_node = self.get_instance_node()
+        if self._bd_mgr is not None and inst_node is not None:
+            self._bd_mgr.invalidate_pool(inst_node)
+
     def _manager_run(self, override_hash_check, poke_cluster, lock_already_hold=False):
         _, self._failed_actions = self._drbd_mgr.run(override_hash_check,
                                                      poke_cluster,
@@ -1607,6 +1774,69 @@ class DrbdManageServer(object):
             add_rc_entry(fn_rc, DM_EPLUGIN, "error running plugin")
         return fn_rc, {}
 
+    @wait_startup
+    def wait_for(self, wait_type, props, reply_fn):
+        """
+        Waits until the policy of a wait_for plugin is fulfilled
+
+        Registers a waiter whose policy is evaluated whenever the
+        configuration is saved or reloaded, so that clients do not need to
+        poll run_external_plugin() with the wait_for plugins.
+
+        @param   wait_type: "resource", "snapshot" or "volume-size", for the
+                 WaitForResource, WaitForSnapshot and WaitForVolumeSize
+                 plugins
+        @param   props: configuration of the wait_for plugin; the optional
+                 "timeout" is the maximum time to wait in seconds
+        @param   reply_fn: function called with the return codes and the
+                 result dictionary if the wait finishes later
+        @return: tuple (fn_rc, result dict) if the wait finished immediately;
+                 None if reply_fn will be called
+        """
+        fn_rc = []
+        try:
+            self.request_ctrlvol()
+            return self._waiters.register(wait_type, props, reply_fn)
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+        return fn_rc, {}
+
+    def dispatch_write(self, reply_fn, error_fn, fn, *args):
+        """
+        Queues a client request that may modify the configuration
+
+        See RequestDispatcher.write()
+        """
+        self._dispatcher.write(fn, args, reply_fn, error_fn)
+
+    def dispatch_read(self, reply_fn, error_fn, fn, *args):
+        """
+        Queues a client request that only reads the configuration
+
+        The function must accept the keyword argument view, see
+        RequestDispatcher.read(). Satellites queue read requests like
+        requests that modify the configuration, because they update their
+        configuration from the leader node before reading it, see
+        req_ctrlvol().
+        """
+        if self._server_role == SAT_SATELLITE:
+            self._dispatcher.write(fn, args, reply_fn, error_fn)
+        else:
+            self._dispatcher.read(fn, args, reply_fn, error_fn)
+
+    def _publish_config(self, persist):
+        """
+        Publishes the configuration that was saved or loaded last to the
+        read requests
+
+        @param   persist: persistence layer object that saved or loaded
+                 the configuration
+        """
+        containers = None
+        if persist is not None:
+            containers = persist.get_containers()
+        self._dispatcher.publish(self.peek_serial(), containers)
+
     def peek_serial(self):
         """
         Returns the current serial number without changing it
@@ -1614,27 +1844,7 @@ class DrbdManageServer(object):
         Returns the current serial number, whether or not it is still in use
         for changes.
         """
-        serial = 0
-        serial_str = self._cluster_conf.get_prop(SERIAL)
-        try:
-            serial = int(serial_str)
-        except TypeError:
-            # FIXME: a better solution would be to find the greatest
-            #        serial number set on any object in the
-            #        configuration, and then to increase that number
-            #        and use it as the new serial number of the cluster
-            #        configuration.
-            #        Another possibility would be to reset the serial
-            #        number on
-            #        all objects to 0 and then set a serial of 1 here.
-            #        The current workaround merely keeps the system
-            #        running, but the serial numbers are totally messed
-            #        up if this happens.
-            logging.error(
-                "Unparseable serial number in the cluster "
-                "configuration, setting serial=0 to recover"
-            )
-        return serial
+        return self._cluster_conf.get_serial()
 
 
     def get_serial(self):
@@ -1667,6 +1877,52 @@ class DrbdManageServer(object):
         return self._quorum
 
 
+    def get_capacity_index(self):
+        """
+        Returns the index of the nodes' storage pool capacity
+
+        The index is built from the current configuration if it has not
+        been built yet or if the configuration has been reloaded
+        """
+        capacity_index = self._capacity_index
+        if capacity_index is None or not capacity_index.uses_nodes(self._nodes):
+            capacity_index = CapacityIndex(self._nodes)
+            self._capacity_index = capacity_index
+        return capacity_index
+
+
+    def invalidate_capacity_index(self):
+        """
+        Drops the capacity index
+
+        The index is rebuilt from the current configuration when it is
+        used next
+        """
+        if self._capacity_index is not None:
+            for node in self._nodes.itervalues():
+                node.set_capacity_index(None)
+            self._capacity_index = None
+
+
+    def _capacity_node_added(self, node):
+        """
+        Adds a node that has been added to the nodes map to the capacity index
+        """
+        if self._capacity_index is not None:
+            self._capacity_index.update(node)
+            node.set_capacity_index(self._capacity_index)
+
+
+    def _capacity_node_removed(self, node):
+        """
+        Removes a node that has been removed from the nodes map from the
+        capacity index
+        """
+        node.set_capacity_index(None)
+        if self._capacity_index is not None:
+            self._capacity_index.remove(node.get_name())
+
+
     def get_drbd_mgr(self):
         """
         Returns the DRBD devices manager instance
@@ -2139,6 +2395,8 @@ class DrbdManageServer(object):
         except Exception as exc:
             self.catch_and_append_internal_error(fn_rc, exc)
         finally:
+            # The site of nodes may have changed
+            self.invalidate_capacity_index()
             self.cond_end_modify_conf(persist)
 
         if len(fn_rc) == 0:
@@ -2275,6 +2533,8 @@ class DrbdManageServer(object):
                             aux_props = aux_props_selector(props)
                             node.get_props().merge_gen(aux_props)
                             self._nodes[node.get_name()] = node
+                            self._objects_changed()
+                            self._capacity_node_added(node)
                             if node_drbdctrl:
                                 self._cluster_nodes_update()
                                 # create or update the drbdctrl.res file
@@ -2344,6 +2604,8 @@ class DrbdManageServer(object):
                         for peer_assg in resource.iterate_assignments():
                             peer_assg.update_connections()
                     del self._nodes[node_name]
+                    self._objects_changed()
+                    self._capacity_node_removed(node)
                     if drbdctrl_flag:
                         self._cluster_nodes_update()
                 self.get_serial()
@@ -2382,6 +2644,8 @@ class DrbdManageServer(object):
                 resource = self._create_resource(res_name, props, fn_rc)
                 if resource is not None:
                     self._resources[resource.get_name()] = resource
+                    self._objects_changed()
+                    self._allocate_resource_nrs(resource)
                     self.save_conf_data(persist)
             else:
                 raise PersistenceException
@@ -2559,7 +2823,9 @@ class DrbdManageServer(object):
                         port = int(props[RES_PORT])
                         if self.is_free_port_nr(port):
                             try:
+                                self._release_resource_port(resource)
                                 resource.set_port(port)
+                                self._allocate_resource_port(resource)
                                 for assg in resource.iterate_assignments():
                                     assg.update_config()
                                 self.schedule_run_changes()
@@ -2632,7 +2898,9 @@ class DrbdManageServer(object):
                         if self.is_free_minor_nr(minor_nr):
                             try:
                                 minor = MinorNr(minor_nr)
+                                self._release_volume_nrs(volume)
                                 volume.set_minor(minor)
+                                self._allocate_volume_nrs(volume)
                                 for assg in resource.iterate_assignments():
                                     assg.update_config()
                                 self.schedule_run_changes()
@@ -2953,6 +3221,8 @@ class DrbdManageServer(object):
                         node = assg.get_node()
                         node.remove_assignment(assg)
                     del self._resources[resource.get_name()]
+                    self._objects_changed()
+                    self._release_resource_nrs(resource)
                 self.get_serial()
                 self.save_conf_data(persist)
             else:
@@ -2996,11 +3266,7 @@ class DrbdManageServer(object):
                     except ValueError:
                         raise InvalidMinorNrException
                     if minor == MinorNr.MINOR_NR_AUTO:
-                        occupied_minor_nrs = self.get_occupied_minor_nrs()
-                        if occupied_minor_nrs is not None:
-                            minor = self.get_free_minor_nr(occupied_minor_nrs, True)
-                        else:
-                            raise InvalidMinorNrException
+                        minor = self.get_free_minor_nr(True)
                     if minor == MinorNr.MINOR_NR_ERROR:
                         raise InvalidMinorNrException
                     vol_id = -1
@@ -3042,6 +3308,7 @@ class DrbdManageServer(object):
                             vol_props.set_prop(DrbdVolume.KEY_CURRENT_GI, generate_gi_hex_string())
 
                             resource.add_volume(volume)
+                            self._allocate_volume_nrs(volume)
                             for assg in resource.iterate_assignments():
                                 assg.update_volume_states(chg_serial)
                                 vol_st = assg.get_volume_state(volume.get_id())
@@ -3094,6 +3361,7 @@ class DrbdManageServer(object):
                         self.schedule_run_changes()
                     else:
                         resource.remove_volume(vol_id)
+                        self._release_volume_nrs(volume)
                         for assg in resource.iterate_assignments():
                             assg.remove_volume_state(vol_id)
                     self.get_serial()
@@ -3403,31 +3671,17 @@ class DrbdManageServer(object):
         redundancy = int(redundancy)
 
         free_space = 0
-        nodes = self._nodes_in_site(allowed_site)
-        total_space = reduce(lambda x, y: x+y,
-                             map(lambda n: max(0, n.get_poolsize()),
-                                 nodes),
-                             0)
+        capacity_index = self.get_capacity_index()
+        total_space = capacity_index.get_total(allowed_site)
         try:
             if redundancy >= 1:
                 if redundancy <= len(self._nodes):
-                    # Select nodes where the amount of free space on
-                    # that node is known
-                    selected = []
-                    for node in nodes:
-                        if is_set(node.get_state(), DrbdNode.FLAG_STORAGE):
-                            poolfree = node.get_poolfree()
-                            if poolfree != -1:
-                                selected.append(node)
-
-                    # Sort by free space
-                    selected = sorted(
-                        selected,
-                        key=lambda node: node.get_poolfree(), reverse=True
+                    # Free space of the node with the n-th largest amount
+                    # of known free space, where n is the redundancy
+                    gross_free = capacity_index.get_nth_free(
+                        redundancy, allowed_site
                     )
-                    if len(selected) >= redundancy:
-                        node = selected[redundancy - 1]
-                        gross_free = node.get_poolfree()
+                    if gross_free is not None:
                         max_peers = self.DEFAULT_MAX_PEERS
                         try:
                             max_peers = int(
@@ -3492,221 +3746,141 @@ class DrbdManageServer(object):
         persist = None
         try:
             save_changes = False
-            if ((count == 0 and delta == 0) or count < 0):
-                add_rc_entry(
-                    fn_rc, DM_EINVAL,
-                    "auto_deploy: Count (%(c)d) must be positive, or if 0, then delta (%(d)d) must be != 0",
-                    [["c", count], ["d", delta]]
-                )
-                raise ValueError
-            elif (count != 0 and delta != 0):
-                add_rc_entry(
-                    fn_rc, DM_EINVAL,
-                    "auto_deploy: Only one of count (%(c)d) or delta (%(d)d) may be set to a non-zero value",
-                    [["c", count], ["d", delta]]
-                )
-                raise ValueError
-            else:
-                deployer = self._pluginmgr.get_plugin_instance(
-                    self.get_conf_value(self.KEY_DEPLOYER_NAME)
-                )
-                if deployer is None:
-                    raise PluginException
+            self._check_deploy_count(fn_rc, count, delta)
+            deployer = self._pluginmgr.get_plugin_instance(
+                self.get_conf_value(self.KEY_DEPLOYER_NAME)
+            )
+            if deployer is None:
+                raise PluginException
 
-                persist = self.begin_modify_conf()
-                if persist is None:
-                    raise PersistenceException
+            persist = self.begin_modify_conf()
+            if persist is None:
+                raise PersistenceException
 
-                maxnodes = self.DEFAULT_MAX_NODE_ID
-                try:
-                    maxnodes = int(self._conf[self.KEY_MAX_NODE_ID]) + 1
-                except ValueError:
-                    pass
+            maxnodes = self.DEFAULT_MAX_NODE_ID
+            try:
+                maxnodes = int(self._conf[self.KEY_MAX_NODE_ID]) + 1
+            except ValueError:
+                pass
 
-                nodes = self._nodes_in_site(allowed_site)
+            nodes = self._nodes_in_site(allowed_site)
 
-                crtnodes = len(nodes)
-                maxcount = maxnodes if maxnodes < crtnodes else crtnodes
-                resource = self._resources[res_name]
-                assigned_count = resource.assigned_count()
+            resource = self._resources[res_name]
+            save_changes = self._auto_deploy_resource(
+                fn_rc, deployer, resource, count, delta, site_clients,
+                nodes, maxnodes
+            )
 
-                # Calculate target node count
-                if delta != 0:
-                    final_count = assigned_count + delta
-                    if final_count <= 0:
-                        add_rc_entry(
-                            fn_rc, DM_EINVAL,
-                            "auto_deploy: Final count %(fin)d less than 1: assigned %(ass)d + delta %(delta)d",
-                            [["ass", assigned_count], ["delta", delta], ["fin", final_count]]
-                        )
-                        raise ValueError
-                else:
-                    final_count = count
+            if save_changes:
+                self.save_conf_data(persist)
+                self.schedule_run_changes()
+        except KeyError:
+            add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT))
+        except (ValueError, DeployerException):
+            # add_rc_entry() error message set by exception generator
+            pass
+        except DrbdManageException as server_exc:
+            server_exc.add_rc_entry(fn_rc)
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+        finally:
+            self.cond_end_modify_conf(persist)
+        if len(fn_rc) == 0:
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return fn_rc
 
-                # Try to achieve it
-                if final_count > maxcount:
-                    add_rc_entry(fn_rc, DM_ENODECNT, dm_exc_text(DM_ENODECNT))
-                    raise ValueError
+    @wait_startup
+    @fwd_leader
+    def auto_deploy_many(self, res_names, count, delta, site_clients,
+                         allowed_site=''):
+        """
+        Deploys multiple resources to a number of nodes each
+
+        Each resource is deployed like by auto_deploy(), but all resources
+        are placed within a single modification of the configuration, which
+        is saved once. The storage that the placement of a resource will
+        occupy on a node is tracked for the batch and subtracted from the
+        node's free space that the deployer sees for the next resource, so
+        that the deployer spreads the resources over the nodes instead of
+        selecting the same nodes for every resource. The nodes' pool data
+        is not modified. Deployer plugins that set PLANS_STORAGE track the
+        storage of their selections themselves.
+        Resources that cannot be deployed are reported in the return codes
+        and do not prevent the deployment of the other resources.
+
+        @param   res_names: list of resource names
+        @return: standard return code defined in drbdmanage.exceptions
+        """
+        fn_rc = []
+        persist = None
+        try:
+            save_changes = False
+            self._check_deploy_count(fn_rc, count, delta)
+            deployer = self._pluginmgr.get_plugin_instance(
+                self.get_conf_value(self.KEY_DEPLOYER_NAME)
+            )
+            if deployer is None:
+                raise PluginException
 
-                elif final_count <= 0:
-                    add_rc_entry(
-                        fn_rc, DM_EINVAL,
-                        "auto_deploy: Final count %(fin)d <= 0",
-                        [["fin", final_count]]
-                    )
-                    raise ValueError
+            persist = self.begin_modify_conf()
+            if persist is None:
+                raise PersistenceException
 
-                elif final_count > assigned_count:
-                    # ========================================
-                    # DEPLOY / EXTEND
-                    # ========================================
-                    # FIXME: extend does nothing for some unknown reason,
-                    #        but succeeds (exit code = 0)
-                    size_sum = 0
-                    space_check = True
-                    conf_space_check = self.get_conf_value(DrbdManageServer.KEY_SPACE_CHECK)
-                    if conf_space_check is not None:
-                        try:
-                            space_check = string_to_bool(conf_space_check)
-                        except ValueError:
-                            pass
-                    if space_check:
-                        """
-                        Calculate the aggregate space required by the resource
-                        (the sum of the space required by each volume)
-                        """
-                        max_peers = self.DEFAULT_MAX_PEERS
-                        try:
-                            max_peers = int(
-                                self.get_conf_value(self.KEY_MAX_PEERS)
-                            )
-                        except ValueError:
-                            # Unparseable configuration entry;
-                            # no-op: use default value instead
-                            pass
-                        for vol in resource.iterate_volumes():
-                            # Calculate required gross space for a volume
-                            # with the specified net space
-                            try:
-                                size_sum += md.MetaData.get_gross_kiB(
-                                    vol.get_size_kiB(), max_peers,
-                                    md.MetaData.DEFAULT_AL_STRIPES,
-                                    md.MetaData.DEFAULT_AL_kiB
-                                )
-                            except md.MetaDataException as md_exc:
-                                add_rc_entry(
-                                    fn_rc, DM_EINVAL,
-                                    md_exc.message
-                                )
-                                logging.debug("auto_deploy(): MetaDataException: " + md_exc.message)
-                                raise ValueError
-                    """
-                    filter nodes that do not have the resource deployed yet
-                    """
-                    undeployed = {}
-                    for node in nodes:
-                        # skip nodes, where:
-                        #   - resource is deployed already
-                        #   - resource is being deployed
-                        #   - resource is being undeployed
-                        #   - node does not have its own storage
-                        #     (diskless/client assignments only)
-                        if (is_set(node.get_state(), DrbdNode.FLAG_STORAGE) and
-                            resource.get_assignment(node.get_name()) is None):
-                            # Node has its own storage, but the resource is not
-                            # deployed on it; add it to the list of candidates
-                            undeployed[node.get_name()] = node
-                    """
-                    Call the deployer plugin to select nodes for deploying
-                    the resource
-                    """
-                    diff = final_count - assigned_count
-                    selected = []
-                    sub_rc = deployer.deploy_select(
-                        undeployed, selected,
-                        diff, size_sum, True
-                    )
-                    if sub_rc == DM_SUCCESS:
-                        for node in selected:
-                            self._assign(
-                                node, resource,
-                                0,
-                                Assignment.FLAG_DEPLOY |
-                                Assignment.FLAG_CONNECT,
-                                DrbdNode.NODE_ID_NONE
-                            )
-                        save_changes = True
-                    else:
-                        add_rc_entry(fn_rc, sub_rc, dm_exc_text(sub_rc))
-                        raise DeployerException
-
-                elif final_count < assigned_count:
-                    # ========================================
-                    # REDUCE
-                    # ========================================
-                    ctr = assigned_count
-                    # If there are assignments that are waiting for
-                    # deployment, but do not have the resource deployed
-                    # yet, undeploy those first
-                    if ctr > final_count:
-                        for assg in resource.iterate_assignments():
-                            if (is_set(assg.get_tstate(),
-                                Assignment.FLAG_DEPLOY) and
-                                is_unset(assg.get_cstate(),
-                                Assignment.FLAG_DEPLOY)):
-                                    assg.undeploy()
-                                    ctr -= 1
-                            if not ctr > final_count:
-                                break
-                    if ctr > final_count:
-                        # Undeploy from nodes that have the
-                        # resource deployed, or should have the resource
-                        # deployed (target state)
-                        # Collect nodes where the resource is deployed
-                        deployed = {}
-                        for assg in resource.iterate_assignments():
-                            if (is_set(
-                                    assg.get_tstate(),
-                                    Assignment.FLAG_DEPLOY
-                                ) and
-                                is_unset(
-                                    assg.get_tstate(),
-                                    Assignment.FLAG_DISKLESS
-                                )):
-                                    node = assg.get_node()
-                                    deployed[node.get_name()] = node
-                        """
-                        Call the deployer plugin to select nodes for
-                        undeployment of the resource
-                        """
-                        diff = ctr - final_count
-                        selected = []
-                        deployer.undeploy_select(
-                            deployed, selected,
-                            diff, True
-                        )
-                        for node in selected:
-                            assg = node.get_assignment(resource.get_name())
-                            if site_clients:
-                                # turn the node into a client
-                                assg.deploy_client()
-                            else:
-                                self._unassign(assg, False)
-                    save_changes = True
+            maxnodes = self.DEFAULT_MAX_NODE_ID
+            try:
+                maxnodes = int(self._conf[self.KEY_MAX_NODE_ID]) + 1
+            except ValueError:
+                pass
+            max_peers = self.DEFAULT_MAX_PEERS
+            try:
+                max_peers = int(self.get_conf_value(self.KEY_MAX_PEERS))
+            except ValueError:
+                # Unparseable configuration value;
+                # no-op: keep default value
+                pass
+
+            nodes = self._nodes_in_site(allowed_site)
 
-            # condition (final_count == assigned_count) is successful, too
+            # node name = storage planned for the resources deployed so far
+            planned_kiB = None
+            if not getattr(deployer, "PLANS_STORAGE", False):
+                planned_kiB = {}
 
-            if site_clients:
-                # turn all remaining nodes into clients
-                if self._site_clients(resource, None, nodes):
-                    save_changes = True
+            for res_name in res_names:
+                resource = self._resources.get(res_name)
+                if resource is None:
+                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
+                                 [[RES_NAME, res_name]])
+                    continue
+                assigned = set()
+                for assg in resource.iterate_assignments():
+                    assigned.add(assg.get_node().get_name())
+                rc_count = len(fn_rc)
+                try:
+                    if self._auto_deploy_resource(
+                        fn_rc, deployer, resource, count, delta, site_clients,
+                        nodes, maxnodes, planned_kiB
+                    ):
+                        save_changes = True
+                except (ValueError, DeployerException):
+                    # add_rc_entry() error message set by exception generator;
+                    # add the name of the resource that failed
+                    for rc_entry in fn_rc[rc_count:]:
+                        rc_entry[2].append([RES_NAME, res_name])
+                    continue
+                if planned_kiB is not None:
+                    for assg in resource.iterate_assignments():
+                        node_name = assg.get_node().get_name()
+                        if node_name not in assigned:
+                            planned_kiB[node_name] = (
+                                planned_kiB.get(node_name, 0) +
+                                assg.get_gross_size_kiB_correction(max_peers)
+                            )
 
             if save_changes:
                 self.save_conf_data(persist)
                 self.schedule_run_changes()
-        except KeyError:
-            add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT))
-        except (ValueError, DeployerException):
+        except ValueError:
             # add_rc_entry() error message set by exception generator
             pass
         except DrbdManageException as server_exc:
@@ -3719,6 +3893,242 @@ class DrbdManageServer(object):
             add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
         return fn_rc
 
+    def _check_deploy_count(self, fn_rc, count, delta):
+        """
+        Checks the count and delta arguments of auto_deploy()
+
+        @raise   ValueError: if the arguments are invalid; the error is
+                 added to fn_rc
+        """
+        if ((count == 0 and delta == 0) or count < 0):
+            add_rc_entry(
+                fn_rc, DM_EINVAL,
+                "auto_deploy: Count (%(c)d) must be positive, or if 0, then delta (%(d)d) must be != 0",
+                [["c", count], ["d", delta]]
+            )
+            raise ValueError
+        elif (count != 0 and delta != 0):
+            add_rc_entry(
+                fn_rc, DM_EINVAL,
+                "auto_deploy: Only one of count (%(c)d) or delta (%(d)d) may be set to a non-zero value",
+                [["c", count], ["d", delta]]
+            )
+            raise ValueError
+
+    def _auto_deploy_resource(self, fn_rc, deployer, resource, count, delta,
+                              site_clients, nodes, maxnodes, planned_kiB=None):
+        """
+        Deploys or undeploys a resource until it is deployed on the requested
+        number of nodes, see auto_deploy()
+
+        Changes are not saved; the caller must have opened the configuration
+        for modification.
+
+        @param   deployer: deployer plugin instance
+        @param   nodes: list of the nodes that may be selected
+        @param   maxnodes: maximum number of nodes a resource can be
+                 deployed on
+        @param   planned_kiB: dictionary of node name = storage in kiB to
+                 subtract from the node's free space for the deployer;
+                 None to pass the nodes as they are
+        @return: True if the configuration has been changed
+        @raise   ValueError, DeployerException: if the resource cannot be
+                 deployed; the error is added to fn_rc
+        """
+        save_changes = False
+
+        crtnodes = len(nodes)
+        maxcount = maxnodes if maxnodes < crtnodes else crtnodes
+        assigned_count = resource.assigned_count()
+
+        # Calculate target node count
+        if delta != 0:
+            final_count = assigned_count + delta
+            if final_count <= 0:
+                add_rc_entry(
+                    fn_rc, DM_EINVAL,
+                    "auto_deploy: Final count %(fin)d less than 1: assigned %(ass)d + delta %(delta)d",
+                    [["ass", assigned_count], ["delta", delta], ["fin", final_count]]
+                )
+                raise ValueError
+        else:
+            final_count = count
+
+        # Try to achieve it
+        if final_count > maxcount:
+            add_rc_entry(fn_rc, DM_ENODECNT, dm_exc_text(DM_ENODECNT))
+            raise ValueError
+
+        elif final_count <= 0:
+            add_rc_entry(
+                fn_rc, DM_EINVAL,
+                "auto_deploy: Final count %(fin)d <= 0",
+                [["fin", final_count]]
+            )
+            raise ValueError
+
+        elif final_count > assigned_count:
+            # ========================================
+            # DEPLOY / EXTEND
+            # ========================================
+            # FIXME: extend does nothing for some unknown reason,
+            #        but succeeds (exit code = 0)
+            size_sum = 0
+            space_check = True
+            conf_space_check = self.get_conf_value(DrbdManageServer.KEY_SPACE_CHECK)
+            if conf_space_check is not None:
+                try:
+                    space_check = string_to_bool(conf_space_check)
+                except ValueError:
+                    pass
+            if space_check:
+                """
+                Calculate the aggregate space required by the resource
+                (the sum of the space required by each volume)
+                """
+                max_peers = self.DEFAULT_MAX_PEERS
+                try:
+                    max_peers = int(
+                        self.get_conf_value(self.KEY_MAX_PEERS)
+                    )
+                except ValueError:
+                    # Unparseable configuration entry;
+                    # no-op: use default value instead
+                    pass
+                for vol in resource.iterate_volumes():
+                    # Calculate required gross space for a volume
+                    # with the specified net space
+                    try:
+                        size_sum += md.MetaData.get_gross_kiB(
+                            vol.get_size_kiB(), max_peers,
+                            md.MetaData.DEFAULT_AL_STRIPES,
+                            md.MetaData.DEFAULT_AL_kiB
+                        )
+                    except md.MetaDataException as md_exc:
+                        add_rc_entry(
+                            fn_rc, DM_EINVAL,
+                            md_exc.message
+                        )
+                        logging.debug("auto_deploy(): MetaDataException: " + md_exc.message)
+                        raise ValueError
+            """
+            filter nodes that do not have the resource deployed yet
+            """
+            undeployed = {}
+            for node in nodes:
+                # skip nodes, where:
+                #   - resource is deployed already
+                #   - resource is being deployed
+                #   - resource is being undeployed
+                #   - node does not have its own storage
+                #     (diskless/client assignments only)
+                if (is_set(node.get_state(), DrbdNode.FLAG_STORAGE) and
+                    resource.get_assignment(node.get_name()) is None):
+                    # Node has its own storage, but the resource is not
+                    # deployed on it; add it to the list of candidates
+                    if planned_kiB is not None and node.get_name() in planned_kiB:
+                        node = PlannedNode(node, planned_kiB[node.get_name()])
+                    undeployed[node.get_name()] = node
+            """
+            Call the deployer plugin to select nodes for deploying
+            the resource; deployer plugins that set COUNTS_ASSIGNED
+            receive the nodes that the resource is assigned to already
+            as the start of the result list and the final node count,
+            all others receive an empty result list and the number of
+            nodes to add
+            """
+            selected = []
+            if getattr(deployer, "COUNTS_ASSIGNED", False):
+                for assg in resource.iterate_assignments():
+                    if is_set(assg.get_tstate(), Assignment.FLAG_DEPLOY):
+                        selected.append(assg.get_node())
+                select_count = final_count
+            else:
+                select_count = final_count - assigned_count
+            assigned_nodes = len(selected)
+            sub_rc = deployer.deploy_select(
+                undeployed, selected,
+                select_count, size_sum, True
+            )
+            if sub_rc == DM_SUCCESS:
+                for node in selected[assigned_nodes:]:
+                    if isinstance(node, PlannedNode):
+                        node = node.get_node()
+                    self._assign(
+                        node, resource,
+                        0,
+                        Assignment.FLAG_DEPLOY |
+                        Assignment.FLAG_CONNECT,
+                        DrbdNode.NODE_ID_NONE
+                    )
+                save_changes = True
+            else:
+                add_rc_entry(fn_rc, sub_rc, dm_exc_text(sub_rc))
+                raise DeployerException
+
+        elif final_count < assigned_count:
+            # ========================================
+            # REDUCE
+            # ========================================
+            ctr = assigned_count
+            # If there are assignments that are waiting for
+            # deployment, but do not have the resource deployed
+            # yet, undeploy those first
+            if ctr > final_count:
+                for assg in resource.iterate_assignments():
+                    if (is_set(assg.get_tstate(),
+                        Assignment.FLAG_DEPLOY) and
+                        is_unset(assg.get_cstate(),
+                        Assignment.FLAG_DEPLOY)):
+                            assg.undeploy()
+                            ctr -= 1
+                    if not ctr > final_count:
+                        break
+            if ctr > final_count:
+                # Undeploy from nodes that have the
+                # resource deployed, or should have the resource
+                # deployed (target state)
+                # Collect nodes where the resource is deployed
+                deployed = {}
+                for assg in resource.iterate_assignments():
+                    if (is_set(
+                            assg.get_tstate(),
+                            Assignment.FLAG_DEPLOY
+                        ) and
+                        is_unset(
+                            assg.get_tstate(),
+                            Assignment.FLAG_DISKLESS
+                        )):
+                            node = assg.get_node()
+                            deployed[node.get_name()] = node
+                """
+                Call the deployer plugin to select nodes for
+                undeployment of the resource
+                """
+                diff = ctr - final_count
+                selected = []
+                deployer.undeploy_select(
+                    deployed, selected,
+                    diff, True
+                )
+                for node in selected:
+                    assg = node.get_assignment(resource.get_name())
+                    if site_clients:
+                        # turn the node into a client
+                        assg.deploy_client()
+                    else:
+                        self._unassign(assg, False)
+            save_changes = True
+
+        # condition (final_count == assigned_count) is successful, too
+
+        if site_clients:
+            # turn all remaining nodes into clients
+            if self._site_clients(resource, None, nodes):
+                save_changes = True
+
+        return save_changes
+
     @wait_startup
     @fwd_leader
     def auto_undeploy(self, res_name, force):
@@ -4018,24 +4428,22 @@ class DrbdManageServer(object):
     def update_pool_check(self):
         """
         Checks storage pool data and if necessary, updates the data
+
+        Uses the cached storage pool data; the node's pool data is only
+        updated if it differs from the cached data by more than the
+        configured threshold
         """
         fn_rc = []
         try:
             inst_node = self.get_instance_node()
             if inst_node is not None:
                 if is_set(inst_node.get_state(), DrbdNode.FLAG_STORAGE):
-                    (stor_rc, poolsize, poolfree) = (
-                        self._bd_mgr.update_pool(inst_node)
-                    )
+                    stor_rc, update_required = self._pool_update_required(inst_node)
                     if stor_rc == DM_SUCCESS:
-                        poolfree = self._pool_free_correction(
-                            inst_node, poolfree
-                        )
-                        if (inst_node.get_poolsize() != poolsize or
-                            inst_node.get_poolfree() != poolfree):
-                                fn_rc = self.update_pool(
-                                    [ inst_node.get_name() ]
-                                )
+                        if update_required:
+                            fn_rc = self.update_pool(
+                                [ inst_node.get_name() ], refresh=False
+                            )
                     else:
                         add_rc_entry(fn_rc, DM_ESTORAGE, dm_exc_text(DM_ESTORAGE))
             else:
@@ -4063,10 +4471,12 @@ class DrbdManageServer(object):
 
     @wait_startup
     @fwd_leader
-    def update_pool(self, node_names=[]):
+    def update_pool(self, node_names=[], refresh=True):
         """
         Updates information about the current node's storage pool
 
+        @param   refresh: if set, query the storage plugin instead of using
+                 the cached storage pool data
         @return: standard return code defined in drbdmanage.exceptions
         free space
         """
@@ -4076,7 +4486,7 @@ class DrbdManageServer(object):
             persist = self.begin_modify_conf()
             if persist is not None:
                 logging.info("updating storage pool information")
-                sub_rc = self.update_pool_data()
+                sub_rc = self.update_pool_data(refresh=refresh)
                 if sub_rc == DM_SUCCESS:
                     self.cleanup()
                     self.update_satellite_pools(node_names)
@@ -4100,10 +4510,12 @@ class DrbdManageServer(object):
         return fn_rc
 
 
-    def update_pool_data(self, force=False):
+    def update_pool_data(self, force=False, refresh=False):
         """
         Updates information about the current node's storage pools
 
+        @param   refresh: if set, query the storage plugin instead of using
+                 the cached storage pool data
         @return: standard return code defined in drbdmanage.exceptions
         """
         fn_rc = DM_ESTORAGE
@@ -4111,9 +4523,16 @@ class DrbdManageServer(object):
             inst_node = self.get_instance_node()
             if inst_node is not None and self._bd_mgr is not None:
                 if is_set(inst_node.get_state(), DrbdNode.FLAG_STORAGE) or force:
-                    (stor_rc, poolsize, poolfree) = (
-                        self._bd_mgr.update_pool(inst_node)
-                    )
+                    if refresh:
+                        (stor_rc, poolsize, poolfree) = (
+                            self._bd_mgr.update_pool(inst_node)
+                        )
+                    else:
+                        (stor_rc, poolsize, poolfree) = (
+                            self._bd_mgr.get_pool(
+                                inst_node, self._get_pool_refresh_interval()
+                            )
+                        )
                     if stor_rc == DM_SUCCESS:
                         poolfree = self._pool_free_correction(
                             inst_node, poolfree
@@ -4132,6 +4551,76 @@ class DrbdManageServer(object):
         return fn_rc
 
 
+    def _pool_update_required(self, node):
+        """
+        Checks whether the node's pool data differs from the cached storage
+        pool data by more than the configured threshold
+
+        @return: tuple (stor_rc, update_required)
+        """
+        update_required = False
+        (stor_rc, poolsize, poolfree) = (
+            self._bd_mgr.get_pool(node, self._get_pool_refresh_interval())
+        )
+        if stor_rc == DM_SUCCESS:
+            poolfree = self._pool_free_correction(node, poolfree)
+            update_required = self._pool_changed(node, poolsize, poolfree)
+        return stor_rc, update_required
+
+
+    def _pool_changed(self, node, poolsize, poolfree):
+        """
+        Checks whether storage pool data differs from the node's pool data
+        by more than the configured threshold
+        """
+        threshold = self.DEFAULT_POOL_THRESHOLD
+        try:
+            threshold = int(
+                self.get_conf_value(self.KEY_POOL_THRESHOLD)
+            )
+        except (ValueError, TypeError):
+            # Unparseable configuration value;
+            # no-op: keep default value
+            pass
+        node_poolsize = node.get_poolsize()
+        node_poolfree = node.get_poolfree()
+        if node_poolsize < 0 or node_poolfree < 0:
+            # Pool data is unknown
+            return node_poolsize != poolsize or node_poolfree != poolfree
+        return (
+            abs(node_poolsize - poolsize) > threshold or
+            abs(node_poolfree - poolfree) > threshold or
+            (poolfree == 0) != (node_poolfree == 0)
+        )
+
+
+    def _get_pool_refresh_interval(self):
+        interval = self.DEFAULT_POOL_REFRESH
+        try:
+            interval = int(
+                self.get_conf_value(self.KEY_POOL_REFRESH)
+            )
+        except (ValueError, TypeError):
+            # Unparseable configuration value;
+            # no-op: keep default value
+            pass
+        if interval < 1:
+            interval = 1
+        return interval
+
+    def _get_metrics_interval(self):
+        interval = DEFAULT_METRICS_INTERVAL
+        try:
+            interval = int(self.get_conf_value(KEY_METRICS_INTERVAL))
+        except (ValueError, TypeError):
+            # Unparseable configuration value;
+            # no-op: keep default value
+            pass
+        if interval < 1:
+            interval = 1
+        return interval
+
+
     def _pool_free_correction(self, node, poolfree_in):
         """
         Predicts remaining free storage space
@@ -4284,6 +4773,8 @@ class DrbdManageServer(object):
                             drbdctrl_flag = True
             for node in removable:
                 del self._nodes[node.get_name()]
+                self._objects_changed()
+                self._capacity_node_removed(node)
             if len(removable) > 0:
                 update_serial = True
             # if nodes with a control volume have been removed, reconfigure the control volume
@@ -4312,6 +4803,8 @@ class DrbdManageServer(object):
                         removable.append(resource)
             for resource in removable:
                 del self._resources[resource.get_name()]
+                self._objects_changed()
+                self._release_resource_nrs(resource)
             if len(removable) > 0:
                 update_serial = True
 
@@ -4332,6 +4825,7 @@ class DrbdManageServer(object):
                             removable.append(volume)
                 for volume in removable:
                     resource.remove_volume(volume.get_id())
+                    self._release_volume_nrs(volume)
                 if len(removable) > 0:
                     update_serial = True
 
@@ -4458,6 +4952,7 @@ class DrbdManageServer(object):
                     item = item_res
 
                 if target == "common":
+                    self.invalidate_global_conf()
                     for node in self._nodes.itervalues():
                         self._set_updflag(node)
                 elif target == "sites":
@@ -4492,232 +4987,497 @@ class DrbdManageServer(object):
 
     @wait_startup
     @req_ctrlvol
-    def list_nodes(self, node_names, serial, filter_props, req_props):
+    def list_nodes(self, node_names, serial, filter_props, req_props,
+                   view=None):
         """
         Generates a list of node views suitable for serialized transfer
 
         Used by the drbdmanage client to display the node list
         """
         fn_rc = []
+        try:
+            node_list, _ = self._list_nodes(
+                fn_rc, node_names, serial, filter_props, req_props, "", 0, view
+            )
+            return fn_rc, node_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, None
+
+    @wait_startup
+    @req_ctrlvol
+    def list_nodes_page(self, node_names, serial, filter_props, req_props,
+                        cursor, limit, view=None):
+        """
+        Generates one page of the list of node views
+
+        Nodes are listed in ascending order of their names.
+
+        @param   cursor: cursor returned with the previous page; empty for
+                 the first page
+        @param   limit: maximum number of nodes on the page; 0 for no limit
+        @return: tuple (fn_rc, cursor for the next page, node list); the
+                 cursor is empty on the last page
+        """
+        fn_rc = []
+        try:
+            node_list, next_cursor = self._list_nodes(
+                fn_rc, node_names, serial, filter_props, req_props,
+                cursor, limit, view
+            )
+            return fn_rc, next_cursor, node_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, "", None
+
+    def _list_nodes(self, fn_rc, node_names, serial, filter_props, req_props,
+                    cursor, limit, view):
+        """
+        Generates a page of the list of node views
+
+        @param   view: ConfigSnapshot object to read; None to read the
+                 server's configuration
+        @return: tuple (node list, cursor for the next page)
+        """
+        nodes, _ = self._view_objects(view)
 
         def node_filter():
             for node_name in node_names:
-                node = self._nodes.get(node_name)
+                node = nodes.get(node_name)
                 if node is None:
                     add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
                                  [ [ NODE_NAME, node_name ] ])
                 else:
                     yield node
 
-        try:
-            node_list = []
-            if node_names is not None and len(node_names) > 0:
-                selected_nodes = node_filter()
-            else:
-                selected_nodes = self._nodes.itervalues()
+        node_list = []
+        select_all = False
+        if node_names is not None and len(node_names) > 0:
+            selected_nodes = node_filter()
             if serial > 0:
                 selected_nodes = serial_filter(serial, selected_nodes)
+        elif serial > 0:
+            selected_nodes = self._changed_objects(ChangeIndex.OBJ_NODE, serial, view)
+        else:
+            selected_nodes = nodes.itervalues()
+            select_all = True
 
-            if filter_props is not None and len(filter_props) > 0:
-                selected_nodes = props_filter(selected_nodes, filter_props)
-
-            control_node = True if self._server_role_potential == SAT_POTENTIAL_LEADER_NODE else False
-
-            instance_node = self.get_instance_node()
-            for node in selected_nodes:
-                node_props = node.get_properties(req_props)
-                # Indicate if a node with a control volume is not connected/replicating
-
-                if control_node:
-                    if (node is not instance_node and
-                        is_set(node.get_state(), DrbdNode.FLAG_DRBDCTRL)):
-                        if not self._quorum.is_active_member_node(node.get_name()):
-                            node_props[IND_NODE_OFFLINE] = BOOL_TRUE
-                node_entry = [
-                    node.get_name(),
-                    node_props
-                ]
-                node_list.append(node_entry)
-                add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
-            return fn_rc, node_list
-        except Exception as exc:
-            self.catch_and_append_internal_error(fn_rc, exc)
+        if filter_props is not None and len(filter_props) > 0:
+            selected_nodes = self._props_filter(
+                ChangeIndex.OBJ_NODE, selected_nodes, filter_props, select_all, view
+            )
 
-        return fn_rc, None
+        selected_nodes, next_cursor = page_filter(
+            selected_nodes, lambda node: node.get_name(), cursor, limit
+        )
+
+        control_node = True if self._server_role_potential == SAT_POTENTIAL_LEADER_NODE else False
+
+        instance_node = nodes.get(self._instance_node_name)
+        for node in selected_nodes:
+            node_props = node.get_properties(req_props)
+            # Indicate if a node with a control volume is not connected/replicating
+
+            if control_node:
+                if (node is not instance_node and
+                    is_set(node.get_state(), DrbdNode.FLAG_DRBDCTRL)):
+                    if not self._quorum.is_active_member_node(node.get_name()):
+                        node_props[IND_NODE_OFFLINE] = BOOL_TRUE
+            node_entry = [
+                node.get_name(),
+                node_props
+            ]
+            node_list.append(node_entry)
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return node_list, next_cursor
 
     @wait_startup
     @req_ctrlvol
-    def list_resources(self, res_names, serial, filter_props, req_props):
+    def list_resources(self, res_names, serial, filter_props, req_props,
+                       view=None):
         """
         Generates a list of resources views suitable for serialized transfer
 
         Used by the drbdmanage client to display the resources/volumes list
         """
         fn_rc = []
+        try:
+            res_list, _ = self._list_resources(
+                fn_rc, res_names, serial, filter_props, req_props, "", 0, view
+            )
+            return fn_rc, res_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
 
-        def resource_filter(res_names):
-            for res_name in res_names:
-                res = self._resources.get(res_name)
-                if res is None:
-                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
-                                 [ [ RES_NAME, res_name ] ])
-                else:
-                    yield res
+        return fn_rc, None
 
+    @wait_startup
+    @req_ctrlvol
+    def list_resources_page(self, res_names, serial, filter_props, req_props,
+                            cursor, limit, view=None):
+        """
+        Generates one page of the list of resource views
+
+        Resources are listed in ascending order of their names.
+
+        @param   cursor: cursor returned with the previous page; empty for
+                 the first page
+        @param   limit: maximum number of resources on the page; 0 for no limit
+        @return: tuple (fn_rc, cursor for the next page, resource list); the
+                 cursor is empty on the last page
+        """
+        fn_rc = []
         try:
-            res_list = []
-            if res_names is not None and len(res_names) > 0:
-                selected_res = resource_filter(res_names)
+            res_list, next_cursor = self._list_resources(
+                fn_rc, res_names, serial, filter_props, req_props,
+                cursor, limit, view
+            )
+            return fn_rc, next_cursor, res_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, "", None
+
+    def _resource_filter(self, fn_rc, res_names, view):
+        """
+        Generator for iterating over the resources with the specified names
+
+        Adds an error to fn_rc for each resource that does not exist
+        """
+        _, resources = self._view_objects(view)
+        for res_name in res_names:
+            res = resources.get(res_name)
+            if res is None:
+                add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
+                             [ [ RES_NAME, res_name ] ])
             else:
-                selected_res = self._resources.itervalues()
+                yield res
+
+    def _list_resources(self, fn_rc, res_names, serial, filter_props,
+                        req_props, cursor, limit, view):
+        """
+        Generates a page of the list of resource views
+
+        @param   view: ConfigSnapshot object to read; None to read the
+                 server's configuration
+        @return: tuple (resource list, cursor for the next page)
+        """
+        _, resources = self._view_objects(view)
+        res_list = []
+        select_all = False
+        if res_names is not None and len(res_names) > 0:
+            selected_res = self._resource_filter(fn_rc, res_names, view)
             if serial > 0:
                 selected_res = serial_filter(serial, selected_res)
+        elif serial > 0:
+            selected_res = self._changed_objects(ChangeIndex.OBJ_RESOURCE, serial, view)
+        else:
+            selected_res = resources.itervalues()
+            select_all = True
 
-            if filter_props is not None and len(filter_props) > 0:
-                selected_res = props_filter(selected_res, filter_props)
+        if filter_props is not None and len(filter_props) > 0:
+            selected_res = self._props_filter(
+                ChangeIndex.OBJ_RESOURCE, selected_res, filter_props, select_all, view
+            )
 
-            for res in selected_res:
-                res_entry = [
-                    res.get_name(),
-                    res.get_properties(req_props)
-                ]
-                res_list.append(res_entry)
-            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
-            return fn_rc, res_list
-        except Exception as exc:
-            self.catch_and_append_internal_error(fn_rc, exc)
+        selected_res, next_cursor = page_filter(
+            selected_res, lambda res: res.get_name(), cursor, limit
+        )
 
-        return fn_rc, None
+        for res in selected_res:
+            res_entry = [
+                res.get_name(),
+                res.get_properties(req_props)
+            ]
+            res_list.append(res_entry)
+        add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return res_list, next_cursor
 
     @wait_startup
     @req_ctrlvol
-    def list_volumes(self, res_names, serial, filter_props, req_props):
+    def list_volumes(self, res_names, serial, filter_props, req_props,
+                     view=None):
         """
         Generates a list of resources views suitable for serialized transfer
 
         Used by the drbdmanage client to display the resources/volumes list
         """
         fn_rc = []
+        try:
+            res_list, _ = self._list_volumes(
+                fn_rc, res_names, serial, filter_props, req_props, "", 0, view
+            )
+            return fn_rc, res_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
 
-        def resource_filter(res_names):
-            for res_name in res_names:
-                res = self._resources.get(res_name)
-                if res is None:
-                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
-                                 [ [ RES_NAME, res_name ] ])
-                else:
-                    yield res
+        return fn_rc, []
 
+    @wait_startup
+    @req_ctrlvol
+    def list_volumes_page(self, res_names, serial, filter_props, req_props,
+                          cursor, limit, view=None):
+        """
+        Generates one page of the list of resource views with their volumes
+
+        Resources are listed in ascending order of their names. If filter
+        properties are specified, a page can contain fewer resources than
+        the limit even if it is not the last page.
+
+        @param   cursor: cursor returned with the previous page; empty for
+                 the first page
+        @param   limit: maximum number of resources on the page; 0 for no limit
+        @return: tuple (fn_rc, cursor for the next page, resource list); the
+                 cursor is empty on the last page
+        """
+        fn_rc = []
         try:
-            selected_res = self._resources.itervalues()
-            if res_names is not None and len(res_names) > 0:
-                selected_res = resource_filter(res_names)
-            # TODO: serial filter on vols? or serial bubbled "up", so on res as a perf opt?
+            res_list, next_cursor = self._list_volumes(
+                fn_rc, res_names, serial, filter_props, req_props,
+                cursor, limit, view
+            )
+            return fn_rc, next_cursor, res_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, "", []
+
+    def _list_volumes(self, fn_rc, res_names, serial, filter_props,
+                      req_props, cursor, limit, view):
+        """
+        Generates a page of the list of resource views with their volumes
+
+        @param   view: ConfigSnapshot object to read; None to read the
+                 server's configuration
+        @return: tuple (resource list, cursor for the next page)
+        """
+        _, resources = self._view_objects(view)
+        # TODO: serial filter on vols? or serial bubbled "up", so on res as a perf opt?
+        select_all = False
+        if res_names is not None and len(res_names) > 0:
+            selected_res = self._resource_filter(fn_rc, res_names, view)
             if serial > 0:
                 selected_res = serial_filter(serial, selected_res)
+        elif serial > 0:
+            selected_res = self._changed_objects(ChangeIndex.OBJ_RESOURCE, serial, view)
+        else:
+            selected_res = resources.itervalues()
+            select_all = True
 
-            props_filter_flag = True if filter_props is not None and len(filter_props) > 0 else False
-            res_list = []
-            for res in selected_res:
-                selected_vol = res.iterate_volumes()
-                if props_filter_flag:
-                    selected_vol = props_filter(
-                        selected_vol, filter_props
-                    )
-                if serial > 0:
-                    selected_vol = serial_filter(serial, selected_vol)
-
-                vol_list = []
-                for vol in selected_vol:
-                    vol_entry = [ vol.get_id(), vol.get_properties(req_props) ]
-                    vol_list.append(vol_entry)
-                if (not props_filter_flag) or len(vol_list) > 0:
-                    res_entry = [
-                        res.get_name(),
-                        res.get_properties(req_props), vol_list
+        props_filter_flag = True if filter_props is not None and len(filter_props) > 0 else False
+
+        # Volumes matching the filter properties by resource name,
+        # if the property index can answer the query
+        matched_vols = None
+        if props_filter_flag:
+            matches = self._view_change_index(view).find_props(
+                ChangeIndex.OBJ_VOLUME, filter_props
+            )
+            if matches is not None:
+                matched_vols = {}
+                for ((res_name, vol_id), vol) in matches.iteritems():
+                    matched_vols.setdefault(res_name, []).append(vol)
+                if select_all:
+                    # Only resources with matching volumes are listed
+                    selected_res = [
+                        resources[res_name] for res_name in matched_vols.iterkeys()
+                        if res_name in resources
                     ]
-                    res_list.append(res_entry)
-            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
-            return fn_rc, res_list
-        except Exception as exc:
-            self.catch_and_append_internal_error(fn_rc, exc)
 
-        return fn_rc, []
+        selected_res, next_cursor = page_filter(
+            selected_res, lambda res: res.get_name(), cursor, limit
+        )
+
+        res_list = []
+        for res in selected_res:
+            if matched_vols is not None:
+                selected_vol = matched_vols.get(res.get_name(), [])
+            elif props_filter_flag:
+                selected_vol = props_filter(
+                    res.iterate_volumes(), filter_props
+                )
+            else:
+                selected_vol = res.iterate_volumes()
+            if serial > 0:
+                selected_vol = serial_filter(serial, selected_vol)
+
+            vol_list = []
+            for vol in selected_vol:
+                vol_entry = [ vol.get_id(), vol.get_properties(req_props) ]
+                vol_list.append(vol_entry)
+            if (not props_filter_flag) or len(vol_list) > 0:
+                res_entry = [
+                    res.get_name(),
+                    res.get_properties(req_props), vol_list
+                ]
+                res_list.append(res_entry)
+        add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return res_list, next_cursor
 
     @wait_startup
     @req_ctrlvol
     def list_assignments(self, node_names, res_names, serial,
-                         filter_props, req_props):
+                         filter_props, req_props, view=None):
         """
         Generates a list of assignment views suitable for serialized transfer
 
         Used by the drbdmanage client to display the assignments list
         """
         fn_rc = []
+        try:
+            assg_list, _ = self._list_assignments(
+                fn_rc, node_names, res_names, serial, filter_props, req_props,
+                "", 0, view
+            )
+            return fn_rc, assg_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, None
+
+    @wait_startup
+    @req_ctrlvol
+    def list_assignments_page(self, node_names, res_names, serial,
+                              filter_props, req_props, cursor, limit,
+                              view=None):
+        """
+        Generates one page of the list of assignment views
+
+        Assignments are listed in ascending order of their node name and
+        resource name keys, see _assg_page_key().
+
+        @param   cursor: cursor returned with the previous page; empty for
+                 the first page
+        @param   limit: maximum number of assignments on the page; 0 for no limit
+        @return: tuple (fn_rc, cursor for the next page, assignment list); the
+                 cursor is empty on the last page
+        """
+        fn_rc = []
+        try:
+            assg_list, next_cursor = self._list_assignments(
+                fn_rc, node_names, res_names, serial, filter_props, req_props,
+                cursor, limit, view
+            )
+            return fn_rc, next_cursor, assg_list
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, "", None
+
+    @staticmethod
+    def _assg_page_key(assg):
+        """
+        Returns the key that orders assignments on the pages of their list
+
+        Node names can not contain a colon, therefore the key is unique.
+        """
+        return "%s:%s" % (assg.get_node().get_name(), assg.get_resource().get_name())
+
+    def _list_assignments(self, fn_rc, node_names, res_names, serial,
+                          filter_props, req_props, cursor, limit, view):
+        """
+        Generates a page of the list of assignment views
+
+        @param   view: ConfigSnapshot object to read; None to read the
+                 server's configuration
+        @return: tuple (assignment list, cursor for the next page)
+        """
+        nodes, resources = self._view_objects(view)
 
         def assg_filter(selected_nodes, selected_res):
+            # Iterate the assignments of whichever side has fewer of them
+            # and look up the other side in its selection map
+            node_assg_count = 0
             for node in selected_nodes.itervalues():
+                node_assg_count += node.num_assignments()
+            res_assg_count = 0
+            for res in selected_res.itervalues():
+                res_assg_count += res.num_assignments()
+            if node_assg_count <= res_assg_count:
+                select_all = selected_res is resources
+                for node in selected_nodes.itervalues():
+                    for assg in node.iterate_assignments():
+                        if (select_all or
+                            assg.get_resource().get_name() in selected_res):
+                            yield assg
+            else:
+                select_all = selected_nodes is nodes
                 for res in selected_res.itervalues():
-                    assg = node.get_assignment(res.get_name())
-                    if assg is not None:
-                        yield assg
+                    for assg in res.iterate_assignments():
+                        if (select_all or
+                            assg.get_node().get_name() in selected_nodes):
+                            yield assg
 
-        try:
-            if node_names is not None and len(node_names) > 0:
-                selected_nodes = {}
-                for node_name in node_names:
-                    node = self._nodes.get(node_name)
-                    if node is None:
-                        add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
-                                     [ [ NODE_NAME, node_name ] ])
-                    else:
-                        selected_nodes[node.get_name()] = node
-            else:
-                selected_nodes = self._nodes
+        if node_names is not None and len(node_names) > 0:
+            selected_nodes = {}
+            for node_name in node_names:
+                node = nodes.get(node_name)
+                if node is None:
+                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
+                                 [ [ NODE_NAME, node_name ] ])
+                else:
+                    selected_nodes[node.get_name()] = node
+        else:
+            selected_nodes = nodes
 
-            if res_names is not None and len(res_names) > 0:
-                selected_res = {}
-                for res_name in res_names:
-                    res = self._resources.get(res_name)
-                    if res is None:
-                        add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
-                                     [ [ RES_NAME, res_name ] ])
-                    else:
-                        selected_res[res.get_name()] = res
-            else:
-                selected_res = self._resources
+        if res_names is not None and len(res_names) > 0:
+            selected_res = {}
+            for res_name in res_names:
+                res = resources.get(res_name)
+                if res is None:
+                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
+                                 [ [ RES_NAME, res_name ] ])
+                else:
+                    selected_res[res.get_name()] = res
+        else:
+            selected_res = resources
 
+        select_all = selected_nodes is nodes and selected_res is resources
+        if serial > 0 and select_all:
+            selected_assg = self._changed_objects(ChangeIndex.OBJ_ASSIGNMENT, serial, view)
+            select_all = False
+        else:
             selected_assg = assg_filter(selected_nodes, selected_res)
             if serial > 0:
                 selected_assg = serial_filter(serial, selected_assg)
 
-            if filter_props is not None and len(filter_props) > 0:
-                selected_assg = props_filter(selected_assg, filter_props)
+        if filter_props is not None and len(filter_props) > 0:
+            selected_assg = self._props_filter(
+                ChangeIndex.OBJ_ASSIGNMENT, selected_assg, filter_props, select_all, view
+            )
 
-            assg_list = []
-            for assg in selected_assg:
-                vol_state_list = []
-                for vol_state in assg.iterate_volume_states():
-                    vol_state_entry = [
-                        vol_state.get_id(),
-                        # FIXME: req_props, filter_props, nothing?
-                        vol_state.get_properties(None)
-                    ]
-                    vol_state_list.append(vol_state_entry)
-                assg_entry = [
-                    assg.get_node().get_name(),
-                    assg.get_resource().get_name(),
-                    # FIXME: req_props, filter_props, nothing?
-                    assg.get_properties(None),
-                    vol_state_list
-                ]
-                assg_list.append(assg_entry)
-            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
-            return fn_rc, assg_list
-        except Exception as exc:
-            self.catch_and_append_internal_error(fn_rc, exc)
+        selected_assg, next_cursor = page_filter(
+            selected_assg, self._assg_page_key, cursor, limit
+        )
 
-        return fn_rc, None
+        # The requested keys apply to the views of the assignments and of
+        # their volume states; a frozenset is shared by all the views'
+        # Selector objects instead of being copied for every view
+        if req_props is not None and len(req_props) > 0:
+            req_props = frozenset(req_props)
+        else:
+            req_props = None
+
+        assg_list = []
+        for assg in selected_assg:
+            vol_state_list = []
+            for vol_state in assg.iterate_volume_states():
+                vol_state_entry = [
+                    vol_state.get_id(),
+                    vol_state.get_properties(req_props)
+                ]
+                vol_state_list.append(vol_state_entry)
+            assg_entry = [
+                assg.get_node().get_name(),
+                assg.get_resource().get_name(),
+                assg.get_properties(req_props),
+                vol_state_list
+            ]
+            assg_list.append(assg_entry)
+        add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return assg_list, next_cursor
 
     @wait_startup
     @fwd_leader
@@ -4870,19 +5630,49 @@ class DrbdManageServer(object):
                     yield snaps
 
         try:
-            selected_res = self._resources.itervalues()
+            # Snapshots changed after the specified serial number,
+            # by resource name
+            changed_snaps = None
+            if serial > 0:
+                changed_snaps = {}
+                for snaps in self._changed_objects(ChangeIndex.OBJ_SNAPSHOT, serial):
+                    res_snaps = changed_snaps.setdefault(snaps.get_resource().get_name(), [])
+                    res_snaps.append(snaps)
+
             if res_names is not None and len(res_names) > 0:
                 selected_res = resource_filter(res_names)
-            #if serial > 0:
-            #    selected_res = serial_filter(serial, selected_res)
+            elif changed_snaps is not None:
+                selected_res = [
+                    snaps_list[0].get_resource() for snaps_list in changed_snaps.itervalues()
+                ]
+            else:
+                selected_res = self._resources.itervalues()
+
+            # Snapshots matching the filter properties, if the property
+            # index can answer the query
+            matched_snaps = None
+            if filter_props is not None and len(filter_props) > 0:
+                matches = self._get_change_index().find_props(
+                    ChangeIndex.OBJ_SNAPSHOT, filter_props
+                )
+                if matches is not None:
+                    matched_snaps = set(matches.itervalues())
 
             res_list = []
             for res in selected_res:
-                if snaps_names is not None and len(snaps_names) > 0:
+                if changed_snaps is not None:
+                    selected_sn = changed_snaps.get(res.get_name(), [])
+                    if snaps_names is not None and len(snaps_names) > 0:
+                        selected_sn = [
+                            sn for sn in selected_sn if sn.get_name() in snaps_names
+                        ]
+                elif snaps_names is not None and len(snaps_names) > 0:
                     selected_sn = snaps_filter(res, snaps_names)
                 else:
                     selected_sn = res.iterate_snapshots()
-                if filter_props is not None and len(filter_props) > 0:
+                if matched_snaps is not None:
+                    selected_sn = [sn for sn in selected_sn if sn in matched_snaps]
+                elif filter_props is not None and len(filter_props) > 0:
                     selected_sn = props_filter(
                         selected_sn, filter_props
                     )
@@ -4937,43 +5727,83 @@ class DrbdManageServer(object):
             else:
                 selected_res = self._resources.itervalues()
 
+            node_name_set = None
+            if node_names is not None and len(node_names) > 0:
+                node_name_set = set(node_names)
+
+            # Shared by the views of all snapshot assignments
+            if req_props is not None and len(req_props) > 0:
+                req_props = frozenset(req_props)
+            else:
+                req_props = None
+
             assg_list = []
-            for res in selected_res:
+            if serial > 0:
+                res_name_set = None
+                if res_names is not None and len(res_names) > 0:
+                    res_name_set = set(res_names)
+                snaps_name_set = None
                 if snaps_names is not None and len(snaps_names) > 0:
-                    selected_snaps = snaps_filter(res, snaps_names)
-                else:
-                    selected_snaps = res.iterate_snapshots()
-
-                for snaps in selected_snaps:
-                    snaps_assg_list = []
-                    if node_names is not None and len(node_names) > 0:
-                        name_map = {}
-                        for name in node_names:
-                            name_map[name] = None
-                        for snaps_assg in snaps.iterate_snaps_assgs():
-                            assg = snaps_assg.get_assignment()
-                            node_name = assg.get_node().get_name()
-                            if name_map.get(node_name) is not None:
+                    snaps_name_set = set(snaps_names)
+                # Group the selected snapshot assignments that changed after
+                # the specified serial number by resource and snapshot
+                changed_entries = {}
+                for snaps_assg in self._changed_objects(ChangeIndex.OBJ_SNAPS_ASSG, serial):
+                    snaps = snaps_assg.get_snapshot()
+                    res_name = snaps.get_resource().get_name()
+                    node_name = snaps_assg.get_assignment().get_node().get_name()
+                    if ((res_name_set is None or res_name in res_name_set) and
+                        (snaps_name_set is None or snaps.get_name() in snaps_name_set) and
+                        (node_name_set is None or node_name in node_name_set)):
+                        snaps_entry = [
+                            node_name,
+                            snaps_assg.get_properties(req_props)
+                        ]
+                        snaps_assg_list = changed_entries.setdefault(
+                            (res_name, snaps.get_name()), []
+                        )
+                        snaps_assg_list.append(snaps_entry)
+                for ((res_name, snaps_name), snaps_assg_list) in changed_entries.iteritems():
+                    snaps_list_entry = [res_name, snaps_name, snaps_assg_list]
+                    assg_list.append(snaps_list_entry)
+            else:
+                for res in selected_res:
+                    if snaps_names is not None and len(snaps_names) > 0:
+                        selected_snaps = snaps_filter(res, snaps_names)
+                    else:
+                        selected_snaps = res.iterate_snapshots()
+
+                    for snaps in selected_snaps:
+                        snaps_assg_list = []
+                        if node_names is not None and len(node_names) > 0:
+                            # Look up the selected nodes in the snapshot's
+                            # node name to snapshot assignment map; only
+                            # the snapshot assignments on the selected
+                            # nodes are listed, and snapshots without any
+                            # are left out
+                            for node_name in node_name_set:
+                                snaps_assg = snaps.get_snaps_assg(node_name)
+                                if snaps_assg is not None:
+                                    snaps_entry = [
+                                        node_name,
+                                        snaps_assg.get_properties(req_props)
+                                    ]
+                                    snaps_assg_list.append(snaps_entry)
+                        else:
+                            for snaps_assg in snaps.iterate_snaps_assgs():
+                                assg = snaps_assg.get_assignment()
+                                node_name = assg.get_node().get_name()
                                 snaps_entry = [
                                     node_name,
                                     snaps_assg.get_properties(req_props)
                                 ]
                                 snaps_assg_list.append(snaps_entry)
-                    else:
-                        for snaps_assg in snaps.iterate_snaps_assgs():
-                            assg = snaps_assg.get_assignment()
-                            node_name = assg.get_node().get_name()
-                            snaps_entry = [
-                                node_name,
-                                snaps_assg.get_properties(req_props)
+                        if len(snaps_assg_list) > 0:
+                            snaps_list_entry = [
+                                res.get_name(), snaps.get_name(),
+                                snaps_assg_list
                             ]
-                            snaps_assg_list.append(snaps_entry)
-                    if len(snaps_assg_list) > 0:
-                        snaps_list_entry = [
-                            res.get_name(), snaps.get_name(),
-                            snaps_assg_list
-                        ]
-                        assg_list.append(snaps_list_entry)
+                            assg_list.append(snaps_list_entry)
         except Exception as exc:
             self.catch_and_append_internal_error(fn_rc, exc)
         if len(fn_rc) == 0:
@@ -4981,6 +5811,39 @@ class DrbdManageServer(object):
 
         return fn_rc, assg_list
 
+    @wait_startup
+    @req_ctrlvol
+    def list_removed(self, obj_type, serial):
+        """
+        Generates a list of the keys of objects removed after serial
+
+        Allows clients that poll the list_* functions for objects changed
+        after a serial number to learn about removed objects, too.
+        Each key is a list of the names (and volume ids) that identify the
+        removed object, e.g. [ node name, resource name ] for assignments.
+        If the removed objects are not known for the specified serial
+        number anymore, DM_ENOENT is returned, and the client must reload
+        the complete list of objects.
+
+        @param   obj_type: one of the ChangeIndex.OBJ_* object types
+        """
+        fn_rc = []
+        key_list = []
+        try:
+            if obj_type not in ChangeIndex.OBJ_TYPES:
+                add_rc_entry(fn_rc, DM_EINVAL, dm_exc_text(DM_EINVAL))
+            else:
+                removed = self._get_change_index().get_removed(obj_type, serial)
+                if removed is None:
+                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT))
+                else:
+                    key_list = self._change_keys_list(removed)
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+        if len(fn_rc) == 0:
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return fn_rc, key_list
+
     @wait_startup
     @fwd_leader
     def restore_snapshot(self, res_name, snaps_res_name, snaps_name,
@@ -5021,7 +5884,9 @@ class DrbdManageServer(object):
                     snaps_res = self._resources[snaps_res_name]
                     snapshot = snaps_res.get_snapshot(snaps_name)
                     if snapshot is not None:
-                        occupied_minor_nrs = self.get_occupied_minor_nrs()
+                        # Minor numbers selected for the restored volumes,
+                        # which are not registered before the resource is
+                        restored_minor_nrs = set()
                         for snaps_assg in snapshot.iterate_snaps_assgs():
                             # Build the new resource's volume list from the
                             # first snapshot assignment's volume list
@@ -5053,10 +5918,8 @@ class DrbdManageServer(object):
                                     except ValueError:
                                         raise InvalidMinorNrException
                                 if minor == MinorNr.MINOR_NR_AUTO:
-                                    if occupied_minor_nrs is None:
-                                        raise InvalidMinorNrException
                                     minor = self.get_free_minor_nr(
-                                        occupied_minor_nrs, True
+                                        True, restored_minor_nrs
                                     )
                                 if minor == MinorNr.MINOR_NR_ERROR:
                                     raise InvalidMinorNrException
@@ -5065,7 +5928,7 @@ class DrbdManageServer(object):
                                     MinorNr(minor), 0, self.get_serial,
                                     None, None
                                 )
-                                occupied_minor_nrs.append(minor)
+                                restored_minor_nrs.add(minor)
                                 if v_props is not None:
                                     # Merge only auxiliary properties into the
                                     # DrbdVolume's properties container
@@ -5090,6 +5953,8 @@ class DrbdManageServer(object):
                         #        resource definition should probably be
                         #        rolled back
                         self._resources[resource.get_name()] = resource
+                        self._objects_changed()
+                        self._allocate_resource_nrs(resource)
                         # Assign the newly created resource to each node that
                         # the snapshot resource was assigned to
                         # (unless that assignment is currently
@@ -5444,6 +6309,9 @@ class DrbdManageServer(object):
         hash_obj = persist.get_hash_obj()
         if hash_obj is not None:
             self._conf_hash = hash_obj.get_hex_hash()
+        self._announce_changes()
+        self._waiters.schedule_evaluation()
+        self._publish_config(persist)
 
 
     def open_conf(self):
@@ -5518,6 +6386,7 @@ class DrbdManageServer(object):
                             # return the persistence object
                             self._locked_persist = self._persist
                             ret_persist = self._persist
+                            self._prepare_change_feed()
                         else:
                             # if the configuration was opened only for reading,
                             # no modifiable persistence object can be returned,
@@ -5659,11 +6528,12 @@ class DrbdManageServer(object):
         resource = assignment.get_resource()
         res_name = resource.get_name()
 
-        assg_conf, global_conf = self.open_assignment_conf(res_name)
+        global_path = self.get_global_conf_path()
+        assg_conf = self.open_assignment_conf(res_name)
         writer = DrbdAdmConf(self._objects_root)
         file_written = False
         try:
-            writer.write(assg_conf, assignment, False, global_conf)
+            writer.write(assg_conf, assignment, False, global_path=global_path)
             file_written = True
         except IOError as io_error:
             res_exc = ResourceFileException(
@@ -5673,7 +6543,7 @@ class DrbdManageServer(object):
             self._message_log.add_entry(msglog.MessageLog.ALERT, res_exc.get_log_message())
             raise res_exc
         finally:
-            self.close_assignment_conf(assg_conf, global_conf)
+            self.close_assignment_conf(assg_conf)
         if file_written:
             self.update_assignment_conf(res_name)
 
@@ -5712,120 +6582,160 @@ class DrbdManageServer(object):
         return fn_rc
 
 
-    def open_assignment_conf(self, resource_name):
+    def invalidate_global_conf(self):
+        """
+        Marks the global configuration file for regeneration
+
+        The file is regenerated when it is referenced by the next
+        resource configuration file that is written. The cached site
+        topology used for generating connection meshes is dropped as well.
         """
-        Opens DRBD configuration files for updating
+        self._global_conf_stale = True
+        DrbdConnectionConf.invalidate_topology()
 
-        If either file cannot be opened, both files are closed and
-        a ResourceFileException is generated
 
-        @returns: tuple(resource configuration file stream, global configuration file stream)
+    def get_global_conf_path(self):
         """
-        assg_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
-                                 "drbdmanage_" + resource_name + ".res.tmp")
-        global_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
-                                   FILE_GLOBAL_COMMON_CONF + ".tmp")
-        assg_conf = None
-        global_conf = None
-        try:
+        Returns the path of the global configuration file
+
+        Regenerates the global configuration file first, if it has been
+        marked for regeneration by invalidate_global_conf()
+
+        If the global configuration file cannot be updated, a
+        ResourceFileException is generated, so that the resource
+        configuration file that refers to it is not updated either. The
+        file remains marked for regeneration.
+
+        @return: path of the global configuration file; None if there is no
+                 global configuration
+        """
+        if self._global_conf_stale:
             try:
-                assg_conf = open(assg_path, "w")
-            except OSError as os_error:
-                logging.error(
-                    "Cannot update DRBD resource file '%s', error "
-                    "returned by the OS is: %s"
-                    % (assg_path, os_error.strerror)
-                )
-                raise ResourceFileException(assg_path)
+                if self.update_global_conf():
+                    self._global_conf_path = os.path.join(
+                        self._conf[self.KEY_DRBD_CONFPATH], FILE_GLOBAL_COMMON_CONF
+                    )
+                else:
+                    self._global_conf_path = None
+                self._global_conf_stale = False
+            except ResourceFileException as res_exc:
+                self._message_log.add_entry(msglog.MessageLog.ALERT, res_exc.get_log_message())
+                raise res_exc
+        return self._global_conf_path
+
+
+    def update_global_conf(self):
+        """
+        Generates the global configuration file
+
+        The file is only replaced if its content has changed.
+        If the update fails, a ResourceFileException is generated.
+
+        @return: True if there is a global configuration, False otherwise
+        """
+        global_final_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
+                                         FILE_GLOBAL_COMMON_CONF)
+        global_tmp_path = global_final_path + ".tmp"
+
+        global_conf = ConfFileBuffer(global_tmp_path)
+        writer = DrbdAdmConf(self._objects_root)
+        wrote_global = writer.write_global(global_conf)
+        self.close_assignment_conf(global_conf)
+
+        if self._conf_file_unchanged(global_final_path):
+            self._conf_file_stats[self.CONF_STATS_GLOBAL_UNCHANGED] += 1
+        else:
             try:
-                global_conf = open(global_path, "w")
+                os.rename(global_tmp_path, global_final_path)
+                self._conf_file_stats[self.CONF_STATS_GLOBAL_WRITTEN] += 1
             except OSError as os_error:
-                logging.error(
-                    "Cannot update DRBD global configuration file '%s', error "
-                    "returned by the OS is: %s"
-                    % (global_path, os_error.strerror)
+                logging.info(
+                    'Could not rename %s: %s\n' % (global_tmp_path, str(os_error))
                 )
-                raise ResourceFileException(global_path)
-        except ResourceFileException as res_file_exc:
-            if assg_conf is None:
-                try:
-                    assg_conf.close()
-                except:
-                    pass
-            if global_conf is None:
-                try:
-                    global_conf.close()
-                except:
-                    pass
-            raise res_file_exc
-        return assg_conf, global_conf
+                raise ResourceFileException(global_final_path)
+        return wrote_global
+
+
+    def open_assignment_conf(self, resource_name):
+        """
+        Opens a DRBD resource configuration file for updating
+
+        The configuration file is generated in memory. When the stream
+        is closed, the temporary file is only written if the content
+        differs from the content of the current configuration file.
+        The global configuration file is generated separately, see
+        get_global_conf_path().
+
+        @returns: resource configuration file stream
+        """
+        assg_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
+                                 "drbdmanage_" + resource_name + ".res.tmp")
+        return ConfFileBuffer(assg_path)
 
 
     def update_assignment_conf(self, resource_name):
         """
-        Update the final configuration files by moving the temporary ones
+        Update the final configuration file by moving the temporary one
+
+        A configuration file that was regenerated with unchanged content is
+        neither validated nor moved.
 
         If the update fails, a ResourceFileException is generated.
-        The method always attempts to move both files. If the resource configuration file
-        cannot be moved, the exception reports the resource configuration file path. If
-        the global configuration file cannot be moved, the exception reports the global
-        configuration file path. If both files cannot be moved, the exception reports
-        the resource configuration file path.
         """
         assg_final_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
                                  "drbdmanage_" + resource_name + ".res")
         assg_tmp_path = assg_final_path + ".tmp"
-        global_final_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
-                                   FILE_GLOBAL_COMMON_CONF)
-        global_tmp_path = global_final_path + ".tmp"
 
         update_exception = None
 
-        # Attempt to move the global configuration file
-        try:
-            os.rename(global_tmp_path, global_final_path)
-        except OSError as os_error:
-            logging.info('Could not rename %s\n' % global_tmp_path)
-            update_exception = ResourceFileException(global_final_path)
-
         # Attempt to move the resource configuration file
-        if update_exception is None:
+        if self._conf_file_unchanged(assg_final_path):
+            self._conf_file_stats[self.CONF_STATS_RES_UNCHANGED] += 1
+        else:
             try:
                 if not self._drbd_mgr.check_res_file(resource_name, assg_tmp_path, assg_final_path):
                     logging.info('Resource file %s not valid\n' % assg_tmp_path)
                     os.rename(assg_tmp_path, assg_final_path + '.q')
+                    self._conf_file_stats[self.CONF_STATS_RES_INVALID] += 1
                     update_exception = ResourceFileException(assg_final_path)
                 else:
                     os.rename(assg_tmp_path, assg_final_path)
+                    self._conf_file_stats[self.CONF_STATS_RES_WRITTEN] += 1
             except OSError as os_error:
                 update_exception = ResourceFileException(assg_final_path)
 
         if update_exception is not None:
             raise update_exception
 
-    def close_assignment_conf(self, assg_conf, global_conf):
+
+    def _conf_file_unchanged(self, final_path):
         """
-        Closes the resource/global configuration file streams
+        Checks and clears the unchanged-flag of a configuration file
         """
-        try:
-            if assg_conf is not None:
-                assg_conf.close()
-        except OSError as os_error:
-            logging.error(
-                "Cannot close DRBD resource configuration file '%s', error "
-                "returned by the OS is: %s"
-                % (assg_conf.name, os_error.strerror)
-            )
+        unchanged = final_path in self._unchanged_conf_files
+        self._unchanged_conf_files.discard(final_path)
+        return unchanged
+
 
+    def close_assignment_conf(self, conf_stream):
+        """
+        Closes a configuration file stream
+
+        Writes the temporary configuration file if its content has changed
+        """
+        final_path = conf_stream.get_final_path()
         try:
-            if global_conf is not None:
-                global_conf.close()
-        except OSError as os_error:
+            conf_stream.close()
+        except (IOError, OSError) as io_error:
             logging.error(
-                "Cannot close DRBD global configuration file '%s', error "
+                "Cannot write DRBD configuration file '%s', error "
                 "returned by the OS is: %s"
-                % (global_conf.name, os_error.strerror)
+                % (conf_stream.name, io_error.strerror)
             )
+        if conf_stream.changed is False:
+            self._unchanged_conf_files.add(final_path)
+        else:
+            self._unchanged_conf_files.discard(final_path)
 
 
     def get_conf_hash(self):
@@ -6147,17 +7057,16 @@ class DrbdManageServer(object):
         if port_nr is not None:
             try:
                 port_nr = int(port_nr)
-                res_name = None
-                is_free = True
-                for resource in self._resources.itervalues():
-                    used_port = resource.get_port()
-                    if port_nr == used_port:
-                        is_free = False
-                        res_name = resource.get_name()
-                        port_info = "Port number %d is ALLOCATED for managed resource '%s'" % (port_nr, res_name)
-                        break
-                if is_free:
+                if self.is_free_port_nr(port_nr):
                     port_info = "Port number %d is NOT ALLOCATED for any managed resource" % (port_nr)
+                else:
+                    # Find the resource that the port number is allocated for
+                    for resource in self._resources.itervalues():
+                        used_port = resource.get_port()
+                        if port_nr == used_port:
+                            res_name = resource.get_name()
+                            port_info = "Port number %d is ALLOCATED for managed resource '%s'" % (port_nr, res_name)
+                            break
             except (ValueError, TypeError):
                 port_info = "Error: Invalid argument: port-number"
         else:
@@ -6167,11 +7076,9 @@ class DrbdManageServer(object):
 
     def TQ_free_minor_nr(self):
         minor_info = "Automatic minor number allocation failed"
-        occupied_list = self.get_occupied_minor_nrs()
-        if occupied_list is not None:
-            free_minor_nr = self.get_free_minor_nr(occupied_list, False)
-            if free_minor_nr != MinorNr.MINOR_NR_ERROR:
-                minor_info = "Next free minor number: %d" % (free_minor_nr)
+        free_minor_nr = self.get_free_minor_nr(False)
+        if free_minor_nr != MinorNr.MINOR_NR_ERROR:
+            minor_info = "Next free minor number: %d" % (free_minor_nr)
         return [minor_info]
 
 
@@ -6180,22 +7087,22 @@ class DrbdManageServer(object):
         if minor_nr is not None:
             try:
                 minor_nr = int(minor_nr)
-                is_free = True
-                for resource in self._resources.itervalues():
-                    for vol in resource.iterate_volumes():
-                        minor_obj = vol.get_minor()
-                        nr_item = minor_obj.get_value()
-                        if minor_nr == nr_item:
-                            is_free = False
-                            res_name = resource.get_name()
-                            vol_nr = vol.get_id()
-                            minor_info = (
-                                "Minor number %d is ALLOCATED for managed resource '%s' volume number %d"
-                                % (minor_nr, res_name, vol_nr)
-                            )
-                            break
-                if is_free:
+                if self.is_free_minor_nr(minor_nr):
                     minor_info = "Minor number %d is NOT ALLOCATED for any managed resource" % (minor_nr)
+                else:
+                    # Find the volume that the minor number is allocated for
+                    for resource in self._resources.itervalues():
+                        for vol in resource.iterate_volumes():
+                            minor_obj = vol.get_minor()
+                            nr_item = minor_obj.get_value()
+                            if minor_nr == nr_item:
+                                res_name = resource.get_name()
+                                vol_nr = vol.get_id()
+                                minor_info = (
+                                    "Minor number %d is ALLOCATED for managed resource '%s' volume number %d"
+                                    % (minor_nr, res_name, vol_nr)
+                                )
+                                break
             except (ValueError, TypeError):
                 minor_info = "Error: Invalid argument: minor-number"
         else:
@@ -6351,6 +7258,19 @@ class DrbdManageServer(object):
         self._message_log.clear()
         return ["Message log cleared"]
 
+    def TQ_metrics(self, group=None):
+        """
+        Lists the latency metrics of the server's operations
+
+        @param   group: only list the metrics of this group, e.g. "dbus"
+        """
+        if group is not None and group not in metrics.GROUPS:
+            return [
+                "Error: unknown metrics group '%s', known groups: %s"
+                % (group, ", ".join(sorted(metrics.GROUPS.iterkeys())))
+            ]
+        return metrics.get_registry().format_text(group)
+
     @wait_startup
     @req_ctrlvol
     def text_query(self, command):
@@ -6793,6 +7713,12 @@ class DrbdManageServer(object):
                                 "%s\n" % (self._conf_hash)
                             )
                         fn_rc = 0
+                    elif subcommand == "conf-stats":
+                        for key in sorted(self._conf_file_stats.iterkeys()):
+                            self._debug_out.write(
+                                "%-30s = %d\n" % (key, self._conf_file_stats[key])
+                            )
+                        fn_rc = 0
                 except (AttributeError, IndexError):
                     pass
             elif command == "exit":
@@ -7744,26 +8670,255 @@ class DrbdManageServer(object):
         logging.info("server shutdown complete, exiting")
         exit(0)
 
+    def _get_minor_allocator(self):
+        """
+        Returns the allocator that tracks the minor numbers of all volumes
+
+        The allocator is rebuilt from the resources' volumes if it has been
+        invalidated or if the range of minor numbers has been reconfigured
+
+        @raise   ValueError: if the configured minimum minor number is invalid
+        """
+        min_nr = int(self._conf[self.KEY_MIN_MINOR_NR])
+        self._check_allocators()
+        allocator = self._minor_alloc
+        if allocator is None or allocator.get_range() != (min_nr, MinorNr.MINOR_NR_MAX):
+            allocator = NumberAllocator(min_nr, MinorNr.MINOR_NR_MAX)
+            for resource in self._resources.itervalues():
+                for vol in resource.iterate_volumes():
+                    allocator.allocate(vol.get_minor().get_value())
+            self._minor_alloc = allocator
+        return allocator
+
+    def _get_port_allocator(self):
+        """
+        Returns the allocator that tracks the port numbers of all resources
+
+        The allocator is rebuilt from the resources if it has been
+        invalidated or if the range of port numbers has been reconfigured
+
+        @raise   ValueError: if the configured port number range is invalid
+        """
+        min_nr = int(self._conf[self.KEY_MIN_PORT_NR])
+        max_nr = int(self._conf[self.KEY_MAX_PORT_NR])
+        self._check_allocators()
+        allocator = self._port_alloc
+        if allocator is None or allocator.get_range() != (min_nr, max_nr):
+            allocator = NumberAllocator(min_nr, max_nr)
+            for resource in self._resources.itervalues():
+                allocator.allocate(resource.get_port())
+            self._port_alloc = allocator
+        return allocator
+
+    def _check_allocators(self):
+        """
+        Drops the allocators if the resources map has been exchanged
+        """
+        if self._alloc_resources is not self._resources:
+            self.invalidate_allocators()
+            self._alloc_resources = self._resources
+
+    def invalidate_allocators(self):
+        """
+        Drops the minor and port number allocators
+
+        The allocators are rebuilt from the current configuration when they
+        are used next
+        """
+        self._minor_alloc = None
+        self._port_alloc  = None
+
+    def _allocate_resource_nrs(self, resource):
+        """
+        Registers the port and minor numbers of a resource that has been
+        added to the resources map with the allocators
+        """
+        self._allocate_resource_port(resource)
+        for volume in resource.iterate_volumes():
+            self._allocate_volume_nrs(volume)
+
+    def _release_resource_nrs(self, resource):
+        """
+        Releases the port and minor numbers of a resource that has been
+        removed from the resources map
+        """
+        self._release_resource_port(resource)
+        for volume in resource.iterate_volumes():
+            self._release_volume_nrs(volume)
+
+    def _allocate_resource_port(self, resource):
+        if self._port_alloc is not None:
+            self._port_alloc.allocate(resource.get_port())
+
+    def _release_resource_port(self, resource):
+        if self._port_alloc is not None:
+            self._port_alloc.release(resource.get_port())
+
+    def _allocate_volume_nrs(self, volume):
+        if self._minor_alloc is not None:
+            self._minor_alloc.allocate(volume.get_minor().get_value())
+
+    def _release_volume_nrs(self, volume):
+        if self._minor_alloc is not None:
+            self._minor_alloc.release(volume.get_minor().get_value())
+
+    def _get_change_index(self):
+        """
+        Returns the index of changed and removed objects
+
+        The index is built from the current configuration if it has not
+        been built yet or if the configuration has been reloaded
+        """
+        change_index = self._change_index
+        if change_index is None or not change_index.uses_objects(self._nodes, self._resources):
+            change_index = ChangeIndex(self._nodes, self._resources, self.peek_serial)
+            self._change_index = change_index
+        return change_index
+
+    def _view_objects(self, view):
+        """
+        Returns the nodes and resources maps of a view of the configuration
+
+        @param   view: ConfigSnapshot object; None for the server's configuration
+        @return: tuple (nodes map, resources map)
+        """
+        if view is None:
+            return self._nodes, self._resources
+        return view.get_nodes(), view.get_resources()
+
+    def _view_change_index(self, view):
+        """
+        Returns the index of changed objects of a view of the configuration
+
+        @param   view: ConfigSnapshot object; None for the server's configuration
+        """
+        if view is None:
+            return self._get_change_index()
+        return view.get_change_index()
+
+    @staticmethod
+    def _change_keys_list(keys):
+        """
+        Converts keys of the change index to lists of names for serialized
+        transfer, e.g. [ node name, resource name ] for assignments
+        """
+        key_list = []
+        for key in keys:
+            if isinstance(key, tuple):
+                key_list.append([str(item) for item in key])
+            else:
+                key_list.append([key])
+        return key_list
+
+    def _prepare_change_feed(self):
+        """
+        Prepares announcing the changes of a modification of the configuration
+
+        Builds the index of changed objects before the configuration is
+        modified, so that the changes can be announced after saving the
+        configuration, see _announce_changes()
+        """
+        try:
+            self._get_change_index()
+            if self._change_feed_serial is None:
+                self._change_feed_serial = self.peek_serial()
+        except Exception as exc:
+            logging.error("Cannot prepare the change feed: %s" % str(exc))
+
+    def _announce_changes(self):
+        """
+        Emits the change feed signal for the objects changed since the
+        last announcement
+
+        One signal is emitted for each type of objects that changed. If the
+        configuration was reloaded since the last announcement, the removed
+        objects are not known, and the signal for each type of objects is
+        emitted with an empty list of keys.
+        """
+        if self._change_feed_serial is None:
+            return
+        try:
+            if self._change_feed is None and self._signal_factory is not None:
+                self._change_feed = self._signal_factory.create_change_feed()
+            serial = self.peek_serial()
+            if self._change_feed is not None and serial > self._change_feed_serial:
+                change_index = self._get_change_index()
+                for obj_type in ChangeIndex.OBJ_TYPES:
+                    changed_keys = change_index.get_changed_keys(
+                        obj_type, self._change_feed_serial
+                    )
+                    if changed_keys is None:
+                        self._change_feed.changed(serial, obj_type, [])
+                    elif len(changed_keys) > 0:
+                        self._change_feed.changed(
+                            serial, obj_type, self._change_keys_list(changed_keys)
+                        )
+            self._change_feed_serial = serial
+        except Exception as exc:
+            logging.error("Cannot announce configuration changes: %s" % str(exc))
+
+    def _objects_changed(self):
+        """
+        Marks nodes or resources as added to or removed from the server's
+        nodes or resources map for the index of changed objects
+        """
+        if self._change_index is not None:
+            self._change_index.root_changed()
+
+    def _changed_objects(self, obj_type, serial, view=None):
+        """
+        Returns all objects of the specified type that changed after serial
+
+        @param   obj_type: one of the ChangeIndex.OBJ_* object types
+        @param   view: ConfigSnapshot object; None for the server's configuration
+        @return: list of objects
+        """
+        return self._view_change_index(view).get_changed(obj_type, serial)
+
+    def _props_filter(self, obj_type, selected, filter_props, select_all,
+                      view=None):
+        """
+        Selects the objects that match filter_props
+
+        Uses the inverted property index of the change index if possible
+
+        @param   obj_type: one of the ChangeIndex.OBJ_* object types
+        @param   selected: iterable of the objects to select from
+        @param   select_all: True if selected contains all objects of the
+                 specified type
+        @param   view: ConfigSnapshot object; None for the server's configuration
+        @return: iterable of the selected objects
+        """
+        matches = self._view_change_index(view).find_props(obj_type, filter_props)
+        if matches is None:
+            selected = props_filter(selected, filter_props)
+        elif select_all:
+            selected = matches.values()
+        else:
+            match_set = set(matches.itervalues())
+            selected = [obj for obj in selected if obj in match_set]
+        return selected
+
     def get_occupied_minor_nrs(self):
         """
         Retrieves a list of occupied (in-use) minor numbers
 
+        Only minor numbers in the range that minor numbers are allocated
+        from are listed
+
         @return list of minor numbers that are currently in use
         """
-        minor_list = []
         try:
-            min_nr = int(self._conf[self.KEY_MIN_MINOR_NR])
-            for resource in self._resources.itervalues():
-                for vol in resource.iterate_volumes():
-                    minor_obj = vol.get_minor()
-                    nr_item = minor_obj.get_value()
-                    if nr_item >= min_nr and nr_item <= MinorNr.MINOR_NR_MAX:
-                        minor_list.append(nr_item)
+            allocator = self._get_minor_allocator()
         except ValueError:
-            minor_list = None
-        return minor_list
+            return None
+        min_nr, max_nr = allocator.get_range()
+        return [
+            nr_item for nr_item in allocator.get_allocated()
+            if nr_item >= min_nr and nr_item <= max_nr
+        ]
 
-    def get_free_minor_nr(self, occupied_list, update_next_number):
+    def get_free_minor_nr(self, update_next_number, excluded=None):
         """
         Retrieves a free (unused) minor number
 
@@ -7772,10 +8927,16 @@ class DrbdManageServer(object):
         that is unique across the drbdmanage cluster is allocated for each
         volume.
 
-        @return: next free minor number; or -1 on error
+        @param   update_next_number: save the number following the
+                 allocated one as the next potentially usable number
+        @param   excluded: collection of minor numbers that are unallocated,
+                 but must not be returned (e.g., because they have been
+                 selected for volumes that are not registered yet)
+        @return: next free minor number; or MinorNr.MINOR_NR_ERROR on error
         """
         try:
-            min_nr = int(self._conf[self.KEY_MIN_MINOR_NR])
+            allocator = self._get_minor_allocator()
+            min_nr = allocator.get_range()[0]
             minor_nr = min_nr
 
             # Get the next potentially usable number
@@ -7783,32 +8944,13 @@ class DrbdManageServer(object):
             if minor_nr_str is not None:
                 minor_nr = min(max(int(minor_nr_str), min_nr), MinorNr.MINOR_NR_MAX)
 
-            occupied_list_len = len(occupied_list)
-            if occupied_list_len > 0:
-                occupied_list = sorted(occupied_list)
-                chk_idx = bisect_left(occupied_list, minor_nr)
-                if chk_idx != occupied_list_len and occupied_list[chk_idx] == minor_nr:
-                    # Number is in use, recycle a free minor number
-                    #
-                    # Try finding a free number in the range of numbers
-                    # greater than the current minor number
-                    free_nr = get_free_number(
-                        minor_nr, MinorNr.MINOR_NR_MAX,
-                        occupied_list, nr_sorted=True
-                    )
-                    if free_nr == -1:
-                        # No free numbers in the high range, try finding a free
-                        # number in the range of numbers less than the current
-                        # minor number
-                        free_nr = get_free_number(
-                            min_nr, minor_nr,
-                            occupied_list, nr_sorted=True
-                        )
-                        if free_nr == -1:
-                            # All minor numbers are occupied
-                            raise ValueError
-                    # Use the free number as new minor number
-                    minor_nr = free_nr
+            # Use the next potentially usable number if it is unused,
+            # otherwise recycle a free minor number, searching the range of
+            # numbers greater than the current minor number first
+            minor_nr = allocator.get_free(minor_nr, excluded)
+            if minor_nr == -1:
+                # All minor numbers are occupied
+                raise ValueError
 
             # Save the next potentially usable number
             if update_next_number:
@@ -7827,13 +8969,7 @@ class DrbdManageServer(object):
 
         @return: True if the specified port number is unallocated, False otherwise
         """
-        is_free = True
-        for resource in self._resources.itervalues():
-            used_port = resource.get_port()
-            if port == used_port:
-                is_free = False
-                break
-        return is_free
+        return self._get_port_allocator().is_free(port)
 
 
     def is_free_minor_nr(self, minor):
@@ -7842,13 +8978,7 @@ class DrbdManageServer(object):
 
         @return: True if the specified minor number is unallocated, False otherwise
         """
-        is_free = True
-        used_minors = self.get_occupied_minor_nrs()
-        if len(used_minors) > 0:
-            used_minors = sorted(used_minors)
-            chk_index = bisect_left(used_minors, minor)
-            is_free = (chk_index >= len(used_minors) or used_minors[chk_index] != minor)
-        return is_free
+        return self._get_minor_allocator().is_free(minor)
 
 
     def get_free_port_nr(self):
@@ -7861,15 +8991,7 @@ class DrbdManageServer(object):
 
         @return: next free network port number; or -1 on error
         """
-        min_nr = int(self._conf[self.KEY_MIN_PORT_NR])
-        max_nr = int(self._conf[self.KEY_MAX_PORT_NR])
-
-        port_list = []
-        for resource in self._resources.itervalues():
-            nr_item = resource.get_port()
-            if nr_item >= min_nr and nr_item <= max_nr:
-                port_list.append(nr_item)
-        port = get_free_number(min_nr, max_nr, port_list)
+        port = self._get_port_allocator().get_free()
         if port == -1:
             port = RES_PORT_NR_ERROR
         return port
@@ -143,24 +143,22 @@ class DrbdSnapshot(drbdcommon.GenericDrbdObject):
             properties[consts.RES_NAME] = self._resource.get_name()
 
         # Add PropsContainer properties
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
 
         return properties
 
 
 class DrbdSnapshotAssignment(drbdcommon.GenericDrbdObject):
 
-    _snapshot         = None
-    _assignment       = None
-    _snaps_vol_states = None
-    _cstate           = 0
-    _tstate           = 0
-
-    # Signal for status change notifications
-    _signal           = None
+    __slots__ = (
+        "_snapshot",
+        "_assignment",
+        "_snaps_vol_states",
+        "_cstate",
+        "_tstate",
+        # Signal for status change notifications
+        "_signal",
+    )
 
     FLAG_DEPLOY = 1
 
@@ -178,6 +176,7 @@ class DrbdSnapshotAssignment(drbdcommon.GenericDrbdObject):
         self._cstate           = cstate
         self._tstate           = tstate
         self._snaps_vol_states = {}
+        self._signal           = None
 
 
     def add_snaps_vol_state(self, snaps_vol_state):
@@ -431,10 +430,7 @@ class DrbdSnapshotAssignment(drbdcommon.GenericDrbdObject):
             )
 
         # Add PropsContainer properties
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
 
         return properties
 
@@ -442,11 +438,14 @@ class DrbdSnapshotAssignment(drbdcommon.GenericDrbdObject):
 class DrbdSnapshotVolumeState(drbdcommon.GenericDrbdObject,
                               storagecommon.GenericStorage):
 
-    _vol_id  = None
-    _bd_path = None
-    _bd_name = None
-    _cstate  = 0
-    _tstate  = 0
+    __slots__ = (
+        "_vol_id",
+        "_size_kiB",
+        "_bd_path",
+        "_bd_name",
+        "_cstate",
+        "_tstate",
+    )
 
     FLAG_DEPLOY = 1
 
@@ -465,7 +464,9 @@ class DrbdSnapshotVolumeState(drbdcommon.GenericDrbdObject,
         storagecommon.GenericStorage.__init__(
             self, size_kiB
         )
-        self._vol_id = vol_id
+        self._vol_id  = vol_id
+        self._bd_name = None
+        self._bd_path = None
         if bd_name is not None and bd_path is not None:
             self._bd_name = bd_name
             self._bd_path = bd_path
@@ -613,9 +614,6 @@ class DrbdSnapshotVolumeState(drbdcommon.GenericDrbdObject,
             )
 
         # Add PropsContainer properties
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        self.add_props_properties(properties, req_props)
 
         return properties
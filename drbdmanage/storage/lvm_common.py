@@ -16,6 +16,9 @@ class LvmCommon(StoragePluginCommon, storcore.StoragePlugin):
 
     LVM_LVS_ENOENT = 5
 
+    # Maximum time (in seconds) to wait for udev to create a new LV's device node
+    DEV_SETTLE_TIMEOUT = 10
+
     def __init__(self):
         super(LvmCommon, self).__init__()
 
@@ -106,6 +109,20 @@ class LvmCommon(StoragePluginCommon, storcore.StoragePlugin):
             )
             raise StoragePluginException
 
+    def wait_lv_to_settle(self, devpath, plugin_name):
+        """
+        Waits for udev to create the device node of a new LV
+
+        @returns: True if the device node exists, False on timeout
+        """
+        settled = storcore.wait_for_blockdevice(devpath, LvmCommon.DEV_SETTLE_TIMEOUT)
+        if not settled:
+            logging.warning(
+                plugin_name + ": Device node '%s' did not exist after %d sec"
+                % (devpath, LvmCommon.DEV_SETTLE_TIMEOUT)
+            )
+        return settled
+
     def discard_fraction(self, text):
         """
         Discards the fraction part from a string representing a number
@@ -79,6 +79,10 @@ class LvmThinPool(lvmcom.LvmCommon):
     # Maximum number of retries
     MAX_RETRIES = 2
 
+    # Thin pool selection and creation is not thread-safe,
+    # see StoragePluginCommon.create_blockdevices()
+    MAX_CONCURRENT_CREATE = 1
+
     # Module configuration defaults
     CONF_DEFAULTS = {
         KEY_DEV_PATH: "/dev/",
@@ -202,6 +206,9 @@ class LvmThinPool(lvmcom.LvmCommon):
             lv_name = self.vol_name(name, vol_id)
             pool_name = ThinPool.generate_pool_name(name, vol_id)
 
+            # Finish the removal of a trashed volume with the same name
+            self.reclaim_pending(lv_name)
+
             # Check for collisions (very unlikely)
             pool_exists = self._check_vol_exists(pool_name)
             if not pool_exists:
@@ -808,7 +815,7 @@ class LvmThinPool(lvmcom.LvmCommon):
 
         # Serialize the block devices into the volumes map
         volumes_con = {}
-        for blockdev in save_volumes.itervalues():
+        for blockdev in save_volumes.values():
             bd_persist = storpers.BlockDevicePersistence(blockdev)
             bd_persist.save(volumes_con)
 
@@ -817,7 +824,7 @@ class LvmThinPool(lvmcom.LvmCommon):
 
         # Save the thin pools to the state map
         pools_con = {}
-        for thin_pool in save_pools.itervalues():
+        for thin_pool in save_pools.values():
             p_thin_pool = ThinPoolPersistence(thin_pool)
             p_thin_pool.save(pools_con)
         state_con["pools"] = pools_con
@@ -832,7 +839,7 @@ class LvmThinPool(lvmcom.LvmCommon):
                 self._conf[consts.KEY_VG_NAME]
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            lvm_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_create,
                 env=self._subproc_env, close_fds=True
@@ -846,6 +853,8 @@ class LvmThinPool(lvmcom.LvmCommon):
             raise StoragePluginException
 
         devpath = "/dev/" + self._conf[consts.KEY_VG_NAME] + "/" + lv_name
+        if lvm_rc == 0:
+            self.wait_lv_to_settle(devpath, "LvmThinPool")
         utils.wipefs(devpath)
 
     def _check_vol_exists(self, lv_name):
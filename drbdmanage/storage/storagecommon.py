@@ -4,7 +4,10 @@ import drbdmanage.utils
 
 class GenericStorage(object):
 
-    _size_kiB = None
+    # Subclasses provide _size_kiB, either as a slot or in their __dict__;
+    # the empty __slots__ allows combining this class with other slotted
+    # base classes
+    __slots__ = ()
 
 
     def __init__(self, size_kiB):
@@ -19,7 +19,15 @@
 """
 
 
+import ctypes
+import ctypes.util
+import errno
 import logging
+import os
+import select
+import stat
+import threading
+import time
 import drbdmanage.utils
 import drbdmanage.messagelog as msglog
 
@@ -32,6 +40,129 @@ from drbdmanage.exceptions import (
 )
 
 
+# inotify(7) event masks and flags
+IN_ATTRIB    = 0x00000004
+IN_MOVED_TO  = 0x00000080
+IN_CREATE    = 0x00000100
+IN_NONBLOCK  = 0o4000
+IN_CLOEXEC   = 0o2000000
+
+# Events that may indicate the creation of a device node or of a symlink
+# to a device node
+DEV_WATCH_MASK = IN_CREATE | IN_MOVED_TO | IN_ATTRIB
+
+# Maximum time (in seconds) between two checks for the device node, in case
+# an inotify event was missed
+DEV_RECHECK_INTERVAL = 1.0
+
+_libc = None
+
+
+def _inotify_init():
+    """
+    Creates a nonblocking inotify instance
+
+    @return: inotify file descriptor; -1 if inotify is not available
+    """
+    global _libc
+    inotify_fd = -1
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        inotify_fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        pass
+    return inotify_fd
+
+
+def _inotify_drain(inotify_fd):
+    """
+    Discards all pending events; only the fact that something changed matters
+    """
+    while True:
+        try:
+            if len(os.read(inotify_fd, 4096)) == 0:
+                break
+        except OSError:
+            # EAGAIN, no more events
+            break
+
+
+def _nearest_existing_dir(path):
+    """
+    Returns the nearest parent directory of path that exists
+    """
+    dir_path = os.path.dirname(path)
+    while dir_path != "/" and not os.path.isdir(dir_path):
+        dir_path = os.path.dirname(dir_path)
+    return dir_path
+
+
+def is_blockdevice(path):
+    """
+    Checks whether path is a block device node or a symlink to one
+    """
+    try:
+        return stat.S_ISBLK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def wait_for_blockdevice(path, timeout_s=45):
+    """
+    Waits until the block device node for path has been created by udev
+
+    Watches the nearest existing parent directory of path (e.g. /dev/zvol/<pool>
+    or /dev/<vg>) with inotify and returns as soon as the device node or its
+    symlink appears. Parent directories that do not exist yet are followed as
+    soon as they are created. If inotify is unavailable, the device node is
+    polled once per second.
+
+    @param   path: path of the device node, commonly a udev symlink
+    @type    path: str
+    @param   timeout_s: maximum time to wait in seconds
+    @return: True if the block device exists, False if the wait timed out
+    @rtype:  bool
+    """
+    deadline = time.time() + timeout_s
+    inotify_fd = _inotify_init()
+    try:
+        watch_dir = None
+        while True:
+            if inotify_fd != -1:
+                dir_path = _nearest_existing_dir(path)
+                if dir_path != watch_dir:
+                    # Watches on previous directories are kept; events from
+                    # there only cause an additional check
+                    watch_id = _libc.inotify_add_watch(
+                        inotify_fd, ctypes.c_char_p(dir_path),
+                        ctypes.c_uint32(DEV_WATCH_MASK)
+                    )
+                    if watch_id != -1:
+                        watch_dir = dir_path
+            # Check after adding the watch, so that no event is lost
+            if is_blockdevice(path):
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            wait_time = min(remaining, DEV_RECHECK_INTERVAL)
+            if inotify_fd != -1 and watch_dir is not None:
+                try:
+                    readable, _, _ = select.select([inotify_fd], [], [], wait_time)
+                    if readable:
+                        _inotify_drain(inotify_fd)
+                except select.error as sel_err:
+                    if sel_err.args[0] != errno.EINTR:
+                        raise
+            else:
+                time.sleep(wait_time)
+    finally:
+        if inotify_fd != -1:
+            os.close(inotify_fd)
+    return False
+
+
 class BlockDevice(GenericStorage):
     """
     Represents a block device
@@ -72,12 +203,28 @@ class BlockDeviceManager(object):
     _server = None
     _plugin = None
 
+    # Storage pool data cache, see get_pool()
+    _pool_lock    = None
+    # (pool_size, pool_free) of the last successful pool query
+    _pool_data    = None
+    # time.time() of the last successful pool query
+    _pool_time    = 0
+    # Set if the storage pool has changed since the last pool query
+    _pool_stale   = False
+    # Background thread running a pool query
+    _pool_refresh = None
+    # Serializes the storage plugin's pool queries, so that a synchronous
+    # query does not run at the same time as a background query
+    _query_lock   = None
+
 
     def __init__(self, server, plugin_name, plugin_mgr):
         """
         Creates a new instance of the BlockDeviceManager
         """
         self._server = server
+        self._pool_lock = threading.Lock()
+        self._query_lock = threading.Lock()
         self._plugin = plugin_mgr.get_plugin_instance(plugin_name)
         if self._plugin is None:
             log_message = (
@@ -87,6 +234,13 @@ class BlockDeviceManager(object):
             )
             logging.error(log_message)
             self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
+        else:
+            try:
+                self._plugin.start_reclaim(self._blockdevice_reclaimed)
+            except NotImplementedError:
+                # Plugin does not support deferred removal,
+                # trash_blockdevice() falls back to remove_blockdevice()
+                pass
 
 
     def get_blockdevice(self, bd_name):
@@ -190,6 +344,100 @@ class BlockDeviceManager(object):
         return fn_rc
 
 
+    def create_blockdevices(self, requests):
+        """
+        Allocates the block devices for multiple volumes of a resource
+
+        Either all block devices are allocated, or none of them; if the
+        allocation of any block device fails, those that were allocated
+        already are removed again.
+
+        @param   requests: list of (name, vol_id, size) tuples
+        @return: list of BlockDevice objects in the order of the requests;
+                 all entries are None if the allocation failed
+        """
+        blockdevs = [None] * len(requests)
+        if self._plugin is not None:
+            try:
+                blockdevs = self._plugin.create_blockdevices(requests)
+                status = "successful" if None not in blockdevs else "failed"
+                logging.debug(
+                    "BlockDeviceManager: create_blockdevices(%d volumes): %s"
+                    % (len(requests), status)
+                )
+            except NotImplementedError:
+                # Create the block devices one after another
+                for index, (name, vol_id, size) in enumerate(requests):
+                    blockdevs[index] = self.create_blockdevice(name, vol_id, size)
+                    if blockdevs[index] is None:
+                        break
+                if None in blockdevs:
+                    for index, blockdev in enumerate(blockdevs):
+                        if blockdev is not None:
+                            self.remove_blockdevice(blockdev.get_name())
+                            blockdevs[index] = None
+        else:
+            self._log_no_plugin()
+        return blockdevs
+
+
+    def trash_blockdevice(self, bd_name):
+        """
+        Marks a block device for deferred removal
+
+        The storage plugin reclaims the space in the background; the server
+        is asked to update the storage pool data once the removal is done.
+        Falls back to remove_blockdevice() if the plugin does not support
+        deferred removal.
+        """
+        fn_rc = DM_ESTORAGE
+        if self._plugin is not None:
+            blockdev = self.get_blockdevice(bd_name)
+            if blockdev is not None:
+                try:
+                    fn_rc = self._plugin.trash_blockdevice(blockdev)
+                    status = "successful" if fn_rc == DM_SUCCESS else "failed"
+                    logging.debug(
+                        "BlockDeviceManager: trash_blockdevice('%s'): "
+                        "%s fn_rc=%d"
+                        % (bd_name, status, fn_rc)
+                    )
+                except NotImplementedError:
+                    fn_rc = self.remove_blockdevice(bd_name)
+            else:
+                # Let remove_blockdevice() report the missing BlockDevice
+                fn_rc = self.remove_blockdevice(bd_name)
+        else:
+            self._log_no_plugin()
+        return fn_rc
+
+
+    def invalidate_inventory(self):
+        """
+        Discards any cached view of the storage backend's volumes
+
+        Called once per DrbdManager run, so that each run starts with
+        current information about the volumes that exist in the backend
+        """
+        if self._plugin is not None:
+            try:
+                self._plugin.invalidate_inventory()
+            except NotImplementedError:
+                pass
+
+
+    def _blockdevice_reclaimed(self, bd_name):
+        """
+        Called by the storage plugin's reclaim worker (not the main loop)
+        after a trashed block device has been removed
+        """
+        logging.debug(
+            "BlockDeviceManager: trashed block device '%s' reclaimed"
+            % (bd_name)
+        )
+        self.invalidate_pool(self._server.get_instance_node())
+
+
     def up_blockdevice(self, bd_name):
         """
         Activates a block device (e.g., connects an iSCSI resource)
@@ -362,15 +610,24 @@ class BlockDeviceManager(object):
     def update_pool(self, drbd_node):
         """
         Retrieves storage pool space information
+
+        Queries the storage plugin and updates the cached pool data. If a
+        background query is running, waits for it to complete before
+        querying the storage plugin.
         """
         fn_rc = DM_ESTORAGE
         pool_size = -1
         pool_free = -1
         if self._plugin is not None:
             try:
-                fn_rc, pool_size, pool_free = (
-                    self._plugin.update_pool(drbd_node)
-                )
+                with self._query_lock:
+                    with self._pool_lock:
+                        self._pool_stale = False
+                    fn_rc, pool_size, pool_free = (
+                        self._plugin.update_pool(drbd_node)
+                    )
+                    if fn_rc == DM_SUCCESS:
+                        self._set_pool_data(pool_size, pool_free)
             except NotImplementedError:
                 log_message = (
                     "BlockDeviceManager: The currently loaded storage "
@@ -384,10 +641,109 @@ class BlockDeviceManager(object):
         return fn_rc, pool_size, pool_free
 
 
+    def get_pool(self, drbd_node, max_age):
+        """
+        Retrieves storage pool space information from the cache
+
+        If there is no cached data yet, the storage plugin is queried
+        synchronously. If the cached data is older than max_age seconds or
+        the pool has changed since the data was retrieved, the cached data
+        is returned and a refresh is started in the background.
+
+        @param   drbd_node: the node the storage pool belongs to
+        @type    drbd_node: DrbdNode object
+        @param   max_age: maximum age (in seconds) of the cached data
+        @return: tuple (fn_rc, pool_size, pool_free)
+        """
+        with self._pool_lock:
+            pool_data = self._pool_data
+            expired = (
+                self._pool_stale or
+                time.time() - self._pool_time > max_age
+            )
+        if pool_data is None:
+            return self.update_pool(drbd_node)
+        if expired:
+            self.refresh_pool(drbd_node)
+        pool_size, pool_free = pool_data
+        return DM_SUCCESS, pool_size, pool_free
+
+
+    def invalidate_pool(self, drbd_node):
+        """
+        Marks the cached storage pool data as outdated and starts a refresh
+
+        Called after volumes have been created, resized or removed
+        """
+        with self._pool_lock:
+            self._pool_stale = True
+        self.refresh_pool(drbd_node)
+
+
+    def refresh_pool(self, drbd_node):
+        """
+        Queries the storage plugin for storage pool data in the background
+
+        If the pool data has changed once the query has completed, the
+        server is asked to check whether the node's pool data must be
+        updated. Does nothing if a refresh is already running.
+        """
+        if self._plugin is not None:
+            with self._pool_lock:
+                if self._pool_refresh is None:
+                    self._pool_refresh = threading.Thread(
+                        target=self._pool_refresh_worker,
+                        args=(drbd_node,),
+                        name="pool-refresh"
+                    )
+                    self._pool_refresh.daemon = True
+                    self._pool_refresh.start()
+
+
+    def _pool_refresh_worker(self, drbd_node):
+        """
+        Runs the storage plugin's pool query outside of the main loop
+        """
+        try:
+            with self._query_lock:
+                with self._pool_lock:
+                    prev_data = self._pool_data
+                    self._pool_stale = False
+                fn_rc, pool_size, pool_free = self._plugin.update_pool(drbd_node)
+                if fn_rc == DM_SUCCESS:
+                    self._set_pool_data(pool_size, pool_free)
+            if fn_rc == DM_SUCCESS:
+                if prev_data != (pool_size, pool_free):
+                    self._server.schedule_update_pool_check()
+            else:
+                logging.warning(
+                    "BlockDeviceManager: background storage pool query "
+                    "failed, fn_rc=%d" % (fn_rc)
+                )
+        except NotImplementedError:
+            pass
+        except Exception as unhandled_exc:
+            logging.error(
+                "BlockDeviceManager: background storage pool query failed, "
+                "unhandled exception: %s" % (str(unhandled_exc))
+            )
+        finally:
+            with self._pool_lock:
+                self._pool_refresh = None
+
+
+    def _set_pool_data(self, pool_size, pool_free):
+        with self._pool_lock:
+            self._pool_data = (pool_size, pool_free)
+            self._pool_time = time.time()
+
+
     def reconfigure(self):
         """
         Reconfigures the storage plugin
         """
+        with self._pool_lock:
+            self._pool_stale = True
         fn_rc = DM_ESTORAGE
         if self._plugin is not None:
             try:
@@ -577,6 +933,51 @@ class StoragePlugin(object):
         """
         raise NotImplementedError
 
+    def create_blockdevices(self, requests):
+        """
+        Allocates the block devices for multiple volumes
+
+        Either all block devices are allocated, or none of them.
+
+        @param   requests: list of (name, vol_id, size) tuples
+        @type    requests: list
+        @return: block devices in the order of the requests
+        @rtype:  list of BlockDevice objects; None if the allocation fails
+        """
+        raise NotImplementedError
+
+    def trash_blockdevice(self, blockdevice):
+        """
+        Marks a block device for deferred removal
+
+        The block device is removed in the background by the worker started
+        with start_reclaim().
+
+        @param   blockdevice: the block device to deallocate
+        @type    blockdevice: BlockDevice object
+        @return: standard return code (see drbdmanage.exceptions)
+        """
+        raise NotImplementedError
+
+    def start_reclaim(self, reclaim_handler=None):
+        """
+        Starts the background removal of trashed block devices
+
+        @param   reclaim_handler: called with the block device name whenever
+                 a trashed block device has been removed
+        @type    reclaim_handler: callable
+        """
+        raise NotImplementedError
+
+    def invalidate_inventory(self):
+        """
+        Discards the plugin's cached list of the volumes in the backend
+
+        Plugins that cache the results of listing the backend's volumes
+        must reload them on the next access.
+        """
+        raise NotImplementedError
+
     def up_blockdevice(self, blockdevice):
         """
         Activates a block device (e.g., connects an iSCSI resource)
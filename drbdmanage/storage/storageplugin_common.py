@@ -20,7 +20,10 @@
 import errno
 import json
 import logging
+import os
+import threading
 import time
+import Queue
 import drbdmanage.exceptions as exc
 import drbdmanage.storage.storagecore as storcore
 import drbdmanage.storage.persistence as storpers
@@ -61,8 +64,32 @@ class StoragePluginCommon(object):
     # Traits map, str = str key/value pairs
     traits = None
 
+    # Volumes pending removal (trash), name = BlockDevice object
+    _trash = None
+    # Names of trashed volumes that are being removed right now
+    _trash_busy = None
+    # Protects _trash and _trash_busy, signals completed removals
+    _trash_cond = None
+    # Names of trashed volumes queued for the reclaim worker
+    _trash_queue = None
+    # Background thread that removes trashed volumes
+    _reclaim_thread = None
+    # Called with the volume name after a trashed volume was removed
+    _reclaim_handler = None
+    # Serializes writes to the state file
+    _state_lock = None
+
+    # Maximum number of block devices that create_blockdevices() creates
+    # concurrently; 1 creates the block devices one after another
+    MAX_CONCURRENT_CREATE = 8
+
     def __init__(self):
         self.traits = {}
+        self._trash = {}
+        self._trash_busy = set()
+        self._trash_cond = threading.Condition()
+        self._trash_queue = Queue.Queue()
+        self._state_lock = threading.RLock()
 
     def _deserialize(self, data):
         """
@@ -172,7 +199,9 @@ class StoragePluginCommon(object):
 
     def _serialize(self, save_objects):
         save_bd_properties = {}
-        for blockdev in save_objects.itervalues():
+        # values() copies the list of objects, the reclaim worker may
+        # modify the map concurrently
+        for blockdev in save_objects.values():
             bd_persist = storpers.BlockDevicePersistence(blockdev)
             bd_persist.save(save_bd_properties)
         return save_bd_properties
@@ -185,6 +214,7 @@ class StoragePluginCommon(object):
         state_filename = self.STATEFILE
         plugin_name = self.NAME
 
+        self._state_lock.acquire()
         try:
             save_bd_properties = self._serialize(save_objects)
             try:
@@ -224,6 +254,7 @@ class StoragePluginCommon(object):
         finally:
             if state_file is not None:
                 state_file.close()
+            self._state_lock.release()
 
     def get_blockdevice(self, bd_name):
         """
@@ -259,6 +290,9 @@ class StoragePluginCommon(object):
         vol_name = self.vol_name(name, vol_id)
 
         try:
+            # Finish the removal of a trashed volume with the same name
+            self.reclaim_pending(vol_name)
+
             # Remove any existing vol
             tries = 0
             # Check whether an vol with that name exists already
@@ -380,6 +414,59 @@ class StoragePluginCommon(object):
 
         return blockdev
 
+    def create_blockdevices(self, requests):
+        """
+        Allocates the block devices for multiple volumes
+
+        Up to MAX_CONCURRENT_CREATE block devices are created concurrently.
+        If the allocation of any of the block devices fails, the block
+        devices that were allocated successfully are removed again.
+
+        @param   requests: list of (name, vol_id, size) tuples, see
+                 create_blockdevice()
+        @type    requests: list
+        @return: block devices in the order of the requests
+        @rtype:  list of BlockDevice objects; None if the allocation fails
+        """
+        blockdevs = [None] * len(requests)
+
+        def create_worker(index, name, vol_id, size):
+            blockdevs[index] = self.create_blockdevice(name, vol_id, size)
+
+        max_concurrent = max(1, self.MAX_CONCURRENT_CREATE)
+        for start in xrange(0, len(requests), max_concurrent):
+            batch = requests[start:start + max_concurrent]
+            if len(batch) == 1:
+                name, vol_id, size = batch[0]
+                create_worker(start, name, vol_id, size)
+            else:
+                workers = []
+                for offset, (name, vol_id, size) in enumerate(batch):
+                    worker = threading.Thread(
+                        target=create_worker,
+                        args=(start + offset, name, vol_id, size),
+                        name="%s-create-%s" % (self.NAME, self.vol_name(name, vol_id))
+                    )
+                    worker.start()
+                    workers.append(worker)
+                for worker in workers:
+                    worker.join()
+            if None in blockdevs[start:start + len(batch)]:
+                break
+
+        if None in blockdevs:
+            # Roll back the allocations that succeeded
+            for index, blockdev in enumerate(blockdevs):
+                if blockdev is not None:
+                    logging.warning(
+                        "%s: Removing volume '%s', allocation of other "
+                        "volumes of the same resource failed"
+                        % (self.NAME, blockdev.get_name())
+                    )
+                    self.remove_blockdevice(blockdev)
+                    blockdevs[index] = None
+        return blockdevs
+
     def remove_blockdevice(self, blockdevice):
         """
         Deallocates a block device
@@ -457,6 +544,184 @@ class StoragePluginCommon(object):
 
         return fn_rc
 
+    def trash_blockdevice(self, blockdevice):
+        """
+        Marks a block device for deferred removal
+
+        The block device is queued for removal by the reclaim worker and
+        this function returns immediately. The list of trashed volumes is
+        saved, so that removals that have not completed are resumed when the
+        reclaim worker is started again. If the reclaim worker is not running,
+        the block device is removed synchronously.
+
+        @param   blockdevice: the block device to deallocate
+        @type    blockdevice: BlockDevice object
+        @return: standard return code (see drbdmanage.exceptions)
+        """
+        if self._reclaim_thread is None:
+            return self.remove_blockdevice(blockdevice)
+
+        fn_rc = exc.DM_ESTORAGE
+        vol_name = blockdevice.get_name()
+        if self._volumes.get(vol_name) is not None:
+            self._trash_cond.acquire()
+            try:
+                if vol_name not in self._trash and vol_name not in self._trash_busy:
+                    self._trash[vol_name] = blockdevice
+                    self._save_trash()
+                    self._trash_queue.put(vol_name)
+            finally:
+                self._trash_cond.release()
+            fn_rc = exc.DM_SUCCESS
+        else:
+            logging.error(
+                "%s: vol '%s' is unknown to drbdmanage's storage subsystem. "
+                "Aborting removal." % (self.NAME, vol_name)
+            )
+        return fn_rc
+
+    def start_reclaim(self, reclaim_handler=None):
+        """
+        Starts the background worker that removes trashed block devices
+
+        Volumes that were still trashed when the worker stopped are
+        queued for removal again.
+
+        @param   reclaim_handler: called with the volume name whenever the
+                 removal of a trashed volume has completed
+        @type    reclaim_handler: callable
+        """
+        self._trash_cond.acquire()
+        try:
+            self._reclaim_handler = reclaim_handler
+            if self._reclaim_thread is None:
+                for vol_name in self._load_trash():
+                    blockdev = self._volumes.get(vol_name)
+                    if blockdev is not None and vol_name not in self._trash:
+                        self._trash[vol_name] = blockdev
+                        self._trash_queue.put(vol_name)
+                self._reclaim_thread = threading.Thread(
+                    target=self._reclaim_worker,
+                    name="%s-reclaim" % (self.NAME)
+                )
+                self._reclaim_thread.daemon = True
+                self._reclaim_thread.start()
+        finally:
+            self._trash_cond.release()
+
+    def reclaim_pending(self, vol_name):
+        """
+        Completes the removal of a trashed volume, so that its name can be reused
+
+        Waits for the reclaim worker if it is removing the volume right now,
+        otherwise removes the volume synchronously.
+        """
+        blockdev = None
+        self._trash_cond.acquire()
+        try:
+            while vol_name in self._trash_busy:
+                self._trash_cond.wait()
+            blockdev = self._trash.pop(vol_name, None)
+            if blockdev is not None:
+                self._trash_busy.add(vol_name)
+        finally:
+            self._trash_cond.release()
+        if blockdev is not None:
+            fn_rc = self.remove_blockdevice(blockdev)
+            self._release_trash(vol_name, blockdev, fn_rc == exc.DM_SUCCESS)
+
+    def _reclaim_worker(self):
+        while True:
+            vol_name = self._trash_queue.get()
+            blockdev = None
+            self._trash_cond.acquire()
+            try:
+                blockdev = self._trash.pop(vol_name, None)
+                if blockdev is not None:
+                    self._trash_busy.add(vol_name)
+            finally:
+                self._trash_cond.release()
+            if blockdev is None:
+                # Already reclaimed by reclaim_pending()
+                continue
+
+            fn_rc = exc.DM_ESTORAGE
+            try:
+                fn_rc = self.remove_blockdevice(blockdev)
+            except Exception as unhandled_exc:
+                logging.error(
+                    "%s: Removal of trashed vol '%s' failed, "
+                    "unhandled exception: %s"
+                    % (self.NAME, vol_name, str(unhandled_exc))
+                )
+            removed = (fn_rc == exc.DM_SUCCESS)
+            self._release_trash(vol_name, blockdev, removed)
+
+            reclaim_handler = self._reclaim_handler
+            if removed and reclaim_handler is not None:
+                try:
+                    reclaim_handler(vol_name)
+                except Exception as unhandled_exc:
+                    logging.error(
+                        "%s: Reclaim handler failed, unhandled exception: %s"
+                        % (self.NAME, str(unhandled_exc))
+                    )
+
+    def _release_trash(self, vol_name, blockdev, removed):
+        self._trash_cond.acquire()
+        try:
+            self._trash_busy.discard(vol_name)
+            if not removed:
+                # Keep the volume in the trash; the removal is retried when
+                # the name is reused or when the reclaim worker is restarted
+                self._trash[vol_name] = blockdev
+                logging.warning(
+                    "%s: Removal of trashed vol '%s' failed, keeping it in the trash"
+                    % (self.NAME, vol_name)
+                )
+            self._save_trash()
+            self._trash_cond.notify_all()
+        finally:
+            self._trash_cond.release()
+
+    def _trash_filename(self):
+        return os.path.splitext(self.STATEFILE)[0] + ".trash.json"
+
+    def _load_trash(self):
+        trash_names = []
+        trash_filename = self._trash_filename()
+        try:
+            with open(trash_filename, "r") as trash_file:
+                trash_names = json.load(trash_file)
+        except IOError as io_err:
+            if io_err.errno != errno.ENOENT:
+                logging.warning(
+                    "%s: Loading the trash file '%s' failed, "
+                    "error message from the OS: %s"
+                    % (self.NAME, trash_filename, io_err.strerror)
+                )
+        except ValueError:
+            logging.warning(
+                "%s: Data in trash file '%s' is corrupt, ignoring it"
+                % (self.NAME, trash_filename)
+            )
+        return trash_names
+
+    def _save_trash(self):
+        # Caller must hold _trash_cond
+        trash_filename = self._trash_filename()
+        trash_names = sorted(set(self._trash.keys()) | self._trash_busy)
+        try:
+            with open(trash_filename, "w") as trash_file:
+                json.dump(trash_names, trash_file)
+                trash_file.write("\n")
+        except (IOError, OSError) as os_err:
+            logging.error(
+                "%s: Saving to the trash file '%s' failed, "
+                "error message from the OS: %s"
+                % (self.NAME, trash_filename, str(os_err))
+            )
+
     def extend_blockdevice(self, blockdevice, size):
         """
         Deallocates a block device
@@ -680,6 +945,7 @@ class StoragePluginCommon(object):
 
         try:
             vol_name = self.vol_name(restore_name, vol_id)
+            self.reclaim_pending(vol_name)
 
             blockdev = self._restore_snapshot(vol_name, source_blockdev)
         except NotImplementedError:
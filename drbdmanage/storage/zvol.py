@@ -21,8 +21,7 @@
 import os
 import logging
 import subprocess
-import time
-import stat
+import threading
 import drbdmanage.storage.storagecore as storcore
 from drbdmanage.storage.storageplugin_common import (
     StoragePluginCommon, StoragePluginException, StoragePluginCheckFailedException)
@@ -90,7 +89,11 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
     _cmd_list = None
     _subproc_env = None
 
+    # Index of the datasets in the pool, see ZfsInventory
+    _inventory = None
+
     def __init__(self, server):
+        self._inventory = ZfsInventory()
         super(Zvol, self).__init__()
         self.traits[storcore.StoragePlugin.KEY_PROV_TYPE] = storcore.StoragePlugin.PROV_TYPE_FAT
         self.reconfigure()
@@ -129,6 +132,7 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
 
             # Load the saved state
             self._volumes = self.load_state()
+            self._inventory.invalidate()
         except exc.PersistenceException as pers_exc:
             logging.warning(
                 "Zvol plugin: Cannot load state file '%s'"
@@ -148,52 +152,88 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
         pool_size = -1
         pool_free = -1
 
-        zpool_proc = None
+        try:
+            # Pool accounting always reloads the inventory, which also
+            # picks up any changes made outside of drbdmanage
+            self._inventory.invalidate()
+            pool_entry = self._get_inventory().get(self._conf[consts.KEY_VG_NAME])
+            if pool_entry is not None:
+                pool_avail = pool_entry[ZfsInventory.AVAIL]
+                pool_used = pool_entry[ZfsInventory.USED]
+                if pool_avail != -1 and pool_used != -1:
+                    pool_size = (pool_avail + pool_used) / 1024
+                    pool_free = pool_avail / 1024
+                    fn_rc = exc.DM_SUCCESS
+        except StoragePluginCheckFailedException:
+            # Reported by _get_inventory()
+            pass
+        except Exception as unhandled_exc:
+            logging.error(
+                "Zvol: Retrieving storage pool information failed, "
+                "unhandled exception: %s"
+                % (str(unhandled_exc))
+            )
+
+        return (fn_rc, pool_size, pool_free)
+
+    def invalidate_inventory(self):
+        """
+        Discards the dataset inventory; it is reloaded when it is needed next
+        """
+        self._inventory.invalidate()
+
+    def _get_inventory(self):
+        """
+        Returns the dataset inventory, loading it if required
+
+        A single 'zfs list' retrieves all volumes and snapshots in the pool.
+        The plugin's own operations keep the inventory up to date, any
+        failed zfs command invalidates it.
+        """
+        if not self._inventory.is_loaded():
+            self._load_inventory()
+        return self._inventory
+
+    def _load_inventory(self):
+        zfs_proc = None
         try:
             exec_args = [
-                self._cmd_vgs, 'get', '-H', '-p', 'available,used',
+                self._cmd_list, self.ZVOL_LIST, '-H', '-p', '-r',
+                '-t', 'filesystem,volume,snapshot',
+                '-o', ','.join(ZfsInventory.LIST_FIELDS),
                 self._conf[consts.KEY_VG_NAME]
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            zpool_proc = subprocess.Popen(
+            zfs_proc = subprocess.Popen(
                 exec_args,
+                0, self._cmd_list,
                 env=self._subproc_env, stdout=subprocess.PIPE,
                 close_fds=True
             )
-
-            # output should be sorted, but just to be sure
-            for i in range(2):
-                pool_data = zpool_proc.stdout.readline()
-                if len(pool_data) > 0:
-                    pool_data = pool_data.strip().split()
-                    if pool_data[1].strip() == 'available':
-                        pool_free = long(pool_data[2].strip())
-                    elif pool_data[1].strip() == 'used':
-                        pool_used = long(pool_data[2].strip())
-
-            if pool_used == -1 or pool_free == -1:
-                pool_size, pool_free = -1, -1
-            else:
-                pool_size = pool_free + pool_used
-                pool_size /= 1024
-                pool_free /= 1024
-                fn_rc = exc.DM_SUCCESS
-
-        except Exception as unhandled_exc:
+            list_data = zfs_proc.stdout.read()
+            zfs_proc.stdout.close()
+            zfs_rc = zfs_proc.wait()
+            zfs_proc = None
+            if zfs_rc != 0:
+                logging.error(
+                    "%s: Unable to retrieve the list of existing Zvols, "
+                    "'%s' exited with exit code %d"
+                    % (self.NAME, self._cmd_list, zfs_rc)
+                )
+                raise StoragePluginCheckFailedException
+            self._inventory.load(list_data.splitlines())
+        except OSError:
             logging.error(
-                "Zvol: Retrieving storage pool information failed, "
-                "unhandled exception: %s"
-                % (str(unhandled_exc))
+                "%s: Unable to retrieve the list of existing Zvols" % (self.NAME)
             )
+            raise StoragePluginCheckFailedException
         finally:
-            if zpool_proc is not None:
+            if zfs_proc is not None:
                 try:
-                    zpool_proc.stdout.close()
+                    zfs_proc.stdout.close()
                 except Exception:
                     pass
-                zpool_proc.wait()
-
-        return (fn_rc, pool_size, pool_free)
+                zfs_proc.wait()
 
     def _roundup_k(self, size_k, mult_of_str=consts.DEFAULT_BLOCKSIZE):
         units = {
@@ -234,21 +274,9 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
         return final_size, bs
 
     def _wait_dev_to_settle(self, path, retries_s=45):
-        # currently we saw that for zfs, if we need that for other LVMs, move to storagecore
         # give udev some time to create the device
-        retries = 0
-        while True:
-            try:
-                mode = os.stat(path).st_mode
-                if stat.S_ISBLK(mode):
-                    return True
-            except:
-                pass
-
-            retries += 1
-            if retries >= retries_s:
-                break
-            time.sleep(1)
+        if storcore.wait_for_blockdevice(path, retries_s):
+            return True
 
         logging.error(
             "%s: LV creation failed, %s did not exist after %d sec" % (self.NAME, path, retries_s)
@@ -273,9 +301,12 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
             )
             zfs_rc = zfs_proc.wait()
             if zfs_rc == 0:
+                self._inventory.add(zfs_vol_name, volsize=size * 1024)
                 path = os.path.join(self._conf[self.KEY_DEV_PATH], zfs_vol_name)
                 if not self._wait_dev_to_settle(path):
                     raise StoragePluginException
+            else:
+                self._inventory.invalidate()
 
         except OSError as os_err:
             logging.error(
@@ -301,6 +332,9 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
             )
             if proc_rc == 0:
                 status = True
+                self._inventory.set_volsize(
+                    utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name), size * 1024
+                )
         except OSError as os_err:
             logging.error(
                 self.NAME + ": vol extension failed, unable to run "
@@ -310,36 +344,28 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
         return status
 
     def _remove_vol(self, vol_name):
-        origin_data = []
+        zfs_vol_name = utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
+        origin = None
         try:
-            exec_args = [
-                self._cmd_vgs, 'get', '-H', '-p', 'origin',
-                utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
-            ]
-            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            zpool_proc = subprocess.Popen(
-                exec_args,
-                env=self._subproc_env, stdout=subprocess.PIPE,
-                close_fds=True
-            )
-
-            origin_data = zpool_proc.stdout.readline()
-            origin_data = origin_data.strip().split()
-
-        except:
+            origin = self._get_inventory().get_origin(zfs_vol_name)
+        except StoragePluginCheckFailedException:
             pass
 
         try:
             exec_args = [
-                self._cmd_remove, self.ZVOL_REMOVE, '-R',
-                utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
+                self._cmd_remove, self.ZVOL_REMOVE, '-R', zfs_vol_name
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            zfs_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_remove,
                 env=self._subproc_env, close_fds=True
             )
+            if zfs_rc == 0:
+                # destroy -R also removes all snapshots and clones
+                self._inventory.remove(zfs_vol_name, recursive=True)
+            else:
+                self._inventory.invalidate()
         except OSError as os_err:
             logging.error(
                 "Zvol: LV remove failed, unable to run "
@@ -349,45 +375,28 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
             raise StoragePluginException
 
         try:
-            if len(origin_data) == 4:
+            if origin is not None:
                 # rm origin
                 exec_args = [
-                    self._cmd_remove, self.ZVOL_REMOVE, origin_data[2]
+                    self._cmd_remove, self.ZVOL_REMOVE, origin
                 ]
                 utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-                subprocess.call(
+                zfs_rc = subprocess.call(
                     exec_args,
                     0, self._cmd_remove,
                     env=self._subproc_env, close_fds=True
                 )
+                if zfs_rc == 0:
+                    self._inventory.remove(origin)
+                else:
+                    self._inventory.invalidate()
         except:
             pass
 
     def _check_vol_exists(self, vol_name):
-        exists = False
-
-        try:
-            exec_args = [
-                self._cmd_list, self.ZVOL_LIST,
-                utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
-            ]
-            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            zfs_proc = subprocess.Popen(
-                exec_args,
-                0, self._cmd_list,
-                env=self._subproc_env,
-                close_fds=True
-            )
-            zfs_rc = zfs_proc.wait()
-            if zfs_rc == 0:
-                exists = True
-        except OSError:
-            logging.error(
-                "Zvol: Unable to retrieve the list of existing Zvols"
-            )
-            raise StoragePluginCheckFailedException
-
-        return exists
+        return self._get_inventory().contains(
+            utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
+        )
 
     # SNAPSHOTTING
     def _create_snapshot_impl(self, snaps_name, lv_name):
@@ -398,15 +407,20 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
                 zfs_snap_name
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            zfs_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_create,
                 env=self._subproc_env, close_fds=True
             )
+            if zfs_rc == 0:
+                self._inventory.add(zfs_snap_name)
+            else:
+                self._inventory.invalidate()
 
+            zfs_clone_name = utils.build_path(self._conf[consts.KEY_VG_NAME], snaps_name)
             exec_args = [
                 self._cmd_create, self.ZVOL_SNAP_CLONE, zfs_snap_name,
-                utils.build_path(self._conf[consts.KEY_VG_NAME], snaps_name)
+                zfs_clone_name
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
             zfs_proc = subprocess.Popen(
@@ -416,10 +430,12 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
             )
             zfs_rc = zfs_proc.wait()
             if zfs_rc == 0:
-                path = os.path.join(self._conf[self.KEY_DEV_PATH],
-                                    utils.build_path(self._conf[consts.KEY_VG_NAME], snaps_name))
+                self._inventory.add(zfs_clone_name, origin=zfs_snap_name)
+                path = os.path.join(self._conf[self.KEY_DEV_PATH], zfs_clone_name)
                 if not self._wait_dev_to_settle(path):
                     raise StoragePluginException
+            else:
+                self._inventory.invalidate()
         except OSError as os_err:
             logging.error(
                 "Zvol: Snapshot creation failed, unable to run "
@@ -434,3 +450,132 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
     def _remove_snapshot(self, blockdevice):
         # actually unused, see remove_snapshot in storagecore
         return self.remove_blockdevice(blockdevice)
+
+
+class ZfsInventory(object):
+
+    """
+    Index of the datasets in a zfs pool
+
+    Maps dataset names to their properties and origin snapshots to the
+    clones that were created from them. Loaded from the output of a single
+    'zfs list' and updated incrementally by the storage plugin. May be
+    accessed by the plugin's reclaim worker thread concurrently.
+    """
+
+    # Columns requested from 'zfs list -o'
+    LIST_FIELDS = ["name", "origin", "volsize", "used", "avail"]
+
+    # Keys of the dataset entries
+    ORIGIN  = "origin"
+    VOLSIZE = "volsize"
+    USED    = "used"
+    AVAIL   = "avail"
+
+    # name = dict of properties; None if the inventory is not loaded
+    _datasets = None
+    # origin snapshot name = set of clone names
+    _clones = None
+    _lock = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._datasets = None
+        self._clones = {}
+
+    def is_loaded(self):
+        return self._datasets is not None
+
+    def invalidate(self):
+        with self._lock:
+            self._datasets = None
+            self._clones = {}
+
+    def load(self, lines):
+        """
+        Rebuilds the inventory from 'zfs list -H -p' output lines
+        """
+        with self._lock:
+            self._datasets = {}
+            self._clones = {}
+            for line in lines:
+                fields = line.split("\t")
+                if len(fields) == len(ZfsInventory.LIST_FIELDS):
+                    name, origin, volsize, used, avail = fields
+                    self._add(
+                        name, None if origin == "-" else origin,
+                        self._parse_number(volsize), self._parse_number(used),
+                        self._parse_number(avail)
+                    )
+
+    def add(self, name, origin=None, volsize=-1):
+        with self._lock:
+            if self._datasets is not None:
+                self._add(name, origin, volsize, -1, -1)
+
+    def remove(self, name, recursive=False):
+        """
+        Removes a dataset; if recursive is set, its snapshots and their
+        clones are removed as well (like 'zfs destroy -R')
+        """
+        with self._lock:
+            if self._datasets is None:
+                return
+            remove_names = [name]
+            while len(remove_names) > 0:
+                rm_name = remove_names.pop()
+                entry = self._datasets.pop(rm_name, None)
+                if entry is not None and entry[ZfsInventory.ORIGIN] is not None:
+                    clone_set = self._clones.get(entry[ZfsInventory.ORIGIN])
+                    if clone_set is not None:
+                        clone_set.discard(rm_name)
+                if recursive:
+                    remove_names.extend(self._clones.pop(rm_name, []))
+                    snaps_prefix = rm_name + "@"
+                    remove_names.extend(
+                        [ds_name for ds_name in self._datasets.iterkeys()
+                         if ds_name.startswith(snaps_prefix)]
+                    )
+
+    def set_volsize(self, name, volsize):
+        with self._lock:
+            if self._datasets is not None:
+                entry = self._datasets.get(name)
+                if entry is not None:
+                    entry[ZfsInventory.VOLSIZE] = volsize
+
+    def contains(self, name):
+        with self._lock:
+            return self._datasets is not None and name in self._datasets
+
+    def get(self, name):
+        with self._lock:
+            entry = None
+            if self._datasets is not None:
+                entry = self._datasets.get(name)
+            return entry
+
+    def get_origin(self, name):
+        entry = self.get(name)
+        return entry[ZfsInventory.ORIGIN] if entry is not None else None
+
+    def get_clones(self, origin):
+        with self._lock:
+            return list(self._clones.get(origin, []))
+
+    def _add(self, name, origin, volsize, used, avail):
+        self._datasets[name] = {
+            ZfsInventory.ORIGIN:  origin,
+            ZfsInventory.VOLSIZE: volsize,
+            ZfsInventory.USED:    used,
+            ZfsInventory.AVAIL:   avail
+        }
+        if origin is not None:
+            self._clones.setdefault(origin, set()).add(name)
+
+    @classmethod
+    def _parse_number(cls, text):
+        try:
+            return long(text)
+        except ValueError:
+            return -1
@@ -22,8 +22,7 @@ import os
 import logging
 import subprocess
 import drbdmanage.storage.storagecore as storcore
-from drbdmanage.storage.storageplugin_common import (
-    StoragePluginException, StoragePluginCheckFailedException)
+from drbdmanage.storage.storageplugin_common import StoragePluginException
 from drbdmanage.storage.zvol import Zvol
 
 import drbdmanage.consts as consts
@@ -128,6 +127,7 @@ class Zvol2(Zvol):
 
             # Load the saved state
             self._volumes = self.load_state()
+            self._inventory.invalidate()
         except exc.PersistenceException as pers_exc:
             logging.warning(
                 "Zvol2 plugin: Cannot load state file '%s'"
@@ -154,16 +154,20 @@ class Zvol2(Zvol):
             vol_name = self._vol_name_to_snapshot(vol_name)
 
         try:
+            zfs_vol_name = utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
             exec_args = [
-                self._cmd_remove, self.ZVOL_REMOVE,
-                utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
+                self._cmd_remove, self.ZVOL_REMOVE, zfs_vol_name
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            zfs_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_remove,
                 env=self._subproc_env, close_fds=True
             )
+            if zfs_rc == 0:
+                self._inventory.remove(zfs_vol_name)
+            else:
+                self._inventory.invalidate()
         except OSError as os_err:
             logging.error(
                 "Zvol2: LV remove failed, unable to run "
@@ -173,32 +177,11 @@ class Zvol2(Zvol):
             raise StoragePluginException
 
     def _check_vol_exists(self, vol_name):
-        exists = False
-
-        try:
-            exec_args = [self._cmd_list, self.ZVOL_LIST]
-            if '.' in vol_name:
-                vol_name = self._vol_name_to_snapshot(vol_name)
-                exec_args += ['-t', 'snapshot']
-
-            exec_args.append(utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name))
-            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            zfs_proc = subprocess.Popen(
-                exec_args,
-                0, self._cmd_list,
-                env=self._subproc_env,
-                close_fds=True
-            )
-            zfs_rc = zfs_proc.wait()
-            if zfs_rc == 0:
-                exists = True
-        except OSError:
-            logging.error(
-                "Zvol2: Unable to retrieve the list of existing Zvols"
-            )
-            raise StoragePluginCheckFailedException
-
-        return exists
+        if '.' in vol_name:
+            vol_name = self._vol_name_to_snapshot(vol_name)
+        return self._get_inventory().contains(
+            utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
+        )
 
     # SNAPSHOTTING
     def _create_snapshot_impl(self, snaps_name, lv_name):
@@ -209,11 +192,15 @@ class Zvol2(Zvol):
                 zfs_snap_name
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            zfs_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_create,
                 env=self._subproc_env, close_fds=True
             )
+            if zfs_rc == 0:
+                self._inventory.add(zfs_snap_name)
+            else:
+                self._inventory.invalidate()
         except OSError as os_err:
             logging.error(
                 "Zvol2: Snapshot creation failed, unable to run "
@@ -243,10 +230,13 @@ class Zvol2(Zvol):
             )
             zfs_rc = zfs_proc.wait()
             if zfs_rc == 0:
+                self._inventory.add(new_vol, origin=zfs_snap_name)
                 path = os.path.join(self._conf[self.KEY_DEV_PATH],
                                     new_vol)
                 if not self._wait_dev_to_settle(path):
                     raise StoragePluginException
+            else:
+                self._inventory.invalidate()
         except OSError as os_err:
             logging.error(
                 "Zvol: Snapshot creation failed, unable to run "
@@ -22,8 +22,11 @@
 Generalized utility functions and classes for drbdmanage
 """
 
+import bisect
 import dbus
 import errno
+import heapq
+import math
 import os
 import sys
 import hashlib
@@ -40,11 +43,14 @@ import locale
 import pickle
 import copy_reg
 import ConfigParser
+import StringIO
 from functools import wraps
+from drbdmanage.metrics import timed, GROUP_COMMAND
 from drbdmanage.exceptions import SyntaxException, InvalidNameException, EventException
 from drbdmanage.consts import (
     SERVER_CONFFILE, PLUGIN_PREFIX, KEY_DRBD_CONFPATH, KEY_DRBDCTRL_VG,
-    KEY_SAT_CFG_ROLE, KEY_COLORS, KEY_UTF8, RES_NAME, SNAPS_NAME, NODE_NAME,
+    KEY_SAT_CFG_ROLE, KEY_COLORS, KEY_UTF8, KEY_RPC_SOCKET, KEY_METRICS_FILE,
+    KEY_METRICS_INTERVAL, RES_NAME, SNAPS_NAME, NODE_NAME,
     KEY_LOGLEVEL, NODE_NAME_MINLEN, NODE_NAME_MAXLEN, NODE_NAME_LABEL_MAXLEN,
     RES_NAME_MINLEN, RES_NAME_MAXLEN, SNAPS_NAME_MINLEN, SNAPS_NAME_MAXLEN,
     RES_NAME_VALID_CHARS, SNAPS_NAME_VALID_CHARS, RES_NAME_VALID_INNER_CHARS,
@@ -492,7 +498,9 @@ def check_name(name, min_length, max_length, valid_chars, valid_inner_chars):
         idx += 1
     if not alpha:
         raise InvalidNameException
-    checked_name = str(name_b)
+    # Names are repeated in every object that refers to the named object;
+    # interning lets those references share a single string
+    checked_name = intern(str(name_b))
     return checked_name
 
 
@@ -524,7 +532,7 @@ def check_node_name(name):
                 if not (letter == ord('.') or letter == ord('-')):
                     raise InvalidNameException
         idx += 1
-    checked_name = str(name_b)
+    checked_name = intern(str(name_b))
     return checked_name
 
 
@@ -598,7 +606,10 @@ def load_server_conf_file(localonly=False):
                                                                        KEY_SAT_CFG_ROLE,
                                                                        KEY_DRBD_CONFPATH,
                                                                        KEY_COLORS,
-                                                                       KEY_UTF8))
+                                                                       KEY_UTF8,
+                                                                       KEY_RPC_SOCKET,
+                                                                       KEY_METRICS_FILE,
+                                                                       KEY_METRICS_INTERVAL))
                     ignored = [k for k in in_file_cfg if k not in final_config]
                     for k in ignored:
                         logging.warning('Ignoring %s in configuration file' % k)
@@ -909,11 +920,55 @@ def serial_filter(serial, objects):
     Generator for iterating over objects with obj_serial > serial
     """
     for obj in objects:
-        obj_serial = obj.get_props().get_prop(consts.SERIAL)
-        if obj_serial is None or obj_serial > serial:
+        if obj.get_props().get_serial() > serial:
             yield obj
 
 
+def page_filter(objects, key, cursor, limit):
+    """
+    Selects one page of objects in ascending order of their keys
+
+    Only the objects of the page are kept in memory, therefore the list
+    functions can generate pages of large lists with bounded memory usage.
+
+    @param   objects: iterable of objects
+    @param   key: function that returns the unique string key of an object
+    @param   cursor: key of the last object of the previous page;
+             empty for the first page
+    @param   limit: maximum number of objects on the page; 0 for no limit,
+             in which case the remaining objects are returned unsorted
+    @return: tuple (iterable of the objects on the page, cursor for the
+             next page); the cursor is empty if there are no more objects
+    """
+    if cursor:
+        objects = (obj for obj in objects if key(obj) > cursor)
+    next_cursor = ""
+    if limit > 0:
+        page = heapq.nsmallest(limit + 1, objects, key=key)
+        if len(page) > limit:
+            del page[limit:]
+            next_cursor = key(page[-1])
+        objects = page
+    return objects, next_cursor
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns a percentile of a sorted list of values (nearest-rank method)
+
+    @param   sorted_values: list of values in ascending order
+    @param   fraction: the percentile as a fraction, e.g. 0.99 for the
+             99th percentile
+    @return: the smallest value that is greater than or equal to the given
+             fraction of all values; None if the list is empty
+    """
+    count = len(sorted_values)
+    if count == 0:
+        return None
+    rank = int(math.ceil(fraction * count))
+    return sorted_values[min(count, max(1, rank)) - 1]
+
+
 def props_filter(source, filter_props):
     """
     Generator for iterating over objects that match filter properties
@@ -1129,6 +1184,212 @@ class DataHash(object):
         return self.HASH_LEN * 2
 
 
+class NumberAllocator(object):
+
+    """
+    Tracks allocated numbers for quickly finding free numbers
+
+    All numbers in the range min_nr..max_nr at or above the high-water mark
+    are free. Free numbers below the high-water mark are kept in a sorted
+    list, so that free numbers are found by a binary search instead of
+    collecting and sorting all allocated numbers or scanning the range.
+    Numbers outside of the range are tracked as allocated, but are never
+    returned as free numbers. Allocations are reference counted, so that
+    numbers that are (erroneously) allocated more than once remain
+    allocated until each allocation has been released.
+    """
+
+    _min_nr  = None
+    _max_nr  = None
+    # Lowest number in the range min_nr..max_nr above all allocated numbers
+    # in the range
+    _high_nr = None
+    # Sorted list of the free numbers below the high-water mark
+    _freed   = None
+    # number = allocation count
+    _counts  = None
+
+    def __init__(self, min_nr, max_nr):
+        self._min_nr  = min_nr
+        self._max_nr  = max_nr
+        self._high_nr = min_nr
+        self._freed   = []
+        self._counts  = {}
+
+
+    def get_range(self):
+        """
+        @return: tuple (min_nr, max_nr) of the range of allocatable numbers
+        """
+        return self._min_nr, self._max_nr
+
+
+    def allocate(self, nr):
+        count = self._counts.get(nr, 0)
+        self._counts[nr] = count + 1
+        if count == 0 and nr >= self._min_nr and nr <= self._max_nr:
+            if nr >= self._high_nr:
+                self._freed.extend(xrange(self._high_nr, nr))
+                self._high_nr = nr + 1
+            else:
+                del self._freed[bisect.bisect_left(self._freed, nr)]
+
+
+    def release(self, nr):
+        count = self._counts.get(nr, 0)
+        if count > 1:
+            self._counts[nr] = count - 1
+        elif count == 1:
+            del self._counts[nr]
+            if nr >= self._min_nr and nr <= self._max_nr:
+                if nr == self._high_nr - 1:
+                    # Lower the high-water mark below all free numbers
+                    # at the end of the list
+                    self._high_nr = nr
+                    freed = self._freed
+                    while len(freed) > 0 and freed[-1] == self._high_nr - 1:
+                        freed.pop()
+                        self._high_nr -= 1
+                else:
+                    bisect.insort(self._freed, nr)
+
+
+    def is_free(self, nr):
+        return nr not in self._counts
+
+
+    def get_allocated(self):
+        """
+        @return: sorted list of all allocated numbers
+        """
+        return sorted(self._counts.iterkeys())
+
+
+    def get_free(self, start_nr=None, excluded=None):
+        """
+        Returns a free number
+
+        Searches for a free number in the range start_nr..max_nr first and
+        continues searching from min_nr if there is none.
+
+        @param   start_nr: number to start searching at; None for min_nr
+        @param   excluded: collection of numbers to skip although unallocated
+        @return: free number; or -1 if all numbers are allocated
+        """
+        begin_nr = self._min_nr
+        if start_nr is not None and start_nr >= self._min_nr and start_nr <= self._max_nr:
+            begin_nr = start_nr
+        nr = self._find_free(begin_nr, self._max_nr + 1, excluded)
+        if nr == -1:
+            nr = self._find_free(self._min_nr, begin_nr, excluded)
+        return nr
+
+
+    def _find_free(self, begin_nr, end_nr, excluded):
+        """
+        Returns the lowest free number in the range begin_nr..end_nr - 1,
+        or -1 if there is none
+        """
+        freed = self._freed
+        index = bisect.bisect_left(freed, begin_nr)
+        while index < len(freed) and freed[index] < end_nr:
+            nr = freed[index]
+            if not excluded or nr not in excluded:
+                return nr
+            index += 1
+        nr = max(begin_nr, self._high_nr)
+        if excluded:
+            while nr < end_nr and nr in excluded:
+                nr += 1
+        return (nr if nr < end_nr else -1)
+
+
+class ConfFileBuffer(object):
+
+    """
+    Collects the content of a generated configuration file in memory
+
+    Used like a file stream that was opened for writing the temporary file
+    'name'. When the buffer is closed, the hash of its content is compared
+    with the hash of the final file (the temporary file's path without the
+    ".tmp" suffix), and the temporary file is only written if the content
+    has changed.
+    """
+
+    TMP_SUFFIX = ".tmp"
+
+    # Path of the temporary file
+    name    = None
+    # Set by close(): True if the temporary file was written,
+    # False if the content matches the content of the final file
+    changed = None
+    _buffer = None
+
+
+    def __init__(self, tmp_path):
+        self.name    = tmp_path
+        self._buffer = StringIO.StringIO()
+
+
+    def write(self, data):
+        self._buffer.write(data)
+
+
+    def get_final_path(self):
+        path = self.name
+        if path.endswith(ConfFileBuffer.TMP_SUFFIX):
+            path = path[:-len(ConfFileBuffer.TMP_SUFFIX)]
+        return path
+
+
+    def close(self):
+        """
+        Writes the temporary file if the content has changed
+
+        Does nothing if the buffer has been closed already
+
+        @raise   IOError: if the temporary file cannot be written
+        """
+        if self._buffer is None:
+            return
+        content = self._buffer.getvalue()
+        self._buffer.close()
+        self._buffer = None
+
+        content_hash = DataHash()
+        content_hash.update(content)
+        self.changed = (
+            content_hash.get_hex_hash() != self._file_hash(self.get_final_path())
+        )
+        if self.changed:
+            try:
+                with open(self.name, "w") as tmp_file:
+                    tmp_file.write(content)
+            except (IOError, OSError):
+                # Do not leave an incomplete temporary file behind
+                try:
+                    os.unlink(self.name)
+                except OSError:
+                    pass
+                raise
+
+
+    @staticmethod
+    def _file_hash(path):
+        """
+        Returns the hash of a file's content, or None if it cannot be read
+        """
+        file_hash = None
+        try:
+            with open(path, "r") as in_file:
+                data_hash = DataHash()
+                data_hash.update(in_file.read())
+                file_hash = data_hash.get_hex_hash()
+        except (IOError, OSError):
+            pass
+        return file_hash
+
+
 class NioLineReader(object):
 
     """
@@ -1223,6 +1484,7 @@ class ExternalCommand(object):
         self.source           = source
         self.trace_id         = trace_id
 
+    @timed(GROUP_COMMAND, lambda self: os.path.basename(self._args[0]))
     def run(self):
         epoll = select.epoll()
 
@@ -1466,10 +1728,14 @@ class Selector(object):
 
 
     def __init__(self, keys_list):
-        self._keys = {}
-        if keys_list is not None:
-            for key in keys_list:
-                self._keys[key] = None
+        if isinstance(keys_list, frozenset):
+            # Shared by the views of many objects, see list_assignments()
+            self._keys = keys_list
+        else:
+            self._keys = {}
+            if keys_list is not None:
+                for key in keys_list:
+                    self._keys[key] = None
 
 
     def all_selector(self, key):
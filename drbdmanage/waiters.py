@@ -0,0 +1,208 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import logging
+import gobject
+from drbdmanage.consts import BOOL_TRUE
+from drbdmanage.exceptions import DM_SUCCESS, DM_EINVAL, dm_exc_text
+from drbdmanage.utils import add_rc_entry
+from drbdmanage.plugins.plugins.wait_for import (
+    WaitForResource, WaitForSnapshot, WaitForVolumeSize
+)
+
+
+class Waiter(object):
+
+    """
+    A client waiting for the policy of a wait_for plugin to be fulfilled
+    """
+
+    # wait_for plugin instance that evaluates the policy
+    _policy   = None
+    # Function called with (fn_rc, result dict) to reply to the client
+    _reply_fn = None
+    # Timeout in seconds; 0 for no timeout
+    _timeout  = 0
+    # Source id of the timeout timer; None if there is no timer
+    _timer_id = None
+
+    def __init__(self, policy, reply_fn, timeout):
+        self._policy   = policy
+        self._reply_fn = reply_fn
+        self._timeout  = timeout
+
+    def get_policy(self):
+        return self._policy
+
+    def get_timeout(self):
+        return self._timeout
+
+    def set_timer_id(self, timer_id):
+        self._timer_id = timer_id
+
+    def reply(self, result):
+        """
+        Stops the timeout timer and sends the reply to the client
+
+        @param   result: tuple (fn_rc, result dict)
+        """
+        if self._timer_id is not None:
+            gobject.source_remove(self._timer_id)
+            self._timer_id = None
+        try:
+            self._reply_fn(*result)
+        except Exception as exc:
+            # The client may have disconnected
+            logging.warning("Cannot send the reply to a waiting client: %s" % str(exc))
+
+
+class WaiterRegistry(object):
+
+    """
+    Registry of clients waiting for the policy of a wait_for plugin
+
+    Instead of polling run_external_plugin() with a wait_for plugin, clients
+    register a waiter with the policy, and receive a single reply when the
+    policy is fulfilled, when it fails or when the wait times out.
+    The policies of all waiters are evaluated whenever the server's
+    configuration is saved or reloaded, see schedule_evaluation().
+    """
+
+    # wait type = wait_for plugin class that evaluates the policy
+    WAIT_TYPES = {
+        "resource":    WaitForResource,
+        "snapshot":    WaitForSnapshot,
+        "volume-size": WaitForVolumeSize
+    }
+
+    # Configuration key of the timeout in seconds
+    KEY_TIMEOUT = "timeout"
+
+    # Reference to the server
+    _server    = None
+    # List of waiting Waiter objects
+    _waiters   = None
+    # Set if the evaluation of the waiters is scheduled
+    _scheduled = False
+
+    def __init__(self, server):
+        self._server  = server
+        self._waiters = []
+
+    def register(self, wait_type, config, reply_fn):
+        """
+        Registers a waiter, unless the wait is finished immediately
+
+        @param   wait_type: one of the keys of WAIT_TYPES
+        @param   config: configuration of the wait_for plugin
+        @param   reply_fn: function called with (fn_rc, result dict) when
+                 the wait finishes
+        @return: tuple (fn_rc, result dict) if the wait is finished
+                 immediately; None if reply_fn will be called
+        """
+        fn_rc = []
+        policy_class = WaiterRegistry.WAIT_TYPES.get(wait_type)
+        if policy_class is None:
+            add_rc_entry(fn_rc, DM_EINVAL, dm_exc_text(DM_EINVAL))
+            return fn_rc, {}
+        try:
+            timeout = float(config.get(WaiterRegistry.KEY_TIMEOUT, 0))
+        except ValueError:
+            add_rc_entry(fn_rc, DM_EINVAL, dm_exc_text(DM_EINVAL))
+            return fn_rc, {}
+
+        policy = policy_class(self._server)
+        policy.set_config(config)
+        result = self._evaluate(policy)
+        if self._is_finished(result):
+            return result
+
+        waiter = Waiter(policy, reply_fn, timeout)
+        if timeout > 0:
+            waiter.set_timer_id(
+                gobject.timeout_add(int(timeout * 1000), self._timed_out, waiter)
+            )
+        self._waiters.append(waiter)
+        return None
+
+    def get_waiter_count(self):
+        return len(self._waiters)
+
+    def schedule_evaluation(self):
+        """
+        Schedules the evaluation of the waiters in the main loop
+
+        Called whenever the configuration may have changed. Multiple calls
+        before the evaluation runs are coalesced. May be called from
+        threads other than the main loop's, e.g. by the satellite proxy.
+        """
+        if len(self._waiters) > 0 and not self._scheduled:
+            self._scheduled = True
+            gobject.idle_add(self._evaluate_all)
+
+    def _evaluate_all(self):
+        self._scheduled = False
+        for waiter in list(self._waiters):
+            result = self._evaluate(waiter.get_policy())
+            if self._is_finished(result):
+                self._waiters.remove(waiter)
+                waiter.reply(result)
+        # Run only once
+        return False
+
+    def _timed_out(self, waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            waiter.set_timer_id(None)
+            timeout = str(waiter.get_timeout())
+            waiter.reply(
+                waiter.get_policy().success(
+                    "Timed out after %(t_o)s seconds", [["t_o", timeout]],
+                    timeout=True
+                )
+            )
+        # Run only once
+        return False
+
+    def _evaluate(self, policy):
+        """
+        Evaluates the policy of a waiter
+
+        @return: tuple (fn_rc, result dict)
+        """
+        try:
+            return policy.evaluate()
+        except (KeyError, ValueError):
+            fn_rc = []
+            add_rc_entry(fn_rc, DM_EINVAL, dm_exc_text(DM_EINVAL))
+            return fn_rc, {}
+
+    @staticmethod
+    def _is_finished(result):
+        """
+        Indicates whether the policy is fulfilled or cannot be evaluated
+        """
+        fn_rc, data = result
+        if data.get("result") == BOOL_TRUE:
+            return True
+        for rc_entry in fn_rc:
+            if rc_entry[0] != DM_SUCCESS:
+                return True
+        return False
@@ -30,6 +30,7 @@ import os
 import errno
 import dbus
 import dbus.mainloop.glib
+import gobject
 import json
 import re
 import subprocess
@@ -38,6 +39,7 @@ import traceback
 import locale
 import drbdmanage.drbd.drbdcore
 import drbdmanage.drbd.persistence
+import drbdmanage.rpc
 import drbdmanage.argparse.argparse as argparse
 import drbdmanage.argcomplete as argcomplete
 
@@ -54,6 +56,7 @@ from drbdmanage.consts import (
     KEY_S_CMD_SHUTDOWN,
     KEY_COLORS, KEY_UTF8, NODE_NAME, RES_NAME, SNAPS_NAME, KEY_SHUTDOWN_RES, KEY_SHUTDOWN_CTRLVOL, MANAGED,
     KEY_ERR_STRATEGY, KEY_ERR_RESUME_NO, KEY_ERR_MAX_BOFF, KEY_ERR_INVTERVAL,
+    DBUS_CHANGE_FEED, KEY_RPC_SOCKET, DEFAULT_RPC_SOCKET,
 )
 from drbdmanage.utils import SizeCalc
 from drbdmanage.utils import Table
@@ -76,6 +79,7 @@ from drbdmanage.exceptions import (
     DM_SUCCESS, DM_EEXIST, DM_ENOENT, DM_ENOTREADY, DM_ENOTREADY_STARTUP, DM_ENOTREADY_REQCTRL
 )
 from drbdmanage.dbusserver import DBusServer
+from drbdmanage.changeindex import ChangeIndex
 from drbdmanage.drbd.drbdcore import Assignment
 from drbdmanage.drbd.views import AssignmentView
 from drbdmanage.drbd.views import DrbdNodeView
@@ -104,6 +108,7 @@ class DrbdManage(object):
     _colors = True
     _utf8 = False
     _all_commands = None
+    _transport = "dbus"
 
     UMHELPER_FILE = "/sys/module/drbd/parameters/usermode_helper"
     UMHELPER_OVERRIDE = "/bin/true"
@@ -127,27 +132,44 @@ class DrbdManage(object):
             self._utf8 = True if self._config[KEY_UTF8].strip().lower() == 'yes' else False
 
     def _print_dbus_exception(self, exc):
-        sys.stderr.write(
-            "\nError: Cannot connect to the drbdmanaged process using DBus\n"
-        )
-        sys.stderr.write(
-            "The DBus subsystem returned the following "
-            "error description:\n"
-        )
+        if self._transport == "socket":
+            sys.stderr.write(
+                "\nError: Cannot connect to the drbdmanaged process "
+                "using its RPC socket\n"
+            )
+            sys.stderr.write("The error description is:\n")
+        else:
+            sys.stderr.write(
+                "\nError: Cannot connect to the drbdmanaged process using DBus\n"
+            )
+            sys.stderr.write(
+                "The DBus subsystem returned the following "
+                "error description:\n"
+            )
         sys.stderr.write("%s\n" % (str(exc)))
 
     def dbus_init(self):
         try:
             if self._server is None:
-                dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
-                self._dbus = dbus.SystemBus()
-                self._server = self._dbus.get_object(
-                    DBUS_DRBDMANAGED, DBUS_SERVICE
-                )
+                self._server = self._get_server()
         except dbus.exceptions.DBusException as exc:
             self._print_dbus_exception(exc)
             exit(1)
 
+    def _get_server(self):
+        """
+        Connects to the server using the selected transport
+
+        @return: the server's D-Bus proxy object, or an RpcClient object that
+                 provides the same methods
+        """
+        if self._transport == "socket":
+            path = self._config.get(KEY_RPC_SOCKET, DEFAULT_RPC_SOCKET).strip()
+            return drbdmanage.rpc.RpcClient(path)
+        dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+        self._dbus = dbus.SystemBus()
+        return self._dbus.get_object(DBUS_DRBDMANAGED, DBUS_SERVICE)
+
     def dsc(self, fn, *args, **kwargs):
         tries, retries_max = 0, 15
         while tries <= retries_max:
@@ -182,6 +204,11 @@ class DrbdManage(object):
         parser = argparse.ArgumentParser(prog='drbdmanage')
         parser.add_argument('--version', '-v', action='version',
                             version='%(prog)s ' + DM_VERSION + '; ' + DM_GITHASH)
+        parser.add_argument('--transport', choices=('dbus', 'socket'),
+                            help='Communicate with the server through D-Bus '
+                            '(default) or through the server\'s local RPC '
+                            'socket. The socket must be enabled by the '
+                            '%s setting of the server.' % (KEY_RPC_SOCKET))
         subp = parser.add_subparsers(title='subcommands',
                                      description='valid subcommands',
                                      help='Use the list command to print a '
@@ -623,6 +650,33 @@ class DrbdManage(object):
                               help="only consider nodes from this site")
         p_deploy.set_defaults(func=self.cmd_deploy)
 
+        # deploy multiple resources
+        p_deploy_many = subp.add_parser('deploy-resources',
+                                        aliases=['deploy-many'],
+                                        description='Deploys multiple resources on n automatically '
+                                        'selected nodes each. The placement of all resources is '
+                                        'planned together and saved in a single change of the '
+                                        "drbdmanage cluster's configuration.")
+        p_deploy_many.add_argument('resource', type=check_res_name,
+                                   nargs="+").completer = res_completer
+        p_deploy_many.add_argument('-i', '--increase', action="store_true",
+                                   help='Increase the redundancy count relative to'
+                                   ' the currently set value by a number of'
+                                   ' <redundancy_count>')
+        p_deploy_many.add_argument('-d', '--decrease', action="store_true",
+                                   help='Decrease the redundancy count relative to'
+                                   ' the currently set value by a number of'
+                                   ' <redundancy_count>')
+        p_deploy_many.add_argument('redundancy_count', type=redundancy_type,
+                                   help='The redundancy count specifies the number'
+                                   ' of nodes to which each resource should be'
+                                   ' deployed. It must be at least 1 and at most'
+                                   ' the number of nodes in the cluster')
+        p_deploy_many.add_argument('--with-clients', action="store_true")
+        p_deploy_many.add_argument('-s', '--site', default='',
+                                   help="only consider nodes from this site")
+        p_deploy_many.set_defaults(func=self.cmd_deploy_many)
+
         # undeploy
         p_undeploy = subp.add_parser('undeploy-resource',
                                      aliases=['undeploy'],
@@ -813,6 +867,10 @@ class DrbdManage(object):
         p_lnodes.add_argument('-N', '--nodes', nargs='+', type=check_node_name,
                               help='Filter by list of nodes').completer = node_completer
         p_lnodes.add_argument('--separators', action="store_true")
+        p_lnodes.add_argument('--page-size', type=int, default=0,
+                              help='Query the list from the server in pages of '
+                              'up to PAGE_SIZE nodes; each page is printed as '
+                              'a separate table')
         p_lnodes.set_defaults(func=self.cmd_list_nodes)
 
         # resources
@@ -833,6 +891,10 @@ class DrbdManage(object):
         p_lreses.add_argument('-R', '--resources', nargs='+', type=check_res_name,
                               help='Filter by list of resources').completer = res_completer
         p_lreses.add_argument('--separators', action="store_true")
+        p_lreses.add_argument('--page-size', type=int, default=0,
+                              help='Query the list from the server in pages of '
+                              'up to PAGE_SIZE resources; each page is printed as '
+                              'a separate table')
         p_lreses.set_defaults(func=self.cmd_list_resources)
 
         # volumes
@@ -851,6 +913,10 @@ class DrbdManage(object):
         p_lvols.add_argument('--separators', action="store_true")
         p_lvols.add_argument('-R', '--resources', nargs='+', type=check_res_name,
                              help='Filter by list of resources').completer = res_completer
+        p_lvols.add_argument('--page-size', type=int, default=0,
+                             help='Query the list from the server in pages of '
+                             'up to PAGE_SIZE resources; each page is printed as '
+                             'a separate table')
         p_lvols.set_defaults(func=self.cmd_list_volumes)
 
         # snapshots
@@ -910,6 +976,10 @@ class DrbdManage(object):
                                    help='Filter by list of nodes').completer = node_completer
         p_assignments.add_argument('-R', '--resources', nargs='+', type=check_res_name,
                                    help='Filter by list of resources').completer = res_completer
+        p_assignments.add_argument('--page-size', type=int, default=0,
+                                   help='Query the list from the server in pages of '
+                                   'up to PAGE_SIZE assignments; each page is printed as '
+                                   'a separate table')
         p_assignments.set_defaults(func=self.cmd_list_assignments)
 
         # export
@@ -1014,6 +1084,16 @@ class DrbdManage(object):
                                         description='Queries the server\'s message log')
         p_message_log.set_defaults(func=self.cmd_clear_message_log)
 
+        # list-metrics
+        p_metrics = subp.add_parser('list-metrics', aliases=['metrics'],
+                                    description='Lists the latency metrics of the server\'s '
+                                    'operations. Percentiles are the upper bounds of the '
+                                    'histogram buckets that contain them.')
+        p_metrics.add_argument('group', nargs='?',
+                               choices=['dbus', 'rpc', 'core', 'persistence', 'proxy', 'command'],
+                               help='Only list the metrics of this group')
+        p_metrics.set_defaults(func=self.cmd_metrics)
+
         # query-conf
         p_queryconf = subp.add_parser('query-conf',
                                       description='Print the DRBD'
@@ -1025,6 +1105,19 @@ class DrbdManage(object):
                                  help='Name of the resource').completer = res_completer
         p_queryconf.set_defaults(func=self.cmd_query_conf)
 
+        # watch
+        p_watch = subp.add_parser('watch',
+                                  description='Prints the objects that change '
+                                  'whenever the server saves the configuration, '
+                                  'one line per object: serial number, object type '
+                                  'and the names that identify the object. A "*" '
+                                  'instead of the names means that all objects of '
+                                  'the type must be reloaded.')
+        p_watch.add_argument('-t', '--types', nargs='+',
+                             choices=ChangeIndex.OBJ_TYPES,
+                             help='Only print changes of these types of objects')
+        p_watch.set_defaults(func=self.cmd_watch)
+
         # ping
         p_ping = subp.add_parser('ping', description='Pings the server. The '
                                  'server should answer with a "pong"')
@@ -1277,6 +1370,8 @@ class DrbdManage(object):
 
     def parse(self, pargs):
         args = self._parser.parse_args(pargs)
+        if getattr(args, 'transport', None) is not None:
+            self._transport = args.transport
         args.func(args)
 
     def parser_cmds(self):
@@ -1954,6 +2049,27 @@ class DrbdManage(object):
 
         return fn_rc
 
+    def cmd_deploy_many(self, args):
+        fn_rc = 1
+        res_names = args.resource
+        count = args.redundancy_count
+        delta = 0
+        site_clients = args.with_clients
+
+        if args.decrease:
+            count *= -1
+
+        if args.increase or args.decrease:
+            count, delta = delta, count
+
+        self.dbus_init()
+        server_rc = self.dsc(self._server.auto_deploy_many,
+                             dbus.Array(res_names, signature="s"), dbus.Int32(count),
+                             dbus.Int32(delta), dbus.Boolean(site_clients), dbus.String(args.site))
+        fn_rc = self._list_rc_entries(server_rc)
+
+        return fn_rc
+
     def cmd_undeploy(self, args):
         fn_rc = 1
 
@@ -2203,6 +2319,35 @@ class DrbdManage(object):
 
         return (server_rc, node_list)
 
+    def _get_pages(self, page_fn, page_size, *args):
+        """
+        Queries a list from the server in pages of up to page_size entries
+
+        The first page is queried immediately. The following pages are
+        queried while the returned iterator is consumed, so that only one
+        page of the list is kept in memory at a time. The entries are
+        sorted by the server.
+
+        @return: tuple (server_rc of the first page, first page, iterator
+                 over the pages of the list)
+        """
+        server_rc, cursor, page = self.dsc(
+            page_fn, *(args + (dbus.String(""), dbus.UInt32(page_size)))
+        )
+
+        def iterate_pages(cursor, page):
+            while page is not None:
+                yield page
+                if not cursor:
+                    break
+                page_rc, cursor, page = self.dsc(
+                    page_fn, *(args + (dbus.String(cursor), dbus.UInt32(page_size)))
+                )
+                if page is None:
+                    self._list_rc_entries(page_rc)
+
+        return (server_rc, page, iterate_pages(cursor, page))
+
     def cmd_list_nodes(self, args):
         color = self.color
 
@@ -2213,35 +2358,65 @@ class DrbdManage(object):
 
         node_filter_arg = [] if args.nodes is None else args.nodes
 
-        server_rc, node_list = self._get_nodes(sort=True,
-                                               node_filter=node_filter_arg)
+        # With --page-size, each page is printed as soon as it is received,
+        # as a separate table in human readable mode
+        if args.page_size > 0:
+            self.dbus_init()
+            server_rc, first_page, pages = self._get_pages(
+                self._server.list_nodes_page, args.page_size,
+                dbus.Array(node_filter_arg, signature="s"),
+                0,
+                dbus.Dictionary({}, signature="ss"),
+                dbus.Array([], signature="s")
+            )
+        else:
+            server_rc, node_list = self._get_nodes(sort=True,
+                                                   node_filter=node_filter_arg)
+            first_page = node_list
+            pages = [node_list]
 
-        if (not machine_readable) and (node_list is None or len(node_list) == 0):
+        if (not machine_readable) and (first_page is None or len(first_page) == 0):
             sys.stdout.write("No nodes defined\n")
             return 0
 
-        t = Table(colors=self._colors, utf8=self._utf8, pastable=pastable)
         if not args.groupby:
             groupby = ["Name"]
         else:
             groupby = args.groupby
 
-        t.add_column("Name", color=color(COLOR_TEAL))
-        t.add_column("Pool_Size", color=color(COLOR_BROWN), just_txt='>')
-        t.add_column("Pool_Free", color=color(COLOR_BROWN), just_txt='>')
-        t.add_column("Site", color=color(COLOR_BROWN), just_txt='>')
-        t.add_column("Family", just_txt='>')
-        t.add_column("IP", just_txt='>')
-        t.add_column("State", color=color(COLOR_DARKGREEN), just_txt='>', just_col='>')
+        def new_table():
+            t = Table(colors=self._colors, utf8=self._utf8, pastable=pastable)
+            t.add_column("Name", color=color(COLOR_TEAL))
+            t.add_column("Pool_Size", color=color(COLOR_BROWN), just_txt='>')
+            t.add_column("Pool_Free", color=color(COLOR_BROWN), just_txt='>')
+            t.add_column("Site", color=color(COLOR_BROWN), just_txt='>')
+            t.add_column("Family", just_txt='>')
+            t.add_column("IP", just_txt='>')
+            t.add_column("State", color=color(COLOR_DARKGREEN), just_txt='>', just_col='>')
+
+            # fixed ones we always show
+            tview = ["Name", "Pool_Size", "Pool_Free", "State"]
+            if args.show:
+                tview += args.show
+            t.set_view(tview)
+
+            t.set_groupby(groupby)
+            t.set_show_separators(args.separators)
+            return t
 
-        # fixed ones we always show
-        tview = ["Name", "Pool_Size", "Pool_Free", "State"]
-        if args.show:
-            tview += args.show
-        t.set_view(tview)
+        for node_list in pages:
+            t = new_table()
+            self._list_nodes_page(t, node_list, machine_readable)
+            if not machine_readable and t.got_row:
+                t.show()
+        return 0
 
-        t.set_groupby(groupby)
+    def _list_nodes_page(self, t, node_list, machine_readable):
+        """
+        Outputs a page of the node list, see cmd_list_nodes()
 
+        @param   t: Table for the human readable output
+        """
         for node_entry in node_list:
             try:
                 node_name, properties = node_entry
@@ -2307,11 +2482,6 @@ class DrbdManage(object):
             except IncompatibleDataException:
                 sys.stderr.write("Warning: incompatible table entry skipped\n")
 
-        if not machine_readable:
-            t.set_show_separators(args.separators)
-            t.show()
-        return 0
-
     def cmd_list_resources(self, args):
         return self._list_resources(args, False)
 
@@ -2361,40 +2531,76 @@ class DrbdManage(object):
 
         resource_filter_arg = [] if args.resources is None else args.resources
 
-        server_rc, res_list = self.__list_resources(
-            list_volumes, resource_filter=resource_filter_arg
-        )
+        # With --page-size, each page is printed as soon as it is received,
+        # as a separate table in human readable mode
+        if args.page_size > 0:
+            self.dbus_init()
+            if list_volumes:
+                page_fn = self._server.list_volumes_page
+            else:
+                page_fn = self._server.list_resources_page
+            server_rc, first_page, pages = self._get_pages(
+                page_fn, args.page_size,
+                dbus.Array(resource_filter_arg, signature="s"),
+                0,
+                dbus.Dictionary({}, signature="ss"),
+                dbus.Array([], signature="s")
+            )
+        else:
+            server_rc, res_list = self.__list_resources(
+                list_volumes, resource_filter=resource_filter_arg
+            )
+            first_page = res_list
+            pages = [res_list]
 
-        if (not machine_readable) and (res_list is None or len(res_list) == 0):
+        if (not machine_readable) and (first_page is None or len(first_page) == 0):
                 sys.stdout.write("No resources defined\n")
                 return 0
 
-        t = Table(colors=self._colors, utf8=self._utf8, pastable=pastable)
-
         if not args.groupby:
             groupby = ["Name"]
         else:
             groupby = args.groupby
 
-        t.add_column("Name", color=color(COLOR_TEAL))
-        if list_volumes:
-            t.add_column("Vol_ID", color=color(COLOR_BROWN), just_txt='>')
-            t.add_column("Size", color=color(COLOR_BROWN), just_txt='>')
-            t.add_column("Minor", color=color(COLOR_BROWN), just_txt='>')
-        t.add_column("Port", just_txt='>')
-        t.add_column("State", color=color(COLOR_DARKGREEN), just_txt='>', just_col='>')
+        def new_table():
+            t = Table(colors=self._colors, utf8=self._utf8, pastable=pastable)
+            t.add_column("Name", color=color(COLOR_TEAL))
+            if list_volumes:
+                t.add_column("Vol_ID", color=color(COLOR_BROWN), just_txt='>')
+                t.add_column("Size", color=color(COLOR_BROWN), just_txt='>')
+                t.add_column("Minor", color=color(COLOR_BROWN), just_txt='>')
+            t.add_column("Port", just_txt='>')
+            t.add_column("State", color=color(COLOR_DARKGREEN), just_txt='>', just_col='>')
 
-        # fixed ones we always show
-        tview = ["Name", "State"]
+            # fixed ones we always show
+            tview = ["Name", "State"]
 
-        if list_volumes:
-            tview += ["Vol_ID", "Size", "Minor"]
+            if list_volumes:
+                tview += ["Vol_ID", "Size", "Minor"]
 
-        if args.show:
-            tview += args.show
-        t.set_view(tview)
+            if args.show:
+                tview += args.show
+            t.set_view(tview)
 
-        t.set_groupby(groupby)
+            t.set_groupby(groupby)
+            t.set_show_separators(args.separators)
+            return t
+
+        for res_list in pages:
+            t = new_table()
+            self._list_resources_page(t, res_list, list_volumes, machine_readable)
+            if not machine_readable and t.got_row:
+                # t.show(overwrite=list_volumes)
+                t.show()
+        return 0
+
+    def _list_resources_page(self, t, res_list, list_volumes, machine_readable):
+        """
+        Outputs a page of the resource or volume list, see _list_resources()
+
+        @param   t: Table for the human readable output
+        """
+        color = self.color
 
         for res_entry in res_list:
             try:
@@ -2459,12 +2665,6 @@ class DrbdManage(object):
             except IncompatibleDataException:
                 sys.stderr.write("Warning: incompatible table entry skipped\n")
 
-        if not machine_readable:
-            t.set_show_separators(args.separators)
-            # t.show(overwrite=list_volumes)
-            t.show()
-        return 0
-
     def _list_snapshots(self, resource_filter=[]):
         self.dbus_init()
 
@@ -2604,39 +2804,69 @@ class DrbdManage(object):
         node_filter_arg = [] if args.nodes is None else args.nodes
         resource_filter_arg = [] if args.resources is None else args.resources
 
-        server_rc, assg_list = self.dsc(self._server.list_assignments,
-                                        dbus.Array(node_filter_arg, signature="s"),
-                                        dbus.Array(resource_filter_arg, signature="s"),
-                                        0,
-                                        dbus.Dictionary({}, signature="ss"),
-                                        dbus.Array([], signature="s"))
-        if (not machine_readable) and (assg_list is None or len(assg_list) == 0):
+        # With --page-size, each page is printed as soon as it is received,
+        # as a separate table in human readable mode
+        if args.page_size > 0:
+            server_rc, first_page, pages = self._get_pages(
+                self._server.list_assignments_page, args.page_size,
+                dbus.Array(node_filter_arg, signature="s"),
+                dbus.Array(resource_filter_arg, signature="s"),
+                0,
+                dbus.Dictionary({}, signature="ss"),
+                dbus.Array([], signature="s")
+            )
+        else:
+            server_rc, assg_list = self.dsc(self._server.list_assignments,
+                                            dbus.Array(node_filter_arg, signature="s"),
+                                            dbus.Array(resource_filter_arg, signature="s"),
+                                            0,
+                                            dbus.Dictionary({}, signature="ss"),
+                                            dbus.Array([], signature="s"))
+            first_page = assg_list
+            pages = [assg_list]
+        if (not machine_readable) and (first_page is None or len(first_page) == 0):
             sys.stdout.write("No assignments defined\n")
             return 0
 
-        t = Table(colors=self._colors, utf8=self._utf8, pastable=pastable)
-
         if not args.groupby:
             groupby = ["Node", "Resource"]
         else:
             groupby = args.groupby
 
-        t.add_column("Node", color=color(COLOR_TEAL))
-        t.add_column("Resource", color=color(COLOR_DARKGREEN))
-        t.add_column("Vol_ID", color=color(COLOR_DARKPINK), just_txt='>')
-        t.add_column("Blockdevice")
-        t.add_column("Node_ID", just_txt='>')
-        t.add_column("State", color=color(COLOR_DARKGREEN), just_txt='>', just_col='>')
+        def new_table():
+            t = Table(colors=self._colors, utf8=self._utf8, pastable=pastable)
+            t.add_column("Node", color=color(COLOR_TEAL))
+            t.add_column("Resource", color=color(COLOR_DARKGREEN))
+            t.add_column("Vol_ID", color=color(COLOR_DARKPINK), just_txt='>')
+            t.add_column("Blockdevice")
+            t.add_column("Node_ID", just_txt='>')
+            t.add_column("State", color=color(COLOR_DARKGREEN), just_txt='>', just_col='>')
 
-        # fixed ones we always show
-        tview = ["Node", "Resource", "Vol_ID", "State"]
+            # fixed ones we always show
+            tview = ["Node", "Resource", "Vol_ID", "State"]
 
-        if args.show:
-            tview += args.show
-        t.set_view(tview)
+            if args.show:
+                tview += args.show
+            t.set_view(tview)
 
-        t.set_groupby(groupby)
+            t.set_groupby(groupby)
+            t.set_show_separators(args.separators)
+            return t
+
+        for assg_list in pages:
+            t = new_table()
+            self._list_assignments_page(t, assg_list, machine_readable)
+            if not machine_readable and t.got_row:
+                # t.show(overwrite=True)
+                t.show()
+        return 0
+
+    def _list_assignments_page(self, t, assg_list, machine_readable):
+        """
+        Outputs a page of the assignment list, see cmd_list_assignments()
 
+        @param   t: Table for the human readable output
+        """
         for assg_entry in assg_list:
             try:
                 node_name, res_name, properties, vol_state_list = assg_entry
@@ -2677,12 +2907,6 @@ class DrbdManage(object):
             except IncompatibleDataException:
                 sys.stderr.write("Warning: incompatible table entry skipped\n")
 
-        if not machine_readable:
-            t.set_show_separators(args.separators)
-            # t.show(overwrite=True)
-            t.show()
-        return 0
-
     def cmd_export_conf(self, args):
         fn_rc = 0
 
@@ -2809,6 +3033,23 @@ class DrbdManage(object):
 
         return fn_rc
 
+    def cmd_metrics(self, args):
+        """
+        Displays the latency metrics of the server's operations
+        """
+        fn_rc = 1
+
+        self.dbus_init()
+        query = ["metrics"]
+        if args.group is not None:
+            query.append(args.group)
+        server_rc, lines = self.dsc(self._server.text_query, query)
+        for line in lines:
+            sys.stdout.write("%s\n" % (line))
+        fn_rc = self._list_rc_entries(server_rc)
+
+        return fn_rc
+
     def cmd_lowlevel_debug(self, args):
         cmd = args.cmd
 
@@ -2914,6 +3155,40 @@ class DrbdManage(object):
             )
         return fn_rc
 
+    def cmd_watch(self, args):
+        """
+        Prints the changes announced by the server's change feed signal
+        """
+        self.dbus_init()
+        if self._dbus is None:
+            sys.stderr.write("The watch command requires the D-Bus transport\n")
+            return 1
+
+        obj_types = None if args.types is None else set(args.types)
+
+        def changed(serial, obj_type, obj_keys):
+            if obj_types is None or obj_type in obj_types:
+                if len(obj_keys) > 0:
+                    for obj_key in obj_keys:
+                        sys.stdout.write(
+                            "%d %s %s\n"
+                            % (serial, obj_type, ":".join([str(name) for name in obj_key]))
+                        )
+                else:
+                    sys.stdout.write("%d %s *\n" % (serial, obj_type))
+                sys.stdout.flush()
+
+        self._dbus.add_signal_receiver(
+            changed, signal_name="changed",
+            dbus_interface=DBUS_DRBDMANAGED, path=DBUS_CHANGE_FEED
+        )
+        self._gmainloop = gobject.MainLoop()
+        try:
+            self._gmainloop.run()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
     def cmd_startup(self, args):
         fn_rc = 1
         # if we start using args, check for 'None', because
@@ -3013,9 +3288,7 @@ Confirm:
                 # Startup the drbdmanage server and add the current node
                 # Previous DBus connection is gone after shutdown,
                 # must run dbus_init() again
-                self._server = self._dbus.get_object(
-                    DBUS_DRBDMANAGED, DBUS_SERVICE
-                )
+                self._server = self._get_server()
                 server_rc = self.dsc(self._server.init_node,
                                      dbus.String(node_name), props)
 
@@ -23,8 +23,12 @@ Initialize the drbdmanage server and its D-Bus communication layer
 """
 
 import logging
+import socket
 import drbdmanage.server
 import drbdmanage.dbusserver
+import drbdmanage.rpc
+from drbdmanage.consts import KEY_RPC_SOCKET
+from drbdmanage.utils import load_server_conf_file
 
 
 def main():
@@ -34,6 +38,14 @@ def main():
     signal_factory = drbdmanage.dbusserver.DBusSignalFactory()
     server = drbdmanage.server.DrbdManageServer(signal_factory)
     drbdmanage.dbusserver.DBusServer(server)
+    rpc_socket = load_server_conf_file(localonly=True).get(KEY_RPC_SOCKET)
+    if rpc_socket:
+        try:
+            drbdmanage.rpc.RpcServer(server, rpc_socket.strip())
+        except (socket.error, OSError) as exc:
+            logging.error(
+                "Cannot create the RPC socket '%s': %s" % (rpc_socket, str(exc))
+            )
     try:
         server.run()
     except KeyboardInterrupt:
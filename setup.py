@@ -215,7 +215,8 @@ setup(
         "drbdmanage.plugins.external",
     ],
     py_modules=["drbdmanage_server", "drbdmanage_client"],
-    scripts=["scripts/drbdmanage", "scripts/dbus-drbdmanaged-service"],
+    scripts=["scripts/drbdmanage", "scripts/drbdmanage-replay",
+             "scripts/dbus-drbdmanaged-service"],
     data_files=gen_data_files(),
     cmdclass={
         "build_man": BuildManCommand,
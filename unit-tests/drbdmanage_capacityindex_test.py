@@ -0,0 +1,199 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import drbdmanage.consts as const
+
+from drbdmanage.capacityindex import CapacityIndex
+from drbdmanage.drbd.drbdcore import DrbdNode
+from drbdmanage.propscontainer import PropsContainer
+
+
+class Node(object):
+
+    """Node with the data the capacity index reads from DrbdNode objects"""
+
+    def __init__(self, name, poolsize, poolfree, site=None, storage=True):
+        self.name = name
+        self.poolsize = poolsize
+        self.poolfree = poolfree
+        self.state = DrbdNode.FLAG_STORAGE if storage else 0
+        self.props = PropsContainer(lambda: 1, None, None)
+        if site is not None:
+            self.props.set_prop(
+                const.KEY_SITE, site,
+                PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+            )
+        self.capacity_index = None
+
+    def get_name(self):
+        return self.name
+
+    def get_poolsize(self):
+        return self.poolsize
+
+    def get_poolfree(self):
+        return self.poolfree
+
+    def get_state(self):
+        return self.state
+
+    def get_props(self):
+        return self.props
+
+    def set_capacity_index(self, capacity_index):
+        self.capacity_index = capacity_index
+
+
+def build_index(*nodes):
+    return CapacityIndex(dict([(node.get_name(), node) for node in nodes]))
+
+
+class CapacityIndexTests(unittest.TestCase):
+
+    def test_build(self):
+        """adds all nodes and registers the index with the nodes"""
+        node_a = Node("a", 1000, 600)
+        node_b = Node("b", 2000, 300)
+        index = build_index(node_a, node_b)
+        self.assertEqual(3000, index.get_total())
+        self.assertEqual(2, index.get_free_count())
+        self.assertTrue(node_a.capacity_index is index)
+        self.assertTrue(node_b.capacity_index is index)
+
+    def test_update(self):
+        """replaces the entries of a node that changed"""
+        node_a = Node("a", 1000, 600)
+        index = build_index(node_a, Node("b", 2000, 300))
+        node_a.poolsize = 1500
+        node_a.poolfree = 100
+        index.update(node_a)
+        self.assertEqual(3500, index.get_total())
+        self.assertEqual([(300, "b"), (100, "a")], list(index.iterate_largest()))
+
+    def test_repeated_update(self):
+        """counts a node only once if it is updated repeatedly"""
+        node_a = Node("a", 1000, 600)
+        index = build_index(node_a)
+        for poolfree in [500, 400, 400, 700]:
+            node_a.poolfree = poolfree
+            index.update(node_a)
+        self.assertEqual(1000, index.get_total())
+        self.assertEqual(1, index.get_free_count())
+        self.assertEqual([(700, "a")], list(index.iterate_largest()))
+
+    def test_update_site(self):
+        """moves a node to the entries of its new site"""
+        node_a = Node("a", 1000, 600, site="site-a")
+        index = build_index(node_a)
+        node_a.props.set_prop(
+            const.KEY_SITE, "site-b",
+            PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+        )
+        index.update(node_a)
+        self.assertEqual(0, index.get_total("site-a"))
+        self.assertEqual(0, index.get_free_count("site-a"))
+        self.assertEqual(1000, index.get_total("site-b"))
+        self.assertEqual(600, index.get_nth_free(1, "site-b"))
+
+    def test_remove(self):
+        """removes the entries of a node"""
+        index = build_index(Node("a", 1000, 600, site="site-a"), Node("b", 2000, 300))
+        index.remove("a")
+        self.assertEqual(2000, index.get_total())
+        self.assertEqual(0, index.get_total("site-a"))
+        self.assertEqual([(300, "b")], list(index.iterate_largest()))
+        self.assertEqual([], list(index.iterate_largest(allowed_site="site-a")))
+
+    def test_remove_unknown(self):
+        """ignores the removal of nodes that are not in the index"""
+        index = build_index(Node("a", 1000, 600))
+        index.remove("unknown")
+        index.remove("a")
+        index.remove("a")
+        self.assertEqual(0, index.get_total())
+        self.assertEqual(0, index.get_free_count())
+
+    def test_get_total(self):
+        """sums the storage pool sizes per site and of all nodes"""
+        index = build_index(
+            Node("a", 1000, 600, site="site-a"),
+            Node("b", 2000, 300, site="site-a"),
+            Node("c", 4000, 200, site="site-b"),
+            Node("d", 8000, 100),
+            Node("e", -1, -1)
+        )
+        self.assertEqual(15000, index.get_total())
+        self.assertEqual(15000, index.get_total(""))
+        self.assertEqual(3000, index.get_total("site-a"))
+        self.assertEqual(3000, index.get_total(" site-a "))
+        self.assertEqual(4000, index.get_total("site-b"))
+        self.assertEqual(0, index.get_total("site-c"))
+
+    def test_get_nth_free(self):
+        """returns the nth-largest amount of free space"""
+        index = build_index(
+            Node("a", 1000, 600, site="site-a"),
+            Node("b", 1000, 300, site="site-a"),
+            Node("c", 1000, 900)
+        )
+        self.assertEqual(900, index.get_nth_free(1))
+        self.assertEqual(600, index.get_nth_free(2))
+        self.assertEqual(300, index.get_nth_free(3))
+        self.assertEqual(None, index.get_nth_free(4))
+        self.assertEqual(None, index.get_nth_free(0))
+        self.assertEqual(300, index.get_nth_free(2, "site-a"))
+        self.assertEqual(None, index.get_nth_free(1, "site-c"))
+
+    def test_storage_nodes_only(self):
+        """keeps free space entries only for storage nodes with known free space"""
+        index = build_index(
+            Node("a", 1000, 600, storage=False),
+            Node("b", 1000, -1),
+            Node("c", 1000, 300)
+        )
+        self.assertEqual(3000, index.get_total())
+        self.assertEqual(1, index.get_free_count())
+        self.assertEqual([(300, "c")], list(index.iterate_largest()))
+
+    def test_iterate_largest(self):
+        """iterates in descending order of free space down to min_free"""
+        index = build_index(
+            Node("a", 1000, 600),
+            Node("b", 1000, 300),
+            Node("c", 1000, 900),
+            Node("d", 1000, 300)
+        )
+        self.assertEqual(
+            [(900, "c"), (600, "a"), (300, "d"), (300, "b")],
+            list(index.iterate_largest())
+        )
+        self.assertEqual(
+            [(900, "c"), (600, "a"), (300, "d"), (300, "b")],
+            list(index.iterate_largest(min_free=300))
+        )
+        self.assertEqual(
+            [(900, "c"), (600, "a")], list(index.iterate_largest(min_free=301))
+        )
+        self.assertEqual([], list(index.iterate_largest(min_free=1000)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import drbdmanage.server as server
+import drbdmanage.consts as const
+import drbdmanage.exceptions as DME
+
+from drbdmanage.deployers import BalancedDeployer, ReservationDeployer, PlannedNode
+from drbdmanage.drbd.drbdcore import Assignment, DrbdNode
+from drbdmanage.propscontainer import PropsContainer
+
+
+class Node(object):
+
+    """Node with the data the deployers read from DrbdNode objects"""
+
+    def __init__(self, name, poolfree, site=None, rack=None, get_serial=lambda: 1):
+        self.name = name
+        self.poolfree = poolfree
+        self.props = PropsContainer(get_serial, None, None)
+        if site is not None:
+            self.props.set_prop(
+                const.KEY_SITE, site,
+                PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+            )
+        if rack is not None:
+            self.props.set_prop(const.AUX_PROP_PREFIX + "rack", rack)
+
+    def get_name(self):
+        return self.name
+
+    def get_poolfree(self):
+        return self.poolfree
+
+    def get_props(self):
+        return self.props
+
+    def get_state(self):
+        return DrbdNode.FLAG_STORAGE
+
+
+def node_dict(*nodes):
+    return dict([(node.get_name(), node) for node in nodes])
+
+
+class PlannedNodeTests(unittest.TestCase):
+
+    def test_get_poolfree(self):
+        """subtracts the planned storage from the free memory"""
+        node = Node("a", 1000)
+        planned = PlannedNode(node, 300)
+        self.assertEqual(700, planned.get_poolfree())
+        self.assertEqual(1000, node.get_poolfree())
+        self.assertEqual(0, PlannedNode(node, 3000).get_poolfree())
+
+    def test_unknown_pool(self):
+        """keeps unknown free memory unknown"""
+        self.assertEqual(-1, PlannedNode(Node("a", -1), 300).get_poolfree())
+
+    def test_forward(self):
+        """forwards other functions to the node"""
+        node = Node("a", 1000)
+        planned = PlannedNode(node, 300)
+        self.assertEqual("a", planned.get_name())
+        self.assertTrue(planned.get_node() is node)
+
+    def test_deploy_select(self):
+        """lets the deployer select other nodes for the next resource"""
+        node_a = Node("a", 1000)
+        node_b = Node("b", 900)
+        nodes = node_dict(PlannedNode(node_a, 500), node_b)
+        result = []
+        BalancedDeployer(None).deploy_select(nodes, result, 1, 50, False)
+        self.assertEqual(["b"], [node.get_name() for node in result])
+
+
+class BalancedDeployerTests(unittest.TestCase):
+
+    def test_deploy_select(self):
+        """selects the nodes with the most free memory"""
+        nodes = node_dict(Node("a", 100), Node("b", 300), Node("c", 200))
+        result = []
+        fn_rc = BalancedDeployer(None).deploy_select(nodes, result, 2, 50, False)
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual(["b", "c"], [node.get_name() for node in result])
+
+    def test_deploy_select_assigned(self):
+        """appends nodes to the nodes that have the resource already"""
+        assigned = Node("a", 100)
+        nodes = node_dict(Node("b", 300), Node("c", 200))
+        result = [assigned]
+        fn_rc = BalancedDeployer(None).deploy_select(nodes, result, 2, 50, False)
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual(["a", "b"], [node.get_name() for node in result])
+
+
+class ReservationDeployerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.deployer = ReservationDeployer(None)
+        self.deployer.set_config({ReservationDeployer.KEY_FAILURE_DOMAIN: "rack"})
+
+    def select(self, nodes, count, size_kiB, result=None):
+        if result is None:
+            result = []
+        fn_rc = self.deployer.deploy_select(nodes, result, count, size_kiB, False)
+        return fn_rc, [node.get_name() for node in result]
+
+    def test_spread_over_sites(self):
+        """spreads over sites before spreading over racks"""
+        nodes = node_dict(
+            Node("a1", 1000, "site-a", "rack1"),
+            Node("a2", 900, "site-a", "rack2"),
+            Node("b1", 100, "site-b", "rack1")
+        )
+        fn_rc, names = self.select(nodes, 2, 50)
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual(set(["a1", "b1"]), set(names))
+
+    def test_spread_over_racks(self):
+        """spreads over the racks within a site"""
+        nodes = node_dict(
+            Node("a1", 1000, "site-a", "rack1"),
+            Node("a2", 900, "site-a", "rack1"),
+            Node("a3", 100, "site-a", "rack2")
+        )
+        fn_rc, names = self.select(nodes, 2, 50)
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual(set(["a1", "a3"]), set(names))
+
+    def test_same_rack_name_in_different_sites(self):
+        """treats racks of the same name in different sites as different racks"""
+        nodes = node_dict(
+            Node("a1", 1000, "site-a", "rack1"),
+            Node("a2", 900, "site-a", "rack1"),
+            Node("b1", 800, "site-b", "rack1"),
+            Node("b2", 700, "site-b", "rack2")
+        )
+        fn_rc, names = self.select(nodes, 3, 50)
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual(set(["a1", "b1", "b2"]), set(names))
+
+    def test_assigned_nodes_count(self):
+        """counts the sites and racks of the nodes that have the resource"""
+        assigned = Node("a1", 1000, "site-a", "rack1")
+        nodes = node_dict(
+            Node("a2", 1000, "site-a", "rack1"),
+            Node("a3", 900, "site-a", "rack2"),
+            Node("b1", 100, "site-b", "rack1")
+        )
+        fn_rc, names = self.select(nodes, 3, 50, [assigned])
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual("a1", names[0])
+        self.assertEqual(set(["a3", "b1"]), set(names[1:]))
+
+    def test_most_free_memory(self):
+        """selects the node with the most available memory of a rack"""
+        nodes = node_dict(
+            Node("a1", 100, "site-a", "rack1"),
+            Node("a2", 300, "site-a", "rack1"),
+            Node("a3", 200, "site-a", "rack1")
+        )
+        fn_rc, names = self.select(nodes, 1, 50)
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual(["a2"], names)
+
+    def test_reserve(self):
+        """subtracts the storage reserved by previous selections"""
+        node_a = Node("a", 1000)
+        node_b = Node("b", 900)
+        nodes = node_dict(node_a, node_b)
+        self.assertEqual(["a"], self.select(nodes, 1, 500)[1])
+        self.assertEqual(500, self.deployer.get_reserved_kiB(node_a))
+        self.assertEqual(["b"], self.select(nodes, 1, 500)[1])
+        self.assertEqual(DME.DM_ENOSPC, self.select(nodes, 1, 600)[0])
+
+    def test_reservation_dropped_on_report(self):
+        """drops reservations when the node reports new pool data"""
+        node_a = Node("a", 1000)
+        self.select(node_dict(node_a), 1, 500)
+        node_a.poolfree = 500
+        self.assertEqual(0, self.deployer.get_reserved_kiB(node_a))
+
+    def test_reservation_timeout(self):
+        """drops reservations that are older than the reservation timeout"""
+        self.deployer.set_config({ReservationDeployer.KEY_RESERVATION_TTL: "-1"})
+        node_a = Node("a", 1000)
+        self.select(node_dict(node_a), 1, 500)
+        self.assertEqual(0, self.deployer.get_reserved_kiB(node_a))
+
+    def test_no_reservation_without_space(self):
+        """does not reserve storage if not enough nodes are found"""
+        node_a = Node("a", 1000)
+        node_b = Node("b", 100)
+        fn_rc, names = self.select(node_dict(node_a, node_b), 2, 500)
+        self.assertEqual(DME.DM_ENOSPC, fn_rc)
+        self.assertEqual(0, self.deployer.get_reserved_kiB(node_a))
+        self.assertEqual(0, self.deployer.get_reserved_kiB(node_b))
+
+    def test_unknown_pool(self):
+        """selects nodes with unknown pool data only if deploy_unknown is set"""
+        nodes = node_dict(Node("a", -1))
+        self.assertEqual(DME.DM_ENOSPC, self.select(nodes, 1, 50)[0])
+        result = []
+        fn_rc = self.deployer.deploy_select(nodes, result, 1, 50, True)
+        self.assertEqual(DME.DM_SUCCESS, fn_rc)
+        self.assertEqual(1, len(result))
+
+    def test_site_change(self):
+        """reads the site again after the node's properties changed"""
+        serial = [1]
+        node_a = Node("a1", 1000, "site-a", "rack1")
+        node_b = Node("b1", 900, "site-b", "rack1", lambda: serial[0])
+        node_c = Node("c1", 800, "site-c", "rack1")
+        nodes = node_dict(node_a, node_b, node_c)
+        self.assertEqual(set(["a1", "b1"]), set(self.select(nodes, 2, 50)[1]))
+        serial[0] = 2
+        node_b.props.set_prop(
+            const.KEY_SITE, "site-a",
+            PropsContainer.NAMESPACES[PropsContainer.KEY_DMCONFIG]
+        )
+        self.assertEqual(set(["a1", "c1"]), set(self.select(nodes, 2, 50)[1]))
+
+    def test_undeploy_select(self):
+        """undeploys from the nodes with the least available memory"""
+        nodes = node_dict(Node("a", 100), Node("b", 300), Node("c", 200))
+        result = []
+        self.deployer.undeploy_select(nodes, result, 2, False)
+        self.assertEqual(["a", "c"], [node.get_name() for node in result])
+
+
+class LegacyDeployer(object):
+
+    """Deployer plugin that does not set COUNTS_ASSIGNED"""
+
+    def __init__(self):
+        self.calls = []
+
+    def deploy_select(self, nodes, result, count, size_kiB, deploy_unknown):
+        self.calls.append((len(result), count))
+        for name in sorted(nodes.iterkeys())[:count]:
+            result.append(nodes[name])
+        return DME.DM_SUCCESS
+
+
+class Assg(object):
+
+    def __init__(self, node):
+        self.node = node
+
+    def get_node(self):
+        return self.node
+
+    def get_tstate(self):
+        return Assignment.FLAG_DEPLOY
+
+
+class Resource(object):
+
+    """Resource with the data that the server's auto-deploy reads"""
+
+    def __init__(self, *assigned):
+        self.assignments = dict([(node.get_name(), Assg(node)) for node in assigned])
+
+    def assigned_count(self):
+        return len(self.assignments)
+
+    def get_assignment(self, node_name):
+        return self.assignments.get(node_name)
+
+    def iterate_assignments(self):
+        return self.assignments.itervalues()
+
+    def iterate_volumes(self):
+        return iter([])
+
+
+class AutoDeployTests(unittest.TestCase):
+
+    """Calls of the deployer plugins by the server's auto-deploy"""
+
+    def setUp(self):
+        srv = server.DrbdManageServer
+        self.server = srv.__new__(srv)
+        self.server._conf = dict(srv.CONF_DEFAULTS)
+        self.assigned = []
+        self.server._assign = (
+            lambda node, resource, cstate, tstate, node_id:
+            self.assigned.append(node.get_name())
+        )
+        self.nodes = [Node("a", 300), Node("b", 200), Node("c", 100)]
+        self.resource = Resource(self.nodes[0])
+
+    def auto_deploy(self, deployer):
+        return self.server._auto_deploy_resource(
+            [], deployer, self.resource, 3, 0, False, self.nodes, 32
+        )
+
+    def test_counts_assigned(self):
+        """passes the assigned nodes to plugins that set COUNTS_ASSIGNED"""
+        self.assertTrue(self.auto_deploy(BalancedDeployer(None)))
+        self.assertEqual(["b", "c"], self.assigned)
+
+    def test_legacy_deployer(self):
+        """passes an empty result and the number of nodes to add to other plugins"""
+        deployer = LegacyDeployer()
+        self.assertTrue(self.auto_deploy(deployer))
+        self.assertEqual([(0, 2)], deployer.calls)
+        self.assertEqual(["b", "c"], self.assigned)
+
+
+if __name__ == "__main__":
+    unittest.main()
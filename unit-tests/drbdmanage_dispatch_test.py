@@ -0,0 +1,293 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import threading
+import unittest
+
+# The server module must be imported first, it is part of an import cycle
+# with the dispatcher
+import drbdmanage.server  # NOQA
+import drbdmanage.dispatch as dispatch
+import drbdmanage.drbd.drbdcore as drbdcore
+import drbdmanage.drbd.persistence as persistence
+
+from drbdmanage.dispatch import RequestDispatcher
+
+
+def containers(node_names, res_name):
+    """
+    Returns the containers of a configuration with a resource that is
+    assigned to all nodes
+    """
+    get_serial = lambda: 1
+    nodes_con, res_con, assg_con = {}, {}, {}
+    resource = drbdcore.DrbdResource(
+        res_name, 7000, "secret", 0, None, get_serial, None, None
+    )
+    persistence.DrbdResourcePersistence(resource).save(res_con)
+    for node_id, name in enumerate(node_names):
+        node = drbdcore.DrbdNode(
+            name, "10.0.0.%d" % (node_id + 1), 4, node_id, 0, 1000, 1000,
+            get_serial, None, None
+        )
+        persistence.DrbdNodePersistence(node).save(nodes_con)
+        assignment = drbdcore.Assignment(
+            node, resource, node_id, 0, 0, 0, None, get_serial, None, None
+        )
+        persistence.AssignmentPersistence(assignment).save(assg_con)
+    return (nodes_con, res_con, assg_con, {}, {})
+
+
+class BlockingSnapshot(dispatch.ConfigSnapshot):
+
+    """Snapshot that is built only after the test releases the builder"""
+
+    started = None
+    release = None
+    built   = None
+
+    def __init__(self, source):
+        BlockingSnapshot.started.set()
+        BlockingSnapshot.release.wait()
+        BlockingSnapshot.built.append(source[0])
+        super(BlockingSnapshot, self).__init__(source)
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = RequestDispatcher()
+
+    def get_built_snapshot(self):
+        """Returns the snapshot after the builder thread has finished"""
+        self.dispatcher.get_snapshot()
+        builder = self.dispatcher._builder
+        if builder is not None:
+            builder.join()
+        return self.dispatcher.get_snapshot()
+
+    def test_not_published(self):
+        """returns no snapshot before a configuration is published"""
+        self.assertEqual(None, self.dispatcher.get_snapshot())
+
+    def test_first_snapshot(self):
+        """does not wait for the first snapshot to be built"""
+        self.dispatcher.publish(1, containers(["alpha"], "res"))
+        self.assertEqual(None, self.dispatcher.get_snapshot())
+        snapshot = self.get_built_snapshot()
+        self.assertEqual(1, snapshot.get_serial())
+        self.assertEqual(["alpha"], snapshot.get_nodes().keys())
+
+    def test_consistent(self):
+        """builds the nodes, resources and assignments of one configuration"""
+        self.dispatcher.publish(1, containers(["alpha", "bravo"], "res"))
+        snapshot = self.get_built_snapshot()
+        nodes = snapshot.get_nodes()
+        resource = snapshot.get_resources()["res"]
+        self.assertEqual(["alpha", "bravo"], sorted(nodes.keys()))
+        for assignment in resource.iterate_assignments():
+            node = assignment.get_node()
+            self.assertTrue(nodes[node.get_name()] is node)
+            self.assertTrue(node.get_assignment("res") is assignment)
+        self.assertEqual(2, len(list(resource.iterate_assignments())))
+
+    def test_previous_snapshot(self):
+        """serves the previous snapshot to requests queued before a publication"""
+        self.dispatcher.publish(1, containers(["alpha"], "res"))
+        old_snapshot = self.get_built_snapshot()
+        old_gen = self.dispatcher._published_gen
+
+        BlockingSnapshot.started = threading.Event()
+        BlockingSnapshot.release = threading.Event()
+        BlockingSnapshot.built = []
+        saved_class = dispatch.ConfigSnapshot
+        dispatch.ConfigSnapshot = BlockingSnapshot
+        try:
+            self.dispatcher.publish(2, containers(["alpha", "bravo"], "res"))
+            # The builder waits, the readers do not
+            self.assertTrue(self.dispatcher.get_snapshot(old_gen) is old_snapshot)
+            self.assertTrue(self.dispatcher.get_snapshot(old_gen) is old_snapshot)
+            self.assertEqual(["alpha"], old_snapshot.get_nodes().keys())
+            # Requests queued after the publication do not get the old snapshot
+            new_gen = self.dispatcher._published_gen
+            self.assertEqual(None, self.dispatcher.get_snapshot(new_gen))
+            BlockingSnapshot.release.set()
+            snapshot = self.get_built_snapshot()
+        finally:
+            BlockingSnapshot.release.set()
+            dispatch.ConfigSnapshot = saved_class
+        self.assertTrue(self.dispatcher.get_snapshot(new_gen) is snapshot)
+        self.assertEqual(2, snapshot.get_serial())
+        self.assertEqual(["alpha", "bravo"], sorted(snapshot.get_nodes().keys()))
+        # The previous snapshot is not modified
+        self.assertEqual(["alpha"], old_snapshot.get_nodes().keys())
+
+    def test_coalesce(self):
+        """builds only the configuration that was published last"""
+        self.dispatcher.publish(1, containers(["alpha"], "res"))
+        self.get_built_snapshot()
+
+        BlockingSnapshot.started = threading.Event()
+        BlockingSnapshot.release = threading.Event()
+        BlockingSnapshot.built = []
+        saved_class = dispatch.ConfigSnapshot
+        dispatch.ConfigSnapshot = BlockingSnapshot
+        try:
+            self.dispatcher.publish(2, containers(["bravo"], "res"))
+            self.dispatcher.get_snapshot()
+            BlockingSnapshot.started.wait()
+            self.dispatcher.publish(3, containers(["charlie"], "res"))
+            self.dispatcher.publish(4, containers(["delta"], "res"))
+            self.dispatcher.get_snapshot()
+            BlockingSnapshot.release.set()
+            snapshot = self.get_built_snapshot()
+        finally:
+            BlockingSnapshot.release.set()
+            dispatch.ConfigSnapshot = saved_class
+        self.assertEqual(4, snapshot.get_serial())
+        self.assertEqual(["delta"], snapshot.get_nodes().keys())
+        # The build of the second configuration was already running
+        self.assertEqual([2, 4], BlockingSnapshot.built)
+
+    def test_unchanged(self):
+        """does not rebuild the snapshot if the containers did not change"""
+        source = containers(["alpha"], "res")
+        self.dispatcher.publish(1, source)
+        snapshot = self.get_built_snapshot()
+        self.dispatcher.publish(1, source)
+        self.assertTrue(self.dispatcher.get_snapshot() is snapshot)
+        self.assertEqual(None, self.dispatcher._builder)
+
+    def test_unpublish(self):
+        """drops the snapshot if the configuration is unpublished"""
+        self.dispatcher.publish(1, containers(["alpha"], "res"))
+        self.get_built_snapshot()
+        self.dispatcher.publish(1, None)
+        self.assertEqual(None, self.dispatcher.get_snapshot())
+
+    def test_change_index(self):
+        """builds the index of changed objects before the snapshot is served"""
+        self.dispatcher.publish(1, containers(["alpha"], "res"))
+        snapshot = self.get_built_snapshot()
+        self.assertTrue(snapshot._change_index is not None)
+
+
+class MainLoop(object):
+
+    """Records the sources that the dispatcher adds to the main loop"""
+
+    PRIORITY_DEFAULT = 0
+
+    def __init__(self):
+        self.idle = []
+        self.added = threading.Condition()
+
+    def idle_add(self, fn, *args, **kwargs):
+        with self.added:
+            self.idle.append((fn, args))
+            self.added.notify_all()
+        return 0
+
+    def run_idle(self, count):
+        """Runs the idle sources until count sources have run"""
+        while count > 0:
+            with self.added:
+                if len(self.idle) == 0:
+                    self.added.wait(10)
+                if len(self.idle) == 0:
+                    raise AssertionError("No source was added to the main loop")
+                fn, args = self.idle.pop(0)
+            count -= 1
+            if fn(*args):
+                self.idle.append((fn, args))
+
+
+class ReadYourWritesTests(unittest.TestCase):
+
+    """Read requests after a modification from the same client"""
+
+    def setUp(self):
+        self.main_loop = MainLoop()
+        self.saved_gobject = dispatch.gobject
+        dispatch.gobject = self.main_loop
+        self.saved_class = dispatch.ConfigSnapshot
+        self.dispatcher = RequestDispatcher()
+        # The server's configuration
+        self.node_names = ["alpha"]
+        self.dispatcher.publish(1, containers(self.node_names, "res"))
+        self.dispatcher.get_snapshot()
+        self.dispatcher._builder.join()
+
+    def tearDown(self):
+        if BlockingSnapshot.release is not None:
+            BlockingSnapshot.release.set()
+        dispatch.ConfigSnapshot = self.saved_class
+        dispatch.gobject = self.saved_gobject
+
+    def create_node(self, name):
+        self.node_names.append(name)
+        self.dispatcher.publish(2, containers(self.node_names, "res"))
+        return 0
+
+    def list_nodes(self, view=None):
+        if view is None:
+            return sorted(self.node_names)
+        return sorted(view.get_nodes().keys())
+
+    def test_read_after_write(self):
+        """sees the modification while the new snapshot is being built"""
+        BlockingSnapshot.started = threading.Event()
+        BlockingSnapshot.release = threading.Event()
+        BlockingSnapshot.built = []
+        dispatch.ConfigSnapshot = BlockingSnapshot
+        replies = []
+
+        self.dispatcher.write(
+            self.create_node, ["bravo"], replies.append, replies.append
+        )
+        self.main_loop.run_idle(1)
+        self.assertEqual([0], replies)
+
+        self.dispatcher.read(self.list_nodes, [], replies.append, replies.append)
+        # The reader queues the request on the main loop, which runs it
+        # and sends the reply
+        self.main_loop.run_idle(2)
+        self.assertEqual([0, ["alpha", "bravo"]], replies)
+        self.assertFalse(BlockingSnapshot.release.is_set())
+
+    def test_read_snapshot(self):
+        """serves reads from the snapshot once it is built"""
+        BlockingSnapshot.release = threading.Event()
+        replies = []
+        self.dispatcher.write(
+            self.create_node, ["bravo"], replies.append, replies.append
+        )
+        self.main_loop.run_idle(1)
+        self.dispatcher.get_snapshot()
+        self.dispatcher._builder.join()
+        # Modify the server's configuration without publishing it
+        self.node_names.append("charlie")
+
+        self.dispatcher.read(self.list_nodes, [], replies.append, replies.append)
+        self.main_loop.run_idle(1)
+        self.assertEqual([0, ["alpha", "bravo"]], replies)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import drbdmanage.metrics as metrics
+
+from drbdmanage.metrics import (
+    BUCKET_BASE, BUCKET_COUNT, GROUP_DBUS, GROUP_RPC,
+    Metric, MetricsRegistry, bucket_bound, bucket_index, timed
+)
+
+
+class Clock(object):
+
+    """Replaces the time module of the metrics module"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class BucketTests(unittest.TestCase):
+
+    def test_bucket_index(self):
+        """counts durations in the bucket with the next larger upper bound"""
+        self.assertEqual(0, bucket_index(0.0))
+        self.assertEqual(0, bucket_index(BUCKET_BASE / 2))
+        self.assertEqual(0, bucket_index(BUCKET_BASE))
+        self.assertEqual(1, bucket_index(BUCKET_BASE * 1.5))
+        self.assertEqual(1, bucket_index(BUCKET_BASE * 2))
+        self.assertEqual(2, bucket_index(BUCKET_BASE * 2.5))
+        self.assertEqual(10, bucket_index(BUCKET_BASE * 1024))
+
+    def test_bucket_bounds(self):
+        """counts each duration in a bucket whose upper bound is not smaller"""
+        for idx in xrange(BUCKET_COUNT):
+            bound = bucket_bound(idx)
+            self.assertEqual(idx, bucket_index(bound))
+            self.assertEqual(idx + 1, bucket_index(bound * 1.01))
+
+    def test_overflow(self):
+        """counts durations above the last upper bound in the last bucket"""
+        last_bound = bucket_bound(BUCKET_COUNT - 1)
+        self.assertEqual(BUCKET_COUNT, bucket_index(last_bound * 1.01))
+        self.assertEqual(BUCKET_COUNT, bucket_index(3600.0))
+        self.assertEqual(BUCKET_COUNT, bucket_index(1e12))
+        self.assertEqual(None, bucket_bound(BUCKET_COUNT))
+
+
+class MetricTests(unittest.TestCase):
+
+    def test_empty(self):
+        """has neither a mean nor percentiles without durations"""
+        metric = Metric()
+        self.assertEqual(0.0, metric.get_mean())
+        self.assertEqual(None, metric.get_percentile(0.5))
+
+    def test_observe(self):
+        """counts the durations"""
+        metric = Metric()
+        metric.observe(0.001)
+        metric.observe(0.003)
+        self.assertEqual(2, metric.count)
+        self.assertAlmostEqual(0.004, metric.total)
+        self.assertAlmostEqual(0.002, metric.get_mean())
+        self.assertEqual(2, sum(metric.buckets))
+
+    def test_get_percentile(self):
+        """returns the upper bound of the bucket that contains the percentile"""
+        metric = Metric()
+        for idx in xrange(98):
+            metric.observe(BUCKET_BASE)
+        metric.observe(bucket_bound(5))
+        metric.observe(bucket_bound(10))
+        self.assertEqual(bucket_bound(0), metric.get_percentile(0.0))
+        self.assertEqual(bucket_bound(0), metric.get_percentile(0.5))
+        self.assertEqual(bucket_bound(0), metric.get_percentile(0.98))
+        self.assertEqual(bucket_bound(5), metric.get_percentile(0.99))
+        self.assertEqual(bucket_bound(10), metric.get_percentile(1.0))
+
+    def test_get_percentile_overflow(self):
+        """has no upper bound for percentiles in the last bucket"""
+        metric = Metric()
+        metric.observe(BUCKET_BASE)
+        metric.observe(3600.0)
+        self.assertEqual(bucket_bound(0), metric.get_percentile(0.5))
+        self.assertEqual(None, metric.get_percentile(0.99))
+
+
+class MetricsRegistryTests(unittest.TestCase):
+
+    def test_get_metrics(self):
+        """returns the metrics sorted by group and name"""
+        registry = MetricsRegistry()
+        registry.observe(GROUP_RPC, "list_nodes", 0.001)
+        registry.observe(GROUP_DBUS, "list_resources", 0.001)
+        registry.observe(GROUP_DBUS, "list_nodes", 0.001)
+        registry.observe(GROUP_DBUS, "list_nodes", 0.002)
+        entries = registry.get_metrics()
+        self.assertEqual(
+            [(GROUP_DBUS, "list_nodes", 2), (GROUP_DBUS, "list_resources", 1),
+             (GROUP_RPC, "list_nodes", 1)],
+            [(group, name, count) for (group, name, count, total, buckets) in entries]
+        )
+        self.assertEqual(1, len(registry.get_metrics(GROUP_RPC)))
+        registry.reset()
+        self.assertEqual([], registry.get_metrics())
+
+    def test_format_prometheus(self):
+        """formats cumulative histograms per group"""
+        registry = MetricsRegistry()
+        registry.observe(GROUP_DBUS, "list_nodes", BUCKET_BASE)
+        registry.observe(GROUP_DBUS, "list_nodes", 3600.0)
+        lines = registry.format_prometheus().splitlines()
+        name = "drbdmanage_dbus_seconds"
+        self.assertEqual("# TYPE %s histogram" % (name), lines[1])
+        self.assertTrue(
+            '%s_bucket{method="list_nodes",le="%r"} 1' % (name, BUCKET_BASE) in lines
+        )
+        self.assertTrue(
+            '%s_bucket{method="list_nodes",le="+Inf"} 2' % (name) in lines
+        )
+        self.assertTrue('%s_count{method="list_nodes"} 2' % (name) in lines)
+        # Groups without metrics are left out
+        self.assertEqual(0, len([line for line in lines if "rpc" in line]))
+
+    def test_escape_label(self):
+        """escapes backslashes, quotes and line breaks in label values"""
+        registry = MetricsRegistry()
+        registry.observe(GROUP_RPC, 'a\\b"c\nd', 0.001)
+        lines = registry.format_prometheus().splitlines()
+        self.assertTrue(
+            'drbdmanage_rpc_seconds_count{method="a\\\\b\\"c\\nd"} 1' in lines
+        )
+        for line in lines:
+            self.assertFalse("\n" in line)
+
+
+class TimedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.saved_time = metrics.time
+        metrics.time = self.clock
+        metrics.get_registry().reset()
+
+    def tearDown(self):
+        metrics.time = self.saved_time
+        metrics.get_registry().reset()
+
+    def get_durations(self):
+        return dict([
+            (name, (count, total))
+            for (group, name, count, total, buckets)
+            in metrics.get_registry().get_metrics(GROUP_DBUS)
+        ])
+
+    def test_timed(self):
+        """counts the duration of a call until it returns"""
+        @timed(GROUP_DBUS)
+        def method(value):
+            self.clock.now += 0.5
+            return value
+
+        self.assertEqual(7, method(7))
+        self.assertEqual({"method": (1, 0.5)}, self.get_durations())
+
+    def test_name(self):
+        """names the operation by the name or the function that is passed"""
+        @timed(GROUP_DBUS, "fixed")
+        def method_a():
+            pass
+
+        @timed(GROUP_DBUS, lambda op: "op_" + op)
+        def method_b(op):
+            pass
+
+        method_a()
+        method_b("create")
+        self.assertEqual(["fixed", "op_create"], sorted(self.get_durations().keys()))
+
+    def test_exception(self):
+        """counts calls that raise an exception"""
+        @timed(GROUP_DBUS)
+        def method():
+            self.clock.now += 0.25
+            raise ValueError
+
+        self.assertRaises(ValueError, method)
+        self.assertEqual({"method": (1, 0.25)}, self.get_durations())
+
+    def test_reply_handler(self):
+        """counts the duration until the asynchronous reply is sent"""
+        replies = []
+        pending = []
+
+        @timed(GROUP_DBUS)
+        def method(value, reply_handler=None, error_handler=None):
+            pending.append(lambda: reply_handler(value))
+
+        method(3, reply_handler=replies.append, error_handler=None)
+        self.clock.now += 0.5
+        # Not counted before the reply is sent
+        self.assertEqual({}, self.get_durations())
+        self.clock.now += 1.5
+        pending[0]()
+        self.assertEqual([3], replies)
+        self.assertEqual({"method": (1, 2.0)}, self.get_durations())
+
+    def test_error_handler(self):
+        """counts the duration until the asynchronous error is sent"""
+        errors = []
+        pending = []
+
+        @timed(GROUP_DBUS)
+        def method(reply_handler=None, error_handler=None):
+            pending.append(lambda: error_handler(ValueError("failed")))
+
+        method(reply_handler=lambda: None, error_handler=errors.append)
+        self.clock.now += 1.0
+        pending[0]()
+        self.assertEqual(1, len(errors))
+        self.assertEqual({"method": (1, 1.0)}, self.get_durations())
+
+    def test_reply_handler_exception(self):
+        """counts asynchronous calls that raise an exception"""
+        @timed(GROUP_DBUS)
+        def method(reply_handler=None, error_handler=None):
+            self.clock.now += 0.75
+            raise ValueError
+
+        self.assertRaises(
+            ValueError, method, reply_handler=lambda: None, error_handler=lambda exc: None
+        )
+        self.assertEqual({"method": (1, 0.75)}, self.get_durations())
+
+
+if __name__ == "__main__":
+    unittest.main()
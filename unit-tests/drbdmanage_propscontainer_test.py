@@ -0,0 +1,157 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import drbdmanage.consts as const
+
+from drbdmanage.propscontainer import PropsContainer
+from drbdmanage.utils import serial_filter
+
+
+class Obj(object):
+
+    def __init__(self, props):
+        self.props = props
+
+    def get_props(self):
+        return self.props
+
+
+class SerialTests(unittest.TestCase):
+
+    def test_init_serial(self):
+        """uses the initial serial number, the SERIAL property or a new one"""
+        props = PropsContainer(lambda: 5, "3", None)
+        self.assertEqual(3, props.get_serial())
+        props = PropsContainer(lambda: 5, None, {const.SERIAL: "4"})
+        self.assertEqual(4, props.get_serial())
+        props = PropsContainer(lambda: 5, None, None)
+        self.assertEqual(5, props.get_serial())
+        props = PropsContainer(None, None, None)
+        self.assertEqual(1, props.get_serial())
+
+    def test_serial_property(self):
+        """keeps the SERIAL property as the string of the serial number"""
+        serial = [1]
+        props = PropsContainer(lambda: serial[0], None, None)
+        serial[0] = 12
+        props.set_prop("key", "value")
+        self.assertEqual(12, props.get_serial())
+        self.assertTrue(isinstance(props.get_serial(), int))
+        self.assertEqual("12", props.get_prop(const.SERIAL))
+        self.assertEqual("12", props.get_all_props()[const.SERIAL])
+
+    def test_serial_gen(self):
+        """changes the serial number once per generation of a SerialGen"""
+        cluster_props = PropsContainer(None, 9, None)
+        serial_gen = cluster_props.new_serial_gen()
+        props = PropsContainer(serial_gen.get_serial, None, None)
+        self.assertEqual(10, props.get_serial())
+        props.set_prop("key", "value")
+        props.set_prop("key", "other")
+        self.assertEqual(10, props.get_serial())
+
+        cluster_props.new_serial()
+        serial_gen.close_serial()
+        props.set_prop("key", "value")
+        self.assertEqual(11, props.get_serial())
+        self.assertEqual("11", props.get_prop(const.SERIAL))
+
+    def test_serial_filter(self):
+        """compares the serial numbers as integers"""
+        objects = [
+            Obj(PropsContainer(None, serial, None)) for serial in [9, 10, 100]
+        ]
+        self.assertEqual(
+            [10, 100],
+            [obj.get_props().get_serial() for obj in serial_filter(9, objects)]
+        )
+        self.assertEqual([], list(serial_filter(100, objects)))
+
+
+class TypedPropsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.props = PropsContainer(lambda: 1, None, None)
+        self.props.set_prop("size", "1024")
+        self.props.set_prop("name", "alpha")
+
+    def test_get_long_or_default(self):
+        """parses integer properties and returns the default otherwise"""
+        self.assertEqual(1024, self.props.get_long_or_default("size", 0))
+        self.assertTrue(isinstance(self.props.get_long_or_default("size", 0), long))
+        self.assertEqual(-1, self.props.get_long_or_default("name", -1))
+        self.assertEqual(-1, self.props.get_long_or_default("missing", -1))
+        self.assertEqual(None, self.props.get_long_or_default("missing", None))
+
+    def test_get_int_or_default(self):
+        """returns integer properties as int"""
+        self.assertEqual(1024, self.props.get_int_or_default("size", 0))
+        self.assertTrue(isinstance(self.props.get_int_or_default("size", 0), int))
+        self.assertEqual(7, self.props.get_int_or_default("name", 7))
+
+    def test_namespace(self):
+        """caches the properties of different namespaces separately"""
+        self.props.set_prop("size", "2048", "/dso/")
+        self.assertEqual(1024, self.props.get_long_or_default("size", 0))
+        self.assertEqual(2048, self.props.get_long_or_default("size", 0, "dso"))
+
+    def test_set_prop(self):
+        """parses a property again after it was set"""
+        self.assertEqual(1024, self.props.get_long_or_default("size", 0))
+        self.props.set_prop("size", "4096")
+        self.assertEqual(4096, self.props.get_long_or_default("size", 0))
+        self.assertEqual(4096, self.props.get_int_or_default("size", 0))
+        self.assertEqual(0, self.props.get_long_or_default("count", 0))
+        self.props.set_prop("count", "3")
+        self.assertEqual(3, self.props.get_long_or_default("count", 0))
+
+    def test_remove_prop(self):
+        """returns the default after a property was removed"""
+        self.assertEqual(1024, self.props.get_long_or_default("size", 0))
+        self.props.remove_prop("size")
+        self.assertEqual(0, self.props.get_long_or_default("size", 0))
+        self.assertEqual(0, self.props.get_int_or_default("size", 0))
+
+    def test_merge_props(self):
+        """parses the properties again after properties were merged"""
+        self.assertEqual(1024, self.props.get_long_or_default("size", 0))
+        self.props.merge_props({"size": "8192"})
+        self.assertEqual(8192, self.props.get_long_or_default("size", 0))
+
+    def test_new_generation(self):
+        """drops the parsed values when a new generation begins"""
+        cluster_props = PropsContainer(None, 1, None)
+        serial_gen = cluster_props.new_serial_gen()
+        props = PropsContainer(serial_gen.get_serial, None, {"size": "1024"})
+        self.assertEqual(1024, props.get_long_or_default("size", 0))
+        # Bypass the functions that begin a new generation
+        props._props["size"] = "2048"
+        self.assertEqual(1024, props.get_long_or_default("size", 0))
+
+        cluster_props.new_serial()
+        serial_gen.close_serial()
+        props.new_serial()
+        self.assertEqual(3, props.get_serial())
+        self.assertEqual(2048, props.get_long_or_default("size", 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
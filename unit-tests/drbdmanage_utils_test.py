@@ -353,6 +353,62 @@ class GetFreeNumberTests(unittest.TestCase):
         )
 
 
+class NumberAllocatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.allocator = utils.NumberAllocator(5, 10)
+        for nr in [3, 5, 6, 8, 1111]:
+            self.allocator.allocate(nr)
+
+    def test_get_free(self):
+        """returns the first free number at or after the start number"""
+        self.assertEqual(7, self.allocator.get_free())
+        self.assertEqual(9, self.allocator.get_free(8))
+
+    def test_get_free_wraps_around(self):
+        """continues searching at the start of the range"""
+        self.allocator.allocate(9)
+        self.allocator.allocate(10)
+        self.assertEqual(7, self.allocator.get_free(9))
+
+    def test_get_free_excluded(self):
+        """skips excluded numbers"""
+        self.assertEqual(9, self.allocator.get_free(None, set([7])))
+
+    def test_get_free_no_free(self):
+        """returns -1 if all numbers in the range are allocated"""
+        for nr in [7, 9, 10]:
+            self.allocator.allocate(nr)
+        self.assertEqual(-1, self.allocator.get_free())
+
+    def test_release(self):
+        """releases numbers after all of their allocations are released"""
+        self.allocator.allocate(5)
+        self.allocator.release(5)
+        self.assertFalse(self.allocator.is_free(5))
+        self.allocator.release(5)
+        self.assertTrue(self.allocator.is_free(5))
+        self.assertEqual(5, self.allocator.get_free())
+
+    def test_is_free_out_of_range(self):
+        """tracks numbers outside of the range"""
+        self.assertFalse(self.allocator.is_free(1111))
+        self.assertTrue(self.allocator.is_free(4))
+        self.assertEqual([3, 5, 6, 8, 1111], self.allocator.get_allocated())
+
+    def test_release_highest(self):
+        """returns released numbers below and at the highest allocated number"""
+        self.allocator.allocate(9)
+        self.allocator.release(8)
+        self.allocator.release(9)
+        self.assertEqual(8, self.allocator.get_free(8))
+        self.allocator.release(6)
+        self.assertEqual(6, self.allocator.get_free())
+        self.allocator.allocate(10)
+        self.assertEqual(7, self.allocator.get_free(7, set([6])))
+        self.assertEqual(9, self.allocator.get_free(9))
+
+
 class FillListTests(unittest.TestCase):
 
     def test_fill_list(self):
@@ -375,6 +431,68 @@ class FillListTests(unittest.TestCase):
         self.assertListEqual(out_list, out_list)
 
 
+class PageFilterTests(unittest.TestCase):
+
+    names = ["delta", "alpha", "echo", "charlie", "bravo"]
+
+    def test_page_filter(self):
+        """returns pages in ascending order and the cursor of the next page"""
+        key = lambda name: name
+        page, cursor = utils.page_filter(self.names, key, "", 2)
+        self.assertEqual(["alpha", "bravo"], list(page))
+        self.assertEqual("bravo", cursor)
+        page, cursor = utils.page_filter(self.names, key, cursor, 2)
+        self.assertEqual(["charlie", "delta"], list(page))
+        page, cursor = utils.page_filter(self.names, key, cursor, 2)
+        self.assertEqual(["echo"], list(page))
+        self.assertEqual("", cursor)
+
+    def test_page_filter_exact_limit(self):
+        """returns an empty cursor if the last page is full"""
+        page, cursor = utils.page_filter(self.names, lambda name: name, "", 5)
+        self.assertEqual(sorted(self.names), list(page))
+        self.assertEqual("", cursor)
+
+    def test_page_filter_no_limit(self):
+        """returns all objects after the cursor if there is no limit"""
+        page, cursor = utils.page_filter(self.names, lambda name: name, "charlie", 0)
+        self.assertEqual(["delta", "echo"], sorted(page))
+        self.assertEqual("", cursor)
+
+
+class PercentileTests(unittest.TestCase):
+
+    def test_percentile(self):
+        """returns the nearest-rank percentile"""
+        values = range(1, 101)
+        self.assertEqual(50, utils.percentile(values, 0.5))
+        self.assertEqual(99, utils.percentile(values, 0.99))
+        self.assertEqual(100, utils.percentile(values, 1.0))
+        self.assertEqual(1, utils.percentile(values, 0.0))
+
+    def test_percentile_small(self):
+        """returns the largest value for high percentiles of few values"""
+        self.assertEqual(3, utils.percentile([1, 2, 3], 0.9))
+        self.assertEqual(None, utils.percentile([], 0.5))
+
+
+class SelectorTests(unittest.TestCase):
+
+    def test_list_selector(self):
+        """selects the keys of the list"""
+        selector = utils.Selector(["cstate:deploy", "tstate:deploy"])
+        self.assertTrue(selector.list_selector("cstate:deploy"))
+        self.assertFalse(selector.list_selector("node-id"))
+        self.assertFalse(selector.list_selector(None))
+
+    def test_list_selector_frozenset(self):
+        """selects the keys of a frozenset without copying it"""
+        keys = frozenset(["cstate:deploy"])
+        selector = utils.Selector(keys)
+        self.assertTrue(selector.list_selector("cstate:deploy"))
+        self.assertFalse(selector.list_selector("tstate:deploy"))
+
+
 class AddRcEntryTests(unittest.TestCase):
 
     def test_add_rc_entry(self):
@@ -0,0 +1,303 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2013 - 2017   LINBIT HA-Solutions GmbH
+                              Author: R. Altnoeder, Roland Kammerer
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+# The server module must be imported first, it is part of an import cycle
+# with the waiter registry
+import drbdmanage.server as server
+import drbdmanage.waiters as waiters
+import drbdmanage.exceptions as DME
+
+from drbdmanage.consts import BOOL_TRUE, BOOL_FALSE
+from drbdmanage.dispatch import RequestDispatcher
+from drbdmanage.propscontainer import PropsContainer
+from drbdmanage.waiters import WaiterRegistry
+
+
+class MainLoop(object):
+
+    """Records the sources that the waiter registry adds to the main loop"""
+
+    def __init__(self):
+        self.idle = []
+        self.timeouts = {}
+        self.next_id = 1
+
+    def idle_add(self, fn, *args, **kwargs):
+        self.idle.append((fn, args))
+        return 0
+
+    def timeout_add(self, interval, fn, *args):
+        timer_id = self.next_id
+        self.next_id += 1
+        self.timeouts[timer_id] = (interval, fn, args)
+        return timer_id
+
+    def source_remove(self, timer_id):
+        del self.timeouts[timer_id]
+
+    def run_idle(self):
+        while len(self.idle) > 0:
+            fn, args = self.idle.pop(0)
+            fn(*args)
+
+    def expire(self, timer_id):
+        interval, fn, args = self.timeouts.pop(timer_id)
+        fn(*args)
+
+
+class Volume(object):
+
+    def __init__(self, size_kiB):
+        self.size_kiB = size_kiB
+
+    def get_size_kiB(self):
+        return self.size_kiB
+
+
+class Resource(object):
+
+    def __init__(self, volumes):
+        self.volumes = volumes
+
+    def get_volume(self, vol_id):
+        return self.volumes.get(vol_id)
+
+
+class Server(object):
+
+    """Server with the data that the wait_for plugins read"""
+
+    def __init__(self):
+        self.volume = Volume(100)
+        self._resources = {"res": Resource({0: self.volume})}
+
+
+class Replies(object):
+
+    """Reply function that records the replies"""
+
+    def __init__(self):
+        self.replies = []
+
+    def __call__(self, fn_rc, result):
+        self.replies.append((fn_rc, result))
+
+
+def size_config(req_size, timeout=None):
+    config = {"resource": "res", "volnr": "0", "req_size": str(req_size)}
+    if timeout is not None:
+        config[WaiterRegistry.KEY_TIMEOUT] = str(timeout)
+    return config
+
+
+class WaiterRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.main_loop = MainLoop()
+        self.saved_gobject = waiters.gobject
+        waiters.gobject = self.main_loop
+        self.server = Server()
+        self.registry = WaiterRegistry(self.server)
+        self.replies = Replies()
+
+    def tearDown(self):
+        waiters.gobject = self.saved_gobject
+
+    def test_finished_immediately(self):
+        """replies immediately if the policy is fulfilled already"""
+        fn_rc, result = self.registry.register(
+            "volume-size", size_config(100), self.replies
+        )
+        self.assertEqual(BOOL_TRUE, result["result"])
+        self.assertEqual(0, self.registry.get_waiter_count())
+        self.assertEqual([], self.replies.replies)
+
+    def test_register(self):
+        """registers a waiter if the policy is not fulfilled yet"""
+        self.assertEqual(
+            None,
+            self.registry.register("volume-size", size_config(200), self.replies)
+        )
+        self.assertEqual(1, self.registry.get_waiter_count())
+        self.assertEqual({}, self.main_loop.timeouts)
+
+    def test_unknown_wait_type(self):
+        """rejects unknown wait types"""
+        fn_rc, result = self.registry.register("unknown", {}, self.replies)
+        self.assertEqual(DME.DM_EINVAL, fn_rc[0][0])
+        self.assertEqual(0, self.registry.get_waiter_count())
+
+    def test_invalid_config(self):
+        """rejects configurations that the policy cannot evaluate"""
+        fn_rc, result = self.registry.register(
+            "volume-size", {"resource": "res"}, self.replies
+        )
+        self.assertEqual(DME.DM_EINVAL, fn_rc[0][0])
+        fn_rc, result = self.registry.register(
+            "volume-size", size_config(200, "never"), self.replies
+        )
+        self.assertEqual(DME.DM_EINVAL, fn_rc[0][0])
+        self.assertEqual(0, self.registry.get_waiter_count())
+
+    def test_evaluation(self):
+        """replies once the policy is fulfilled after a change"""
+        self.registry.register("volume-size", size_config(200, 10), self.replies)
+        self.registry.schedule_evaluation()
+        self.main_loop.run_idle()
+        self.assertEqual([], self.replies.replies)
+        self.assertEqual(1, self.registry.get_waiter_count())
+
+        self.server.volume.size_kiB = 200
+        self.registry.schedule_evaluation()
+        self.main_loop.run_idle()
+        self.assertEqual(1, len(self.replies.replies))
+        fn_rc, result = self.replies.replies[0]
+        self.assertEqual(BOOL_TRUE, result["result"])
+        self.assertEqual(0, self.registry.get_waiter_count())
+        # The timer was stopped
+        self.assertEqual({}, self.main_loop.timeouts)
+
+        # Removed waiters do not reply again
+        self.registry.schedule_evaluation()
+        self.main_loop.run_idle()
+        self.assertEqual(1, len(self.replies.replies))
+
+    def test_coalesce(self):
+        """schedules a single evaluation for multiple changes"""
+        self.registry.register("volume-size", size_config(200), self.replies)
+        self.registry.schedule_evaluation()
+        self.registry.schedule_evaluation()
+        self.assertEqual(1, len(self.main_loop.idle))
+        self.main_loop.run_idle()
+        self.registry.schedule_evaluation()
+        self.assertEqual(1, len(self.main_loop.idle))
+
+    def test_no_waiters(self):
+        """does not schedule an evaluation without waiters"""
+        self.registry.schedule_evaluation()
+        self.assertEqual([], self.main_loop.idle)
+
+    def test_failure(self):
+        """replies with the error if the policy cannot be evaluated anymore"""
+        self.registry.register("volume-size", size_config(200), self.replies)
+        del self.server._resources["res"]
+        self.registry.schedule_evaluation()
+        self.main_loop.run_idle()
+        fn_rc, result = self.replies.replies[0]
+        self.assertEqual(DME.DM_ENOENT, fn_rc[0][0])
+        self.assertEqual(0, self.registry.get_waiter_count())
+
+    def test_timeout(self):
+        """replies with a timeout and removes the waiter"""
+        self.registry.register("volume-size", size_config(200, 1.5), self.replies)
+        self.assertEqual(1, len(self.main_loop.timeouts))
+        timer_id, (interval, fn, args) = self.main_loop.timeouts.items()[0]
+        self.assertEqual(1500, interval)
+        self.main_loop.expire(timer_id)
+        fn_rc, result = self.replies.replies[0]
+        self.assertEqual(DME.DM_SUCCESS, fn_rc[0][0])
+        self.assertEqual(BOOL_FALSE, result["result"])
+        self.assertEqual(BOOL_TRUE, result["timeout"])
+        self.assertEqual(0, self.registry.get_waiter_count())
+
+        # A change after the timeout does not reply again
+        self.server.volume.size_kiB = 200
+        self.registry.schedule_evaluation()
+        self.main_loop.run_idle()
+        self.assertEqual(1, len(self.replies.replies))
+
+    def test_reply_failure(self):
+        """removes the waiter if the client cannot receive the reply"""
+        def reply_fn(fn_rc, result):
+            raise IOError("disconnected")
+        self.registry.register("volume-size", size_config(200), reply_fn)
+        self.server.volume.size_kiB = 200
+        self.registry.schedule_evaluation()
+        self.main_loop.run_idle()
+        self.assertEqual(0, self.registry.get_waiter_count())
+
+
+class Persistence(object):
+
+    """Persistence layer that does not save the configuration"""
+
+    def save(self, objects_root):
+        pass
+
+    def get_hash_obj(self):
+        return None
+
+    def get_containers(self):
+        return None
+
+
+class ServerEvaluationTests(unittest.TestCase):
+
+    """Evaluation of the waiters after the server's configuration changed"""
+
+    def setUp(self):
+        self.main_loop = MainLoop()
+        self.saved_gobject = waiters.gobject
+        waiters.gobject = self.main_loop
+        srv = server.DrbdManageServer
+        self.server = srv.__new__(srv)
+        self.server._resources = Server()._resources
+        self.server._cluster_conf = PropsContainer(lambda: 1, None, None)
+        self.server._dispatcher = RequestDispatcher()
+        self.server._waiters = WaiterRegistry(self.server)
+        self.replies = Replies()
+        self.server._waiters.register(
+            "volume-size", size_config(200), self.replies
+        )
+        self.server._resources["res"].get_volume(0).size_kiB = 200
+
+    def tearDown(self):
+        waiters.gobject = self.saved_gobject
+
+    def test_save_conf_data(self):
+        """evaluates the waiters after the configuration was saved"""
+        self.server._objects_root = {}
+        self.server.save_conf_data(Persistence())
+        self.main_loop.run_idle()
+        self.assertEqual(1, len(self.replies.replies))
+
+    def test_update_objects(self):
+        """evaluates the waiters after the configuration was reloaded"""
+        srv = server.DrbdManageServer
+        resources = self.server._resources
+        self.server._objects_root = {
+            srv.OBJ_NODES_NAME:     {},
+            srv.OBJ_RESOURCES_NAME: resources,
+            srv.OBJ_CCONF_NAME:     self.server._cluster_conf,
+            srv.OBJ_SCONF_NAME:     {},
+            srv.OBJ_COMMON_NAME:    None,
+            srv.OBJ_SGEN_NAME:      None,
+            srv.OBJ_PCONF_NAME:     {},
+            srv.OBJ_PERSIST_NAME:   None,
+            srv.OBJ_MSGLOG_NAME:    None
+        }
+        self.server.update_objects()
+        self.main_loop.run_idle()
+        self.assertEqual(1, len(self.replies.replies))
+
+
+if __name__ == "__main__":
+    unittest.main()